@@ -12,6 +12,9 @@ from volttron.platform.messaging import topics
 from dateutil.parser import parse
 import json
 
+from simulation_data.profiles import DEFAULT_PERIOD_HOURS, SimulationProfile
+from simulation_data.timeseries import load_series, read_load_columns, read_pv_columns
+
 utils.setup_logging()
 _log = logging.getLogger(__name__)
 
@@ -77,6 +80,7 @@ class ReferenceAppAgent(Agent):
             "opt_type": "optIn",            # optIn or optOut
             "report_interval_secs": 30,     # How often to issue RPCs to the VEN agent
             "baseline_power_kw": 6.2,       # Simulated baseline power measurement (constant)
+            "precompute_profiles": False,   # Report expected Load and PV values from the reference data
         }
         self.vip.config.subscribe(self.configure, actions=["NEW", "UPDATE"], pattern="config")
         self.config = utils.load_config(config_path)
@@ -114,6 +118,7 @@ class ReferenceAppAgent(Agent):
         self.report_interval_secs = self.config_for('report_interval_secs')
         self.baseline_power_kw = self.config_for('baseline_power_kw')
         self.default_opt_type=self.config_for('opt_type')
+        self.precompute_profiles = self.config_for('precompute_profiles')
 
         self.sim_topics = []                # Which data elements to track and report
         self.sim_power_topics = []          # Which data elements to sum when deriving net power
@@ -154,6 +159,7 @@ class ReferenceAppAgent(Agent):
         self.last_report = None
         self.sim_data = {}
         self.simulation_started = None
+        self.profile = None
         self.validate_config()
 
     def config_for(self, parameter_name):
@@ -191,6 +197,7 @@ class ReferenceAppAgent(Agent):
         assert type(self.report_file_path) is str
         self.report_file_path = os.path.expandvars(os.path.expanduser(self.report_file_path))
         assert type(self.sim_driver_list) is list
+        assert type(self.precompute_profiles) is bool
 
         if self.simload:
             assert type(self.load_timestamp_column_header) is str
@@ -249,6 +256,9 @@ class ReferenceAppAgent(Agent):
         @param message: The point's scraped value.
         """
         if self.simulation_started and topic in self.sim_topics:
+            if self.profile and topic in self.profile.columns:
+                # The point's expected value comes from the precomputed profile.
+                return
             self.sim_data[topic] = message[0]
 
     def reserve_battery(self):
@@ -269,7 +279,9 @@ class ReferenceAppAgent(Agent):
             First, stop any previous simulation that's still running.
             Then send initialization parameters to each configured driver.
             Then start the clock.
-            At regular intervals, write a line to a CSV output file with the latest scraped point values.
+            If precompute_profiles is configured, precompute the expected Load and PV values.
+            At regular intervals, write a line to a CSV output file with the latest scraped point values
+            (or, for precomputed points, the profile's values at the current simulated time).
             When the clock stops, close the output file.
         """
         # Stop the previous simulation, if any, forcing data files to be reloaded.
@@ -314,6 +326,7 @@ class ReferenceAppAgent(Agent):
                 self.last_report = curr_time
 
         self.initialize_drivers()
+        self.profile = self.build_profile() if self.precompute_profiles else None
 
         if self.simpv:
             self.cancel_actuator_schedule('init_simpv')
@@ -354,6 +367,8 @@ class ReferenceAppAgent(Agent):
                         break
                     else:
                         self.sim_data['report_time'] = sim_time
+                        if self.profile:
+                            self.update_from_profile(sim_time)
                         self.calculate_net_power()
                         data_by_col = {self.rpt_headers[topic]: self.sim_data[topic] if topic in self.sim_data else ''
                                        for topic in self.sim_topics}
@@ -383,6 +398,59 @@ class ReferenceAppAgent(Agent):
         if self.simstorage:
             self.cancel_actuator_schedule('init_simstorage')
 
+    def build_profile(self):
+        """
+            Precompute the expected Load and PV values for the configured simulation period.
+
+            The Storage values depend on OpenADR events, so they are still scraped.
+            If the simulation has no stop time, the profile covers its first DEFAULT_PERIOD_HOURS;
+            past the profile's end, scraped values are reported instead.
+
+        @return: A SimulationProfile, or None if the reference data couldn't be loaded.
+        """
+        start = parse_timestamp_string(self.sim_start)
+        end = parse_timestamp_string(self.sim_end) if self.sim_end else start + timedelta(hours=DEFAULT_PERIOD_HOURS)
+        profile = SimulationProfile(start, end)
+        try:
+            if self.simload:
+                profile.add_load('devices/{}'.format(self.simload),
+                                 load_series(self.load_csv_file_path,
+                                             read_load_columns,
+                                             self.load_data_frequency_min,
+                                             self.load_data_year,
+                                             self.load_timestamp_column_header,
+                                             self.load_power_column_header))
+            if self.simpv:
+                profile.add_pv('devices/{}'.format(self.simpv),
+                               load_series(self.pv_csv_file_path,
+                                           read_pv_columns,
+                                           self.pv_data_frequency_min,
+                                           self.pv_data_year),
+                               self.pv_panel_area,
+                               self.pv_efficiency)
+        except (EnvironmentError, ValueError), err:
+            _log.warning('Unable to precompute profiles, reporting scraped values: {}'.format(err))
+            return None
+        _log.info('Precomputed {} profile steps for {}'.format(profile.steps, sorted(profile.columns)))
+        return profile
+
+    def update_from_profile(self, sim_time):
+        """
+            Copy the profile's values at the current simulated time into sim_data.
+
+            Once the simulated time passes the end of the profile, stop using it.
+
+        @param sim_time: The simulated time reported by the clock.
+        """
+        values = self.profile.values_at(parse_timestamp_string(sim_time))
+        if values:
+            self.sim_data.update(values)
+        else:
+            _log.info('Simulated time {} is outside the precomputed profile, reporting scraped values'.format(sim_time))
+            for topic in self.profile.columns:
+                self.sim_data.pop(topic, None)
+            self.profile = None
+
     def initialize_drivers(self):
         """
             Send initialization parameters to each driver.
@@ -12,6 +12,8 @@
 AGENT_ROOT=$VOLTTRON_ROOT/applications/kisensum/Simulation/SimulationAgent
 
 cd $VOLTTRON_ROOT
+# The simulation reference data package is shared by the simulation drivers and agents.
+pip install $VOLTTRON_ROOT/applications/kisensum/Simulation/SimulationData
 export VIP_SOCKET="ipc://$VOLTTRON_HOME/run/vip.socket"
 python scripts/install-agent.py \
     -s $AGENT_ROOT \
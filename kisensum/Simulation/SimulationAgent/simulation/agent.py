@@ -62,6 +62,9 @@ from volttron.platform.agent import utils
 from volttron.platform.agent.utils import parse_timestamp_string
 from volttron.platform.vip.agent import Agent, Core, PubSub, errors
 
+from simulation_data.profiles import DEFAULT_PERIOD_HOURS, SimulationProfile
+from simulation_data.timeseries import load_series, read_load_columns, read_pv_columns
+
 utils.setup_logging()
 _log = logging.getLogger(__name__)
 
@@ -128,7 +131,8 @@ class SimulationAgent(Agent):
             'storage_reduced_charge_soc_threshold': 0.80,           # Charging is reduced if SOC % > this value
             'storage_reduced_discharge_soc_threshold': 0.20,        # Discharging is reduced if SOC % < this value
             'storage_setpoint_rule': 'oscillation',
-            'sim_driver_list': ['simload', 'simmeter', 'simpv', 'simstorage']
+            'sim_driver_list': ['simload', 'simmeter', 'simpv', 'simstorage'],
+            'precompute_profiles': False                    # Report expected Load/PV/Storage values from the reference data
         }
         self.vip.config.subscribe(self.configure, actions=["NEW", "UPDATE"], pattern="config")
         self.config = utils.load_config(config_path)
@@ -162,6 +166,7 @@ class SimulationAgent(Agent):
         self.storage_reduced_discharge_soc_threshold = self.config_for('storage_reduced_discharge_soc_threshold')
         self.storage_setpoint_rule = self.config_for('storage_setpoint_rule')
         self.sim_driver_list = self.config_for('sim_driver_list')
+        self.precompute_profiles = self.config_for('precompute_profiles')
         self.validate_config()
 
         self.sim_topics = []                # Which data elements to track and report
@@ -186,6 +191,8 @@ class SimulationAgent(Agent):
         self.last_report = None
         self.sim_data = {}
         self.simulation_started = None
+        self.profile = None
+        self.storage_dispatch_kw = None
 
     def config_for(self, parameter_name):
         """
@@ -221,6 +228,7 @@ class SimulationAgent(Agent):
         assert type(self.report_file_path) is str
         self.report_file_path = os.path.expandvars(os.path.expanduser(self.report_file_path))
         assert type(self.sim_driver_list) is list
+        assert type(self.precompute_profiles) is bool
 
         if 'simload' in self.sim_driver_list:
             assert type(self.load_timestamp_column_header) is str
@@ -273,6 +281,9 @@ class SimulationAgent(Agent):
         @param message: The point's scraped value.
         """
         if self.simulation_started and topic in self.sim_topics:
+            if self.profile and topic in self.profile.columns:
+                # The point's expected value comes from the precomputed profile.
+                return
             self.sim_data[topic] = message[0]
 
     def run_simulation(self):
@@ -281,8 +292,10 @@ class SimulationAgent(Agent):
 
             First, stop any previous simulation that's still running.
             Then send initialization parameters to each configured driver.
+            If precompute_profiles is configured, precompute the expected Load, PV and Storage values.
             Then start the clock.
-            At regular intervals, write a line to a CSV output file with the latest scraped point values.
+            At regular intervals, write a line to a CSV output file with the latest scraped point values
+            (or, for precomputed points, the profile's values at the current simulated time).
             When the clock stops, close the output file.
         """
         # Stop the previous simulation, if any, forcing data files to be reloaded.
@@ -302,6 +315,8 @@ class SimulationAgent(Agent):
             self.set_point('simmeter', 'power_kw', 0.0)
 
         self.simulation_started = None
+        self.storage_dispatch_kw = None
+        self.profile = self.build_profile() if self.precompute_profiles else None
 
         # Start the new simulation
         while not self.simulation_started:
@@ -346,6 +361,8 @@ class SimulationAgent(Agent):
                         break
                     else:
                         self.sim_data['report_time'] = sim_time
+                        if self.profile:
+                            self.update_from_profile(sim_time)
                         self.sim_data['net_power_kw'] = sum(self.sim_data[topic] if topic in self.sim_data else 0.0
                                                             for topic in self.sim_power_topics)
                         data_by_col = {self.rpt_headers[topic]: self.sim_data[topic] if topic in self.sim_data else ''
@@ -359,13 +376,18 @@ class SimulationAgent(Agent):
 
                         if 'simstorage' in self.sim_driver_list:
                             # Send a new dispatch setpoint to the storage simulation
-                            if self.storage_setpoint_rule == 'oscillation':
+                            if self.profile:
+                                # The profile's dispatch is only sent when it changes.
+                                storage_setpoint = self.sim_data['devices/simstorage/dispatch_kw']
+                            elif self.storage_setpoint_rule == 'oscillation':
                                 storage_setpoint = self.oscillation_setpoint()
                             else:
                                 # By default, send the storage/battery a command to charge up at max power
                                 storage_setpoint = self.storage_max_charge_kw
-                            _log.debug('\t\tSetting storage dispatch to {} kW'.format(storage_setpoint))
-                            self.set_point('simstorage', 'dispatch_kw', storage_setpoint)
+                            if not self.profile or storage_setpoint != self.storage_dispatch_kw:
+                                _log.debug('\t\tSetting storage dispatch to {} kW'.format(storage_setpoint))
+                                self.set_point('simstorage', 'dispatch_kw', storage_setpoint)
+                                self.storage_dispatch_kw = storage_setpoint
 
                     time.sleep(self.report_interval)
 
@@ -424,30 +446,105 @@ class SimulationAgent(Agent):
             self.set_point('simstorage', 'reduced_discharge_soc_threshold',
                            self.storage_reduced_discharge_soc_threshold)
 
+    def build_profile(self):
+        """
+            Precompute the expected Load, PV and Storage values for the configured simulation period.
+
+            If the simulation has no stop time, the profile covers its first DEFAULT_PERIOD_HOURS;
+            past the profile's end, scraped values are reported instead.
+
+        @return: A SimulationProfile, or None if the reference data couldn't be loaded.
+        """
+        start = parse_timestamp_string(self.sim_start)
+        end = parse_timestamp_string(self.sim_end) if self.sim_end else start + timedelta(hours=DEFAULT_PERIOD_HOURS)
+        profile = SimulationProfile(start, end)
+        try:
+            if 'simload' in self.sim_driver_list:
+                profile.add_load('devices/simload',
+                                 load_series(self.load_csv_file_path,
+                                             read_load_columns,
+                                             self.load_data_frequency_min,
+                                             self.load_data_year,
+                                             self.load_timestamp_column_header,
+                                             self.load_power_column_header))
+            if 'simpv' in self.sim_driver_list:
+                profile.add_pv('devices/simpv',
+                               load_series(self.pv_csv_file_path,
+                                           read_pv_columns,
+                                           self.pv_data_frequency_min,
+                                           self.pv_data_year),
+                               self.pv_panel_area,
+                               self.pv_efficiency)
+        except (EnvironmentError, ValueError), err:
+            _log.warning('Unable to precompute profiles, reporting scraped values: {}'.format(err))
+            return None
+        if 'simstorage' in self.sim_driver_list:
+            if self.storage_setpoint_rule == 'oscillation':
+                dispatch_rule = self.oscillation_dispatch
+            else:
+                dispatch_rule = lambda soc, prior_dispatch: self.storage_max_charge_kw
+            profile.add_storage('devices/simstorage',
+                                self.storage_soc_kwh,
+                                self.storage_max_soc_kwh,
+                                self.storage_max_charge_kw,
+                                self.storage_max_discharge_kw,
+                                self.storage_reduced_charge_soc_threshold,
+                                self.storage_reduced_discharge_soc_threshold,
+                                dispatch_rule,
+                                self.report_interval * self.sim_speed)
+        _log.info('Precomputed {} profile steps for {}'.format(profile.steps, sorted(profile.columns)))
+        return profile
+
+    def update_from_profile(self, sim_time):
+        """
+            Copy the profile's values at the current simulated time into the reported data.
+
+            Once the simulated time passes the end of the profile, stop using it.
+
+        @param sim_time: The simulated time reported by the clock.
+        """
+        values = self.profile.values_at(parse_timestamp_string(sim_time))
+        if values:
+            self.sim_data.update(values)
+        else:
+            _log.info('Simulated time {} is outside the precomputed profile, reporting scraped values'.format(sim_time))
+            for topic in self.profile.columns:
+                self.sim_data.pop(topic, None)
+            self.profile = None
+
     def oscillation_setpoint(self):
         """
             Default algorithm for calculating dispatch power to send to the storage simulation (battery).
 
+            See oscillation_dispatch. Before the storage device's SOC has been scraped, dispatch_kw is positive.
+        """
+        if 'devices/simstorage/soc_kwh' in self.sim_data:
+            return self.oscillation_dispatch(self.sim_data['devices/simstorage/soc_kwh'],
+                                             self.sim_data['devices/simstorage/dispatch_kw'])
+        else:
+            return self.positive_dispatch_kw
+
+    def oscillation_dispatch(self, soc, prior_dispatch):
+        """
             Oscillate between charging/discharging:
             . If SOC < x%, dispatch_kw is a positive constant
             . If SOC > y%, dispatch_kw is a negative constant
             . Otherwise dispatch_kw is a +/- constant, with the sign unchanged from its previous value.
             . The effect is a slow oscillation in the battery's dispatch power and SOC.
+
+        @param soc: The storage device's SOC in kWh.
+        @param prior_dispatch: The storage device's previous dispatch power in kW.
+        @return: The new dispatch power in kW.
         """
-        if 'devices/simstorage/soc_kwh' in self.sim_data:
-            soc = self.sim_data['devices/simstorage/soc_kwh']
-            prior_dispatch = self.sim_data['devices/simstorage/dispatch_kw']
-            if soc < self.go_positive_if_below * self.storage_max_soc_kwh:
+        if soc < self.go_positive_if_below * self.storage_max_soc_kwh:
+            dispatch_kw = self.positive_dispatch_kw
+        elif soc > self.go_negative_if_above * self.storage_max_soc_kwh:
+            dispatch_kw = self.negative_dispatch_kw
+        else:
+            if prior_dispatch >= 0.0:
                 dispatch_kw = self.positive_dispatch_kw
-            elif soc > self.go_negative_if_above * self.storage_max_soc_kwh:
-                dispatch_kw = self.negative_dispatch_kw
             else:
-                if prior_dispatch >= 0.0:
-                    dispatch_kw = self.positive_dispatch_kw
-                else:
-                    dispatch_kw = self.negative_dispatch_kw
-        else:
-            dispatch_kw = self.positive_dispatch_kw
+                dispatch_kw = self.negative_dispatch_kw
         return dispatch_kw
 
     def set_point(self, driver_name, point_name, value):
@@ -56,13 +56,18 @@ import logging
 import sys
 
 from volttron.platform.agent import utils
-from volttron.platform.vip.agent import Agent, RPC
+from volttron.platform.vip.agent import Agent, PubSub, RPC
 
 _log = logging.getLogger(__name__)
 utils.setup_logging()
 
 __version__ = "1.0"
 
+# Fast-forward (lock-step) simulation topics
+CLOCK_TICK_TOPIC = 'simulation/clock/tick'
+CLOCK_ACK_TOPIC = 'simulation/clock/ack'
+CLOCK_STOP_TOPIC = 'simulation/clock/stop'
+
 
 def simulation_clock_agent(config_path, **kwargs):
     """
@@ -90,6 +95,10 @@ class SimulationClockAgent(Agent):
 
         Agents participating in a simulation should issue an RPC get_time() call to
         this agent whenever they need a simulated time.
+
+        Alternatively, a simulation can be run in fast-forward (lock-step) mode,
+        which advances the clock as fast as the participants can keep up rather than
+        following the wall clock. See initialize_fast_forward().
     """
 
     def __init__(self, config_path, **kwargs):
@@ -110,6 +119,15 @@ class SimulationClockAgent(Agent):
         self.simulated_stop_time = None
         self.speed = None
 
+        # Fast-forward state
+        self.tick_interval = None
+        self.tick = None
+        self.simulated_time = None
+        self.participants = []
+        self.pending_acks = set()
+        self.ack_timeout = None
+        self.ack_timeout_event = None
+
     def configure(self, config_name, action, contents):
         """
             Initialize the agent configuration.
@@ -148,20 +166,10 @@ class SimulationClockAgent(Agent):
         @param speed: A multiplier (float) that makes the simulation run faster or slower than real time.
         @return: A string, either an error message or a confirmation that the simulation has started.
         """
-        try:
-            parsed_start_time = utils.parse_timestamp_string(simulated_start_time)
-        except ValueError:
-            _log.debug('Failed to parse simulated_start_time {}'.format(simulated_start_time))
-            return 'Invalid simulated_start_time'
-
-        if simulated_stop_time:
-            try:
-                parsed_stop_time = utils.parse_timestamp_string(simulated_stop_time)
-            except ValueError:
-                _log.debug('Failed to parse simulated_stop_time {}'.format(simulated_stop_time))
-                return 'Invalid simulated_stop_time'
-        else:
-            parsed_stop_time = None
+        parsed_start_time, parsed_stop_time, error = self.parse_start_stop_times(simulated_start_time,
+                                                                                 simulated_stop_time)
+        if error:
+            return error
 
         if speed is not None:
             try:
@@ -175,10 +183,7 @@ class SimulationClockAgent(Agent):
         else:
             parsed_speed = 1.0
 
-        if parsed_stop_time and (parsed_stop_time < parsed_start_time):
-            _log.debug('Asked to initialize with out-of-order start/stop times')
-            return 'simulated_stop_time is earlier than simulated_start_time'
-
+        self.stop_fast_forward()
         self.actual_start_time = utils.get_aware_utc_now()
         self.simulated_start_time = parsed_start_time
         self.simulated_stop_time = parsed_stop_time
@@ -188,6 +193,163 @@ class SimulationClockAgent(Agent):
         _log.debug('Initializing clock to run at: {} times normal'.format(self.speed))
         return 'Simulation started at {}'.format(self.actual_start_time)
 
+    @RPC.export
+    def initialize_fast_forward(self, simulated_start_time, simulated_stop_time=None, tick_seconds=60.0,
+                                participants=None, ack_timeout=30.0):
+        """
+            Start a fast-forward (lock-step) simulation.
+
+            Instead of following the wall clock, the simulated clock advances by tick_seconds
+            as soon as every participant has acknowledged the previous tick, so the simulation
+            runs as fast as its participants can process the ticks.
+
+            Each tick is published once on simulation/clock/tick with the message
+            {'tick': <tick number>, 'timestamp': <simulated time string>}.
+            A participant acknowledges it, once it has finished with the tick, by publishing
+            {'tick': <tick number>, 'participant': <its VIP identity>} on simulation/clock/ack.
+            A participant that does not acknowledge within ack_timeout seconds is logged and skipped.
+            When the simulation passes simulated_stop_time (or is stopped), a message is published
+            on simulation/clock/stop.
+
+            get_time() returns the time of the current tick.
+
+        @param simulated_start_time: The simulated-clock time at which the simulation will start.
+        @param simulated_stop_time: The simulated-clock time at which the simulation will stop (can be None).
+        @param tick_seconds: The simulated time (float, in seconds) between ticks.
+        @param participants: VIP identities that acknowledge each tick. Defaults to the simulation driver.
+        @param ack_timeout: Seconds (float) to wait for acknowledgements; 0 or None waits indefinitely.
+        @return: A string, either an error message or a confirmation that the simulation has started.
+        """
+        parsed_start_time, parsed_stop_time, error = self.parse_start_stop_times(simulated_start_time,
+                                                                                 simulated_stop_time)
+        if error:
+            return error
+
+        try:
+            parsed_tick_seconds = float(tick_seconds)
+        except (TypeError, ValueError):
+            _log.debug('Failed to parse tick_seconds {}'.format(tick_seconds))
+            return 'Invalid tick_seconds'
+        if parsed_tick_seconds <= 0.0:
+            _log.debug('Asked to initialize with a zero or negative tick_seconds')
+            return 'Asked to initialize with a zero or negative tick_seconds'
+
+        if participants is None:
+            participants = ['simulation.driver']
+        if not participants:
+            return 'No participants to acknowledge the ticks'
+
+        self.stop_simulation()
+        self.actual_start_time = utils.get_aware_utc_now()
+        self.simulated_start_time = parsed_start_time
+        self.simulated_stop_time = parsed_stop_time
+        self.tick_interval = timedelta(seconds=parsed_tick_seconds)
+        self.tick = 0
+        self.simulated_time = parsed_start_time
+        self.participants = list(participants)
+        self.ack_timeout = float(ack_timeout) if ack_timeout else None
+        _log.debug('Initializing fast-forward clock at {} to start at: {}'.format(self.actual_start_time,
+                                                                                self.simulated_start_time))
+        _log.debug('Initializing fast-forward clock to stop at:  {}'.format(self.simulated_stop_time))
+        _log.debug('Initializing fast-forward clock to tick every {} for {}'.format(self.tick_interval,
+                                                                                  self.participants))
+        self.publish_tick()
+        return 'Simulation started at {}'.format(self.actual_start_time)
+
+    @staticmethod
+    def parse_start_stop_times(simulated_start_time, simulated_stop_time):
+        """
+            Parse and validate a simulation's start and stop times.
+
+        @param simulated_start_time: The simulated-clock start time string.
+        @param simulated_stop_time: The simulated-clock stop time string (can be None).
+        @return: (start datetime, stop datetime or None, error message or None)
+        """
+        try:
+            parsed_start_time = utils.parse_timestamp_string(simulated_start_time)
+        except ValueError:
+            _log.debug('Failed to parse simulated_start_time {}'.format(simulated_start_time))
+            return None, None, 'Invalid simulated_start_time'
+
+        if simulated_stop_time:
+            try:
+                parsed_stop_time = utils.parse_timestamp_string(simulated_stop_time)
+            except ValueError:
+                _log.debug('Failed to parse simulated_stop_time {}'.format(simulated_stop_time))
+                return None, None, 'Invalid simulated_stop_time'
+        else:
+            parsed_stop_time = None
+
+        if parsed_stop_time and (parsed_stop_time < parsed_start_time):
+            _log.debug('Asked to initialize with out-of-order start/stop times')
+            return None, None, 'simulated_stop_time is earlier than simulated_start_time'
+        return parsed_start_time, parsed_stop_time, None
+
+    def publish_tick(self):
+        """Publish the current fast-forward tick, or end the simulation if it is past the stop time."""
+        if self.simulated_stop_time and self.simulated_time > self.simulated_stop_time:
+            _log.debug('Fast-forward simulation ended after {} ticks'.format(self.tick))
+            self.publish_stop()
+            return
+        self.pending_acks = set(self.participants)
+        if self.ack_timeout:
+            deadline = utils.get_aware_utc_now() + timedelta(seconds=self.ack_timeout)
+            self.ack_timeout_event = self.core.schedule(deadline, self.ack_timed_out, self.tick)
+        self.vip.pubsub.publish('pubsub', CLOCK_TICK_TOPIC,
+                                message={'tick': self.tick, 'timestamp': str(self.simulated_time)})
+
+    def publish_stop(self):
+        """Tell the participants that the fast-forward simulation is over."""
+        self.pending_acks = set()
+        self.vip.pubsub.publish('pubsub', CLOCK_STOP_TOPIC,
+                                message={'tick': self.tick, 'timestamp': str(self.simulated_time)})
+
+    def advance_tick(self):
+        """Move the fast-forward clock to the next tick and publish it."""
+        if self.ack_timeout_event:
+            self.ack_timeout_event.cancel()
+            self.ack_timeout_event = None
+        self.tick += 1
+        self.simulated_time += self.tick_interval
+        self.publish_tick()
+
+    @PubSub.subscribe('pubsub', CLOCK_ACK_TOPIC)
+    def on_tick_ack(self, peer, sender, bus, topic, headers, message):
+        """
+            Record a participant's acknowledgement of a fast-forward tick.
+
+            When every participant has acknowledged the current tick, advance the clock.
+        """
+        if self.tick_interval is None or not self.pending_acks or message.get('tick') != self.tick:
+            return
+        self.pending_acks.discard(message.get('participant'))
+        if not self.pending_acks:
+            self.advance_tick()
+
+    def ack_timed_out(self, tick):
+        """Advance the clock when some participants did not acknowledge a tick in time."""
+        if self.tick_interval is None or tick != self.tick or not self.pending_acks:
+            return
+        self.ack_timeout_event = None
+        _log.warning('No acknowledgement of tick {} from {}'.format(tick, ', '.join(sorted(self.pending_acks))))
+        self.advance_tick()
+
+    def stop_fast_forward(self):
+        """End a fast-forward simulation that is in progress, if any."""
+        if self.tick_interval is None:
+            return
+        if self.ack_timeout_event:
+            self.ack_timeout_event.cancel()
+        if self.pending_acks:
+            self.publish_stop()
+        self.tick_interval = None
+        self.tick = None
+        self.simulated_time = None
+        self.participants = []
+        self.pending_acks = set()
+        self.ack_timeout = None
+        self.ack_timeout_event = None
+
     @RPC.export
     def get_time(self):
         """
@@ -195,6 +357,10 @@ class SimulationClockAgent(Agent):
 
         @return: A Datetime string.
         """
+        if self.tick_interval is not None:
+            if self.simulated_stop_time and self.simulated_time > self.simulated_stop_time:
+                return 'Past the simulation stop time'
+            return str(self.simulated_time)
         if not (self.actual_start_time and self.simulated_start_time and self.speed):
             return 'No simulation is in progress'
         elapsed_seconds = (utils.get_aware_utc_now() - self.actual_start_time).seconds
@@ -213,6 +379,7 @@ class SimulationClockAgent(Agent):
         @return: A confirmation message.
         """
         _log.debug('Stopping simulation')
+        self.stop_fast_forward()
         self.actual_start_time = None
         self.simulated_start_time = None
         self.simulated_stop_time = None
@@ -150,6 +150,29 @@ class TestSimulationClock:
         response = self.start_one_for_one_simulation(agent, '2017-01-01 08:00', '2017-01-01 10:00')
         assert 'started' in response
 
+    def test_fast_forward_simulation(self, agent):
+        """Confirm that a fast-forward simulation clock advances by one tick each time the tick is acknowledged."""
+        response = self.issue_rpc_call(agent, 'initialize_fast_forward', '2017-01-01 08:00',
+                                       simulated_stop_time='2017-01-01 08:01', tick_seconds=60.0,
+                                       participants=[agent.core.identity], ack_timeout=0)
+        assert 'started' in response
+        assert str(self.get_time(agent)) == str(utils.parse_timestamp_string('2017-01-01 08:00'))
+
+        self.acknowledge_tick(agent, 0)
+        assert str(self.get_time(agent)) == str(utils.parse_timestamp_string('2017-01-01 08:01'))
+
+        self.acknowledge_tick(agent, 1)
+        assert self.get_time(agent) == 'Past the simulation stop time'
+
+        response = self.stop_simulation(agent)
+        assert response == 'Simulation stopped'
+        assert self.get_time(agent) == 'No simulation is in progress'
+
+    def test_invalid_tick_seconds(self, agent):
+        """Confirm error returned when trying to initialize a fast-forward simulation with an invalid tick."""
+        response = self.issue_rpc_call(agent, 'initialize_fast_forward', '2017-01-01 08:00', tick_seconds='XX')
+        assert response == 'Invalid tick_seconds'
+
     def start_simulation(self, agt, start_time, stop_time, speed):
         """Issue an RPC call to initialize a simulation."""
         return self.issue_rpc_call(agt, 'initialize_clock', start_time, simulated_stop_time=stop_time, speed=speed)
@@ -171,6 +194,13 @@ class TestSimulationClock:
             parsed_response = response
         return parsed_response
 
+    @staticmethod
+    def acknowledge_tick(agt, tick):
+        """Acknowledge a fast-forward clock tick, and give the clock time to publish the next one."""
+        agt.vip.pubsub.publish('pubsub', 'simulation/clock/ack',
+                               message={'tick': tick, 'participant': agt.core.identity}).get(timeout=10)
+        gevent.sleep(1)
+
     def stop_simulation(self, agt):
         """Issue an RPC call to stop the current simulation."""
         return self.issue_rpc_call(agt, 'stop_simulation')
@@ -0,0 +1,8 @@
+from setuptools import setup, find_packages
+
+setup(
+    name='simulation_data',
+    version='1.0',
+    install_requires=['numpy'],
+    packages=find_packages('.', exclude=['tests']),
+)
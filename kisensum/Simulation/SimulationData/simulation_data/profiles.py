@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2017, SLAC National Laboratory / Kisensum Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor SLAC / Kisensum,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# SLAC / Kisensum. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# }}}
+
+"""
+    Expected point values of a simulation, precomputed from its reference data.
+
+    The Load and PV values are looked up in the drivers' reference time series (see timeseries.py)
+    the same way the simload and simpv drivers look them up, and the storage trajectory follows
+    the simstorage driver's power and SOC calculations. A profile holds one value per simulated minute.
+"""
+
+from array import array
+from datetime import timedelta
+import logging
+
+_log = logging.getLogger(__name__)
+
+STEP_SECONDS = 60                   # The profile holds one value per simulated minute
+DEFAULT_PERIOD_HOURS = 24           # Length of the profile when the simulation has no stop time
+
+
+class SimulationProfile(object):
+    """
+        Expected point values over a simulated period, one value per simulated minute.
+
+        Columns are keyed by point topic (for example devices/simload/power_kw), so a run loop
+        can merge the values for a simulated time into the data it reports.
+    """
+
+    def __init__(self, start, end):
+        """
+        :param start: (datetime) Start of the simulated period.
+        :param end: (datetime) End of the simulated period.
+        """
+        self.start = start
+        self.steps = int((end - start).total_seconds()) // STEP_SECONDS + 1
+        self.columns = {}
+
+    def times(self):
+        """Return a generator of the simulated time of each step."""
+        step = timedelta(seconds=STEP_SECONDS)
+        return (self.start + index * step for index in xrange(self.steps))
+
+    def index_of(self, sim_time):
+        """Return the step index of a simulated time, or None if the time is outside the profile."""
+        index = int((sim_time - self.start).total_seconds()) // STEP_SECONDS
+        return index if 0 <= index < self.steps else None
+
+    def values_at(self, sim_time):
+        """Return a dictionary of the expected point values at a simulated time, empty if it is outside the profile."""
+        index = self.index_of(sim_time)
+        if index is None:
+            return {}
+        return {topic: column[index] for topic, column in self.columns.iteritems()}
+
+    def reference_values(self, series):
+        """
+            Return a generator of a reference series' value at the simulated time of each step.
+
+            As in the simulation drivers, this is the sample at the next interval boundary after the time's minute.
+            It is None where the reference data has no value, or has no such date (February 29).
+
+        :param series: A timeseries.TimeSeries.
+        """
+        for sim_time in self.times():
+            try:
+                yield series.value_at(sim_time)
+            except ValueError:
+                yield None
+
+    def add_load(self, device_topic, series):
+        """
+            Add the power_kw column of a simulated Load.
+
+            Like the simload driver, a time without a (nonzero) reference value keeps the prior power.
+
+        :param device_topic: Topic prefix of the device's points, e.g. devices/simload.
+        :param series: The timeseries.TimeSeries of power values.
+        """
+        column = array('d')
+        power_kw = 0.0
+        for value in self.reference_values(series):
+            if value:
+                power_kw = value
+            column.append(power_kw)
+        self.columns[device_topic + '/power_kw'] = column
+
+    def add_pv(self, device_topic, series, panel_area, efficiency):
+        """
+            Add the power_kw column of a simulated PV.
+
+        :param device_topic: Topic prefix of the device's points, e.g. devices/simpv.
+        :param series: The timeseries.TimeSeries of irradiance values.
+        :param panel_area: (float) Panel area in m2.
+        :param efficiency: (float) Panel efficiency, from 0.0 to 1.0.
+        """
+        elapsed_time_hrs = series.interval_min / 60.0
+        column = array('d')
+        power_kw = 0.0
+        for irradiance_wh_m2 in self.reference_values(series):
+            if irradiance_wh_m2:
+                # The power_kw value is negated because the PV contributes power to the circuit
+                power_kw = -(irradiance_wh_m2 / 1000.0) * panel_area * efficiency / elapsed_time_hrs
+            column.append(power_kw)
+        self.columns[device_topic + '/power_kw'] = column
+
+    def add_storage(self, device_topic, soc_kwh, max_soc_kwh, max_charge_kw, max_discharge_kw,
+                    reduced_charge_soc_threshold, reduced_discharge_soc_threshold,
+                    dispatch_rule, dispatch_interval_secs):
+        """
+            Add the power_kw, soc_kwh and dispatch_kw columns of a simulated Storage device.
+
+            The dispatch power is recalculated at the given interval by calling dispatch_rule(soc_kwh, prior_dispatch_kw).
+
+        :param device_topic: Topic prefix of the device's points, e.g. devices/simstorage.
+        :param soc_kwh: (float) SOC at the start of the simulation.
+        :param dispatch_rule: Function returning the dispatch power for an SOC and the prior dispatch power.
+        :param dispatch_interval_secs: (float) Simulated seconds between dispatch changes.
+        """
+        dispatch_steps = max(1, int(round(dispatch_interval_secs / STEP_SECONDS)))
+        elapsed_time_hrs = STEP_SECONDS / 3600.0
+        power_column, soc_column, dispatch_column = array('d'), array('d'), array('d')
+        dispatch_kw = 0.0
+        for index in xrange(self.steps):
+            if index % dispatch_steps == 0:
+                dispatch_kw = dispatch_rule(soc_kwh, dispatch_kw)
+            soc_percent = soc_kwh / max_soc_kwh
+            if dispatch_kw >= 0:
+                if soc_percent <= reduced_charge_soc_threshold:
+                    adjustment_fraction = 1.0
+                else:
+                    adjustment_fraction = (max_soc_kwh - soc_kwh) / (max_soc_kwh - reduced_charge_soc_threshold * max_soc_kwh)
+                power_kw = min(adjustment_fraction * dispatch_kw, max_charge_kw)
+            else:
+                if soc_percent >= reduced_discharge_soc_threshold:
+                    adjustment_fraction = 1.0
+                else:
+                    adjustment_fraction = soc_kwh / (reduced_discharge_soc_threshold * max_soc_kwh)
+                power_kw = max(adjustment_fraction * dispatch_kw, -max_discharge_kw)
+            power_kw = int(1000 * power_kw) / 1000.0
+            if index:
+                soc_kwh = min(max(soc_kwh + power_kw * elapsed_time_hrs, 0.0), max_soc_kwh)
+                soc_kwh = int(1000 * soc_kwh) / 1000.0
+            power_column.append(power_kw)
+            soc_column.append(soc_kwh)
+            dispatch_column.append(dispatch_kw)
+        self.columns[device_topic + '/power_kw'] = power_column
+        self.columns[device_topic + '/soc_kwh'] = soc_column
+        self.columns[device_topic + '/dispatch_kw'] = dispatch_column
@@ -0,0 +1,502 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2017, SLAC National Laboratory / Kisensum Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor SLAC / Kisensum,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# SLAC / Kisensum. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# }}}
+"""
+    Fixed-interval reference time series for the simulation drivers.
+
+    The simulated Load and PV drivers look up a reference value (power, irradiance)
+    for the current simulated time on every scrape. Rather than keeping a year of CSV rows
+    in a dictionary indexed by formatted timestamp strings, the values are stored in a flat
+    array with one sample per data interval of the reference data's calendar year,
+    so a lookup is integer arithmetic on the simulated time's minute of the year.
+
+    The binary file format (little-endian) is a 24-byte header followed by the samples:
+
+        magic           8 bytes     'SIMTS001'
+        interval_min    uint32      Sample interval in minutes, e.g. 15 or 30
+        sample_count    uint32      Number of samples (minutes in the year / interval_min)
+        year            int32       Calendar year of the reference data
+        (padding)       4 bytes
+        samples         float64 * sample_count, NaN where the reference data has no value
+
+    Binary files are memory-mapped read-only, and each file is mapped once per process,
+    so all of the simulated devices that use the same reference data share its pages.
+    CSV files are still accepted by the drivers: they are parsed into arrays and converted
+    in memory the first time they are loaded, and the converted series is shared in the same way.
+    Gaps, duplicate timestamps and samples off the interval boundaries are reported at load time.
+    Convert them ahead of time with:
+
+        python -m simulation_data.timeseries load load_and_pv.csv load.simts \\
+            --year 2015 --frequency 15 --timestamp-column local_date --value-column load_kw
+        python -m simulation_data.timeseries pv nrel_pv_readings.csv pv.simts \\
+            --year 2015 --frequency 30
+
+    and set the driver's csv_file_path to the .simts file.
+"""
+import argparse
+import calendar
+import csv
+import logging
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+import weakref
+from datetime import datetime
+
+import numpy as np
+
+_log = logging.getLogger(__name__)
+
+MAGIC = b'SIMTS001'
+HEADER = struct.Struct('<8sIIi4x')
+SAMPLE = struct.Struct('<d')
+FILE_EXTENSION = '.simts'
+MINUTES_PER_DAY = 24 * 60
+
+# Minute of the year at which each month starts, for non-leap and leap years.
+_MONTH_START_MINUTE = {}
+for _leap in (False, True):
+    _days = [31, 29 if _leap else 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+    _MONTH_START_MINUTE[_leap] = [0] + [sum(_days[:m]) * MINUTES_PER_DAY for m in range(12)]
+
+# Time series that are currently mapped, by file path.
+_mapped_series = weakref.WeakValueDictionary()
+
+# Time series that are currently loaded from CSV files, by file path, modification time and CSV layout.
+_csv_series = weakref.WeakValueDictionary()
+
+
+def minute_of_year(timestamp, year):
+    """
+        Return the minute of the given year that has the timestamp's month, day, hour and minute.
+
+        This maps the simulated time onto the reference data's calendar year.
+
+    :param timestamp: (datetime) The simulated time.
+    :param year: (int) The year of the reference data.
+    :return: (int) Minutes since January 1 00:00 of the year.
+    """
+    leap = calendar.isleap(year)
+    if timestamp.month == 2 and timestamp.day == 29 and not leap:
+        raise ValueError('{} has no February 29'.format(year))
+    return (_MONTH_START_MINUTE[leap][timestamp.month] +
+            (timestamp.day - 1) * MINUTES_PER_DAY +
+            timestamp.hour * 60 +
+            timestamp.minute)
+
+
+class TimeSeries(object):
+    """
+        Samples of reference data at a fixed interval over a calendar year.
+
+        The samples are read from a buffer holding the binary file format described above,
+        either a read-only memory map of a .simts file or a bytearray built from a CSV file.
+    """
+
+    def __init__(self, buf, path=None):
+        magic, interval_min, sample_count, year = HEADER.unpack_from(buf, 0)
+        if magic != MAGIC:
+            raise ValueError('Not a simulation time series file: {}'.format(path))
+        if len(buf) < HEADER.size + sample_count * SAMPLE.size:
+            raise ValueError('Truncated simulation time series file: {}'.format(path))
+        self._buf = buf
+        self.path = path
+        self.interval_min = interval_min
+        self.sample_count = sample_count
+        self.year = year
+
+    @classmethod
+    def open(cls, path):
+        """
+            Memory-map a .simts file, or return the series already mapped from it.
+
+        :param path: Pathname of the binary time series file.
+        :return: A TimeSeries.
+        """
+        path = os.path.realpath(path)
+        series = _mapped_series.get(path)
+        if series is None:
+            with open(path, 'rb') as series_file:
+                buf = mmap.mmap(series_file.fileno(), 0, access=mmap.ACCESS_READ)
+            series = cls(buf, path)
+            _mapped_series[path] = series
+        return series
+
+    @classmethod
+    def from_samples(cls, samples, interval_min, year, path=None):
+        """
+            Build an in-memory series from (timestamp, value) pairs.
+
+            Samples that are not in the year, or not on an interval boundary, are skipped.
+
+        :param samples: Iterable of (datetime, float) pairs.
+        :param interval_min: (int) Sample interval in minutes.
+        :param year: (int) Calendar year of the series.
+        :param path: Pathname of the source data, for log messages.
+        :return: A TimeSeries.
+        """
+        return cls(series_bytes(samples, interval_min, year, path), path)
+
+    @classmethod
+    def from_columns(cls, fields, values, interval_min, year, path=None):
+        """
+            Build an in-memory series from arrays of timestamp fields and values.
+
+        :param fields: (n, 5) int array of year, month, day, hour and minute.
+        :param values: Array of n float values.
+        :param interval_min: (int) Sample interval in minutes.
+        :param year: (int) Calendar year of the series.
+        :param path: Pathname of the source data, for log messages.
+        :return: A TimeSeries.
+        """
+        return cls(columns_bytes(fields, values, interval_min, year, path), path)
+
+    def sample(self, index):
+        """Return the sample at the index, or None if the reference data has no value for it."""
+        value = SAMPLE.unpack_from(self._buf, HEADER.size + index * SAMPLE.size)[0]
+        return None if math.isnan(value) else value
+
+    def value_at(self, timestamp, interpolate=False):
+        """
+            Return the reference value for a simulated time.
+
+            Without interpolation, this is the sample at the next interval boundary after the
+            timestamp's minute (matching the CSV lookup of adjusted_sim_time); with interpolation,
+            it is linearly interpolated between the samples on either side of the timestamp.
+            The timestamp's month, day, hour and minute are mapped onto the series' year.
+
+        :param timestamp: (datetime) The simulated time.
+        :param interpolate: (bool) Whether to interpolate between samples.
+        :return: (float) The reference value, or None if there is no data for the time.
+        """
+        minute = minute_of_year(timestamp, self.year)
+        index, offset = divmod(minute, self.interval_min)
+        last = self.sample_count - 1
+        if not interpolate:
+            return self.sample(min(index + 1, last))
+        value = self.sample(min(index, last))
+        if offset == 0 or index >= last or value is None:
+            return value
+        next_value = self.sample(index + 1)
+        if next_value is None:
+            return value
+        return value + (next_value - value) * offset / float(self.interval_min)
+
+
+def series_bytes(samples, interval_min, year, path=None):
+    """
+        Return the binary time series format of (timestamp, value) pairs.
+
+    :param samples: Iterable of (datetime, float) pairs.
+    :param interval_min: (int) Sample interval in minutes.
+    :param year: (int) Calendar year of the series.
+    :param path: Pathname of the source data, for log messages.
+    :return: (bytearray) Header and samples.
+    """
+    return columns_bytes(*sample_columns(samples), interval_min=interval_min, year=year, path=path)
+
+
+def sample_columns(samples):
+    """
+        Return arrays of the timestamp fields and values of (timestamp, value) pairs.
+
+    :param samples: Iterable of (datetime, float) pairs.
+    :return: (fields, values) -- an (n, 5) int array of year, month, day, hour and minute, and an array of n floats.
+    """
+    fields = []
+    values = []
+    for timestamp, value in samples:
+        fields.append((timestamp.year, timestamp.month, timestamp.day, timestamp.hour, timestamp.minute))
+        values.append(value)
+    return np.array(fields, dtype=int).reshape(-1, 5), np.array(values, dtype=float)
+
+
+def columns_bytes(fields, values, interval_min, year, path=None):
+    """
+        Return the binary time series format of arrays of timestamp fields and values.
+
+        Samples that are not in the year, or not on an interval boundary, are skipped.
+        When a time has more than one sample, the last one is kept.
+        Skipped samples, duplicate times and gaps in the year are logged.
+
+    :param fields: (n, 5) int array of year, month, day, hour and minute.
+    :param values: Array of n float values.
+    :param interval_min: (int) Sample interval in minutes.
+    :param year: (int) Calendar year of the series.
+    :param path: Pathname of the source data, for log messages.
+    :return: (bytearray) Header and samples.
+    """
+    interval_min = int(interval_min)
+    year = int(year)
+    if interval_min <= 0 or MINUTES_PER_DAY % interval_min:
+        raise ValueError('Sample interval must divide a day evenly: {}'.format(interval_min))
+    leap = calendar.isleap(year)
+    sample_count = (366 if leap else 365) * MINUTES_PER_DAY // interval_min
+    source = path or 'Reference data'
+
+    in_year = fields[:, 0] == year
+    fields = fields[in_year]
+    values = values[in_year]
+    month, day, hour, minute = fields[:, 1], fields[:, 2], fields[:, 3], fields[:, 4]
+    valid = (month >= 1) & (month <= 12) & (day >= 1)
+    if not leap:
+        valid &= ~((month == 2) & (day == 29))
+    minutes = (np.array(_MONTH_START_MINUTE[leap])[month[valid]] +
+               (day[valid] - 1) * MINUTES_PER_DAY +
+               hour[valid] * 60 +
+               minute[valid])
+    indexes, offsets = np.divmod(minutes, interval_min)
+    on_boundary = (offsets == 0) & (indexes >= 0) & (indexes < sample_count)
+    skipped = len(fields) - np.count_nonzero(on_boundary)
+    if skipped:
+        _log.warning('Skipped {} samples that are not on a {} minute boundary'.format(skipped, interval_min))
+    indexes = indexes[on_boundary]
+    values = values[valid][on_boundary]
+
+    # Keep the last sample of each time, as a row-by-row conversion would.
+    unique_indexes, last = np.unique(indexes[::-1], return_index=True)
+    duplicates = len(indexes) - len(unique_indexes)
+    if duplicates:
+        _log.warning('{} has {} duplicate sample times, keeping the last sample of each'.format(source, duplicates))
+    samples = np.full(sample_count, np.nan)
+    samples[unique_indexes] = values[::-1][last]
+    gaps = np.count_nonzero(np.isnan(samples))
+    if gaps:
+        _log.warning('{} has no value for {} of the {} {} minute intervals in {}'.format(
+            source, gaps, sample_count, interval_min, year))
+
+    buf = bytearray(HEADER.size + sample_count * SAMPLE.size)
+    HEADER.pack_into(buf, 0, MAGIC, interval_min, sample_count, year)
+    buf[HEADER.size:] = samples.astype('<f8').tobytes()
+    return buf
+
+
+def write_series(path, samples, interval_min, year):
+    """
+        Write (timestamp, value) pairs to a binary time series file.
+
+    :param path: Pathname of the .simts file.
+    :param samples: Iterable of (datetime, float) pairs.
+    :param interval_min: (int) Sample interval in minutes.
+    :param year: (int) Calendar year of the series.
+    """
+    buf = series_bytes(samples, interval_min, year)
+    with open(path, 'wb') as series_file:
+        series_file.write(buf)
+
+
+def read_load_csv(csv_file_path, timestamp_column, value_column):
+    """
+        Read (timestamp, value) pairs from a Load reference CSV file.
+
+        The timestamps are formatted as M/D/YY H:MM.
+
+    :param csv_file_path: Pathname of the CSV file containing power data by time.
+    :param timestamp_column: Header of the timestamp column.
+    :param value_column: Header of the power column.
+    :return: Generator of (datetime, float) pairs.
+    """
+    with open(csv_file_path, 'rb' if sys.version_info[0] < 3 else 'r') as csv_file:
+        for row in csv.DictReader(csv_file):
+            try:
+                time_string = row[timestamp_column]
+                if time_string:
+                    yield datetime.strptime(time_string, '%m/%d/%y %H:%M'), float(row[value_column])
+                else:
+                    _log.warning('Missing timestamp during Load data file load')
+            except ValueError:
+                _log.warning('Skipping row during Load data file load')
+
+
+def read_pv_csv(csv_file_path):
+    """
+        Read (timestamp, diffuse horizontal irradiance) pairs from an NREL PV reference CSV file.
+
+    :param csv_file_path: Pathname of the CSV file containing irradiance data by time.
+    :return: Generator of (datetime, float) pairs, irradiance in Wh/m2.
+    """
+    with open(csv_file_path, 'rb' if sys.version_info[0] < 3 else 'r') as csv_file:
+        # This column sequence can vary depending on how the data was extracted.
+        # It's difficult to be data-sensitive since the file starts with two extra header rows
+        # prior to the column headers.
+        fieldnames = ['Year', 'Month', 'Day', 'Hour', 'Minute', 'DHI', 'DNI', 'Temperature']
+        for row in csv.DictReader(csv_file, fieldnames=fieldnames):
+            try:
+                timestamp = datetime(int(row['Year']),
+                                     int(row['Month']),
+                                     int(row['Day']),
+                                     int(row['Hour']),
+                                     int(row['Minute']))
+                # Not currently making use of DNI and Temperature data
+                yield timestamp, float(row['DHI'])
+            except (TypeError, ValueError):
+                # Skip rows that have other data types in the columns of interest
+                _log.warning('Skipping row during PV data file load')
+
+
+def read_load_columns(csv_file_path, timestamp_column, value_column):
+    """
+        Read the timestamps and values of a Load reference CSV file into arrays.
+
+        The M/D/YY H:MM timestamps of all rows are parsed as a single integer array instead of
+        one strptime call per row. If a row doesn't parse, the file is read row by row instead,
+        skipping the rows that can't be parsed.
+
+    :param csv_file_path: Pathname of the CSV file containing power data by time.
+    :param timestamp_column: Header of the timestamp column.
+    :param value_column: Header of the power column.
+    :return: (fields, values) -- an (n, 5) int array of year, month, day, hour and minute, and an array of n floats.
+    """
+    with open(csv_file_path, 'rb' if sys.version_info[0] < 3 else 'r') as csv_file:
+        reader = csv.reader(csv_file)
+        header = next(reader, [])
+        if timestamp_column not in header or value_column not in header:
+            raise ValueError('{} has no {} or {} column'.format(csv_file_path, timestamp_column, value_column))
+        time_index = header.index(timestamp_column)
+        value_index = header.index(value_column)
+        rows = [(row[time_index], row[value_index]) for row in reader if row]
+    if not rows:
+        return np.empty((0, 5), dtype=int), np.empty(0)
+    time_strings, value_strings = zip(*rows)
+    try:
+        # Month, day, two-digit year, hour and minute of each row
+        parts = np.array(re.split('[/ :]', ' '.join(time_strings)), dtype=int).reshape(-1, 5)
+        values = np.array(value_strings, dtype=float)
+    except ValueError:
+        return sample_columns(read_load_csv(csv_file_path, timestamp_column, value_column))
+    # As with strptime's %y, 69-99 are in the 1900s and 00-68 are in the 2000s.
+    years = parts[:, 2] + np.where(parts[:, 2] < 69, 2000, 1900)
+    fields = np.column_stack((years, parts[:, 0], parts[:, 1], parts[:, 3], parts[:, 4]))
+    return fields, values
+
+
+def read_pv_columns(csv_file_path):
+    """
+        Read the timestamps and diffuse horizontal irradiance of an NREL PV reference CSV file into arrays.
+
+        The data rows are converted as a single float array. If a data row doesn't parse,
+        the file is read row by row instead, skipping the rows that can't be parsed.
+
+    :param csv_file_path: Pathname of the CSV file containing irradiance data by time.
+    :return: (fields, values) -- an (n, 5) int array of year, month, day, hour and minute,
+        and an array of n irradiance values in Wh/m2.
+    """
+    with open(csv_file_path, 'rb' if sys.version_info[0] < 3 else 'r') as csv_file:
+        # The file starts with two extra header rows prior to the column headers (see read_pv_csv).
+        # Data rows are the ones that start with a year.
+        rows = [row[:6] for row in csv.reader(csv_file) if len(row) >= 6 and row[0].isdigit()]
+    try:
+        data = np.array(rows, dtype=float).reshape(-1, 6)
+    except ValueError:
+        return sample_columns(read_pv_csv(csv_file_path))
+    return data[:, :5].astype(int), data[:, 5]
+
+
+def load_series(file_path, csv_columns, interval_min, year, *csv_args):
+    """
+        Load reference data from a binary time series file or a CSV file.
+
+        A CSV file is only parsed once per process for a given layout, interval and year:
+        while any device holds the resulting series, it is returned to the other devices
+        that load the same (unmodified) file.
+
+    :param file_path: Pathname of a .simts file, or of a CSV file.
+    :param csv_columns: Function returning the timestamp fields and values of a CSV file,
+        e.g. read_load_columns or read_pv_columns.
+    :param interval_min: (int) Sample interval of the CSV data, in minutes.
+    :param year: (int) Year of the reference data.
+    :param csv_args: Additional arguments to csv_columns, such as column headers.
+    :return: A TimeSeries.
+    """
+    expanded_path = os.path.expandvars(os.path.expanduser(file_path))
+    if expanded_path.endswith(FILE_EXTENSION):
+        series = TimeSeries.open(expanded_path)
+        if series.year != int(year) or series.interval_min != int(interval_min):
+            _log.warning('{} holds {} minute data for {}, not {} minute data for {}'.format(
+                file_path, series.interval_min, series.year, interval_min, year))
+        return series
+    real_path = os.path.realpath(expanded_path)
+    key = (real_path, os.path.getmtime(real_path), csv_columns.__name__, csv_args, int(interval_min), int(year))
+    series = _csv_series.get(key)
+    if series is None:
+        fields, values = csv_columns(real_path, *csv_args)
+        series = TimeSeries.from_columns(fields, values, interval_min, year, expanded_path)
+        _csv_series[key] = series
+    return series
+
+
+def main(argv=sys.argv):
+    """Convert a Load or PV reference CSV file to the binary time series format."""
+    parser = argparse.ArgumentParser(description='Convert simulation reference data to a .simts time series file.')
+    parser.add_argument('format', choices=['load', 'pv'], help='CSV layout of the simload or simpv reference data')
+    parser.add_argument('csv_file', help='reference data CSV file')
+    parser.add_argument('output', help='time series file to write')
+    parser.add_argument('--year', type=int, required=True, help='calendar year of the data to convert')
+    parser.add_argument('--frequency', type=int, required=True, help='data frequency in minutes')
+    parser.add_argument('--timestamp-column', default='local_date', help='Load timestamp column header')
+    parser.add_argument('--value-column', default='load_kw', help='Load power column header')
+    args = parser.parse_args(argv[1:])
+
+    if args.format == 'load':
+        samples = read_load_csv(args.csv_file, args.timestamp_column, args.value_column)
+    else:
+        samples = read_pv_csv(args.csv_file)
+    write_series(args.output, samples, args.frequency, args.year)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2017, SLAC National Laboratory / Kisensum Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor SLAC / Kisensum,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# SLAC / Kisensum. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# }}}
+from datetime import datetime, timedelta
+import logging
+import os
+import struct
+
+import numpy as np
+import pytest
+
+from simulation_data import timeseries
+from simulation_data.timeseries import (TimeSeries, columns_bytes, load_series, minute_of_year,
+                                                     read_load_columns, read_load_csv, read_pv_columns, read_pv_csv,
+                                                     sample_columns, write_series)
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, 'SimulationAgent', 'data')
+YEAR = 2015
+INTERVAL = 15
+SAMPLES_PER_YEAR = 365 * 24 * 60 // INTERVAL
+
+
+def year_samples(year=YEAR, interval=INTERVAL, value=lambda index: float(index)):
+    """Return (timestamp, value) pairs at every interval boundary of the year, the value of sample i being value(i)."""
+    start = datetime(year, 1, 1)
+    count = (366 if year % 4 == 0 else 365) * 24 * 60 // interval
+    return [(start + timedelta(minutes=i * interval), value(i)) for i in range(count)]
+
+
+@pytest.fixture(scope='module')
+def series():
+    return TimeSeries.from_samples(year_samples(), INTERVAL, YEAR)
+
+
+def test_minute_of_year():
+    assert minute_of_year(datetime(2015, 1, 1, 0, 0), 2015) == 0
+    assert minute_of_year(datetime(2015, 1, 2, 1, 30), 2015) == 24 * 60 + 90
+    assert minute_of_year(datetime(2015, 3, 1), 2015) == 59 * 24 * 60
+    assert minute_of_year(datetime(2015, 12, 31, 23, 59), 2015) == 365 * 24 * 60 - 1
+
+
+def test_minute_of_year_leap():
+    assert minute_of_year(datetime(2016, 2, 29, 12, 0), 2016) == (59 * 24 + 12) * 60
+    assert minute_of_year(datetime(2016, 3, 1), 2016) == 60 * 24 * 60
+    assert minute_of_year(datetime(2016, 12, 31, 23, 59), 2016) == 366 * 24 * 60 - 1
+
+
+def test_minute_of_year_maps_simulated_year():
+    # The simulated time's year is replaced by the reference data's year.
+    assert minute_of_year(datetime(2017, 3, 1), 2016) == 60 * 24 * 60
+    assert minute_of_year(datetime(2016, 3, 1), 2015) == 59 * 24 * 60
+    with pytest.raises(ValueError):
+        minute_of_year(datetime(2016, 2, 29), 2015)
+
+
+def test_value_at_boundary(series):
+    # Without interpolation, the value is the sample at the next interval boundary.
+    assert series.value_at(datetime(2015, 1, 1, 0, 0)) == 1.0
+    assert series.value_at(datetime(2015, 1, 1, 0, 15)) == 2.0
+    assert series.value_at(datetime(2015, 1, 2, 0, 0)) == 24 * 4 + 1.0
+
+
+def test_value_at_inside_interval(series):
+    assert series.value_at(datetime(2015, 1, 1, 0, 1)) == 1.0
+    assert series.value_at(datetime(2015, 1, 1, 0, 14)) == 1.0
+    assert series.value_at(datetime(2015, 6, 1, 10, 20)) == minute_of_year(datetime(2015, 6, 1, 10, 20), YEAR) // 15 + 1
+
+
+def test_value_at_year_end(series):
+    last = SAMPLES_PER_YEAR - 1
+    assert series.value_at(datetime(2015, 12, 31, 23, 30)) == last
+    assert series.value_at(datetime(2015, 12, 31, 23, 45)) == last
+    assert series.value_at(datetime(2015, 12, 31, 23, 59)) == last
+    assert series.value_at(datetime(2015, 12, 31, 23, 59), interpolate=True) == last
+
+
+def test_value_at_interpolate(series):
+    assert series.value_at(datetime(2015, 1, 1, 0, 0), interpolate=True) == 0.0
+    assert series.value_at(datetime(2015, 1, 1, 0, 15), interpolate=True) == 1.0
+    assert series.value_at(datetime(2015, 1, 1, 0, 6), interpolate=True) == pytest.approx(0.4)
+    assert series.value_at(datetime(2015, 1, 1, 0, 20), interpolate=True) == pytest.approx(1 + 5 / 15.0)
+
+
+def test_value_at_gaps():
+    # Samples 2 and 4 are missing.
+    samples = [sample for sample in year_samples() if sample[1] not in (2.0, 4.0)]
+    series = TimeSeries.from_samples(samples, INTERVAL, YEAR)
+    assert series.sample(2) is None
+    assert series.value_at(datetime(2015, 1, 1, 0, 15)) is None
+    assert series.value_at(datetime(2015, 1, 1, 0, 30), interpolate=True) is None
+    # Next to a gap, the interpolated value is the sample before the timestamp.
+    assert series.value_at(datetime(2015, 1, 1, 0, 20), interpolate=True) == 1.0
+    assert series.value_at(datetime(2015, 1, 1, 0, 50), interpolate=True) == 3.0
+
+
+def test_write_and_open(tmpdir):
+    path = str(tmpdir.join('load.simts'))
+    write_series(path, year_samples(value=lambda index: index * 0.5), INTERVAL, YEAR)
+    series = TimeSeries.open(path)
+    assert (series.interval_min, series.sample_count, series.year) == (INTERVAL, SAMPLES_PER_YEAR, YEAR)
+    assert series.sample(0) == 0.0
+    assert series.sample(SAMPLES_PER_YEAR - 1) == (SAMPLES_PER_YEAR - 1) * 0.5
+    assert series.value_at(datetime(2015, 7, 4, 12, 0)) == (minute_of_year(datetime(2015, 7, 4, 12), YEAR) // 15 + 1) * 0.5
+    # A file is mapped once per process.
+    assert TimeSeries.open(path) is series
+    assert load_series(path, read_load_columns, INTERVAL, YEAR) is series
+
+
+def test_write_leap_year(tmpdir):
+    path = str(tmpdir.join('leap.simts'))
+    write_series(path, year_samples(year=2016, interval=30), 30, 2016)
+    series = TimeSeries.open(path)
+    assert series.sample_count == 366 * 48
+    assert series.value_at(datetime(2016, 2, 29, 0, 0), interpolate=True) == 59 * 48
+
+
+def test_open_bad_magic(tmpdir):
+    path = tmpdir.join('bad.simts')
+    path.write_binary(struct.pack('<8sIIi4x', b'NOTSIMTS', INTERVAL, 1, YEAR) + struct.pack('<d', 1.0))
+    with pytest.raises(ValueError) as error:
+        TimeSeries.open(str(path))
+    assert 'Not a simulation time series file' in str(error.value)
+
+
+def test_open_truncated(tmpdir):
+    path = tmpdir.join('truncated.simts')
+    write_series(str(path), year_samples(), INTERVAL, YEAR)
+    data = path.read_binary()
+    path.write_binary(data[:len(data) - 8])
+    with pytest.raises(ValueError) as error:
+        TimeSeries.open(str(path))
+    assert 'Truncated simulation time series file' in str(error.value)
+
+
+def test_interval_must_divide_a_day():
+    with pytest.raises(ValueError):
+        TimeSeries.from_samples(year_samples(), 7, YEAR)
+
+
+def test_convert_load_csv(tmpdir):
+    csv_path = tmpdir.join('load.csv')
+    csv_path.write('local_date,load_kw\n1/1/15 0:00,10.5\n1/1/15 0:15,11.0\n1/1/15 0:30,12.5\n')
+    output = str(tmpdir.join('converted.simts'))
+    timeseries.main(['timeseries', 'load', str(csv_path), output, '--year', '2015', '--frequency', '15'])
+    series = TimeSeries.open(output)
+    assert [series.sample(i) for i in range(3)] == [10.5, 11.0, 12.5]
+    assert series.sample(3) is None
+    assert series.value_at(datetime(2015, 1, 1, 0, 5)) == 11.0
+
+
+def assert_same_columns(columns, expected):
+    fields, values = columns
+    expected_fields, expected_values = expected
+    assert fields.shape == expected_fields.shape
+    assert np.array_equal(fields, expected_fields)
+    assert np.array_equal(values, expected_values)
+
+
+def test_read_load_columns_matches_row_reader():
+    csv_path = os.path.join(DATA_DIR, 'load_and_pv.csv')
+    columns = read_load_columns(csv_path, 'local_date', 'load_kw')
+    assert len(columns[0]) > 30000
+    assert_same_columns(columns, sample_columns(read_load_csv(csv_path, 'local_date', 'load_kw')))
+
+
+def test_read_pv_columns_matches_row_reader():
+    csv_path = os.path.join(DATA_DIR, 'nrel_pv_readings.csv')
+    columns = read_pv_columns(csv_path)
+    assert len(columns[0]) == 365 * 48
+    assert_same_columns(columns, sample_columns(read_pv_csv(csv_path)))
+
+
+def test_read_load_columns_two_digit_years(tmpdir):
+    csv_path = str(tmpdir.join('load.csv'))
+    with open(csv_path, 'w') as csv_file:
+        csv_file.write('local_date,load_kw\n12/31/14 23:45,1.5\n1/1/15 0:00,2\n6/30/69 12:05,3.25\n')
+    fields, values = read_load_columns(csv_path, 'local_date', 'load_kw')
+    assert fields.tolist() == [[2014, 12, 31, 23, 45], [2015, 1, 1, 0, 0], [1969, 6, 30, 12, 5]]
+    assert values.tolist() == [1.5, 2.0, 3.25]
+    assert_same_columns((fields, values), sample_columns(read_load_csv(csv_path, 'local_date', 'load_kw')))
+
+
+def test_read_load_columns_falls_back_on_bad_rows(tmpdir, caplog):
+    csv_path = str(tmpdir.join('load.csv'))
+    with open(csv_path, 'w') as csv_file:
+        csv_file.write('local_date,load_kw\n1/1/15 0:00,2\n1/1/15 0:15,n/a\n,4\n1/1/15 0:45,5\n')
+    with caplog.at_level(logging.WARNING):
+        fields, values = read_load_columns(csv_path, 'local_date', 'load_kw')
+    assert fields.tolist() == [[2015, 1, 1, 0, 0], [2015, 1, 1, 0, 45]]
+    assert values.tolist() == [2.0, 5.0]
+    assert 'Skipping row during Load data file load' in caplog.text
+    assert 'Missing timestamp during Load data file load' in caplog.text
+
+
+def test_read_load_columns_missing_column(tmpdir):
+    csv_path = str(tmpdir.join('load.csv'))
+    with open(csv_path, 'w') as csv_file:
+        csv_file.write('local_date,pv_kw\n1/1/15 0:00,2\n')
+    with pytest.raises(ValueError):
+        read_load_columns(csv_path, 'local_date', 'load_kw')
+
+
+def test_read_pv_columns_falls_back_on_bad_rows(tmpdir):
+    csv_path = str(tmpdir.join('pv.csv'))
+    with open(csv_path, 'w') as csv_file:
+        csv_file.write('Source,Location ID\nNSRDB,686205\nYear,Month,Day,Hour,Minute,DHI,DNI,Temperature\n'
+                       '2015,1,1,0,0,0,0,5.8\n2015,1,1,0,30,-,0,5.5\n2015,1,1,1,0,12.5,0,5.2\n')
+    fields, values = read_pv_columns(csv_path)
+    assert fields.tolist() == [[2015, 1, 1, 0, 0], [2015, 1, 1, 1, 0]]
+    assert values.tolist() == [0.0, 12.5]
+
+
+def test_columns_bytes_logs_duplicates_gaps_and_off_boundary_samples(caplog):
+    samples = year_samples()
+    samples.insert(2, (datetime(2015, 1, 1, 0, 30), -1.0))          # Duplicate of sample 2, which is kept
+    samples.insert(0, (datetime(2015, 1, 1, 0, 5), -2.0))           # Not on a 15 minute boundary
+    samples.append((datetime(2016, 1, 1, 0, 0), -3.0))              # Not in the year
+    del samples[100:103]                                             # A gap of three samples
+    with caplog.at_level(logging.WARNING):
+        series = TimeSeries(columns_bytes(*sample_columns(samples), interval_min=INTERVAL, year=YEAR,
+                                          path='load.csv'))
+    assert series.sample(2) == 2.0
+    assert series.sample(0) == 0.0
+    assert [series.sample(i) for i in range(98, 101)] == [None] * 3
+    assert 'Skipped 1 samples that are not on a 15 minute boundary' in caplog.text
+    assert 'load.csv has 1 duplicate sample times, keeping the last sample of each' in caplog.text
+    assert 'load.csv has no value for 3 of the {} 15 minute intervals in 2015'.format(SAMPLES_PER_YEAR) in caplog.text
+
+
+def test_columns_bytes_clean_data_logs_nothing(caplog):
+    with caplog.at_level(logging.WARNING):
+        columns_bytes(*sample_columns(year_samples()), interval_min=INTERVAL, year=YEAR)
+    assert not caplog.records
+
+
+def test_columns_bytes_matches_row_by_row_conversion():
+    # Each sample on a boundary is written at its index, the last of a duplicated time winning.
+    samples = year_samples(value=lambda index: index * 0.25)
+    samples += [(datetime(2015, 3, 1, 6, 0), 42.0), (datetime(2015, 3, 1, 6, 7), 43.0)]
+    expected = [None] * SAMPLES_PER_YEAR
+    for timestamp, value in samples:
+        index, offset = divmod(minute_of_year(timestamp, YEAR), INTERVAL)
+        if not offset:
+            expected[index] = value
+    series = TimeSeries.from_samples(samples, INTERVAL, YEAR)
+    assert [series.sample(i) for i in range(SAMPLES_PER_YEAR)] == expected
+
+
+def test_load_series_caches_csv(tmpdir):
+    csv_path = str(tmpdir.join('load.csv'))
+    with open(csv_path, 'w') as csv_file:
+        csv_file.write('local_date,load_kw\n1/1/15 0:00,10.5\n1/1/15 0:15,11.0\n')
+    series = load_series(csv_path, read_load_columns, INTERVAL, YEAR, 'local_date', 'load_kw')
+    assert load_series(csv_path, read_load_columns, INTERVAL, YEAR, 'local_date', 'load_kw') is series
+    # A different interval, year or column is a different series.
+    assert load_series(csv_path, read_load_columns, 30, YEAR, 'local_date', 'load_kw') is not series
+    assert load_series(csv_path, read_load_columns, INTERVAL, '2015', 'local_date', 'load_kw') is series
+
+
+def test_load_series_reloads_modified_csv(tmpdir):
+    csv_path = str(tmpdir.join('load.csv'))
+    with open(csv_path, 'w') as csv_file:
+        csv_file.write('local_date,load_kw\n1/1/15 0:00,10.5\n')
+    series = load_series(csv_path, read_load_columns, INTERVAL, YEAR, 'local_date', 'load_kw')
+    assert series.sample(0) == 10.5
+    with open(csv_path, 'w') as csv_file:
+        csv_file.write('local_date,load_kw\n1/1/15 0:00,20.5\n')
+    modified_time = os.path.getmtime(csv_path) + 10
+    os.utime(csv_path, (modified_time, modified_time))
+    reloaded = load_series(csv_path, read_load_columns, INTERVAL, YEAR, 'local_date', 'load_kw')
+    assert reloaded is not series
+    assert reloaded.sample(0) == 20.5
+    assert load_series(csv_path, read_load_columns, INTERVAL, YEAR, 'local_date', 'load_kw') is reloaded
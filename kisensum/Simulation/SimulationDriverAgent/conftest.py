@@ -0,0 +1,7 @@
+import sys
+import os
+
+# Add system path of the agent's directory
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+# Add system path of the simulation_data package the drivers depend on, when run in the source tree
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, 'SimulationData')))
@@ -59,10 +59,12 @@ import logging
 import sys
 from zmq.utils import jsonapi
 
-from volttron.platform.vip.agent import Agent, RPC
+from volttron.platform.vip.agent import Agent, PubSub, RPC
 from volttron.platform.agent import utils
+from volttron.platform.messaging import headers as headers_mod
 
 from driver import DriverAgent
+from scrape_stats import ScrapeStatistics
 from driver_locks import configure_socket_lock, configure_publish_lock
 from interfaces import DriverInterfaceError
 
@@ -72,6 +74,14 @@ _log = logging.getLogger(__name__)
 __version__ = '1.0'
 
 
+# Fast-forward (lock-step) topics published by the SimulationClockAgent
+CLOCK_TICK_TOPIC = 'simulation/clock/tick'
+CLOCK_ACK_TOPIC = 'simulation/clock/ack'
+CLOCK_STOP_TOPIC = 'simulation/clock/stop'
+
+SCRAPE_STATISTICS_TOPIC = 'simulation/driver/scrape_statistics'
+
+
 class OverrideError(DriverInterfaceError):
     pass
 
@@ -87,6 +97,13 @@ def simulation_driver_agent(config_path, **kwargs):
     config = utils.load_config(config_path)
     return SimulationDriverAgent(get_config('driver_config_list'),
                                  get_config('driver_scrape_interval', 0.02),
+                                 get_config('max_concurrent_publishes', 10000),
+                                 get_config('publish_depth_first_all', True),
+                                 get_config('publish_breadth_first_all', True),
+                                 get_config('publish_depth_first', True),
+                                 get_config('publish_breadth_first', True),
+                                 get_config('blocking_publishes', True),
+                                 get_config('scrape_statistics_interval', 0),
                                  heartbeat_autostart=True,
                                  **kwargs)
 
@@ -99,21 +116,51 @@ class SimulationDriverAgent(Agent):
         Its strategy for scheduling device-driver scrapes attempts to match that of the Master Driver.
         Please see services.core.MasterDriverAgent.master_driver.agent.py for additional commentary
         about this agent's implementation.
+
+        When the SimulationClockAgent runs in fast-forward mode, the device drivers are not scraped
+        on their own schedules. Instead, all devices are scraped together for each clock tick,
+        using the tick's simulated time, and the tick is then acknowledged to the clock.
+
+        As in the MasterDriverAgent, the publish_depth_first_all, publish_breadth_first_all,
+        publish_depth_first and publish_breadth_first settings select the topics that are published
+        for each scrape (and can be overridden in a device's configuration). With blocking_publishes
+        false, publishes don't wait for confirmation; at most max_concurrent_publishes are in flight.
+
+        The timings of each device's scrapes are kept in histograms (see scrape_stats.py), which can be
+        requested by RPC or published every scrape_statistics_interval seconds.
     """
 
-    def __init__(self, driver_config_list, driver_scrape_interval=0.02, **kwargs):
+    def __init__(self, driver_config_list, driver_scrape_interval=0.02, max_concurrent_publishes=10000,
+                 publish_depth_first_all=True, publish_breadth_first_all=True,
+                 publish_depth_first=True, publish_breadth_first=True, blocking_publishes=True,
+                 scrape_statistics_interval=0, **kwargs):
         super(SimulationDriverAgent, self).__init__(**kwargs)
         self.instances = {}
         try:
             self.driver_scrape_interval = float(driver_scrape_interval)
         except ValueError:
             self.driver_scrape_interval = 0.02
+        self.publish_depth_first_all = bool(publish_depth_first_all)
+        self.publish_breadth_first_all = bool(publish_breadth_first_all)
+        self.publish_depth_first = bool(publish_depth_first)
+        self.publish_breadth_first = bool(publish_breadth_first)
+        self.blocking_publishes = bool(blocking_publishes)
+        self.scrape_statistics_interval = 0
+        self.scrape_statistics_event = None
         self.freed_time_slots = []
         self._name_map = {}
         self._override_devices = set()
         self._override_patterns = None
         self._override_interval_events = {}
-        self.default_config = {"driver_scrape_interval": driver_scrape_interval}
+        self.fast_forward = False
+        self.default_config = {"driver_scrape_interval": driver_scrape_interval,
+                               "max_concurrent_publishes": max_concurrent_publishes,
+                               "publish_depth_first_all": publish_depth_first_all,
+                               "publish_breadth_first_all": publish_breadth_first_all,
+                               "publish_depth_first": publish_depth_first,
+                               "publish_breadth_first": publish_breadth_first,
+                               "blocking_publishes": blocking_publishes,
+                               "scrape_statistics_interval": scrape_statistics_interval}
         self.vip.config.set_default("config", self.default_config)
         self.vip.config.subscribe(self.configure_main, actions=["NEW", "UPDATE"], pattern="config")
         self.vip.config.subscribe(self.update_driver, actions=["NEW", "UPDATE"], pattern="devices/*")
@@ -125,13 +172,17 @@ class SimulationDriverAgent(Agent):
         if action == "NEW":
             try:
                 configure_socket_lock()
-                configure_publish_lock(10000)
+                configure_publish_lock(int(config["max_concurrent_publishes"]))
             except ValueError as e:
                 _log.error("ERROR PROCESSING STARTUP CRITICAL CONFIGURATION SETTINGS: {}".format(e))
                 _log.error("SIMULATION DRIVER SHUTTING DOWN")
                 sys.exit(1)
+        elif config["max_concurrent_publishes"] != self.default_config["max_concurrent_publishes"]:
+            _log.info("max_concurrent_publishes can only be changed by restarting the agent")
         self.update_override_patterns()
         self.update_scrape_schedule(config)
+        self.update_publish_types(config)
+        self.update_scrape_statistics_interval(config)
 
     def update_override_patterns(self):
         if self._override_patterns is None:
@@ -179,6 +230,44 @@ class SimulationDriverAgent(Agent):
                 driver.update_scrape_schedule(time_slot, self.driver_scrape_interval)
                 time_slot += 1
 
+    def update_publish_types(self, config):
+        self.publish_depth_first_all = bool(config["publish_depth_first_all"])
+        self.publish_breadth_first_all = bool(config["publish_breadth_first_all"])
+        self.publish_depth_first = bool(config["publish_depth_first"])
+        self.publish_breadth_first = bool(config["publish_breadth_first"])
+        self.blocking_publishes = bool(config["blocking_publishes"])
+        for driver in self.instances.itervalues():
+            driver.update_publish_types(self.publish_depth_first_all,
+                                        self.publish_breadth_first_all,
+                                        self.publish_depth_first,
+                                        self.publish_breadth_first,
+                                        self.blocking_publishes)
+
+    def update_scrape_statistics_interval(self, config):
+        try:
+            interval = float(config["scrape_statistics_interval"] or 0)
+        except ValueError as e:
+            _log.error("ERROR PROCESSING CONFIGURATION: {}".format(e))
+            _log.error("Scrape statistics interval unchanged")
+            return
+        if interval == self.scrape_statistics_interval:
+            return
+        self.scrape_statistics_interval = interval
+        if self.scrape_statistics_event:
+            self.scrape_statistics_event.kill()
+            self.scrape_statistics_event = None
+        if interval > 0:
+            _log.info("Publishing scrape statistics every {} seconds".format(interval))
+            self.scrape_statistics_event = self.core.periodic(interval, self.publish_scrape_statistics, wait=interval)
+
+    def publish_scrape_statistics(self):
+        """Publish the scrape statistics of every device (see get_scrape_statistics)."""
+        now = utils.format_timestamp(utils.get_aware_utc_now())
+        headers = {headers_mod.DATE: now,
+                   headers_mod.TIMESTAMP: now}
+        self.vip.pubsub.publish('pubsub', SCRAPE_STATISTICS_TOPIC,
+                                headers=headers, message=self.get_scrape_statistics())
+
     def stop_driver(self, device_topic):
         real_name = self._name_map.pop(device_topic.lower(), device_topic)
         driver = self.instances.pop(real_name, None)
@@ -211,6 +300,60 @@ class SimulationDriverAgent(Agent):
         _, topic = config_name.split('/', 1)
         return topic
 
+    @PubSub.subscribe('pubsub', CLOCK_TICK_TOPIC)
+    def on_clock_tick(self, peer, sender, bus, topic, headers, message):
+        """Scrape and publish all devices at a fast-forward tick's simulated time, then acknowledge the tick."""
+        self.fast_forward = True
+        sim_time = message['timestamp']
+        timestamp = utils.format_timestamp(utils.parse_timestamp_string(sim_time))
+        for driver in self.instances.values():
+            driver.fast_forward_read(sim_time, timestamp)
+        self.vip.pubsub.publish('pubsub', CLOCK_ACK_TOPIC,
+                                message={'tick': message['tick'], 'participant': self.core.identity})
+
+    @PubSub.subscribe('pubsub', CLOCK_STOP_TOPIC)
+    def on_clock_stop(self, peer, sender, bus, topic, headers, message):
+        """The fast-forward simulation is over: resume scraping the devices on their own schedules."""
+        self.fast_forward = False
+
+    @RPC.export
+    def get_scrape_statistics(self, path=None):
+        """
+            Return timing statistics of the device drivers' scrapes.
+
+            For each device: the number of scrapes and of messages published, and for each phase
+            of a scrape (see scrape_stats.PHASES), the count, last, mean and maximum number of seconds,
+            with 50th, 90th and 99th percentile estimates.
+
+        :param path: A device topic, or None for every device.
+        :return: (dict) Statistics by device topic.
+        """
+        paths = [path] if path is not None else self.instances.keys()
+        return {p: self.instances[p].scrape_statistics.summary() for p in paths}
+
+    @RPC.export
+    def get_scrape_histograms(self, path=None):
+        """
+            Return the histograms of the device drivers' scrape phase timings.
+
+        :param path: A device topic, or None for every device.
+        :return: (dict) By device topic, by phase: the buckets' upper bounds (seconds) and counts.
+                 The last count is of durations above the last bound.
+        """
+        paths = [path] if path is not None else self.instances.keys()
+        return {p: self.instances[p].scrape_statistics.histograms() for p in paths}
+
+    @RPC.export
+    def reset_scrape_statistics(self, path=None):
+        """
+            Clear the scrape statistics, e.g. after changing the scrape schedule.
+
+        :param path: A device topic, or None for every device.
+        """
+        paths = [path] if path is not None else self.instances.keys()
+        for p in paths:
+            self.instances[p].scrape_statistics = ScrapeStatistics()
+
     @RPC.export
     def get_point(self, path, point_name, **kwargs):
         return self.instances[path].get_point(point_name, **kwargs)
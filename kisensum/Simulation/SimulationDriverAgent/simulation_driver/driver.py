@@ -55,6 +55,7 @@ import datetime
 import gevent
 import logging
 import random
+import time
 
 from volttron.platform.agent import utils
 from volttron.platform.messaging import headers as headers_mod
@@ -65,7 +66,8 @@ from volttron.platform.messaging.topics import (DRIVER_TOPIC_BASE,
 from volttron.platform.vip.agent import BasicAgent, Core
 from volttron.platform.vip.agent.errors import VIPError, Again
 
-from driver_locks import publish_lock
+from driver_locks import publish_lock, acquire_publish_slot
+from scrape_stats import ScrapeStatistics
 
 utils.setup_logging()
 _log = logging.getLogger(__name__)
@@ -95,6 +97,13 @@ class DriverAgent(BasicAgent):
         self.heart_beat_point = None
         self.heart_beat_value = 0
         self.interface = None
+        self.point_topics = {}
+        self.scrape_statistics = ScrapeStatistics()
+        self.update_publish_types(parent.publish_depth_first_all,
+                                  parent.publish_breadth_first_all,
+                                  parent.publish_depth_first,
+                                  parent.publish_breadth_first,
+                                  parent.blocking_publishes)
         try:
             interval = int(config.get("interval", 60))
             if interval < 1:
@@ -124,6 +133,20 @@ class DriverAgent(BasicAgent):
             next_periodic_read = self.find_starting_datetime(utils.get_aware_utc_now())
             self.periodic_read_event = self.core.schedule(next_periodic_read, self.periodic_read, next_periodic_read)
 
+    def update_publish_types(self, publish_depth_first_all, publish_breadth_first_all,
+                             publish_depth_first, publish_breadth_first, blocking_publishes):
+        """
+            Set which topics are published for each scrape, and whether publishes wait for confirmation.
+
+            The values passed in (from the agent's configuration) are overridden by settings
+            in the device's configuration.
+        """
+        self.publish_depth_first_all = bool(self.config.get("publish_depth_first_all", publish_depth_first_all))
+        self.publish_breadth_first_all = bool(self.config.get("publish_breadth_first_all", publish_breadth_first_all))
+        self.publish_depth_first = bool(self.config.get("publish_depth_first", publish_depth_first))
+        self.publish_breadth_first = bool(self.config.get("publish_breadth_first", publish_breadth_first))
+        self.blocking_publishes = bool(self.config.get("blocking_publishes", blocking_publishes))
+
     def find_starting_datetime(self, now):
         midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
         seconds_from_midnight = (now - midnight).total_seconds()
@@ -151,6 +174,12 @@ class DriverAgent(BasicAgent):
         next_periodic_read = self.find_starting_datetime(utils.get_aware_utc_now())
         self.periodic_read_event = self.core.schedule(next_periodic_read, self.periodic_read, next_periodic_read)
         self.all_path_depth, self.all_path_breadth = self.get_paths_for_point(DRIVER_TOPIC_ALL)
+        self.point_topics = {point: self.get_paths_for_point(point) for point in self.meta_data}
+
+    @Core.receiver('onstop')
+    def stopping(self, sender, **kwargs):
+        if self.interface is not None:
+            self.interface.release()
 
     def setup_device(self):
         config = self.config
@@ -206,26 +235,86 @@ class DriverAgent(BasicAgent):
         if test_now - next_scrape_time > datetime.timedelta(seconds=self.interval):
             next_scrape_time = self.find_starting_datetime(test_now)
         self.periodic_read_event = self.core.schedule(next_scrape_time, self.periodic_read, next_scrape_time)
+        if self.parent.fast_forward:
+            # The simulation clock's ticks drive the scrapes (see fast_forward_read).
+            return
         _log.debug("scraping device: " + self.device_name)
+        lag_seconds = (test_now - now).total_seconds()
+        start_time = time.time()
         try:
             results = self.interface.scrape_all()
         except Exception as ex:
             _log.error('Failed to scrape ' + self.device_name + ': ' + str(ex))
             return
-        if results:
-            utcnow_string = utils.format_timestamp(utils.get_aware_utc_now())
-            headers = {headers_mod.DATE: utcnow_string,
-                       headers_mod.TIMESTAMP: utcnow_string, }
+        scrape_time = time.time()
+        publishes = self.publish_results(results, utils.format_timestamp(utils.get_aware_utc_now()))
+        self.record_scrape(lag_seconds, start_time, scrape_time, publishes)
+
+    def fast_forward_read(self, sim_time, timestamp):
+        """
+            Scrape the device at a fast-forward tick's simulated time and publish the results.
+
+        :param sim_time: (str) The tick's simulated time, as published by the SimulationClockAgent.
+        :param timestamp: (str) The simulated time formatted for the Date and TimeStamp headers.
+        """
+        start_time = time.time()
+        try:
+            results = self.interface.scrape_all(sim_time)
+        except Exception as ex:
+            _log.error('Failed to scrape ' + self.device_name + ': ' + str(ex))
+            return
+        scrape_time = time.time()
+        publishes = self.publish_results(results, timestamp)
+        # A tick's scrape has no scheduled time slot, so there is no lag to record.
+        self.record_scrape(None, start_time, scrape_time, publishes)
+
+    def record_scrape(self, lag_seconds, start_time, scrape_time, publishes):
+        """
+            Record the timings of a scrape that started at start_time and finished scraping at scrape_time.
+
+        :param lag_seconds: (float) How late the scrape started relative to its time slot, or None if it has none.
+        """
+        timings = {'scrape': scrape_time - start_time,
+                   'publish': time.time() - scrape_time}
+        if lag_seconds is not None:
+            timings['lag'] = lag_seconds
+        timings.update(self.interface.scrape_timings)
+        self.scrape_statistics.record(timings, publishes)
+
+    def publish_results(self, results, timestamp_string):
+        """
+            Publish a scrape's results to the topics selected by the publish settings.
+
+        :return: The number of messages published.
+        """
+        if not results:
+            return 0
+        publishes = 0
+        headers = {headers_mod.DATE: timestamp_string,
+                   headers_mod.TIMESTAMP: timestamp_string, }
+        if self.publish_depth_first or self.publish_breadth_first:
             for point, value in results.iteritems():
-                depth_first_topic, breadth_first_topic = self.get_paths_for_point(point)
+                depth_first_topic, breadth_first_topic = self.point_topics[point]
                 message = [value, self.meta_data[point]]
-                self._publish_wrapper(depth_first_topic, headers=headers, message=message)
-                self._publish_wrapper(breadth_first_topic, headers=headers, message=message)
-            message = [results, self.meta_data]
+                if self.publish_depth_first:
+                    self._publish_wrapper(depth_first_topic, headers=headers, message=message)
+                    publishes += 1
+                if self.publish_breadth_first:
+                    self._publish_wrapper(breadth_first_topic, headers=headers, message=message)
+                    publishes += 1
+        message = [results, self.meta_data]
+        if self.publish_depth_first_all:
             self._publish_wrapper(self.all_path_depth, headers=headers, message=message)
+            publishes += 1
+        if self.publish_breadth_first_all:
             self._publish_wrapper(self.all_path_breadth, headers=headers, message=message)
+            publishes += 1
+        return publishes
 
     def _publish_wrapper(self, topic, headers, message):
+        if not self.blocking_publishes:
+            self._publish_nowait(topic, headers, message)
+            return
         while True:
             try:
                 with publish_lock():
@@ -242,6 +331,27 @@ class DriverAgent(BasicAgent):
             else:
                 break
 
+    def _publish_nowait(self, topic, headers, message):
+        """
+            Publish without waiting for confirmation.
+
+            Each publish holds one of the publish_lock's slots until it completes,
+            so the number of publishes in flight is bounded by max_concurrent_publishes.
+        """
+        release = acquire_publish_slot()
+        try:
+            result = self.vip.pubsub.publish('pubsub', topic, headers=headers, message=message)
+        except Exception:
+            release()
+            raise
+
+        def completed(async_result):
+            release()
+            if not async_result.successful():
+                _log.warn("driver failed to publish " + topic + ": " + str(async_result.exception))
+
+        result.rawlink(completed)
+
     def heart_beat(self):
         if self.heart_beat_point:
             self.heart_beat_value = int(not bool(self.heart_beat_value))
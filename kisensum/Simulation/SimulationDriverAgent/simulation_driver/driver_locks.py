@@ -102,3 +102,16 @@ def publish_lock():
         yield
     finally:
         _publish_lock.release()
+
+
+def acquire_publish_slot():
+    """
+        Acquire one of the publish_lock's slots for a publish that doesn't wait for its confirmation.
+
+    :return: The function that releases the slot, to be called when the publish completes.
+    """
+    global _publish_lock
+    if _publish_lock is None:
+        raise RuntimeError("publish_lock not configured!")
+    _publish_lock.acquire()
+    return _publish_lock.release
@@ -53,6 +53,7 @@
 # }}}
 import abc
 import logging
+import time
 
 _log = logging.getLogger(__name__)
 
@@ -236,6 +237,12 @@ class BaseInterface(object):
         :param kwargs: Any interface-specific parameters.
         """
 
+    def release(self):
+        """
+            Called by the DriverAgent when it stops, to release what the interface holds for the device.
+        """
+        pass
+
     def get_multiple_points(self, path, point_names, **kwargs):
         """
             Read multiple points from the interface.
@@ -389,6 +396,7 @@ class BasicRevert(object):
     def __init__(self, **kwargs):
         super(BasicRevert, self).__init__(**kwargs)
         self._tracker = RevertTracker()
+        self.scrape_timings = {}            # Seconds taken by phases of the last scrape, for the driver's statistics
 
     def _update_clean_values(self, points):
         self._tracker.update_clean_values(points)
@@ -412,9 +420,18 @@ class BasicRevert(object):
         self._tracker.mark_dirty_point(point_name)
         return result
 
-    def scrape_all(self):
-        """Implementation of :py:meth:`BaseInterface.scrape_all`"""
-        sim_time = self.get_simulated_time()
+    def scrape_all(self, sim_time=None):
+        """
+            Implementation of :py:meth:`BaseInterface.scrape_all`
+
+        :param sim_time: (str) The simulated time of a fast-forward clock tick.
+                         If None, the current simulated time is requested from the SimulationClockAgent.
+        """
+        self.scrape_timings = {}
+        if sim_time is None:
+            start_time = time.time()
+            sim_time = self.get_simulated_time()
+            self.scrape_timings['clock_rpc'] = time.time() - start_time
         result = self._scrape_all(sim_time)
         self._update_clean_values(result)
         return result
@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2017, SLAC National Laboratory / Kisensum Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor SLAC / Kisensum,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# SLAC / Kisensum. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# }}}
+"""
+    Fleet simulation backend for the simulation drivers.
+
+    Feeder studies simulate thousands of batteries, PV arrays and loads. Rather than having each
+    device driver calculate its own state from scalar register lookups on every scrape, devices
+    configured with the same "fleet" name in their driver_config keep their state in the fleet's
+    NumPy arrays (one array per register, one slot per device). The fleet steps all of its devices
+    in one vectorized update per simulated time: the first device scraped at a new simulated time
+    advances the fleet, and the other devices read their results.
+
+    Each device is still exposed through its own registers and points (see simulation.FleetRegister),
+    so get_point/set_point calls and scrape publishes are unchanged.
+
+    A fleet is stepped once per clock tick in fast-forward mode, when every device is scraped at the
+    same simulated time. When the devices are scraped on their own schedules, each scrape at a
+    new simulated time steps the whole fleet.
+
+    When a device's driver stops, its slot is released (see release_device) and reused by the next
+    device added to the fleet; a fleet is discarded when its last device is released.
+"""
+import abc
+import logging
+
+import numpy as np
+
+_log = logging.getLogger(__name__)
+
+# Fleets by (fleet class, fleet name)
+_fleets = {}
+
+
+def get_fleet(fleet_class, name):
+    """
+        Return the named fleet of a device type, creating it if it doesn't exist yet.
+
+    :param fleet_class: (class) Fleet subclass for the device type.
+    :param name: (str) Fleet name from the driver_config.
+    :return: (Fleet) The fleet.
+    """
+    key = (fleet_class, name)
+    fleet = _fleets.get(key)
+    if fleet is None:
+        fleet = _fleets[key] = fleet_class(name)
+    return fleet
+
+
+def release_device(fleet, index):
+    """
+        Release a device's slot in its fleet, discarding the fleet if it has no devices left.
+
+    :param fleet: (Fleet) The device's fleet.
+    :param index: (int) The device's index in the fleet's arrays.
+    """
+    fleet.remove_device(index)
+    if not fleet.device_count():
+        key = (type(fleet), fleet.name)
+        if _fleets.get(key) is fleet:
+            del _fleets[key]
+
+
+class Fleet(object):
+    """Abstract superclass for the state of a fleet of simulated devices of one type."""
+
+    __metaclass__ = abc.ABCMeta
+
+    columns = []                # Registers whose values are kept in the fleet's arrays; overridden in subclasses
+    initial_capacity = 64
+
+    def __init__(self, name):
+        self.name = name
+        self.size = 0
+        self.sim_time = None
+        self.stepped = False
+        self.state = {column: np.zeros(self.initial_capacity) for column in self.columns}
+        self.free_indexes = []          # Released slots, reused by add_device
+
+    def add_device(self):
+        """Add a device to the fleet, and return its index in the fleet's arrays."""
+        if self.free_indexes:
+            return self.free_indexes.pop()
+        index = self.size
+        capacity = len(self.state[self.columns[0]])
+        if index == capacity:
+            for column, values in self.state.items():
+                self.state[column] = np.zeros(2 * capacity)
+                self.state[column][:capacity] = values
+        self.size += 1
+        return index
+
+    def remove_device(self, index):
+        """Release a device's slot: its values are cleared and the slot is reused by the next device added."""
+        for values in self.state.values():
+            values[index] = 0.0
+        self.free_indexes.append(index)
+
+    def device_count(self):
+        return self.size - len(self.free_indexes)
+
+    def get(self, column, index):
+        return float(self.state[column][index])
+
+    def set(self, column, index, value):
+        self.state[column][index] = value
+
+    def values(self, column):
+        """Return a column's values for every device in the fleet, as a view of the fleet's array."""
+        return self.state[column][:self.size]
+
+    def advance(self, sim_time):
+        """
+            Step every device in the fleet to the simulated time, unless the fleet has already been stepped to it.
+
+            Every device of the fleet calls this when it's scraped, so while no simulated time is available
+            (sim_time is None), the fleet is only stepped by the first scrape.
+        """
+        if self.stepped and sim_time == self.sim_time:
+            return
+        self.step(sim_time)
+        self.sim_time = sim_time
+        self.stepped = True
+
+    @abc.abstractmethod
+    def step(self, sim_time):
+        """
+            Update the state of every device in the fleet for a new simulated time.
+
+            Subclasses implement this with the vectorized version of the device interface's update().
+
+        :param sim_time: (datetime) The new simulated time, or None if there is none.
+        """
+
+
+class StorageFleet(Fleet):
+    """Fleet of simulated storage devices (batteries). See simstorage.Interface."""
+
+    columns = ['dispatch_kw',
+               'power_kw',
+               'soc_kwh',
+               'max_soc_kwh',
+               'reduced_charge_soc_threshold',
+               'reduced_discharge_soc_threshold',
+               'max_charge_kw',
+               'max_discharge_kw']
+
+    def step(self, sim_time):
+        power_kw = self.calculate_power()
+        self.values('power_kw')[:] = power_kw
+        elapsed_time_hrs = 0.0
+        if sim_time and self.sim_time and sim_time > self.sim_time:
+            elapsed_time_hrs = (sim_time - self.sim_time).total_seconds() / 3600.0
+        new_soc = self.values('soc_kwh') + (power_kw * elapsed_time_hrs)
+        new_soc = np.minimum(np.maximum(new_soc, 0.0), self.values('max_soc_kwh'))
+        self.values('soc_kwh')[:] = np.trunc(1000 * new_soc) / 1000.0      # Round to nearest thousandth
+
+    def calculate_power(self):
+        """Vectorized version of simstorage.Interface.calculate_power: return every device's power in kW."""
+        dispatch_power = self.values('dispatch_kw')
+        current_soc = self.values('soc_kwh')
+        max_soc = self.values('max_soc_kwh')
+        reduced_charge_soc_threshold = self.values('reduced_charge_soc_threshold')
+        reduced_discharge_soc_threshold = self.values('reduced_discharge_soc_threshold')
+
+        # Both adjustments are calculated for every device, so ignore divisions by zero in the unused one
+        with np.errstate(divide='ignore', invalid='ignore'):
+            soc_percent = current_soc / max_soc
+            # Reduce charging power in a straight line -- 100% at SOC_CHARGE_THRESHOLD, 0% at max_charge_kw
+            charge_fraction = np.where(soc_percent <= reduced_charge_soc_threshold,
+                                       1.0,
+                                       (max_soc - current_soc) / (max_soc - (reduced_charge_soc_threshold * max_soc)))
+            # Reduce discharging power in a straight line -- 100% at SOC_DISCHARGE_THRESHOLD, 0% at 0
+            discharge_fraction = np.where(soc_percent >= reduced_discharge_soc_threshold,
+                                          1.0,
+                                          current_soc / (reduced_discharge_soc_threshold * max_soc))
+        power_kw = np.where(dispatch_power >= 0,
+                            np.minimum(charge_fraction * dispatch_power, self.values('max_charge_kw')),
+                            np.maximum(discharge_fraction * dispatch_power, -self.values('max_discharge_kw')))
+        return np.trunc(1000 * power_kw) / 1000.0       # Round to nearest thousandth
+
+
+class SeriesFleet(Fleet):
+    """
+        Abstract superclass for fleets of devices whose values are looked up in reference time series.
+
+        Devices that share a time series (see simulation_data.timeseries.TimeSeries.open) and interpolation setting
+        are grouped, so each series is looked up once per step for all of its devices.
+    """
+
+    def __init__(self, name):
+        super(SeriesFleet, self).__init__(name)
+        self.series = []
+        self.interpolate = []
+        self._groups = None
+
+    def add_device(self):
+        index = super(SeriesFleet, self).add_device()
+        if index == len(self.series):
+            self.series.append(None)
+            self.interpolate.append(False)
+        return index
+
+    def remove_device(self, index):
+        super(SeriesFleet, self).remove_device(index)
+        self.series[index] = None
+        self.interpolate[index] = False
+        self._groups = None
+
+    def set_series(self, index, series, interpolate):
+        """Set a device's reference time series, once its driver has loaded it."""
+        self.series[index] = series
+        self.interpolate[index] = interpolate
+        self._groups = None
+        self.stepped = False            # Step the fleet again, including this device, at the current simulated time
+
+    def lookups(self, sim_time):
+        """
+            Look up the reference value of each group of devices at the simulated time.
+
+        :param sim_time: (datetime) The simulated time.
+        :return: Iterator of (series, array of device indexes, reference value) for groups with a value.
+        """
+        if self._groups is None:
+            groups = {}
+            for index, series in enumerate(self.series):
+                if series is not None:
+                    groups.setdefault((series, self.interpolate[index]), []).append(index)
+            self._groups = [(series, interpolate, np.array(indexes))
+                            for (series, interpolate), indexes in groups.items()]
+        for series, interpolate, indexes in self._groups:
+            try:
+                value = series.value_at(sim_time, interpolate)
+            except ValueError:
+                value = None
+            if value is None:
+                _log.warning('Unable to look up {} value for {} in {}'.format(self.name, sim_time, series.year))
+            else:
+                yield series, indexes, value
+
+
+class LoadFleet(SeriesFleet):
+    """Fleet of simulated loads. See simload.Interface."""
+
+    columns = ['power_kw']
+
+    def step(self, sim_time):
+        if not sim_time:
+            return
+        power_kw = self.values('power_kw')
+        for series, indexes, value in self.lookups(sim_time):
+            # As in simload.Interface.update, a zero power value leaves the last one in place
+            if value:
+                power_kw[indexes] = value
+
+
+class PVFleet(SeriesFleet):
+    """Fleet of simulated PV arrays. See simpv.Interface."""
+
+    columns = ['power_kw',
+               'panel_area',
+               'efficiency']
+
+    def step(self, sim_time):
+        if not sim_time:
+            return
+        power_kw = self.values('power_kw')
+        area_m2 = self.values('panel_area')
+        efficiency = self.values('efficiency')
+        for series, indexes, irradiance_wh_m2 in self.lookups(sim_time):
+            elapsed_time_hrs = series.interval_min / 60.0
+            # The power_kw value is negated because the PV contributes power to the circuit
+            group_power_kw = -(irradiance_wh_m2 / 1000.0) * area_m2[indexes] * efficiency[indexes] / elapsed_time_hrs
+            # As in simpv.Interface.update, a zero power value leaves the last one in place
+            nonzero = group_power_kw != 0
+            power_kw[indexes[nonzero]] = group_power_kw[nonzero]
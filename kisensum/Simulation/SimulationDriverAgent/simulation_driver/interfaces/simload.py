@@ -51,12 +51,12 @@
 # United States Government or any agency thereof.
 #
 # }}}
-import csv
 from datetime import datetime
 import logging
-import os
 
+from fleet import LoadFleet
 from simulation import SimulationRegister, SimulationInterface
+from simulation_data.timeseries import load_series, read_load_columns
 
 _log = logging.getLogger(__name__)
 
@@ -87,19 +87,29 @@ class Interface(SimulationInterface):
                              'data_frequency_min',
                              'data_year']
 
+    fleet_class = LoadFleet
+
+    # Set "interpolate": true in the driver config to interpolate between reference data samples.
+    interpolate = False
+
     def __init__(self, **kwargs):
         super(Interface, self).__init__(**kwargs)
-        self.power_dict = None
+        self.power_series = None
 
     def update(self):
         """Update the device driver's state in advance of a periodic scrape request."""
         super(Interface, self).update()
-        if not self.power_dict:
+        if not self.power_series:
             csv_file_path = self.get_register_value('csv_file_path')
             if csv_file_path:
-                self.power_dict = self.load_power_dict(csv_file_path)
-
-        if self.power_dict:
+                self.power_series = self.load_power_series(csv_file_path)
+                if self.device_fleet:
+                    self.device_fleet.set_series(self.fleet_index, self.power_series, self.interpolate)
+
+        if self.power_series and self.device_fleet:
+            self.device_fleet.advance(self.sim_time())
+            power_kw = None                     # The fleet sets the power_kw register
+        elif self.power_series:
             power_kw = self.calculate_power()
         else:
             _log.info('No Load simulation data has been loaded')
@@ -111,29 +121,28 @@ class Interface(SimulationInterface):
     def calculate_power(self):
         """Return the reference data's power value for the current simulated time."""
         power_kw = None
-        if not self.power_dict:
+        if not self.power_series:
             _log.info('No simulation is in progress')
         else:
             sim_time = self.sim_time()
             if sim_time:
-                data_year = self.get_register_value('data_year')
-                data_frequency_min = self.get_register_value('data_frequency_min')
-                adjusted_time = self.adjusted_sim_time(data_year, data_frequency_min)
                 try:
-                    time_string = adjusted_time.strftime('%-m/%-d/%y %-H:%M')    # The keys are formatted as M/D/YY H:MM
-                    power_kw = self.power_dict[time_string]
+                    power_kw = self.power_series.value_at(sim_time, self.interpolate)
                     _log.debug('Load at {} = {} kw'.format(sim_time, power_kw))
-                except AttributeError:
-                    _log.warning('Unable to look up Load value for {} (adjusted to {})'.format(sim_time, adjusted_time))
+                except ValueError:
+                    _log.warning('Unable to look up Load value for {} in {}'.format(sim_time,
+                                                                                 self.power_series.year))
             else:
                 _log.info('No simulation is in progress')
         return power_kw
 
-    def load_power_dict(self, csv_file_path):
+    def load_power_series(self, csv_file_path):
         """
-            Load reference data from a CSV-formatted file into a dictionary indexed by timestamp.
+            Load reference data from a time series file, or from a CSV-formatted file.
 
             The reference file should include a calendar year's worth of data, gathered at a regular frequency.
+            A .simts file (see simulation_data.timeseries) is memory-mapped and shared by every simulated Load using it;
+            a CSV file is converted to the same representation in memory, once per process.
 
             CSV file info can be furnished as simulation initialization parameters,
             either in the driver configuration or via set_point calls to the running driver.
@@ -145,24 +154,17 @@ class Interface(SimulationInterface):
                 timestamp_column_header
                 power_column_header
 
-        :param csv_file_path: Pathname of the CSV file containing power data by time.
-        :return: A dictionary of power data read from the CSV file.
+        :param csv_file_path: Pathname of the .simts or CSV file containing power data by time.
+        :return: A TimeSeries of power data.
         """
         _log.info('{} Starting to load circuit-load data.'.format(datetime.now()))
-        power_dict = {}
-        expanded_path = os.path.expandvars(os.path.expanduser(csv_file_path))
-        with open(expanded_path, 'rb') as csv_file:
-            timestamp_column = self.get_register_value('timestamp_column_header')
-            power_column = self.get_register_value('power_column_header')
-            csv_reader = csv.DictReader(csv_file)
-            for row in csv_reader:
-                try:
-                    time_string = row[timestamp_column]
-                    if time_string:
-                        power_dict[time_string] = row[power_column]
-                    else:
-                        _log.warning('Missing timestamp during Load data file load')
-                except ValueError:
-                    _log.warning('Skipping row during Load data file load')
+        timestamp_column = self.get_register_value('timestamp_column_header')
+        power_column = self.get_register_value('power_column_header')
+        power_series = load_series(csv_file_path,
+                                   read_load_columns,
+                                   self.get_register_value('data_frequency_min'),
+                                   self.get_register_value('data_year'),
+                                   timestamp_column,
+                                   power_column)
         _log.info('{} Finished loading circuit-load data.'.format(datetime.now()))
-        return power_dict
+        return power_series
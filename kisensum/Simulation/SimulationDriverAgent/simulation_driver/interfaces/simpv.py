@@ -51,11 +51,11 @@
 # United States Government or any agency thereof.
 #
 # }}}
-import csv
 from datetime import datetime
 import logging
-import os
+from fleet import PVFleet
 from simulation import SimulationRegister, SimulationInterface
+from simulation_data.timeseries import load_series, read_pv_columns
 
 _log = logging.getLogger(__name__)
 
@@ -89,19 +89,29 @@ class Interface(SimulationInterface):
                              'data_frequency_min',
                              'data_year']
 
+    fleet_class = PVFleet
+
+    # Set "interpolate": true in the driver config to interpolate between reference data samples.
+    interpolate = False
+
     def __init__(self, **kwargs):
         super(Interface, self).__init__(**kwargs)
-        self.irradiance_dict = None
+        self.irradiance_series = None
 
     def update(self):
         """Update the device driver's state in advance of a periodic scrape request."""
         super(Interface, self).update()
-        if not self.irradiance_dict:
+        if not self.irradiance_series:
             csv_file_path = self.get_register_value('csv_file_path')
             if csv_file_path:
-                self.irradiance_dict = self.load_irradiance_dict(csv_file_path)
-
-        if self.irradiance_dict:
+                self.irradiance_series = self.load_irradiance_series(csv_file_path)
+                if self.device_fleet:
+                    self.device_fleet.set_series(self.fleet_index, self.irradiance_series, self.interpolate)
+
+        if self.irradiance_series and self.device_fleet:
+            self.device_fleet.advance(self.sim_time())
+            power_kw = None                     # The fleet sets the power_kw register
+        elif self.irradiance_series:
             power_kw = self.calculate_power()
         else:
             _log.info('No PV simulation data has been loaded')
@@ -113,19 +123,19 @@ class Interface(SimulationInterface):
     def calculate_power(self):
         """Calculate and return power for the current simulated time based on the reference data's irradiance value."""
         power_kw = None
-        if not self.irradiance_dict:
+        if not self.irradiance_series:
             _log.info('No simulation is in progress')
         else:
             sim_time = self.sim_time()
             if sim_time:
-                data_year = self.get_register_value('data_year')
-                data_frequency_min = self.get_register_value('data_frequency_min')
                 area_m2 = self.get_register_value('panel_area')
                 efficiency = self.get_register_value('efficiency')
-                adjusted_time = self.adjusted_sim_time(data_year, data_frequency_min)
-                elapsed_time_hrs = data_frequency_min / 60.0
+                elapsed_time_hrs = self.irradiance_series.interval_min / 60.0
                 try:
-                    irradiance_wh_m2 = self.irradiance_dict[str(adjusted_time)]
+                    irradiance_wh_m2 = self.irradiance_series.value_at(sim_time, self.interpolate)
+                except ValueError:
+                    irradiance_wh_m2 = None
+                if irradiance_wh_m2 is not None:
                     # The power_kw value is negated because the PV contributes power to the circuit
                     power_kw = -(irradiance_wh_m2 / 1000.0) * area_m2 * efficiency / elapsed_time_hrs
                     numerator = 'irradiance {} wh/m2 * area {} m2 * efficiency {}'.format(irradiance_wh_m2,
@@ -133,18 +143,20 @@ class Interface(SimulationInterface):
                                                                                           efficiency)
                     denominator = '(1000 * elapsed time {} hr)'.format(elapsed_time_hrs)
                     _log.debug('PV power at {} = {} kw = {} / {}'.format(sim_time, power_kw, numerator, denominator))
-                except AttributeError:
-                    _log.warning('Unable to look up PV value for {} (adjusted to {})'.format(sim_time, adjusted_time))
+                else:
+                    _log.warning('Unable to look up PV value for {} in {}'.format(sim_time,
+                                                                               self.irradiance_series.year))
             else:
                 _log.info('No simulation is in progress')
         return power_kw
 
-    @staticmethod
-    def load_irradiance_dict(csv_file_path):
+    def load_irradiance_series(self, csv_file_path):
         """
-            Load irradiance reference data from a CSV-formatted file into a dictionary indexed by timestamp.
+            Load irradiance reference data from a time series file, or from a CSV-formatted file.
 
             The reference file should include a calendar year's worth of data, gathered at a regular frequency.
+            A .simts file (see simulation_data.timeseries) is memory-mapped and shared by every simulated PV using it;
+            a CSV file is converted to the same representation in memory, once per process.
 
             CSV file info can be furnished as simulation initialization parameters,
             either in the driver configuration or via set_point calls to the running driver.
@@ -156,35 +168,13 @@ class Interface(SimulationInterface):
                 data_frequency_min
                 data_year
 
-        :param csv_file_path: Pathname of the CSV file containing irradiance data by time.
-        :return: A dictionary of irradiance data read from the CSV file.
+        :param csv_file_path: Pathname of the .simts or CSV file containing irradiance data by time.
+        :return: A TimeSeries of irradiance data.
         """
         _log.info('{} Starting to load PV data.'.format(datetime.now()))
-        irradiance_dict = {}
-        expanded_path = os.path.expandvars(os.path.expanduser(csv_file_path))
-        with open(expanded_path, 'rb') as csv_file:
-            # This column sequence can vary depending on how the data was extracted.
-            # It's difficult to be data-sensitive since the file starts with two extra header rows
-            # prior to the column headers.
-            fieldnames = ['Year', 'Month', 'Day', 'Hour', 'Minute', 'DHI', 'DNI', 'Temperature']
-            csv_reader = csv.DictReader(csv_file, fieldnames=fieldnames)
-            for row in csv_reader:
-                try:
-                    timestamp = datetime(int(row['Year']),
-                                         int(row['Month']),
-                                         int(row['Day']),
-                                         int(row['Hour']),
-                                         int(row['Minute']))
-                    if timestamp:
-                        # Not currently making use of DHI and Temperature data
-                        diffuse_horizontal_irradiance = float(row['DHI'])       # Wh/m2
-                        direct_normal_irradiance = float(row['DNI'])            # Wh/m2
-                        temperature = float(row['Temperature'])                 # deg Celsius
-                        irradiance_dict[str(timestamp)] = diffuse_horizontal_irradiance
-                    else:
-                        _log.warning('Unparseable time values during PV data file load')
-                except ValueError:
-                    # Skip rows that have other data types in the columns of interest
-                    _log.warning('Skipping row during PV data file load')
+        irradiance_series = load_series(csv_file_path,
+                                        read_pv_columns,
+                                        self.get_register_value('data_frequency_min'),
+                                        self.get_register_value('data_year'))
         _log.info('{} Finished loading PV data.'.format(datetime.now()))
-        return irradiance_dict
+        return irradiance_series
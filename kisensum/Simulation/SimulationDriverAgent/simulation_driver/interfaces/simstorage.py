@@ -52,9 +52,8 @@
 #
 # }}}
 import logging
-from simulation import SimulationRegister, SimulationInterface
-
-from volttron.platform.agent import utils
+from fleet import StorageFleet
+from simulation import SimulationRegister, SimulationInterface, parse_sim_time
 
 _log = logging.getLogger(__name__)
 
@@ -88,6 +87,8 @@ class Interface(SimulationInterface):
                              'max_charge_kw',
                              'max_discharge_kw']
 
+    fleet_class = StorageFleet
+
     def __init__(self, **kwargs):
         super(Interface, self).__init__(**kwargs)
         self.soc_kwh = 0
@@ -101,9 +102,15 @@ class Interface(SimulationInterface):
     def update(self):
         """Update the device driver's state in advance of a periodic scrape request."""
         super(Interface, self).update()
+        try:
+            sim_time = parse_sim_time(self.get_register_value('last_timestamp'))
+        except (TypeError, ValueError):
+            sim_time = None
+        if self.device_fleet:
+            self.device_fleet.advance(sim_time)
+            return
         power_kw = self.calculate_power()
         self.set_register_by_name('power_kw', power_kw)
-        sim_time = self.get_register_value('last_timestamp')
         soc = self.calculate_soc(sim_time, power_kw)
         self.set_register_by_name('soc_kwh', soc)
         self.old_timestamp = sim_time
@@ -151,19 +158,13 @@ class Interface(SimulationInterface):
 
             The new SOC is based on SOC, current power, elapsed time and max SOC.
 
-        :param sim_time: (str) Current time on the simulation clock.
+        :param sim_time: (datetime) Current time on the simulation clock.
         :param power_kw: (float) Current charge/discharge power.
         :return: (float) The new SOC value in kWh.
         """
         elapsed_time_hrs = 0.0
-        if sim_time and self.old_timestamp:
-            try:
-                new_time = utils.parse_timestamp_string(sim_time)
-                old_time = utils.parse_timestamp_string(self.old_timestamp)
-                if new_time > old_time:
-                    elapsed_time_hrs = (new_time - old_time).total_seconds() / 3600.0
-            except ValueError:
-                pass
+        if sim_time and self.old_timestamp and sim_time > self.old_timestamp:
+            elapsed_time_hrs = (sim_time - self.old_timestamp).total_seconds() / 3600.0
         new_soc = self.get_register_value('soc_kwh') + (power_kw * elapsed_time_hrs)
         new_soc = min(max(new_soc, 0.0), self.get_register_value('max_soc_kwh'))
         new_soc = int(1000 * new_soc) / 1000.0          # Round to nearest thousandth
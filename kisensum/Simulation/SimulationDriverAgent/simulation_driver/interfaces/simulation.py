@@ -51,12 +51,15 @@
 # United States Government or any agency thereof.
 #
 # }}}
+from functools import partial
 import logging
+import time
 
 from volttron.platform.agent import utils
 from volttron.platform.agent.utils import parse_timestamp_string
 
 from . import BaseInterface, BaseRegister, BasicRevert
+from .fleet import get_fleet, release_device
 
 _log = logging.getLogger(__name__)
 
@@ -67,6 +70,23 @@ type_mapping = {'string': str,
                 'bool': bool,
                 'boolean': bool}
 
+# The most recently parsed simulated timestamp, as (string, datetime).
+# Every device scraped at the same clock tick gets the same timestamp string, so it's parsed once per tick.
+_parsed_sim_time = (object(), None)
+
+
+def parse_sim_time(timestamp_string):
+    """
+        Parse a simulated timestamp string, reusing the result of the previous call for the same string.
+
+    :param timestamp_string: (str) A timestamp furnished by the SimulationClockAgent.
+    :return: (datetime) The parsed timestamp.
+    """
+    global _parsed_sim_time
+    if timestamp_string != _parsed_sim_time[0]:
+        _parsed_sim_time = (timestamp_string, utils.parse_timestamp_string(timestamp_string))
+    return _parsed_sim_time[1]
+
 
 class SimulationRegister(BaseRegister):
     """Abstract superclass for simulation Registers."""
@@ -101,6 +121,33 @@ class SimulationRegister(BaseRegister):
         self._value = x
 
 
+class FleetRegister(SimulationRegister):
+    """Simulation Register whose value is kept in a fleet's state array (see fleet.py)."""
+
+    def __init__(self, fleet, index, read_only, point_name, units, reg_type, default_value=None, description=''):
+        """
+            Initialize the instance.
+
+        :param fleet: The Fleet that holds the register's value.
+        :param index: The device's index in the fleet's arrays.
+        The other parameters are those of SimulationRegister.
+        """
+        self.fleet = fleet
+        self.index = index
+        super(FleetRegister, self).__init__(read_only, point_name, units, reg_type,
+                                            default_value=default_value, description=description)
+        if self._value is not None:
+            self.value = self._value
+
+    @property
+    def value(self):
+        return self.fleet.get(self.point_name, self.index)
+
+    @value.setter
+    def value(self, x):
+        self.fleet.set(self.point_name, self.index, x)
+
+
 class SimulationInterface(BasicRevert, BaseInterface):
     """
         Abstract superclass for simulation Interfaces.
@@ -112,11 +159,21 @@ class SimulationInterface(BasicRevert, BaseInterface):
     """
 
     registers_from_config = []                  # This definition should be overridden in subclasses
+    fleet_class = None                          # Overridden in subclasses that can be simulated as a fleet
+
+    # Set "fleet": "<name>" in the driver config to simulate the device as a member of the named fleet.
+    fleet = None
 
     def __init__(self, vip=None, core=None, **kwargs):
         super(SimulationInterface, self).__init__(vip=vip, core=core, **kwargs)
+        self.device_fleet = None
+        self.fleet_index = None
 
     def configure(self, config_dict, registry_config):
+        fleet_name = config_dict.get('fleet')
+        if fleet_name and self.fleet_class:
+            self.device_fleet = get_fleet(self.fleet_class, fleet_name)
+            self.fleet_index = self.device_fleet.add_device()
         if registry_config:
             self.parse_config(registry_config)
         for entry in config_dict.keys():
@@ -126,6 +183,13 @@ class SimulationInterface(BasicRevert, BaseInterface):
             _log.debug('from config: {} = {}'.format(reg, property_val))
             self.set_register_by_name(reg, property_val)
 
+    def release(self):
+        """Release the device's slot in its fleet, if it's simulated as a member of one."""
+        if self.device_fleet:
+            release_device(self.device_fleet, self.fleet_index)
+            self.device_fleet = None
+            self.fleet_index = None
+
     def get_point(self, point_name, **kwargs):
         register = self.get_register_by_name(point_name)
         result = register.value if hasattr(register, 'value') else None
@@ -151,7 +215,9 @@ class SimulationInterface(BasicRevert, BaseInterface):
 
     def _scrape_all(self, sim_time):
         self.set_register_by_name('last_timestamp', sim_time)
+        start_time = time.time()
         self.update()               # update() is overridden in each interface subclass
+        self.scrape_timings['update'] = time.time() - start_time
         read_registers = self.get_registers_by_type('byte', True)
         write_registers = self.get_registers_by_type('byte', False)
         return {r.point_name: r.value for r in read_registers + write_registers}
@@ -159,12 +225,16 @@ class SimulationInterface(BasicRevert, BaseInterface):
     def parse_config(self, registry_config_str):
         for regDef in registry_config_str:
             default_value = regDef.get('Starting Value', None)
-            register = SimulationRegister(regDef['Writable'].lower() != 'true',
-                                          regDef['Volttron Point Name'],
-                                          regDef.get('Units', ''),
-                                          type_mapping.get(regDef.get("Type", 'string'), str),
-                                          default_value=default_value if default_value != '' else None,
-                                          description=regDef.get('Notes', ''))
+            if self.device_fleet and regDef['Volttron Point Name'] in self.device_fleet.columns:
+                register_class = partial(FleetRegister, self.device_fleet, self.fleet_index)
+            else:
+                register_class = SimulationRegister
+            register = register_class(regDef['Writable'].lower() != 'true',
+                                      regDef['Volttron Point Name'],
+                                      regDef.get('Units', ''),
+                                      type_mapping.get(regDef.get("Type", 'string'), str),
+                                      default_value=default_value if default_value != '' else None,
+                                      description=regDef.get('Notes', ''))
             self.insert_register(register)
 
     def update(self):
@@ -181,7 +251,8 @@ class SimulationInterface(BasicRevert, BaseInterface):
             Return the current simulated timestamp.
 
             The current simulated timestamp (as a string) was requested from the SimulationClockAgent
-            via an RPC call (see BasicRevert.scrape_all()) and stored in a register.
+            via an RPC call, or furnished by its fast-forward clock tick (see BasicRevert.scrape_all()),
+            and stored in a register.
             Get that value from the register, parse the string, and return the datetime.
 
             If a simulated timestamp cannot be returned, log the reason and return None.
@@ -191,7 +262,7 @@ class SimulationInterface(BasicRevert, BaseInterface):
         sim_time = None
         timestamp_string = self.get_register_value('last_timestamp')
         try:
-            sim_time = utils.parse_timestamp_string(timestamp_string)
+            sim_time = parse_sim_time(timestamp_string)
         except TypeError:
             _log.warning('No timestamp returned by simulated time agent')
         except ValueError:
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2017, SLAC National Laboratory / Kisensum Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor SLAC / Kisensum,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# SLAC / Kisensum. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# }}}
+"""
+    Scrape-cycle timing statistics for the simulation driver.
+
+    Each DriverAgent records the duration of each phase of its scrapes in a fixed-size
+    histogram with log2-spaced buckets, so that the scrape interval, driver_scrape_interval
+    and the number of devices per driver agent can be sized from real measurements.
+"""
+import bisect
+import math
+
+# Phases of a scrape, all measured in seconds:
+#   lag         How late the scrape started, relative to its scheduled time slot.
+#   clock_rpc   The get_time RPC call to the SimulationClockAgent (not made in fast-forward mode).
+#   update      The device interface's update(), which calculates the device's new state.
+#   scrape      The device interface's scrape_all(), including clock_rpc and update.
+#   publish     Publishing the scrape results.
+PHASES = ('lag', 'clock_rpc', 'update', 'scrape', 'publish')
+
+# Upper bounds (seconds) of the histogram buckets: powers of 2 from 1 microsecond to about 134 seconds.
+BUCKET_BOUNDS = [1e-6 * 2 ** i for i in range(28)]
+
+
+class LatencyHistogram(object):
+    """Fixed-size histogram of durations in seconds."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)    # The last bucket counts durations above the last bound
+        self.count = 0
+        self.total = 0.0
+        self.last = None
+        self.max = None
+
+    def add(self, seconds):
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def percentile(self, fraction):
+        """
+            Estimate a percentile of the durations.
+
+        :param fraction: (float) The percentile as a fraction, e.g. 0.99.
+        :return: (float) The upper bound of the bucket holding the percentile (at most the maximum duration),
+                 or None if no durations have been recorded.
+        """
+        if not self.count:
+            return None
+        rank = max(1, int(math.ceil(fraction * self.count)))
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                break
+        return min(BUCKET_BOUNDS[index], self.max) if index < len(BUCKET_BOUNDS) else self.max
+
+    def summary(self):
+        return {'count': self.count,
+                'last': self.last,
+                'mean': self.total / self.count if self.count else None,
+                'max': self.max,
+                'p50': self.percentile(0.5),
+                'p90': self.percentile(0.9),
+                'p99': self.percentile(0.99)}
+
+    def histogram(self):
+        return {'bounds': BUCKET_BOUNDS,
+                'counts': list(self.counts)}
+
+
+class ScrapeStatistics(object):
+    """Timing statistics of a device driver's scrapes."""
+
+    def __init__(self):
+        self.scrapes = 0
+        self.publishes = 0
+        self.phases = {phase: LatencyHistogram() for phase in PHASES}
+
+    def record(self, timings, publishes):
+        """
+            Record a scrape.
+
+        :param timings: (dict) Seconds taken by each phase of the scrape (see PHASES).
+        :param publishes: (int) Number of messages published.
+        """
+        self.scrapes += 1
+        self.publishes += publishes
+        for phase, seconds in timings.iteritems():
+            self.phases[phase].add(seconds)
+
+    def summary(self):
+        """Return the number of scrapes and publishes, and the last, mean, max and percentiles of each phase."""
+        result = {'scrapes': self.scrapes,
+                  'publishes': self.publishes}
+        for phase, histogram in self.phases.iteritems():
+            result[phase] = histogram.summary()
+        return result
+
+    def histograms(self):
+        """Return the histogram of each phase: the buckets' upper bounds and the count of durations in each."""
+        return {phase: histogram.histogram() for phase, histogram in self.phases.iteritems()}
@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2017, SLAC National Laboratory / Kisensum Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor SLAC / Kisensum,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# SLAC / Kisensum. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# }}}
+from datetime import datetime
+
+import gevent
+from gevent.event import AsyncResult
+from gevent.lock import BoundedSemaphore, DummySemaphore
+import pytest
+
+from volttron.platform.agent import utils
+from volttron.platform.messaging import headers as headers_mod
+
+from simulation_driver import driver_locks
+from simulation_driver.agent import SimulationDriverAgent, CLOCK_ACK_TOPIC
+from simulation_driver.driver import DriverAgent
+
+DEVICE = 'campus/building/storage'
+
+
+class FakePubSub(object):
+    """Records publishes, which complete immediately unless the test completes them."""
+
+    def __init__(self, complete=True):
+        self.complete = complete
+        self.published = []
+        self.pending = []
+
+    def publish(self, peer, topic, headers=None, message=None):
+        self.published.append((topic, headers, message))
+        result = AsyncResult()
+        if self.complete:
+            result.set()
+        else:
+            self.pending.append(result)
+        return result
+
+
+class FakeVIP(object):
+    def __init__(self, pubsub):
+        self.pubsub = pubsub
+
+
+class FakeCore(object):
+    identity = 'simulation.driver'
+
+
+class FakeParent(object):
+    """The SimulationDriverAgent settings a DriverAgent reads when it is created."""
+    publish_depth_first_all = True
+    publish_breadth_first_all = True
+    publish_depth_first = True
+    publish_breadth_first = True
+    blocking_publishes = True
+    fast_forward = False
+
+    def __init__(self, pubsub):
+        self.vip = FakeVIP(pubsub)
+
+
+class FakeInterface(object):
+    """Device interface returning fixed results, or failing, at any simulated time."""
+
+    def __init__(self, results=None, error=None):
+        self.results = results if results is not None else {'power_kw': 1.5, 'soc_kwh': 10.0}
+        self.error = error
+        self.scrape_times = []
+        self.scrape_timings = {'update': 0.001}
+
+    def scrape_all(self, sim_time=None):
+        self.scrape_times.append(sim_time)
+        if self.error:
+            raise self.error
+        return dict(self.results)
+
+
+@pytest.fixture
+def publish_lock(monkeypatch):
+    monkeypatch.setattr(driver_locks, '_publish_lock', DummySemaphore())
+
+
+def create_driver(pubsub=None, interface=None, **config):
+    """Create a started DriverAgent without a platform, publishing to a FakePubSub."""
+    pubsub = pubsub or FakePubSub()
+    driver = DriverAgent(FakeParent(pubsub), config, 0, 0.02, DEVICE)
+    driver.interface = interface or FakeInterface()
+    driver.device_name = DEVICE
+    driver.meta_data = {point: {'units': 'kW', 'type': 'float', 'tz': ''} for point in driver.interface.results}
+    driver.all_path_depth = 'devices/{}/all'.format(DEVICE)
+    driver.all_path_breadth = 'devices/all/storage/building/campus'
+    driver.point_topics = {point: ('devices/{}/{}'.format(DEVICE, point),
+                                   'devices/{}/storage/building/campus'.format(point))
+                           for point in driver.interface.results}
+    return driver
+
+
+def create_agent(drivers):
+    agent = SimulationDriverAgent.__new__(SimulationDriverAgent)
+    agent.vip = FakeVIP(FakePubSub())
+    agent.core = FakeCore()
+    agent.instances = dict(drivers)
+    agent.fast_forward = False
+    return agent
+
+
+class RecordingDriver(object):
+    def __init__(self):
+        self.reads = []
+
+    def fast_forward_read(self, sim_time, timestamp):
+        self.reads.append((sim_time, timestamp))
+
+
+def test_on_clock_tick_scrapes_every_driver_and_acknowledges():
+    drivers = {'campus/building/storage': RecordingDriver(), 'campus/building/pv': RecordingDriver()}
+    agent = create_agent(drivers)
+    agent.on_clock_tick(None, None, None, 'simulation/clock/tick', {},
+                        {'tick': 7, 'timestamp': '2017-04-30 13:05:00'})
+    assert agent.fast_forward
+    timestamp = utils.format_timestamp(datetime(2017, 4, 30, 13, 5))
+    for driver in drivers.values():
+        assert driver.reads == [('2017-04-30 13:05:00', timestamp)]
+    assert agent.vip.pubsub.published == [(CLOCK_ACK_TOPIC, None, {'tick': 7, 'participant': 'simulation.driver'})]
+
+
+def test_on_clock_stop_resumes_scheduled_scrapes():
+    agent = create_agent({})
+    agent.on_clock_tick(None, None, None, 'simulation/clock/tick', {},
+                        {'tick': 1, 'timestamp': '2017-04-30 13:00:00'})
+    agent.on_clock_stop(None, None, None, 'simulation/clock/stop', {}, {})
+    assert not agent.fast_forward
+
+
+def test_fast_forward_read_publishes_at_simulated_time(publish_lock):
+    driver = create_driver()
+    timestamp = utils.format_timestamp(datetime(2017, 4, 30, 13, 5))
+    driver.fast_forward_read('2017-04-30 13:05:00', timestamp)
+    assert driver.interface.scrape_times == ['2017-04-30 13:05:00']
+    published = driver.vip.pubsub.published
+    assert len(published) == 2 * 2 + 2
+    for topic, headers, message in published:
+        assert headers == {headers_mod.DATE: timestamp, headers_mod.TIMESTAMP: timestamp}
+    assert published[-2][0] == 'devices/{}/all'.format(DEVICE)
+    assert published[-2][2] == [{'power_kw': 1.5, 'soc_kwh': 10.0}, driver.meta_data]
+    statistics = driver.scrape_statistics.summary()
+    assert statistics['scrapes'] == 1
+    assert statistics['publishes'] == 6
+    assert statistics['update']['count'] == 1
+    assert statistics['scrape']['count'] == 1
+    # Ticks are not scheduled, so they add nothing to the lag histogram.
+    assert statistics['lag']['count'] == 0
+
+
+def test_fast_forward_read_scrape_failure(publish_lock):
+    driver = create_driver(interface=FakeInterface(error=RuntimeError('no data')))
+    driver.fast_forward_read('2017-04-30 13:05:00', utils.format_timestamp(datetime(2017, 4, 30, 13, 5)))
+    assert driver.vip.pubsub.published == []
+    assert driver.scrape_statistics.scrapes == 0
+
+
+@pytest.mark.parametrize('flags, expected', [
+    ({}, ['depth power_kw', 'breadth power_kw', 'depth soc_kwh', 'breadth soc_kwh', 'depth all', 'breadth all']),
+    ({'publish_depth_first': False, 'publish_breadth_first': False}, ['depth all', 'breadth all']),
+    ({'publish_depth_first_all': False, 'publish_breadth_first_all': False},
+     ['depth power_kw', 'breadth power_kw', 'depth soc_kwh', 'breadth soc_kwh']),
+    ({'publish_breadth_first': False, 'publish_breadth_first_all': False},
+     ['depth power_kw', 'depth soc_kwh', 'depth all']),
+    ({'publish_depth_first': False, 'publish_depth_first_all': False, 'publish_breadth_first_all': False},
+     ['breadth power_kw', 'breadth soc_kwh']),
+    ({'publish_depth_first': False, 'publish_breadth_first': False,
+      'publish_depth_first_all': False, 'publish_breadth_first_all': False}, []),
+])
+def test_publish_results_topics(publish_lock, flags, expected):
+    driver = create_driver(**flags)
+    names = {'devices/{}/all'.format(DEVICE): 'depth all', 'devices/all/storage/building/campus': 'breadth all'}
+    for point, (depth_first, breadth_first) in driver.point_topics.items():
+        names[depth_first] = 'depth ' + point
+        names[breadth_first] = 'breadth ' + point
+    results = {'power_kw': 1.5, 'soc_kwh': 10.0}
+    publishes = driver.publish_results(results, '2017-04-30T13:05:00')
+    published = [names[topic] for topic, headers, message in driver.vip.pubsub.published]
+    assert publishes == len(expected)
+    assert sorted(published) == sorted(expected)
+    for topic, headers, message in driver.vip.pubsub.published:
+        if names[topic].endswith(' all'):
+            assert message == [results, driver.meta_data]
+        else:
+            point = names[topic].split()[1]
+            assert message == [results[point], driver.meta_data[point]]
+
+
+def test_publish_results_without_results(publish_lock):
+    driver = create_driver()
+    assert driver.publish_results({}, '2017-04-30T13:05:00') == 0
+    assert driver.vip.pubsub.published == []
+
+
+def test_publish_nowait_bounds_publishes_in_flight(monkeypatch):
+    slots = BoundedSemaphore(2)
+    monkeypatch.setattr(driver_locks, '_publish_lock', slots)
+    pubsub = FakePubSub(complete=False)
+    driver = create_driver(pubsub, blocking_publishes=False, publish_breadth_first=False)
+    greenlet = gevent.spawn(driver.publish_results, {'power_kw': 1.5}, '2017-04-30T13:05:00')
+    gevent.sleep(0.01)
+    # Two of the three publishes are in flight; the third waits for a slot.
+    assert len(pubsub.published) == 2
+    assert not greenlet.ready()
+    pubsub.pending[0].set()
+    gevent.sleep(0.01)
+    assert len(pubsub.published) == 3
+    assert greenlet.get(timeout=1) == 3
+    for result in pubsub.pending[1:]:
+        result.set()
+    gevent.sleep(0.01)
+    assert slots.counter == 2
+
+
+def test_publish_nowait_releases_slot_when_publish_fails(monkeypatch):
+    slots = BoundedSemaphore(1)
+    monkeypatch.setattr(driver_locks, '_publish_lock', slots)
+    pubsub = FakePubSub(complete=False)
+    driver = create_driver(pubsub, blocking_publishes=False)
+    driver._publish_nowait('devices/{}/all'.format(DEVICE), {}, [{}, {}])
+    assert slots.counter == 0
+    pubsub.pending[0].set_exception(RuntimeError('publish failed'))
+    gevent.sleep(0.01)
+    assert slots.counter == 1
+
+
+def test_publish_nowait_releases_slot_when_publish_raises(monkeypatch):
+    slots = BoundedSemaphore(1)
+    monkeypatch.setattr(driver_locks, '_publish_lock', slots)
+    driver = create_driver(blocking_publishes=False)
+
+    def publish(peer, topic, headers=None, message=None):
+        raise RuntimeError('not connected')
+
+    monkeypatch.setattr(driver.vip.pubsub, 'publish', publish)
+    with pytest.raises(RuntimeError):
+        driver._publish_nowait('devices/{}/all'.format(DEVICE), {}, [{}, {}])
+    assert slots.counter == 1
+
+
+def test_acquire_publish_slot(monkeypatch):
+    slots = BoundedSemaphore(2)
+    monkeypatch.setattr(driver_locks, '_publish_lock', slots)
+    release = driver_locks.acquire_publish_slot()
+    driver_locks.acquire_publish_slot()
+    assert slots.locked()
+    release()
+    assert slots.counter == 1
+
+
+def test_acquire_publish_slot_not_configured(monkeypatch):
+    monkeypatch.setattr(driver_locks, '_publish_lock', None)
+    with pytest.raises(RuntimeError):
+        driver_locks.acquire_publish_slot()
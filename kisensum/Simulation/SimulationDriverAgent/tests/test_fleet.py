@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2017, SLAC National Laboratory / Kisensum Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor SLAC / Kisensum,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# SLAC / Kisensum. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# }}}
+import csv
+from datetime import datetime, timedelta
+import itertools
+import os
+import random
+
+import pytest
+
+from simulation_driver.interfaces import fleet, simload, simpv, simstorage
+from simulation_driver.interfaces.fleet import Fleet, LoadFleet, PVFleet, StorageFleet, get_fleet
+from simulation_data.timeseries import write_series
+
+AGENT_DIR = os.path.join(os.path.dirname(__file__), os.pardir)
+START = datetime(2017, 4, 30, 11, 50)
+_fleet_names = itertools.count()
+
+
+def registry_config(name):
+    """Return the rows of one of the agent's registry configuration files."""
+    with open(os.path.join(AGENT_DIR, name + '.csv')) as registry_file:
+        return list(csv.DictReader(registry_file))
+
+
+def create_interfaces(module, configs, fleet_name=None):
+    """Create and configure a device interface of the module for each driver config, in a fleet if one is named."""
+    interfaces = []
+    for config in configs:
+        config = dict(config)
+        if fleet_name:
+            config['fleet'] = fleet_name
+        interface = module.Interface(vip=None, core=None)
+        interface.configure(config, registry_config(module.__name__.split('.')[-1]))
+        interfaces.append(interface)
+    return interfaces
+
+
+def scrape_both(scalar, fleet_interfaces, minutes, set_points=None):
+    """
+        Scrape the scalar and fleet devices every minute, and check they publish the same values.
+
+        The fleet is stepped by the first device scraped at a simulated time, so the points
+        of every device are set before the devices are scraped.
+    """
+    for minute in range(minutes):
+        sim_time = str(START + timedelta(minutes=minute))
+        if set_points:
+            for index, (device, fleet_device) in enumerate(zip(scalar, fleet_interfaces)):
+                for point, value in set_points(minute, index).items():
+                    device.set_point(point, value)
+                    fleet_device.set_point(point, value)
+        for index, (device, fleet_device) in enumerate(zip(scalar, fleet_interfaces)):
+            expected = device.scrape_all(sim_time)
+            result = fleet_device.scrape_all(sim_time)
+            assert result == expected, '{} device {}'.format(sim_time, index)
+
+
+@pytest.fixture(scope='module')
+def series_paths(tmpdir_factory):
+    """Write PV irradiance and Load power reference series with a few missing and zero values."""
+    directory = tmpdir_factory.mktemp('series')
+    generator = random.Random(0)
+    paths = {}
+    for name, interval in (('pv', 30), ('load', 15)):
+        samples = []
+        for index in range(365 * 24 * 60 // interval):
+            value = round(generator.uniform(0.0, 800.0), 2)
+            if index % 7 == 3:
+                value = 0.0
+            if index % 11 != 5:
+                samples.append((datetime(2015, 1, 1) + timedelta(minutes=index * interval), value))
+        paths[name] = str(directory.join(name + '.simts'))
+        write_series(paths[name], samples, interval, 2015)
+    return paths
+
+
+def test_fleet_is_abstract():
+    with pytest.raises(TypeError):
+        Fleet('abstract')
+
+
+def test_storage_fleet_matches_scalar_devices():
+    configs = [{'max_charge_kw': 15.0, 'max_discharge_kw': 15.0, 'max_soc_kwh': 50.0, 'soc_kwh': 25.0,
+                'reduced_charge_soc_threshold': 0.8, 'reduced_discharge_soc_threshold': 0.2},
+               {'max_charge_kw': 40.0, 'max_discharge_kw': 30.0, 'max_soc_kwh': 20.0, 'soc_kwh': 17.0,
+                'reduced_charge_soc_threshold': 0.9, 'reduced_discharge_soc_threshold': 0.1},
+               {'max_charge_kw': 5.0, 'max_discharge_kw': 50.0, 'max_soc_kwh': 10.0, 'soc_kwh': 1.5,
+                'reduced_charge_soc_threshold': 0.7, 'reduced_discharge_soc_threshold': 0.3}]
+    scalar = create_interfaces(simstorage, configs)
+    fleet_interfaces = create_interfaces(simstorage, configs, 'storage-{}'.format(next(_fleet_names)))
+    assert isinstance(fleet_interfaces[0].device_fleet, StorageFleet)
+    generator = random.Random(1)
+    dispatch = {}
+
+    def set_points(minute, index):
+        # Charge and discharge hard enough to reach the reduced power SOC thresholds.
+        if minute % 10 == 0:
+            dispatch[index] = generator.choice([-60.0, -20.0, -5.0, 0.0, 5.0, 20.0, 60.0])
+        return {'dispatch_kw': dispatch[index]}
+
+    scrape_both(scalar, fleet_interfaces, 180, set_points)
+
+
+def test_pv_fleet_matches_scalar_devices(series_paths):
+    configs = [{'csv_file_path': series_paths['pv'], 'max_power_kw': 10.0, 'panel_area': area, 'efficiency': efficiency,
+                'data_frequency_min': 30, 'data_year': '2015', 'interpolate': interpolate}
+               for area, efficiency, interpolate in ((50.0, 0.75, False), (20.0, 0.5, True), (80.0, 0.9, False))]
+    scalar = create_interfaces(simpv, configs)
+    fleet_interfaces = create_interfaces(simpv, configs, 'pv-{}'.format(next(_fleet_names)))
+    assert isinstance(fleet_interfaces[0].device_fleet, PVFleet)
+    scrape_both(scalar, fleet_interfaces, 240)
+
+
+def test_load_fleet_matches_scalar_devices(series_paths):
+    configs = [{'csv_file_path': series_paths['load'], 'data_frequency_min': 15, 'data_year': '2015',
+                'timestamp_column_header': 'local_date', 'power_column_header': 'load_kw',
+                'interpolate': interpolate} for interpolate in (False, True, False)]
+    scalar = create_interfaces(simload, configs)
+    fleet_interfaces = create_interfaces(simload, configs, 'load-{}'.format(next(_fleet_names)))
+    assert isinstance(fleet_interfaces[0].device_fleet, LoadFleet)
+    scrape_both(scalar, fleet_interfaces, 240)
+
+
+def test_release_reuses_slot(series_paths):
+    name = 'load-{}'.format(next(_fleet_names))
+    configs = [{'csv_file_path': series_paths['load'], 'data_frequency_min': 15, 'data_year': '2015',
+                'timestamp_column_header': 'local_date', 'power_column_header': 'load_kw'}] * 3
+    first, second, third = create_interfaces(simload, configs, name)
+    load_fleet = first.device_fleet
+    assert [device.fleet_index for device in (first, second, third)] == [0, 1, 2]
+    for device in (first, second, third):
+        device.scrape_all(str(START))
+
+    second.release()
+    assert second.device_fleet is None
+    assert load_fleet.device_count() == 2
+    assert load_fleet.values('power_kw')[1] == 0.0
+    assert load_fleet.series[1] is None
+
+    replacement = create_interfaces(simload, configs[:1], name)[0]
+    assert replacement.device_fleet is load_fleet
+    assert replacement.fleet_index == 1
+    assert load_fleet.size == 3
+    replacement.scrape_all(str(START + timedelta(minutes=15)))
+    assert replacement.get_point('power_kw') == first.get_point('power_kw')
+
+
+def test_release_last_device_discards_fleet():
+    name = 'storage-{}'.format(next(_fleet_names))
+    config = {'max_charge_kw': 15.0, 'max_discharge_kw': 15.0, 'max_soc_kwh': 50.0, 'soc_kwh': 25.0,
+              'reduced_charge_soc_threshold': 0.8, 'reduced_discharge_soc_threshold': 0.2}
+    devices = create_interfaces(simstorage, [config, config], name)
+    storage_fleet = devices[0].device_fleet
+    devices[0].release()
+    assert get_fleet(StorageFleet, name) is storage_fleet
+    devices[1].release()
+    assert (StorageFleet, name) not in fleet._fleets
+    assert get_fleet(StorageFleet, name) is not storage_fleet
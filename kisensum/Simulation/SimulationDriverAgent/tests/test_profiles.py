@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2017, SLAC National Laboratory / Kisensum Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor SLAC / Kisensum,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# SLAC / Kisensum. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# }}}
+import csv
+from datetime import datetime, timedelta
+import os
+
+from simulation_data.profiles import SimulationProfile
+from simulation_data.timeseries import TimeSeries
+from simulation_driver.interfaces import simstorage
+
+AGENT_DIR = os.path.join(os.path.dirname(__file__), os.pardir)
+START = datetime(2017, 4, 30, 11, 50)
+
+
+def test_values_at():
+    profile = SimulationProfile(START, START + timedelta(minutes=10))
+    profile.columns['devices/simload/power_kw'] = [float(index) for index in range(profile.steps)]
+    profile.columns['devices/simpv/power_kw'] = [-float(index) for index in range(profile.steps)]
+    assert profile.steps == 11
+    assert profile.values_at(START) == {'devices/simload/power_kw': 0.0, 'devices/simpv/power_kw': -0.0}
+    assert profile.values_at(START + timedelta(minutes=3, seconds=30)) == {'devices/simload/power_kw': 3.0,
+                                                                           'devices/simpv/power_kw': -3.0}
+    assert profile.values_at(START + timedelta(minutes=10)) == {'devices/simload/power_kw': 10.0,
+                                                                'devices/simpv/power_kw': -10.0}
+    assert profile.values_at(START + timedelta(minutes=11)) == {}
+    assert profile.values_at(START - timedelta(minutes=1)) == {}
+
+
+def test_add_load_uses_next_boundary_and_keeps_prior_power():
+    samples = [(datetime(2015, 4, 30, 12, 0), 5.0),
+               (datetime(2015, 4, 30, 12, 15), 0.0),
+               (datetime(2015, 4, 30, 12, 30), 7.0)]
+    series = TimeSeries.from_samples(samples, 15, 2015)
+    profile = SimulationProfile(START, START + timedelta(minutes=60))
+    profile.add_load('devices/simload', series)
+    column = profile.columns['devices/simload/power_kw']
+    assert list(column[:10]) == [5.0] * 10                 # 11:50-11:59 look up 12:00
+    assert list(column[10:25]) == [5.0] * 15               # 12:00-12:14 look up the zero at 12:15
+    assert list(column[25:40]) == [7.0] * 15               # 12:15-12:29 look up 12:30
+    assert list(column[40:]) == [7.0] * 21                 # No data after 12:30
+
+
+def test_add_storage_matches_simstorage():
+    config = {'max_charge_kw': 15.0, 'max_discharge_kw': 12.0, 'max_soc_kwh': 20.0, 'soc_kwh': 14.0,
+              'reduced_charge_soc_threshold': 0.8, 'reduced_discharge_soc_threshold': 0.2}
+
+    def dispatch_rule(soc_kwh, prior_dispatch_kw):
+        if soc_kwh < 4.0:
+            return 15.0
+        if soc_kwh > 17.0:
+            return -12.0
+        return 15.0 if prior_dispatch_kw >= 0.0 else -12.0
+
+    profile = SimulationProfile(START, START + timedelta(hours=4))
+    profile.add_storage('devices/simstorage', config['soc_kwh'], config['max_soc_kwh'],
+                        config['max_charge_kw'], config['max_discharge_kw'],
+                        config['reduced_charge_soc_threshold'], config['reduced_discharge_soc_threshold'],
+                        dispatch_rule, 300)
+
+    device = simstorage.Interface(vip=None, core=None)
+    with open(os.path.join(AGENT_DIR, 'simstorage.csv')) as registry_file:
+        device.configure(config, list(csv.DictReader(registry_file)))
+    soc_kwh, dispatch_kw = config['soc_kwh'], 0.0
+    for index, sim_time in enumerate(profile.times()):
+        if index % 5 == 0:
+            dispatch_kw = dispatch_rule(soc_kwh, dispatch_kw)
+            device.set_point('dispatch_kw', dispatch_kw)
+        result = device.scrape_all(str(sim_time))
+        soc_kwh = result['soc_kwh']
+        assert profile.values_at(sim_time) == {'devices/simstorage/power_kw': result['power_kw'],
+                                               'devices/simstorage/soc_kwh': result['soc_kwh'],
+                                               'devices/simstorage/dispatch_kw': result['dispatch_kw']}, sim_time
+    # The trajectory reaches both thresholds, with reduced charging and discharging near the SOC limits.
+    assert min(profile.columns['devices/simstorage/dispatch_kw']) == -12.0
+    assert 0.0 < min(profile.columns['devices/simstorage/soc_kwh']) < 4.0
+    assert 17.0 < max(profile.columns['devices/simstorage/soc_kwh']) < 20.0
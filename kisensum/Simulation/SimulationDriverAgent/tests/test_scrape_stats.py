@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2017, SLAC National Laboratory / Kisensum Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor SLAC / Kisensum,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# SLAC / Kisensum. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# }}}
+from simulation_driver.scrape_stats import BUCKET_BOUNDS, LatencyHistogram, ScrapeStatistics
+
+
+def test_bucket_placement():
+    histogram = LatencyHistogram()
+    histogram.add(BUCKET_BOUNDS[3])         # On a bound: counted in that bound's bucket
+    histogram.add(BUCKET_BOUNDS[3] * 1.5)   # Between bounds: counted in the next bucket up
+    histogram.add(0.0)
+    counts = histogram.histogram()['counts']
+    assert counts[0] == 1
+    assert counts[3] == 1
+    assert counts[4] == 1
+    assert sum(counts) == histogram.count == 3
+
+
+def test_overflow_bucket():
+    histogram = LatencyHistogram()
+    histogram.add(BUCKET_BOUNDS[-1] * 2)
+    counts = histogram.histogram()['counts']
+    assert len(counts) == len(BUCKET_BOUNDS) + 1
+    assert counts[-1] == 1
+    # There is no upper bound for the overflow bucket, so its percentiles are the maximum duration.
+    assert histogram.percentile(0.5) == BUCKET_BOUNDS[-1] * 2
+
+
+def test_percentiles():
+    histogram = LatencyHistogram()
+    for i in range(90):
+        histogram.add(BUCKET_BOUNDS[2])
+    for i in range(9):
+        histogram.add(BUCKET_BOUNDS[10])
+    histogram.add(BUCKET_BOUNDS[20] * 0.75)
+    assert histogram.percentile(0.5) == BUCKET_BOUNDS[2]
+    assert histogram.percentile(0.9) == BUCKET_BOUNDS[2]
+    assert histogram.percentile(0.95) == BUCKET_BOUNDS[10]
+    # The top bucket's bound is above the maximum duration, so the maximum is returned instead.
+    assert histogram.percentile(1.0) == BUCKET_BOUNDS[20] * 0.75
+    assert histogram.percentile(0.0) == BUCKET_BOUNDS[2]
+
+
+def test_empty_histogram():
+    summary = LatencyHistogram().summary()
+    assert summary['count'] == 0
+    assert summary['mean'] is None
+    assert summary['p50'] is None
+    assert summary['p99'] is None
+
+
+def test_statistics_record_only_timed_phases():
+    statistics = ScrapeStatistics()
+    statistics.record({'scrape': 0.002, 'publish': 0.001}, 4)
+    statistics.record({'lag': 0.5, 'scrape': 0.004, 'publish': 0.001}, 4)
+    summary = statistics.summary()
+    assert summary['scrapes'] == 2
+    assert summary['publishes'] == 8
+    assert summary['lag']['count'] == 1
+    assert summary['lag']['max'] == 0.5
+    assert summary['scrape']['count'] == 2
+    assert summary['scrape']['mean'] == 0.003
+    assert summary['clock_rpc']['count'] == 0
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2017, Battelle Memorial Institute
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor Battelle,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY
+# operated by BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+"""
+Per-VEN cache of idle oadrPoll results.
+
+A poll is idle when the VEN has no un-acknowledged site events to be told about. The VTN
+remembers an idle poll for OADR_POLL_CACHE_SECONDS, so the VEN's following polls are answered
+without touching the database. The cached entry is dropped sooner when:
+
+    - a Site, DR Event or Site Event is saved or deleted, or
+    - the next of the VEN's pending site events reaches its scheduled notification time.
+
+Entries are stored in Django's default cache. With a cache shared by all of the VTN's processes
+(e.g. memcached), a change is seen by every process at once; with the default per-process cache,
+another process may answer from its cache until the entry times out.
+"""
+
+from __future__ import unicode_literals
+import hashlib
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from vtn.models import Site, DREvent, SiteEvent
+
+GENERATION_KEY = 'oadr_poll_generation'
+
+
+def ven_key(ven_id):
+    return 'oadr_poll_idle_{}'.format(hashlib.md5(ven_id.encode('utf-8')).hexdigest())
+
+
+def generation():
+    """
+    :return: the current generation of the cache, which changes whenever the DR events change
+    """
+    current = cache.get(GENERATION_KEY)
+    if current is None:
+        # Start a generation if there is none, or the cache has dropped it.
+        cache.add(GENERATION_KEY, uuid.uuid4().hex, None)
+        current = cache.get(GENERATION_KEY)
+    return current
+
+
+def is_idle(ven_id):
+    """
+    :param ven_id: the polling VEN's ID
+    :return: True if the VEN's last poll was idle and nothing has changed since
+    """
+    if not settings.OADR_POLL_CACHE_SECONDS:
+        return False
+    idle_generation = cache.get(ven_key(ven_id))
+    return idle_generation is not None and idle_generation == generation()
+
+
+def set_idle(ven_id, idle_generation, next_notification_time=None):
+    """
+    Remember that a VEN's poll was idle.
+
+    :param ven_id: the polling VEN's ID
+    :param idle_generation: the cache generation read before the poll queried the database
+    :param next_notification_time: the scheduled notification time of the VEN's next pending site event, if any
+    """
+    timeout = settings.OADR_POLL_CACHE_SECONDS
+    if next_notification_time is not None:
+        timeout = min(timeout, (next_notification_time - timezone.now()).total_seconds())
+    if timeout > 0:
+        cache.set(ven_key(ven_id), idle_generation, timeout)
+
+
+@receiver([post_save, post_delete], sender=Site)
+@receiver([post_save, post_delete], sender=DREvent)
+@receiver([post_save, post_delete], sender=SiteEvent)
+def invalidate(sender, **kwargs):
+    """
+    Start a new cache generation, so that no VEN's poll is answered from the cache.
+    """
+    cache.set(GENERATION_KEY, uuid.uuid4().hex, None)
@@ -0,0 +1,39 @@
+"""
+Measures the UpdateReport telemetry ingest throughput in reports/sec.
+
+This is not part of the test suite; run it explicitly, with output capture disabled:
+
+    pytest -s api/tests/benchmark_ingest.py
+"""
+import time
+
+import pytest
+from django.test import Client
+
+from vtn.models import Site, Telemetry
+from .helper_functions import REPORT_URL, get_update_report_xml
+from .setup_test_data import create_customers, create_dr_programs, create_sites
+
+pytestmark = pytest.mark.django_db
+
+NUM_INTERVALS = 1440        # A day of 1-minute intervals
+NUM_REPORTS = 5
+
+
+def test_ingest_throughput():
+    create_customers(1)
+    create_dr_programs(2)
+    create_sites(1)
+    client = Client()
+    update_report_xml = get_update_report_xml(NUM_INTERVALS)
+    # The first report is not timed, so that the timings don't include creating the site's report.
+    client.post(REPORT_URL, update_report_xml, content_type="application/xml")
+
+    start_time = time.time()
+    for i in range(NUM_REPORTS):
+        response = client.post(REPORT_URL, update_report_xml, content_type="application/xml")
+        assert response.status_code == 200
+    elapsed_secs = time.time() - start_time
+    print('UpdateReport ingest: {:.1f} reports/sec of {} intervals ({:.0f} intervals/sec)'.format(
+        NUM_REPORTS / elapsed_secs, NUM_INTERVALS, NUM_REPORTS * NUM_INTERVALS / elapsed_secs))
+    assert Telemetry.objects.filter(site=Site.objects.get(ven_id='0')).count() == (NUM_REPORTS + 1) * NUM_INTERVALS
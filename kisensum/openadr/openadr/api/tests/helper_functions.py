@@ -3,6 +3,7 @@ from api.xsd import oadr_20b
 import os
 from vtn.models import *
 import random
+import re
 from django.utils import timezone
 from datetime import datetime, timedelta
 
@@ -39,6 +40,20 @@ def get_file_xml(filename):
     return xml
 
 
+def get_update_report_xml(num_intervals):
+    """
+    :param num_intervals: the number of telemetry intervals in the report
+    :return: the ven_update_report XML, with its interval repeated at 1-minute steps
+    """
+    update_report_xml = get_file_xml('ven_update_report')
+    interval = re.search(r'<ei:interval .*?</ei:interval>', update_report_xml, re.DOTALL).group(0)
+    start = datetime(2017, 12, 6)
+    intervals = [interval.replace('2017-12-06T21:33:08.423684Z',
+                                  (start + timedelta(minutes=i)).strftime('%Y-%m-%dT%H:%M:%SZ'))
+                 for i in range(num_intervals)]
+    return update_report_xml.replace(interval, '\n'.join(intervals))
+
+
 class NullWriter(object):
     """
     This class is used in conjunction with suppress_output()
@@ -11,6 +11,17 @@ import isodate
 import pytz
 import sys
 from .helper_functions import *
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from datetime import datetime, timedelta
+from unittest import mock
+from django.db.models import Avg
+from vtn.tasks import ingest_telemetry, update_event_statuses
+from vtn.views import DREventDetail, get_graph_data
+import csv
+import gzip
+from django.contrib.auth.models import User
 
 import django
 django.setup()
@@ -287,12 +298,377 @@ class TestDialogue(TestCase):
         self.assertXMLEqual(vtn_response_xml, response.content.decode('utf-8'))
 
 
+@pytest.mark.usefixtures("database_ready")
+class TestPollLoad(TestCase):
+    """
+    This class simulates many VENs polling the VTN.
+    """
 
+    NUM_VENS = 50
+    POLLS_PER_VEN = 5
 
+    def setUp(self):
+        cache.clear()
+        DREvent.objects.all().delete()
+        create_customers(1)
+        create_dr_programs(2)
+        create_sites(self.NUM_VENS - Site.objects.count())
+        self.ven_ids = [site.ven_id for site in Site.objects.all()]
+        self.poll_xml = get_file_xml('ven_poll')
+        self.client = Client()
+
+    def poll(self, ven_id):
+        poll_xml = self.poll_xml.replace("<ei:venID>0</ei:venID>", "<ei:venID>{}</ei:venID>".format(ven_id))
+        return self.client.post(POLL_URL, poll_xml, content_type="application/xml")
+
+    def test_idle_polls(self):
+        """
+        This checks that each VEN's first idle poll takes one query to find its site and pending events
+        and one to update its last status time, and that its later polls don't query the database.
+        """
+        vtn_response_xml = get_file_xml('vtn_response_no_events')
+        with CaptureQueriesContext(connection) as queries:
+            for ven_id in self.ven_ids:
+                response = self.poll(ven_id)
+                self.assertXMLEqual(vtn_response_xml.replace("<oadr:venID>0</oadr:venID>",
+                                                             "<oadr:venID>{}</oadr:venID>".format(ven_id)),
+                                    response.content.decode('utf-8'))
+        self.assertEqual(len(queries), 2 * len(self.ven_ids))
+
+        with self.assertNumQueries(0):
+            for i in range(self.POLLS_PER_VEN):
+                for ven_id in self.ven_ids:
+                    self.assertEqual(self.poll(ven_id).status_code, 200)
+
+    def test_polls_after_event_change(self):
+        """
+        This checks that a new DR event is sent on the next poll, despite the cached idle polls,
+        and that the number of queries per poll doesn't depend on the number of site events.
+        """
+        for ven_id in self.ven_ids:
+            self.poll(ven_id)
+
+        ven_id = self.ven_ids[0]
+        for i in range(3):
+            create_dr_event(ven_id, 'active', 'not_told')
+        with self.assertNumQueries(4):
+            response = self.poll(ven_id)
+        old_stdout = suppress_output()
+        parsed = oadr_20b.parseString(response.content)
+        sys.stdout = old_stdout
+        self.assertEqual(len(parsed.oadrSignedObject.oadrDistributeEvent.oadrEvent), 3)
+        for site_event in SiteEvent.objects.filter(site__ven_id=ven_id):
+            self.assertEqual(site_event.ven_status, 'told')
 
+        # The other VENs' idle polls were invalidated by the new DR event.
+        with self.assertNumQueries(2):
+            self.poll(self.ven_ids[1])
 
 
+@pytest.mark.usefixtures("database_ready")
+class TestTelemetryIngest(TestCase):
+    """
+    This class tests the ingestion of UpdateReport telemetry.
+    """
 
+    NUM_INTERVALS = 1440        # A day of 1-minute intervals
 
+    def setUp(self):
+        Telemetry.objects.all().delete()
+        create_customers(1)
+        create_dr_programs(2)
+        if not Site.objects.filter(ven_id='0').exists():
+            create_sites(1)
+        self.client = Client()
 
+    def test_bulk_ingest(self):
+        """
+        This checks that a day of intervals is saved with a few bulk inserts, not one insert per interval.
+        The ingest throughput is measured by benchmark_ingest.py.
+        """
+        update_report_xml = get_update_report_xml(self.NUM_INTERVALS)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(REPORT_URL, update_report_xml, content_type="application/xml")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Telemetry.objects.filter(site__ven_id='0').count(), self.NUM_INTERVALS)
+        self.assertLess(len(queries), self.NUM_INTERVALS / 50)
+
+    @override_settings(TELEMETRY_ASYNC_INGEST=True)
+    def test_async_ingest(self):
+        """
+        This checks that with TELEMETRY_ASYNC_INGEST, the telemetry is queued instead of saved in the request.
+        """
+        with mock.patch('api.views.ingest_telemetry.delay') as delay:
+            response = self.client.post(REPORT_URL, get_update_report_xml(3), content_type="application/xml")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Telemetry.objects.count(), 0)
+        site_id, reported_on, intervals = delay.call_args[0]
+        self.assertEqual(site_id, Site.objects.get(ven_id='0').pk)
+        self.assertEqual(len(intervals), 3)
+        self.assertEqual(intervals[0][1:], (6.2, 5.44668467252))
+
+    def test_rollups(self):
+        """
+        This checks that the telemetry rollups are updated incrementally on ingest, agree with
+        averaging the raw telemetry, and are rebuilt the same way from the raw telemetry.
+        """
+        site = Site.objects.get(ven_id='0')
+        start = datetime(2017, 12, 6, tzinfo=pytz.utc)
+        for report in range(3):
+            intervals = [((start + timedelta(seconds=20 * i)).isoformat(), float(i), None if i % 4 else 10.0 * report)
+                         for i in range(30)]
+            ingest_telemetry(site.pk, timezone.now().isoformat(), intervals)
+
+        rollups = TelemetryRollup.objects.filter(site=site).order_by('bucket')
+        self.assertEqual(rollups.count(), 10)
+        for rollup in rollups:
+            raw = Telemetry.objects.filter(site=site,
+                                           created_on__gte=rollup.bucket,
+                                           created_on__lt=rollup.bucket + timedelta(seconds=60))
+            self.assertEqual(rollup.baseline_count, 9)
+            self.assertAlmostEqual(rollup.avg_baseline_power_kw, raw.aggregate(x=Avg('baseline_power_kw'))['x'])
+            self.assertEqual(rollup.avg_measured_power_kw, raw.aggregate(x=Avg('measured_power_kw'))['x'])
+
+        graph_data = get_graph_data(Site.objects.filter(pk=site.pk), start, start + timedelta(minutes=10))
+        self.assertEqual(list(graph_data['sum_baseline']),
+                         [TelemetryRollup.bucket_of(rollup.bucket) for rollup in rollups])
+        self.assertEqual(list(graph_data['sum_baseline'].values()),
+                         [rollup.avg_baseline_power_kw for rollup in rollups])
+
+        expected = list(rollups.values_list('bucket', 'baseline_count', 'baseline_power_kw_sum',
+                                            'measured_count', 'measured_power_kw_sum'))
+        TelemetryRollup.rebuild(batch_size=7)
+        self.assertEqual(list(rollups.values_list('bucket', 'baseline_count', 'baseline_power_kw_sum',
+                                                  'measured_count', 'measured_power_kw_sum')), expected)
+
+    def test_graph_data_clips_partial_buckets(self):
+        """
+        This checks that the graph's first and last slices only average the telemetry inside the
+        time range when it doesn't start or end on a bucket boundary, and that the focus range
+        is computed from the telemetry's times.
+        """
+        site = Site.objects.get(ven_id='0')
+        start = datetime(2017, 12, 6, tzinfo=pytz.utc)
+        intervals = [((start + timedelta(seconds=20 * i)).isoformat(), float(i), float(i)) for i in range(30)]
+        ingest_telemetry(site.pk, timezone.now().isoformat(), intervals)
+
+        graph_data = get_graph_data(Site.objects.filter(pk=site.pk),
+                                    start + timedelta(seconds=30), start + timedelta(seconds=250))
+        first_bucket = TelemetryRollup.bucket_of(start)
+        self.assertEqual(list(graph_data['sum_baseline'].items()),
+                         [(first_bucket, 2.0), (first_bucket + 60, 4.0), (first_bucket + 120, 7.0),
+                          (first_bucket + 180, 10.0), (first_bucket + 240, 12.0)])
+        self.assertEqual(graph_data['sum_measured'], graph_data['sum_baseline'])
+        self.assertEqual(graph_data['start_focus'], start + timedelta(seconds=90))
+        self.assertEqual(graph_data['end_focus'], start + timedelta(seconds=190))
+
+        graph_data = get_graph_data(Site.objects.filter(pk=site.pk),
+                                    start + timedelta(seconds=70), start + timedelta(seconds=110))
+        self.assertEqual(list(graph_data['sum_baseline'].items()), [(first_bucket + 60, 4.5)])
+        self.assertIsNone(get_graph_data(Site.objects.filter(pk=site.pk),
+                                         start + timedelta(seconds=590), start + timedelta(seconds=600)))
+
+    def assert_rollups_match_telemetry(self, site):
+        """
+        Check that a site's rollups agree with counting and averaging its raw telemetry by bucket.
+        """
+        buckets = {TelemetryRollup.bucket_of(created_on)
+                   for created_on in Telemetry.objects.filter(site=site).values_list('created_on', flat=True)}
+        rollups = TelemetryRollup.objects.filter(site=site)
+        self.assertEqual({TelemetryRollup.bucket_of(rollup.bucket) for rollup in rollups}, buckets)
+        for rollup in rollups:
+            raw = Telemetry.objects.filter(site=site,
+                                           created_on__gte=rollup.bucket,
+                                           created_on__lt=rollup.bucket + timedelta(seconds=60))
+            self.assertEqual(rollup.baseline_count, raw.exclude(baseline_power_kw=None).count())
+            self.assertEqual(rollup.measured_count, raw.exclude(measured_power_kw=None).count())
+            self.assertAlmostEqual(rollup.avg_baseline_power_kw, raw.aggregate(x=Avg('baseline_power_kw'))['x'])
+            if rollup.measured_count:
+                self.assertAlmostEqual(rollup.avg_measured_power_kw, raw.aggregate(x=Avg('measured_power_kw'))['x'])
+            else:
+                self.assertIsNone(rollup.avg_measured_power_kw)
+
+    def test_rollup_insert_conflict(self):
+        """
+        This checks that when another ingest inserts a bucket's rollup after it was found missing,
+        the telemetry is added to that rollup instead of failing on the unique (site, bucket) constraint.
+        """
+        site = Site.objects.get(ven_id='0')
+        start = datetime(2017, 12, 6, tzinfo=pytz.utc)
+        ingest_telemetry(site.pk, timezone.now().isoformat(),
+                         [((start + timedelta(seconds=20 * i)).isoformat(), 1.0, 2.0) for i in range(3)])
+        intervals = [((start + timedelta(seconds=20 * i)).isoformat(), float(i), None if i % 2 else 3.0)
+                     for i in range(6)]
+        # The rollup of the first minute exists, but isn't found, as if inserted by a concurrent ingest.
+        with mock.patch.object(TelemetryRollup.objects, 'select_for_update',
+                               return_value=TelemetryRollup.objects.none()):
+            ingest_telemetry(site.pk, timezone.now().isoformat(), intervals)
+        self.assertEqual(TelemetryRollup.objects.filter(site=site).count(), 2)
+        self.assert_rollups_match_telemetry(site)
+
+    def test_rollups_follow_deletes(self):
+        """
+        This checks that deleting telemetry, one row or a queryset at a time, removes it from the rollups,
+        and that a rollup is deleted when all of its bucket's telemetry is.
+        """
+        site = Site.objects.get(ven_id='0')
+        start = datetime(2017, 12, 6, tzinfo=pytz.utc)
+        intervals = [((start + timedelta(seconds=20 * i)).isoformat(), float(i), None if i % 4 else 5.0)
+                     for i in range(12)]
+        ingest_telemetry(site.pk, timezone.now().isoformat(), intervals)
+        self.assertEqual(TelemetryRollup.objects.filter(site=site).count(), 4)
+
+        Telemetry.objects.filter(site=site, created_on=start + timedelta(seconds=20)).get().delete()
+        Telemetry.objects.filter(site=site, created_on__gte=start + timedelta(seconds=60),
+                                 created_on__lt=start + timedelta(seconds=140)).delete()
+        self.assertEqual(TelemetryRollup.objects.filter(site=site).count(), 3)
+        self.assert_rollups_match_telemetry(site)
+
+        with CaptureQueriesContext(connection) as queries:
+            Telemetry.objects.filter(site=site).delete()
+        self.assertFalse(TelemetryRollup.objects.filter(site=site).exists())
+        # One select, one delete, an update for each of the 3 buckets, and one delete of the emptied rollups.
+        self.assertEqual(len([query for query in queries.captured_queries
+                              if not query['sql'].startswith(('SAVEPOINT', 'RELEASE'))]), 6)
+
+    def test_site_delete_removes_rollups(self):
+        """
+        This checks that deleting a site cascades to its telemetry and rollups without a query per telemetry row.
+        """
+        site = Site.objects.get(ven_id='0')
+        start = datetime(2017, 12, 6, tzinfo=pytz.utc)
+        intervals = [((start + timedelta(seconds=20 * i)).isoformat(), float(i), None) for i in range(30)]
+        ingest_telemetry(site.pk, timezone.now().isoformat(), intervals)
+
+        with CaptureQueriesContext(connection) as queries:
+            Site.objects.get(pk=site.pk).delete()
+        self.assertFalse(Telemetry.objects.filter(site_id=site.pk).exists())
+        self.assertFalse(TelemetryRollup.objects.filter(site_id=site.pk).exists())
+        self.assertLess(len(queries.captured_queries), 30)
+
+
+@pytest.mark.usefixtures("database_ready")
+class TestDREventDetailQueries(TestCase):
+    """
+    This class checks that the DR Event detail page makes the same number of queries however
+    many sites are in the event.
+    """
+
+    def setUp(self):
+        create_customers(3)
+        create_dr_programs(2)
+        create_sites(8)
+        now = timezone.now()
+        self.event = DREvent.objects.create(dr_program=DRProgram.objects.first(),
+                                            scheduled_notification_time=now - timedelta(hours=2),
+                                            start=now - timedelta(hours=1),
+                                            end=now + timedelta(hours=1),
+                                            event_id=1000)
+
+    def add_sites(self, sites):
+        """
+        Add sites to the event, each with telemetry for the first 10 minutes of the event.
+        """
+        for i, site in enumerate(sites):
+            SiteEvent.objects.create(dr_event=self.event, site=site, last_status_time=timezone.now())
+            intervals = [((self.event.start + timedelta(minutes=m)).isoformat(), 10.0, 10.0 - i)
+                         for m in range(10)]
+            ingest_telemetry(site.pk, (self.event.start + timedelta(minutes=10)).isoformat(), intervals)
+
+    def detail_queries(self):
+        """
+        :return: the number of queries made to build the detail page's context and read everything
+                 its template shows, and the context
+        """
+        view = DREventDetail()
+        view.kwargs = {'pk': self.event.pk}
+        with CaptureQueriesContext(connection) as queries:
+            context = view.get_context_data()
+            str(context['event'])
+            list(context['customerForm'].fields['customer'].queryset)
+            list(context['siteForm'].fields['site'].queryset)
+            for site_event in context['site_events']:
+                str(site_event.site)
+        return len(queries), context
+
+    def test_constant_queries(self):
+        sites = list(Site.objects.order_by('pk'))
+        self.add_sites(sites[:2])
+        num_queries, context = self.detail_queries()
+        self.assertEqual(sorted(site_event.last_stat for site_event in context['site_events']), [0.0, 1.0])
+        self.assertEqual(list(context['sum_measured'].values()), [19.0] * 10)
+
+        self.add_sites(sites[2:])
+        self.assertEqual(self.detail_queries()[0], num_queries)
+
+    def test_update_event_statuses(self):
+        """
+        This checks that DR Event statuses are updated with the same number of queries however many events there are.
+        """
+        create_dr_events(10)
+        DREvent.objects.update(status='far')
+        with CaptureQueriesContext(connection) as queries:
+            update_event_statuses()
+        self.assertLessEqual(len(queries), 2)
+        now = timezone.now()
+        for event in DREvent.objects.all():
+            if event.end < now:
+                self.assertEqual(event.status, 'completed')
+            elif event.start < now:
+                self.assertEqual(event.status, 'active')
+            else:
+                self.assertEqual(event.status, 'far')
+
+
+@pytest.mark.usefixtures("database_ready")
+class TestDREventExport(TestCase):
+    """
+    This class tests the streaming CSV export of a DR Event's telemetry.
+    """
 
+    def setUp(self):
+        create_customers(2)
+        create_dr_programs(2)
+        create_sites(3)
+        now = timezone.now()
+        self.event = DREvent.objects.create(dr_program=DRProgram.objects.first(),
+                                            scheduled_notification_time=now - timedelta(hours=2),
+                                            start=now - timedelta(hours=1),
+                                            end=now + timedelta(hours=1),
+                                            event_id=1000)
+        self.start = datetime(2017, 12, 6, tzinfo=pytz.utc)
+        for i, site in enumerate(Site.objects.order_by('pk')[:2]):
+            SiteEvent.objects.create(dr_event=self.event, site=site, last_status_time=timezone.now())
+            intervals = [((self.start + timedelta(minutes=m)).isoformat(), 10.0, float(m + i)) for m in range(10)]
+            ingest_telemetry(site.pk, timezone.now().isoformat(), intervals)
+        User.objects.create_user('exporter', password='password')
+        self.client = Client()
+        self.client.login(username='exporter', password='password')
+        self.url = '/vtn/export/{}/'.format(self.event.pk)
+
+    def export(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content)
+        if params.get('gzip'):
+            self.assertEqual(response['Content-Type'], 'application/gzip')
+            content = gzip.decompress(content)
+        return list(csv.reader(content.decode('utf-8').splitlines()))
+
+    def test_export(self):
+        rows = self.export()
+        self.assertEqual(rows[0], ['DR Program', 'Site', 'Time', 'Baseline Power (kw)', 'Measured Power (kw)'])
+        self.assertEqual(len(rows), 21)
+        site = Site.objects.order_by('pk').first()
+        self.assertIn([str(self.event.dr_program), str(site), '2017-12-06 12:09:00 AM', '10.0', '9.0'], rows)
+        self.assertEqual(self.export(gzip='1'), rows)
+
+    def test_downsampled_export(self):
+        rows = self.export(resolution='300')
+        self.assertEqual(len(rows), 5)
+        site = Site.objects.order_by('pk').first()
+        self.assertEqual(rows[1], [str(self.event.dr_program), str(site), '2017-12-06 12:00:00 AM', '10.0', '2.0'])
+        self.assertEqual(rows[2][2:], ['2017-12-06 12:05:00 AM', '10.0', '7.0'])
+        self.assertEqual(rows[3][2:], ['2017-12-06 12:00:00 AM', '10.0', '3.0'])
+        self.assertEqual(self.client.get(self.url, {'resolution': 'x'}).status_code, 400)
@@ -58,7 +58,9 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 from api.builders import *
-from django.db.models import Q
+from api import poll_cache
+from vtn.tasks import ingest_telemetry
+from django.db.models import Q, Exists, OuterRef, Subquery, DateTimeField
 from django.views.decorators.csrf import csrf_exempt
 from io import StringIO
 from rest_framework.response import Response
@@ -91,19 +93,12 @@ logger = logging.getLogger(__name__)
 
 
 def update_notification_sent_time(site_events):
-    for site_event in site_events:
-        site_event.notification_sent_time = timezone.now()
-        site_event.ven_status = VEN_STATUS_TOLD
-        site_event.save()
+    SiteEvent.objects.filter(pk__in=[site_event.pk for site_event in site_events]) \
+                     .update(notification_sent_time=timezone.now(), ven_status=VEN_STATUS_TOLD)
 
 
 def update_last_status_time(ven_id):
-    try:
-        site = Site.objects.get(ven_id=ven_id)
-        site.last_status_time = timezone.now()
-        site.save()
-    except ObjectDoesNotExist:
-        pass
+    Site.objects.filter(ven_id=ven_id).update(last_status_time=timezone.now())
 
 
 class OADRRenderer(XMLRenderer):
@@ -156,6 +151,8 @@ class OADRPoll(APIView):
     """
     Called when the VEN issues an oadrPoll. Responds back, right now, with
     a Distribute Event if there are any un-acknowledged site events.
+    Idle polls, with nothing to send, are answered from the poll cache until
+    the DR events change (see api/poll_cache.py).
     """
 
     parser_classes = (OADRParser,)
@@ -167,17 +164,6 @@ class OADRPoll(APIView):
         # Make preliminary checks
         try:
             ven_id = request.data.oadrSignedObject.oadrPoll.venID
-            # 'Validate' VEN ID if there is one
-            if not Site.objects.filter(ven_id=ven_id).exists():
-                payload_response = OADRResponseBuilder(SCHEMA_VERSION,
-                                                       400,
-                                                       BOGUS_REQUEST_ID,
-                                                       'No site with given VEN ID found')
-                payload_xml = payload_response.wrap()
-                update_last_status_time(ven_id)
-                logger.warning('No site with given VEN ID found')
-                return Response({'result' : payload_xml}, content_type='application/xml', status=status.HTTP_400_BAD_REQUEST)
-
         except AttributeError as err:
             payload_response = OADRResponseBuilder(SCHEMA_VERSION,
                                                    400,
@@ -187,17 +173,41 @@ class OADRPoll(APIView):
             logging.warning('VTN Poll has no VEN ID')
             return Response({'result' : payload_xml}, content_type='application/xml', status=status.HTTP_400_BAD_REQUEST)
 
-        # A site with that VEN ID exists
-        build_events = SiteEvent.objects.filter(site__ven_id=ven_id,
-                                                dr_event__scheduled_notification_time__lt=timezone.now(),
-                                                dr_event__end__gt=timezone.now()) \
-                                                .filter(~Q(ven_status=VEN_STATUS_ACK))
+        # Nothing has changed since this VEN's last poll found no events to send
+        if poll_cache.is_idle(ven_id):
+            return self.no_events_response(ven_id)
+
+        # 'Validate' VEN ID, and find out whether there are events to send, in a single query
+        cache_generation = poll_cache.generation()
+        now = timezone.now()
+        pending_events = SiteEvent.objects.filter(site=OuterRef('pk'), dr_event__end__gt=now) \
+                                          .filter(~Q(ven_status=VEN_STATUS_ACK))
+        next_pending_events = pending_events.filter(dr_event__scheduled_notification_time__gte=now) \
+                                            .order_by('dr_event__scheduled_notification_time') \
+                                            .values('dr_event__scheduled_notification_time')
+        site = Site.objects.filter(ven_id=ven_id) \
+                           .annotate(has_events=Exists(pending_events.filter(
+                                         dr_event__scheduled_notification_time__lt=now)),
+                                     next_notification_time=Subquery(next_pending_events[:1],
+                                                                     output_field=DateTimeField())) \
+                           .values('has_events', 'next_notification_time') \
+                           .first()
+
+        if site is None:
+            payload_response = OADRResponseBuilder(SCHEMA_VERSION,
+                                                   400,
+                                                   BOGUS_REQUEST_ID,
+                                                   'No site with given VEN ID found')
+            payload_xml = payload_response.wrap()
+            logger.warning('No site with given VEN ID found')
+            return Response({'result' : payload_xml}, content_type='application/xml', status=status.HTTP_400_BAD_REQUEST)
 
         # Do we have events to send?
-        if build_events.count() > 0:
+        if site['has_events']:
             build_events = SiteEvent.objects.filter(site__ven_id=ven_id,
-                                                    dr_event__scheduled_notification_time__lt=timezone.now(),
-                                                    dr_event__end__gt=timezone.now())
+                                                    dr_event__scheduled_notification_time__lt=now,
+                                                    dr_event__end__gt=now) \
+                                            .select_related('dr_event')
 
             # Build OADR distribute event
             payload_event = OADRDistributeEventBuilder(ven_id=ven_id, site_events=build_events)
@@ -212,14 +222,19 @@ class OADRPoll(APIView):
 
         # Nothing to return at this point - return normal status with an empty oadr_response
         else:
-            payload_response = OADRResponseBuilder(SCHEMA_VERSION,
-                                                   200,
-                                                   BOGUS_REQUEST_ID,
-                                                   'No events to send',
-                                                   ven_id)
-            payload_xml = payload_response.wrap()
             update_last_status_time(ven_id)
-            return Response({'result' : payload_xml}, content_type='application/xml', status=status.HTTP_200_OK)
+            poll_cache.set_idle(ven_id, cache_generation, site['next_notification_time'])
+            return self.no_events_response(ven_id)
+
+    @staticmethod
+    def no_events_response(ven_id):
+        payload_response = OADRResponseBuilder(SCHEMA_VERSION,
+                                               200,
+                                               BOGUS_REQUEST_ID,
+                                               'No events to send',
+                                               ven_id)
+        payload_xml = payload_response.wrap()
+        return Response({'result' : payload_xml}, content_type='application/xml', status=status.HTTP_200_OK)
 
 
 class EIReport(APIView):
@@ -329,6 +344,8 @@ class EIReport(APIView):
                 payload_xml = payload_response.wrap()
                 logger.warning("No site with the given VEN ID in UpdateReport")
                 return Response({'result' : payload_xml}, content_type='application/xml', status=status.HTTP_400_BAD_REQUEST)
+            reported_on = pytz.timezone(settings.TIME_ZONE).localize(datetime.now())
+            telemetry = []
             for oadr_report in oadr_reports:
                 try:
                     intervals = oadr_report.intervals.interval
@@ -354,13 +371,12 @@ class EIReport(APIView):
                                 baseline_power = report_payload.payloadBase.value
                             elif rID == 'actual_power':
                                 actual_power = report_payload.payloadBase.value
-                        reported_on = pytz.timezone(settings.TIME_ZONE).localize(datetime.now())
                         if baseline_power != 'n.a.' and actual_power != 'n.a.':
-                            t = Telemetry(site=site, created_on=start,
-                                          reported_on=reported_on,
-                                          baseline_power_kw=baseline_power,
-                                          measured_power_kw=actual_power)
-                            t.save()
+                            telemetry.append((start.isoformat(), baseline_power, actual_power))
+            if settings.TELEMETRY_ASYNC_INGEST:
+                ingest_telemetry.delay(site.pk, reported_on.isoformat(), telemetry)
+            else:
+                ingest_telemetry(site.pk, reported_on.isoformat(), telemetry)
             payload_response = OADRResponseBuilder(SCHEMA_VERSION,
                                                    200,
                                                    request_id)
@@ -437,7 +453,8 @@ class EIEvent(APIView):
 
                 site_events = SiteEvent.objects.filter(site__ven_id=ven_id,
                                                        dr_event__scheduled_notification_time__lt=timezone.now()) \
-                                               .filter(~Q(ven_status='acknowledged'))
+                                               .filter(~Q(ven_status='acknowledged')) \
+                                               .select_related('dr_event')
 
                 oadr_distribute_event = OADRDistributeEventBuilder(ven_id, site_events)
 
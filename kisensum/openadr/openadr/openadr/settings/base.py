@@ -176,8 +176,24 @@ VTN_ID = 'vtn01'
 
 ONLINE_INTERVAL_MINUTES = 15
 
+# How long an idle oadrPoll is answered from the cache (see api/poll_cache.py); 0 disables the cache.
+# This also bounds how stale a polling site's last_status_time can be.
+OADR_POLL_CACHE_SECONDS = 10
+
+# Use a cache shared by all of the VTN's processes (e.g. memcached) when running more than one.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
 GRAPH_TIMECHUNK_SECONDS = 60
 
+# Queue UpdateReport telemetry for a Celery worker (vtn.tasks.ingest_telemetry) instead of
+# saving it before responding to the VEN. Requires a running worker.
+TELEMETRY_ASYNC_INGEST = False
+
 
 DATETIME_INPUT_FORMATS = [
     '%Y-%m-%d %H:%M:%S',
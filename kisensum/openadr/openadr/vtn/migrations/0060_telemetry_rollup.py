@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.23 on 2026-10-17 20:44
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vtn', '0059_auto_20171213_1300'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TelemetryRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(verbose_name='Bucket Start')),
+                ('baseline_count', models.IntegerField(default=0)),
+                ('baseline_power_kw_sum', models.FloatField(default=0.0)),
+                ('measured_count', models.IntegerField(default=0)),
+                ('measured_power_kw_sum', models.FloatField(default=0.0)),
+                ('site', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='vtn.Site')),
+            ],
+            options={
+                'verbose_name_plural': 'Telemetry Rollups',
+            },
+        ),
+        migrations.AlterIndexTogether(
+            name='telemetry',
+            index_together=set([('site', 'reported_on'), ('site', 'created_on')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='telemetryrollup',
+            unique_together=set([('site', 'bucket')]),
+        ),
+    ]
@@ -58,9 +58,16 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
-from django.db import models
+import calendar
+from datetime import datetime
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.db.models.signals import post_save
+from django.dispatch import receiver
 from django.core.urlresolvers import reverse, reverse_lazy
 from django.contrib.auth.models import User
+from django.utils.timezone import utc
 
 
 class Customer(models.Model):
@@ -192,10 +199,36 @@ class SiteEvent(models.Model):
     deleted = models.BooleanField(default=False)
 
 
+class TelemetryQuerySet(models.QuerySet):
+
+    def delete(self):
+        """
+        Delete the telemetry and subtract it from its sites' rollups, with one UPDATE per bucket.
+
+        Telemetry deleted by cascade (e.g. with its Site) is not subtracted, since its rollups
+        are cascade deleted too.
+        """
+        with transaction.atomic(using=self.db):
+            totals = TelemetryRollup.totals_of(
+                self.only('site_id', 'created_on', 'baseline_power_kw', 'measured_power_kw').iterator())
+            deleted = super(TelemetryQuerySet, self).delete()
+            TelemetryRollup.remove_totals(totals)
+        return deleted
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
 class Telemetry(models.Model):
 
+    objects = TelemetryQuerySet.as_manager()
+
     class Meta:
         verbose_name_plural = "Telemetry"
+        index_together = [
+            ('site', 'created_on'),
+            ('site', 'reported_on'),
+        ]
 
     site = models.ForeignKey(Site)
     created_on = models.DateTimeField(auto_created=True)
@@ -203,6 +236,188 @@ class Telemetry(models.Model):
     baseline_power_kw = models.FloatField('Baseline Power (kw)', blank=True, null=True)
     measured_power_kw = models.FloatField('Measured Power (kw)', blank=True, null=True)
 
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            deleted = super(Telemetry, self).delete(*args, **kwargs)
+            TelemetryRollup.remove_telemetry([self])
+        return deleted
+
+
+class TelemetryRollup(models.Model):
+    """
+    A site's telemetry totals over one GRAPH_TIMECHUNK_SECONDS bucket of created_on times.
+
+    Rollups are kept up to date as telemetry is saved, so the DR Event graphs read one row
+    per site per bucket instead of aggregating raw telemetry. The counts are kept apart from
+    the sums so that averages skip missing values, like Avg() does.
+    """
+
+    class Meta:
+        verbose_name_plural = "Telemetry Rollups"
+        unique_together = ('site', 'bucket')
+
+    site = models.ForeignKey(Site)
+    bucket = models.DateTimeField('Bucket Start')
+    baseline_count = models.IntegerField(default=0)
+    baseline_power_kw_sum = models.FloatField(default=0.0)
+    measured_count = models.IntegerField(default=0)
+    measured_power_kw_sum = models.FloatField(default=0.0)
+
+    @property
+    def avg_baseline_power_kw(self):
+        return self.baseline_power_kw_sum / self.baseline_count if self.baseline_count else None
+
+    @property
+    def avg_measured_power_kw(self):
+        return self.measured_power_kw_sum / self.measured_count if self.measured_count else None
+
+    @staticmethod
+    def bucket_of(time):
+        """Return the epoch second at which the GRAPH_TIMECHUNK_SECONDS bucket containing time starts."""
+        chunk = settings.GRAPH_TIMECHUNK_SECONDS
+        return calendar.timegm(time.utctimetuple()) // chunk * chunk
+
+    @classmethod
+    def totals_of(cls, telemetry):
+        """
+        Return the counts and sums of Telemetry rows by site and bucket.
+
+        :param telemetry: iterable of Telemetry instances
+        :return: dict of [baseline_count, baseline_power_kw_sum, measured_count, measured_power_kw_sum],
+                 keyed by (site_id, bucket epoch second)
+        """
+        totals = {}
+        for datum in telemetry:
+            key = (datum.site_id, cls.bucket_of(datum.created_on))
+            counts = totals.setdefault(key, [0, 0.0, 0, 0.0])
+            if datum.baseline_power_kw is not None:
+                counts[0] += 1
+                counts[1] += datum.baseline_power_kw
+            if datum.measured_power_kw is not None:
+                counts[2] += 1
+                counts[3] += datum.measured_power_kw
+        return totals
+
+    @classmethod
+    def add_telemetry(cls, telemetry):
+        """
+        Add Telemetry rows to their sites' rollups.
+
+        New buckets are bulk inserted, and existing ones are updated in place
+        with one UPDATE per bucket. If another ingest inserts one of the new buckets first,
+        the insert fails on the unique (site, bucket) constraint, and the new buckets
+        are added one at a time instead, updating the ones that now exist.
+
+        :param telemetry: iterable of Telemetry instances (saved or not)
+        """
+        totals = cls.totals_of(telemetry)
+        if not totals:
+            return
+
+        buckets = {key: datetime.fromtimestamp(key[1], tz=utc) for key in totals}
+        with transaction.atomic():
+            existing = cls.objects.select_for_update() \
+                .filter(site_id__in={site_id for site_id, _ in totals},
+                        bucket__in=set(buckets.values())) \
+                .values_list('site_id', 'bucket')
+            existing = {(site_id, cls.bucket_of(bucket)) for site_id, bucket in existing}
+            for key in existing & set(totals):
+                cls.update_bucket(key[0], buckets[key], totals[key])
+            new_keys = [key for key in totals if key not in existing]
+            try:
+                with transaction.atomic():
+                    cls.objects.bulk_create([cls(site_id=key[0],
+                                                 bucket=buckets[key],
+                                                 baseline_count=totals[key][0],
+                                                 baseline_power_kw_sum=totals[key][1],
+                                                 measured_count=totals[key][2],
+                                                 measured_power_kw_sum=totals[key][3])
+                                             for key in new_keys])
+            except IntegrityError:
+                for key in new_keys:
+                    cls.add_to_bucket(key[0], buckets[key], totals[key])
+
+    @classmethod
+    def update_bucket(cls, site_id, bucket, counts):
+        """
+        Add counts and sums to an existing rollup.
+
+        :return: the number of rollups updated, 0 if the site has no rollup for the bucket
+        """
+        baseline_count, baseline_sum, measured_count, measured_sum = counts
+        return cls.objects.filter(site_id=site_id, bucket=bucket) \
+            .update(baseline_count=F('baseline_count') + baseline_count,
+                    baseline_power_kw_sum=F('baseline_power_kw_sum') + baseline_sum,
+                    measured_count=F('measured_count') + measured_count,
+                    measured_power_kw_sum=F('measured_power_kw_sum') + measured_sum)
+
+    @classmethod
+    def add_to_bucket(cls, site_id, bucket, counts):
+        """Add counts and sums to a rollup, inserting it if it doesn't exist yet."""
+        if cls.update_bucket(site_id, bucket, counts):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(site_id=site_id,
+                                   bucket=bucket,
+                                   baseline_count=counts[0],
+                                   baseline_power_kw_sum=counts[1],
+                                   measured_count=counts[2],
+                                   measured_power_kw_sum=counts[3])
+        except IntegrityError:
+            # Another ingest inserted the rollup since the update.
+            cls.update_bucket(site_id, bucket, counts)
+
+    @classmethod
+    def remove_telemetry(cls, telemetry):
+        """
+        Subtract deleted Telemetry rows from their sites' rollups.
+
+        :param telemetry: iterable of Telemetry instances
+        """
+        cls.remove_totals(cls.totals_of(telemetry))
+
+    @classmethod
+    def remove_totals(cls, totals):
+        """
+        Subtract counts and sums, as returned by totals_of, from their rollups.
+
+        Rollups that are left with no values are deleted.
+        """
+        if not totals:
+            return
+        buckets = {key: datetime.fromtimestamp(key[1], tz=utc) for key in totals}
+        with transaction.atomic():
+            for key, counts in totals.items():
+                cls.update_bucket(key[0], buckets[key], [-total for total in counts])
+            cls.objects.filter(site_id__in={site_id for site_id, _ in totals},
+                               bucket__in=set(buckets.values()),
+                               baseline_count__lte=0,
+                               measured_count__lte=0) \
+                .delete()
+
+    @classmethod
+    def rebuild(cls, batch_size=10000):
+        """Recompute every rollup from the raw telemetry, e.g. after changing GRAPH_TIMECHUNK_SECONDS."""
+        with transaction.atomic():
+            cls.objects.all().delete()
+            batch = []
+            for datum in Telemetry.objects.only('site_id', 'created_on', 'baseline_power_kw', 'measured_power_kw') \
+                                          .order_by('site_id', 'created_on').iterator():
+                batch.append(datum)
+                if len(batch) >= batch_size:
+                    cls.add_telemetry(batch)
+                    batch = []
+            cls.add_telemetry(batch)
+
+
+@receiver(post_save, sender=Telemetry)
+def add_saved_telemetry_to_rollup(sender, instance, created, raw=False, **kwargs):
+    # Telemetry saved one row at a time (e.g. from the admin or fixtures); bulk ingest
+    # calls TelemetryRollup.add_telemetry itself.
+    if created and not raw:
+        TelemetryRollup.add_telemetry([instance])
+
 
 class Report(models.Model):
 
@@ -56,10 +56,12 @@
 # }}}
 
 from celery import Celery, absolute_import, unicode_literals, shared_task
-from vtn.models import DREvent, Site
+from vtn.models import DREvent, Site, Telemetry, TelemetryRollup
 from datetime import timedelta
+from django.db import transaction
 from django.db.models import Q
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.conf import settings
 
 celery = Celery('tasks', broker='amqp://localhost')
@@ -67,15 +69,13 @@ celery = Celery('tasks', broker='amqp://localhost')
 
 @shared_task
 def update_event_statuses():
+    # Two UPDATE statements, however many events there are. update() sends no post_save
+    # signals, which is fine for the oadrPoll cache: an event's status does not change
+    # whether a VEN has site events to be told about.
     now = timezone.now()
     dr_events = DREvent.objects.filter(~Q(status='completed')).filter(~Q(status='cancelled'))
-    for dr_event in dr_events:
-        if dr_event.end < now:
-            dr_event.status = 'completed'
-            dr_event.save()
-        elif dr_event.start < now:
-            dr_event.status = 'active'
-            dr_event.save()
+    dr_events.filter(end__lt=now).update(status='completed')
+    dr_events.filter(start__lt=now).filter(end__gte=now).filter(~Q(status='active')).update(status='active')
     return
 
 
@@ -95,3 +95,28 @@ def update_online_offline():
                 site.save()
         except TypeError:
             continue
+
+
+@shared_task
+def ingest_telemetry(site_id, reported_on, intervals):
+    """
+    Save the telemetry intervals of a VEN's UpdateReport with bulk inserts, and add
+    them to the site's telemetry rollups.
+
+    The arguments are JSON-serializable, so the EIReport view can either call this
+    directly or queue it for a Celery worker (see TELEMETRY_ASYNC_INGEST).
+
+    :param site_id: primary key of the reporting Site
+    :param reported_on: ISO 8601 time at which the VTN received the report
+    :param intervals: list of (ISO 8601 interval start, baseline power kW, measured power kW)
+    """
+    reported_on = parse_datetime(reported_on)
+    telemetry = [Telemetry(site_id=site_id,
+                           created_on=parse_datetime(created_on),
+                           reported_on=reported_on,
+                           baseline_power_kw=baseline_power_kw,
+                           measured_power_kw=measured_power_kw)
+                 for created_on, baseline_power_kw, measured_power_kw in intervals]
+    with transaction.atomic():
+        Telemetry.objects.bulk_create(telemetry)
+        TelemetryRollup.add_telemetry(telemetry)
@@ -58,15 +58,18 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import calendar
 import csv
+import itertools
+import zlib
 from datetime import datetime, timedelta
 from django.contrib import messages
 from django.contrib.auth import update_session_auth_hash
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import PasswordChangeForm
-from django.db.models import Case, When, Count, Sum, Min
-from django.db.models import Q, Avg
-from django.http import HttpResponse
+from django.db.models import Case, When, Count, Max, Min, Sum
+from django.db.models import Q, F, FloatField, OuterRef, Subquery
+from django.http import HttpResponse, HttpResponseBadRequest, StreamingHttpResponse
 from django.http import HttpResponseRedirect
 from django.shortcuts import render, redirect
 from django.views.generic import TemplateView
@@ -281,25 +284,102 @@ def dr_event_export(request, pk):
 
     """
     This function does the actual exporting of a given
-    DR Event's data
+    DR Event's data.
+
+    The CSV file is streamed as the telemetry is read from the database, so a large
+    event's export is never held in memory. Optional GET parameters:
+
+        resolution: export each site's average power over intervals of this many seconds,
+                    instead of every telemetry row
+        gzip: if non-empty, export a gzip-compressed file (dr-events.csv.gz)
     """
 
-    event = DREvent.objects.get(pk=pk)
+    event = DREvent.objects.select_related('dr_program').get(pk=pk)
     sites = Site.objects.filter(siteevent__dr_event=event)
 
+    resolution = request.GET.get('resolution', '')
+    if resolution != '':
+        try:
+            resolution = int(resolution)
+        except ValueError:
+            resolution = 0
+        if resolution <= 0:
+            return HttpResponseBadRequest('The resolution must be a positive number of seconds.')
+
     t_data = Telemetry.objects.filter(site__in=sites) \
-                              .filter(reported_on__range=(event.start, event.end)) \
-                              .order_by('-reported_on')
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="dr-events.csv"'
+                              .filter(reported_on__range=(event.start, event.end))
+    if resolution:
+        t_data = t_data.order_by('site_id', 'created_on')
+    else:
+        t_data = t_data.order_by('-reported_on')
+    t_data = t_data.values_list('site_id', 'site__customer__name', 'site__site_name', 'created_on',
+                                'baseline_power_kw', 'measured_power_kw') \
+                   .iterator()
+    if resolution:
+        t_data = downsample_telemetry(t_data, resolution)
+
+    writer = csv.writer(Echo())
+    dr_program = str(event.dr_program)
+    rows = itertools.chain(
+        [writer.writerow(['DR Program', 'Site', 'Time', 'Baseline Power (kw)', 'Measured Power (kw)'])],
+        (writer.writerow([dr_program, '({}) {}'.format(customer_name, site_name),
+                          created_on.strftime("%Y-%m-%d %I:%M:%S %p"), baseline_power_kw, measured_power_kw])
+         for _, customer_name, site_name, created_on, baseline_power_kw, measured_power_kw in t_data))
+
+    if request.GET.get('gzip', ''):
+        response = StreamingHttpResponse(gzip_stream(rows), content_type='application/gzip')
+        response['Content-Disposition'] = 'attachment; filename="dr-events.csv.gz"'
+    else:
+        response = StreamingHttpResponse(rows, content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="dr-events.csv"'
+    return response
 
-    writer = csv.writer(response)
 
-    writer.writerow(['DR Program', 'Site', 'Time', 'Baseline Power (kw)', 'Measured Power (kw)'])
-    for datum in t_data:
-        writer.writerow([event.dr_program, datum.site, datum.created_on.strftime("%Y-%m-%d %I:%M:%S %p"),
-                        datum.baseline_power_kw, datum.measured_power_kw])
-    return response
+class Echo(object):
+    """
+    A file-like object for csv.writer that returns each row instead of buffering it.
+    """
+
+    def write(self, value):
+        return value
+
+
+def downsample_telemetry(t_data, resolution):
+    """
+    :param t_data: (site ID, customer name, site name, created_on, baseline power, measured power)
+                   rows, ordered by site and created_on
+    :param resolution: interval length in seconds
+    :return: generator of rows in the same form, one per site per interval, with the interval's
+             start time and the average of the site's power values in it
+    """
+    def interval(row):
+        return row[0], calendar.timegm(row[3].utctimetuple()) // resolution * resolution
+
+    for (site_id, start), rows in itertools.groupby(t_data, key=interval):
+        baseline = []
+        measured = []
+        for row in rows:
+            customer_name, site_name = row[1:3]
+            if row[4] is not None:
+                baseline.append(row[4])
+            if row[5] is not None:
+                measured.append(row[5])
+        yield (site_id, customer_name, site_name, datetime.fromtimestamp(start, tz=timezone.utc),
+               sum(baseline) / len(baseline) if baseline else None,
+               sum(measured) / len(measured) if measured else None)
+
+
+def gzip_stream(chunks):
+    """
+    :param chunks: iterable of strings
+    :return: generator of the gzip-compressed bytes of the UTF-8 encoded strings
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
 
 
 def report(request):
@@ -567,52 +647,78 @@ def get_dr_event_details(request, pk):
     else:
         sites = Site.objects.filter(pk=site_pk)
 
-    start = event.start
-    end = event.end
-
-    date_slice = "trunc(extract(epoch from created_on) / '{}' ) * {}".format(str(settings.GRAPH_TIMECHUNK_SECONDS),
-                                                                             str(settings.GRAPH_TIMECHUNK_SECONDS))
-    t_data = Telemetry.objects.filter(site__in=sites) \
-        .filter(created_on__range=(start, end)) \
-        .extra(select={'date_slice': date_slice}) \
-        .values('date_slice', 'site') \
-        .annotate(avg_baseline_power_kw=Avg('baseline_power_kw'),
-                  avg_measured_power_kw=Avg('measured_power_kw'),
-                  time=Min('created_on'))
-    if t_data.count() == 0:
+    graph_data = get_graph_data(sites, event.start, event.end)
+    if graph_data is None:
         context['no_data_for_sites'] = 'True'
         return render(request, 'vtn/dr_event_customer_detail.html', context)
     else:
-        co = t_data.order_by('-created_on')
-        context['t_data'] = t_data
-        last = co.first()['time']
-        first = co.last()['time']
-        difference = (last - first).seconds
-        quarter = difference // 4
-        last = last - timedelta(seconds=quarter)
-        first = first + timedelta(seconds=quarter)
-        context['start_focus'] = first
-        context['end_focus'] = last
-
-        sum_baseline = {}
-        sum_measured = {}
-        for datum in t_data:
-            if datum['date_slice'] in sum_baseline:
-                sum_baseline[datum['date_slice']] += datum['avg_baseline_power_kw']
-            else:
-                sum_baseline[datum['date_slice']] = datum['avg_baseline_power_kw']
-            if datum['date_slice'] in sum_measured:
-                sum_measured[datum['date_slice']] += datum['avg_measured_power_kw']
-            else:
-                sum_measured[datum['date_slice']] = datum['avg_measured_power_kw']
-
-        context['sum_baseline'] = OrderedDict(sorted(sum_baseline.items(), key=lambda t: t[0]))
-        context['sum_measured'] = OrderedDict(sorted(sum_measured.items(), key=lambda t: t[0]))
+        context.update(graph_data)
         context['no_data_for_sites'] = 'False'
 
         return render(request, 'vtn/dr_event_customer_detail.html', context)
 
 
+def get_graph_data(sites, start, end):
+    """
+    :param sites: The sites whose telemetry is graphed.
+    :param start: Start of the graphed time range.
+    :param end: End of the graphed time range.
+    :return: Context for the DR Event power graph: the total of the sites' average baseline
+             and measured power in each GRAPH_TIMECHUNK_SECONDS slice (keyed by the slice's
+             epoch second), and the graph's initial focus range. Slices that lie wholly inside
+             the time range are read from the sites' telemetry rollups, and the partial slices
+             at either end from the raw telemetry inside the range. Returns None if there is
+             no telemetry.
+    """
+    telemetry = Telemetry.objects.filter(site__in=sites)
+    times = telemetry.filter(created_on__range=(start, end)) \
+                     .aggregate(first=Min('created_on'), last=Max('created_on'))
+    if times['first'] is None:
+        return None
+
+    chunk = settings.GRAPH_TIMECHUNK_SECONDS
+    first_full = datetime.fromtimestamp(TelemetryRollup.bucket_of(start), tz=timezone.utc)
+    if first_full < start:
+        first_full += timedelta(seconds=chunk)
+    last_partial = datetime.fromtimestamp(TelemetryRollup.bucket_of(end), tz=timezone.utc)
+
+    totals = TelemetryRollup.objects.filter(site__in=sites) \
+                                    .filter(bucket__gte=first_full, bucket__lt=last_partial) \
+                                    .values('bucket') \
+                                    .annotate(sum_baseline=Sum(Case(When(baseline_count__gt=0,
+                                                                         then=F('baseline_power_kw_sum') / F('baseline_count')),
+                                                                    default=0.0,
+                                                                    output_field=FloatField())),
+                                              sum_measured=Sum(Case(When(measured_count__gt=0,
+                                                                         then=F('measured_power_kw_sum') / F('measured_count')),
+                                                                    default=0.0,
+                                                                    output_field=FloatField())))
+    sum_baseline = {}
+    sum_measured = {}
+    for total in totals:
+        date_slice = TelemetryRollup.bucket_of(total['bucket'])
+        sum_baseline[date_slice] = total['sum_baseline']
+        sum_measured[date_slice] = total['sum_measured']
+
+    edges = telemetry.filter(Q(created_on__gte=start, created_on__lt=min(first_full, last_partial)) |
+                             Q(created_on__gte=max(start, last_partial), created_on__lte=end)) \
+                     .only('site_id', 'created_on', 'baseline_power_kw', 'measured_power_kw')
+    for (site_id, date_slice), counts in TelemetryRollup.totals_of(edges).items():
+        baseline_count, baseline_sum, measured_count, measured_sum = counts
+        sum_baseline[date_slice] = sum_baseline.get(date_slice, 0.0) + \
+            (baseline_sum / baseline_count if baseline_count else 0.0)
+        sum_measured[date_slice] = sum_measured.get(date_slice, 0.0) + \
+            (measured_sum / measured_count if measured_count else 0.0)
+
+    first = times['first']
+    last = times['last']
+    quarter = (last - first).seconds // 4
+    return {'sum_baseline': OrderedDict(sorted(sum_baseline.items(), key=lambda t: t[0])),
+            'sum_measured': OrderedDict(sorted(sum_measured.items(), key=lambda t: t[0])),
+            'start_focus': first + timedelta(seconds=quarter),
+            'end_focus': last - timedelta(seconds=quarter)}
+
+
 def dr_event_dispatch(request, pk):
     # This function is called after a user clicks on a DR Event on the
     # overview screen. It "routes" the request to either the DR Event
@@ -633,14 +739,16 @@ class DREventDetail(TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super(DREventDetail, self).get_context_data(**kwargs)
-        event = DREvent.objects.get(pk=self.kwargs['pk'])
-        sites = DREvent.objects.get(pk=self.kwargs['pk']).sites.all()
+        event = DREvent.objects.select_related('dr_program').get(pk=self.kwargs['pk'])
+
+        # Only get those sites that have a corresponding Site Event
+        sites = Site.objects.filter(siteevent__dr_event=event)
         customer_form = DREventCustomerDetailForm()
         site_form = DREventSiteDetailForm()
 
         # Fill out context fields
         customer_form.fields['customer'].queryset = Customer.objects.filter(site__in=sites).distinct()
-        site_form.fields['site'].queryset = Site.objects.filter(siteevent__dr_event=event)
+        site_form.fields['site'].queryset = sites
         context['event'] = event
         context['customerForm'] = customer_form
         context['siteForm'] = site_form
@@ -649,78 +757,40 @@ class DREventDetail(TemplateView):
         context['start'] = event.start
         context['end'] = event.end
 
-        # Get site events for "Site Detail" tab
-        context['site_events'] = SiteEvent.objects.filter(dr_event=event)
-        site_events = SiteEvent.objects.filter(dr_event=event)
-
+        # Get site events for "Site Detail" tab, with each site's most recent telemetry
+        latest_telemetry = Telemetry.objects.filter(site=OuterRef('site')) \
+                                            .filter(reported_on__range=(event.start, event.end)) \
+                                            .order_by('-reported_on') \
+                                            .values('pk')[:1]
+        site_events = list(SiteEvent.objects.filter(dr_event=event)
+                                            .select_related('site__customer')
+                                            .annotate(latest_telemetry=Subquery(latest_telemetry)))
+        telemetry = Telemetry.objects.in_bulk([site_event.latest_telemetry for site_event in site_events
+                                               if site_event.latest_telemetry is not None])
         for site_event in site_events:
-            site_event.last_stat = get_most_recent_stat(event, site_event.site)
+            site_event.last_stat = get_most_recent_stat(telemetry.get(site_event.latest_telemetry))
 
         context['site_events'] = site_events
 
-        # Only get those sites that have a corresponding Site Event
-        sites = Site.objects.filter(siteevent__dr_event=event)
-
         # If there is no telemetry, tell template there is none so 'No data' is displayed
-        if Telemetry.objects.filter(site__in=sites).filter(created_on__range=(event.start, event.end)).count() == 0:
+        graph_data = get_graph_data(sites, event.start, event.end)
+        if graph_data is None:
             context['no_data'] = True
-
-        # If there is telemetry...
         else:
-            start = event.start
-            end = event.end
-
-            date_slice = "trunc(extract(epoch from created_on) / '{}' ) * {}".format(
-                str(settings.GRAPH_TIMECHUNK_SECONDS),
-                str(settings.GRAPH_TIMECHUNK_SECONDS))
-            t_data = Telemetry.objects.filter(site__in=sites) \
-                                      .filter(created_on__range=(start, end)) \
-                                      .extra(select={'date_slice': date_slice}) \
-                                      .values('date_slice', 'site') \
-                                      .annotate(avg_baseline_power_kw=Avg('baseline_power_kw'),
-                                                avg_measured_power_kw=Avg('measured_power_kw'),
-                                                time=Min('created_on'))
-
-            co = t_data.order_by('-created_on')
-            context['t_data'] = t_data
-            last = co.first()['time']
-            first = co.last()['time']
-            difference = (last - first).seconds
-            quarter = difference // 4
-            last = last - timedelta(seconds=quarter)
-            first = first + timedelta(seconds=quarter)
-            context['start_focus'] = first
-            context['end_focus'] = last
-
-            sum_baseline = {}
-            sum_measured = {}
-            for datum in t_data:
-                if datum['date_slice'] in sum_baseline:
-                    sum_baseline[datum['date_slice']] += datum['avg_baseline_power_kw']
-                else:
-                    sum_baseline[datum['date_slice']] = datum['avg_baseline_power_kw']
-                if datum['date_slice'] in sum_measured:
-                    sum_measured[datum['date_slice']] += datum['avg_measured_power_kw']
-                else:
-                    sum_measured[datum['date_slice']] = datum['avg_measured_power_kw']
-
-            context['sum_baseline'] = OrderedDict(sorted(sum_baseline.items(), key=lambda t: t[0]))
-            context['sum_measured'] = OrderedDict(sorted(sum_measured.items(), key=lambda t: t[0]))
+            context.update(graph_data)
 
         return context
 
 
-def get_most_recent_stat(dr_event, site):
+def get_most_recent_stat(t_data):
     """
-    :param site: The site to get the most recent measured power stat for.
-    :param dr_event: Used to get start and end times for telemetry.
+    :param t_data: A site's most recent Telemetry during a DR Event, or None if it has none.
     :return: Ideally, returns the difference between the site's baseline power
              and its actual power. If there is no baseline, it returns 'N.A.
     """
+    if t_data is None:
+        return 'N.A.'
     try:
-        t_data = Telemetry.objects.filter(site=site) \
-                                  .filter(reported_on__range=(dr_event.start, dr_event.end)) \
-                                  .order_by('-reported_on')[0]
         if t_data.baseline_power_kw is not None:
             return t_data.baseline_power_kw - t_data.measured_power_kw
         else:
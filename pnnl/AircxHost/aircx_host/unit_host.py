@@ -0,0 +1,216 @@
+"""
+Copyright (c) 2020, Battelle Memorial Institute
+All rights reserved.
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+The views and conclusions contained in the software and documentation are those
+of the authors and should not be interpreted as representing official policies,
+either expressed or implied, of the FreeBSD Project.
+This material was prepared as an account of work sponsored by an agency of the
+United States Government. Neither the United States Government nor the United
+States Department of Energy, nor Battelle, nor any of their employees, nor any
+jurisdiction or organization that has cooperated in th.e development of these
+materials, makes any warranty, express or implied, or assumes any legal
+liability or responsibility for the accuracy, completeness, or usefulness or
+any information, apparatus, product, software, or process disclosed, or
+represents that its use would not infringe privately owned rights.
+Reference herein to any specific commercial product, process, or service by
+trade name, trademark, manufacturer, or otherwise does not necessarily
+constitute or imply its endorsement, recommendation, or favoring by the
+United States Government or any agency thereof, or Battelle Memorial Institute.
+The views and opinions of authors expressed herein do not necessarily state or
+reflect those of the United States Government or any agency thereof.
+PACIFIC NORTHWEST NATIONAL LABORATORY
+operated by
+BATTELLE
+for the
+UNITED STATES DEPARTMENT OF ENERGY
+under Contract DE-AC05-76RL01830
+"""
+"""
+Multi-unit host shared by the Airside and Economizer AIRCx agents.
+
+One agent process serves many units.  Each unit is an agent of the
+host's unit_agent class without a platform connection of its own, so the
+diagnostic state of every unit is isolated while the host holds the
+single pubsub connection: it makes one subscription per campus/building
+and dispatches each device publish to the unit that owns the topic.
+Results are published with the same topics as a single-unit agent.
+
+The host is used when the configuration lists "devices" instead of a
+single "device".  The other top level entries and the "arguments" are
+shared by all units; "arguments" given with a device override them for
+the units of that device.
+
+The host is agent independent: each agent subclasses UnitHostAgent with
+its unit_agent class and, if needed, a setup_unit hook.  It is packaged
+on its own so that both agents install the same implementation.
+"""
+import copy
+import logging
+from volttron.platform.agent import utils
+from volttron.platform.agent.utils import setup_logging
+from volttron.platform.vip.agent import Agent, Core
+
+setup_logging()
+_log = logging.getLogger(__name__)
+
+
+class UnitPubSub(object):
+    """
+    vip.pubsub of a hosted unit: publishes go out on the host connection,
+    subscriptions are made by the host dispatcher.
+    """
+    def __init__(self, pubsub):
+        self.pubsub = pubsub
+
+    def publish(self, *args, **kwargs):
+        return self.pubsub.publish(*args, **kwargs)
+
+    def subscribe(self, *args, **kwargs):
+        pass
+
+    def unsubscribe(self, *args, **kwargs):
+        pass
+
+
+class UnitVIP(object):
+    def __init__(self, vip):
+        self.pubsub = UnitPubSub(vip.pubsub)
+        self.rpc = getattr(vip, "rpc", None)
+
+
+class UnitCore(object):
+    def __init__(self, identity):
+        self.identity = identity
+
+    def stop(self):
+        raise ValueError("Invalid configuration for {}".format(self.identity))
+
+
+def unit_configs(config):
+    """
+    Split a host configuration into the configurations of its units.
+    :param config: host configuration.
+    :return: list of (campus/building/unit, unit configuration)
+    """
+    shared = {key: value for key, value in config.items() if key != "devices"}
+    configs = []
+    for device in config.get("devices", []):
+        campus = device.get("campus", "")
+        building = device.get("building", "")
+        for unit, unit_device in device.get("unit", {}).items():
+            unit_config = copy.deepcopy(shared)
+            unit_config.setdefault("arguments", {}).update(copy.deepcopy(device.get("arguments", {})))
+            unit_config["device"] = {"campus": campus, "building": building, "unit": {unit: copy.deepcopy(unit_device)}}
+            configs.append(("/".join([campus, building, unit]), unit_config))
+    return configs
+
+
+class UnitHostAgent(Agent):
+    """
+    Agent that runs the diagnostics of many units, one unit_agent each.
+    """
+    unit_agent = None
+
+    def __init__(self, config_path, **kwargs):
+        super(UnitHostAgent, self).__init__(**kwargs)
+        self.config = utils.load_config(config_path)
+        self.units = {}
+        self.topic_units = {}
+        self.prefixes = []
+        self.create_units()
+
+        self.vip.config.set_default("config", self.config)
+        self.vip.config.subscribe(self.configure_main, actions=["NEW", "UPDATE"], pattern="config")
+
+    def configure_main(self, config_name, action, contents):
+        """This triggers configuration via the VOLTTRON configuration store.
+        :param config_name: canonical name is config
+        :param action: on instantiation this is "NEW" or
+        "UPDATE" if user uploads update config to store
+        :param contents: configuration contents
+        :return: None
+        """
+        _log.info("Update %s for %s", config_name, self.core.identity)
+        self.config.update(contents)
+        self.device_unsubscribe()
+        self.create_units()
+        self.onstart_subscriptions(None)
+
+    def create_units(self):
+        """
+        Create a unit_agent for every unit of the configuration and map the
+        device topics to the unit that handles them.  A unit with an invalid
+        configuration is logged and left out.
+        no return
+        """
+        self.units = {}
+        self.topic_units = {}
+        prefixes = set()
+        for name, config in unit_configs(self.config):
+            try:
+                unit = self.unit_agent.hosted(config, UnitVIP(self.vip),
+                                              UnitCore("/".join([self.core.identity or "", name])))
+            except (ValueError, SystemExit) as ex:
+                # Units stop on an invalid configuration with core.stop (UnitCore) or sys.exit.
+                _log.error("Unit {} is not hosted, invalid configuration: {!r}".format(name, ex))
+                continue
+            self.setup_unit(unit)
+            self.units[name] = unit
+            for topic in unit.device_list:
+                self.topic_units[topic] = unit
+            device = config["device"]
+            prefixes.add("/".join(["devices"] + [part for part in (device["campus"], device["building"]) if part]) + "/")
+        self.prefixes = sorted(prefixes)
+        _log.info("Hosting {} units".format(len(self.units)))
+
+    def setup_unit(self, unit):
+        """
+        Give a hosted unit access to the platform interfaces of the host.
+        :param unit: unit_agent created by create_units.
+        no return
+        """
+        pass
+
+    @Core.receiver("onstart")
+    def onstart_subscriptions(self, sender, **kwargs):
+        """Subscribe once per campus/building for the devices of all units"""
+        for prefix in self.prefixes:
+            _log.info("Subscribing to " + prefix)
+            self.vip.pubsub.subscribe(peer="pubsub", prefix=prefix, callback=self.new_data_message)
+
+    def device_unsubscribe(self):
+        """Method used to unsubscribe devices"""
+        self.vip.pubsub.unsubscribe("pubsub", None, None)
+
+    def new_data_message(self, peer, sender, bus, topic, headers, message):
+        """
+        Dispatch a device publish to the unit that owns the topic.
+        peer: string
+        sender: string
+        bus: string
+        topic: string
+        headers: dict
+        message: dict
+        no return
+        """
+        unit = self.topic_units.get(topic)
+        if unit is None:
+            return
+        unit.new_data_message(peer, sender, bus, topic, headers, message)
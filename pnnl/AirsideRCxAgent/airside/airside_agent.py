@@ -49,6 +49,7 @@ import dateutil.tz
 from datetime import timedelta as td
 from dateutil import parser
 import gevent
+import numpy as np
 from volttron.platform.agent import utils
 from volttron.platform.jsonapi import dumps
 from volttron.platform.messaging import (headers as headers_mod, topics)
@@ -57,12 +58,18 @@ from volttron.platform.agent.utils import setup_logging, format_timestamp
 from volttron.platform.vip.agent import Agent, Core
 from volttron.platform.jsonrpc import RemoteError
 from .diagnostics import common
+from .diagnostics.data_buffer import SampleBuffer
 from .diagnostics.sat_aircx import SupplyTempAIRCx
 from .diagnostics.schedule_reset_aircx import SchedResetAIRCx
 from .diagnostics.stcpr_aircx import DuctStaticAIRCx
 
 __version__ = "2.0.0"
 
+# Point mapping keys of the columns of the per AHU device values, in the order
+# parse_device_values assigns them to the data arrays.
+DATA_FIELDS = ("fan_status", "duct_stcpr_stpt", "duct_stcpr", "sat_stpt", "sa_temp", "zone_reheat", "zone_damper",
+               "fan_speedcmd")
+
 setup_logging()
 _log = logging.getLogger(__name__)
 logging.basicConfig(level=logging.debug, format="%(asctime)s   %(levelname)-8s %(message)s",
@@ -76,7 +83,34 @@ class AirsideAgent(Agent):
 
     def __init__(self, config_path, **kwargs):
         super(AirsideAgent, self).__init__(**kwargs)
+        self.initialize_attributes()
 
+        # read configuration file
+        self.read_config(config_path)
+
+    @classmethod
+    def hosted(cls, config, vip, core):
+        """
+        Create and configure an agent that has no platform connection of its
+        own, for batch mode and the multi-unit host.
+        :param config: configuration of one AHU.
+        :param vip: object with the pubsub (and rpc) interface the agent uses.
+        :param core: object with the identity and stop interface the agent uses.
+        :return: AirsideAgent
+        """
+        agent = cls.__new__(cls)
+        agent.vip = vip
+        agent.core = core
+        agent.initialize_attributes()
+        agent.config = config
+        agent.update_configuration()
+        return agent
+
+    def initialize_attributes(self):
+        """
+        Set the class attributes to their defaults, used by the agent and by
+        the batch engine that runs the diagnostics without a platform.
+        """
         # list of class attributes.  Default values will be filled in from reading config file
         # string attributes
         self.analysis_name = ""
@@ -153,7 +187,10 @@ class AirsideAgent(Agent):
         self.zn_rht_data = []
         self.zn_dmpr_data = []
         self.fan_sp_data = []
-        self.device_values = {}
+        self.device_values = None
+        self.point_columns = {}
+        self.device_rows = {}
+        self.last_date = (None, None, None)
         self.stcpr_stpt_deviation_thr_dict = {}
         self.sat_stpt_deviation_thr_dict = {}
         self.percent_reheat_thr_dict = {}
@@ -185,9 +222,6 @@ class AirsideAgent(Agent):
         self.sat_aircx = None
         self.sched_reset_aircx = None
 
-        # read configuration file
-        self.read_config(config_path)
-
     def read_config(self, config_path):
         """
         Use volttrons config reader to grab and parse out configuration file
@@ -208,6 +242,7 @@ class AirsideAgent(Agent):
         self.analysis_name = self.config.get("analysis_name", "AirsideAIRCx")
         self.actuation_mode = self.config.get("actuation_mode", "passive")
         self.timezone = self.config.get("local_timezone", "US/Pacific")
+        self.last_date = (None, None, None)
         self.interval = self.config.get("interval", 60)
         self.missing_data_threshold = self.config.get("missing_data_threshold", 15.0) / 100.0
 
@@ -272,6 +307,7 @@ class AirsideAgent(Agent):
         self.setup_device_list()
         self.read_argument_config()
         self.read_point_mapping()
+        self.create_point_columns()
         self.configuration_value_check()
         self.create_thresholds()
         self.create_diagnostics()
@@ -364,8 +400,27 @@ class AirsideAgent(Agent):
 
     def initialize_devices(self):
         """Set which devices are needed and blank out the values"""
-        self.needed_devices = self.master_devices[:]
-        self.device_values = {}
+        self.needed_devices = set(self.master_devices)
+        shape = (len(self.master_devices), len(DATA_FIELDS))
+        if self.device_values is None or self.device_values.shape != shape:
+            self.device_values = np.full(shape, np.nan)
+        else:
+            self.device_values.fill(np.nan)
+
+    def create_point_columns(self):
+        """
+        Map the point names of the point mapping to columns and the devices
+        to rows of the device values, so each device publish is decoded
+        directly into the per AHU value array.
+        no return
+        """
+        self.point_columns = {}
+        for column, field in enumerate(DATA_FIELDS):
+            name = self.get_point_mapping_or_none(field)
+            if name is not None:
+                self.point_columns.setdefault(name, column)
+        self.device_rows = {device: row for row, device in enumerate(self.master_devices)}
+        self.initialize_devices()
 
     def read_argument_config(self):
         """read all the config arguments section
@@ -572,13 +627,14 @@ class AirsideAgent(Agent):
         """creates the diagnostic classes
         No return
         """
-        self.stcpr_aircx = DuctStaticAIRCx()
+        self.data_buffer = SampleBuffer()
+        self.stcpr_aircx = DuctStaticAIRCx(self.data_buffer)
         self.stcpr_aircx.set_class_values(self.command_tuple, self.no_required_data, self.data_window, self.auto_correct_flag,
                                           self.stcpr_stpt_deviation_thr_dict, self.max_stcpr_stpt, self.stcpr_retuning, self.zn_high_damper_thr_dict,
                                           self.zn_low_damper_thr_dict, self.hdzn_damper_thr_dict, self.min_stcpr_stpt, self.duct_stcpr_stpt_name)
         self.stcpr_aircx.setup_platform_interfaces(self.publish_results, self.send_autocorrect_command)
 
-        self.sat_aircx = SupplyTempAIRCx()
+        self.sat_aircx = SupplyTempAIRCx(self.data_buffer)
         self.sat_aircx.set_class_values(self.command_tuple, self.no_required_data, self.data_window, self.auto_correct_flag,
                                         self.sat_stpt_deviation_thr_dict, self.rht_on_thr,
                                         self.sat_high_damper_thr_dict, self.percent_damper_thr_dict,
@@ -586,46 +642,21 @@ class AirsideAgent(Agent):
                                         self.reheat_valve_thr_dict, self.max_sat_stpt, self.sat_stpt_name)
         self.sat_aircx.setup_platform_interfaces(self.publish_results, self.send_autocorrect_command)
 
-        self.sched_reset_aircx = SchedResetAIRCx()
+        self.sched_reset_aircx = SchedResetAIRCx(self.data_buffer)
         self.sched_reset_aircx.set_class_values(self.unocc_time_thr_dict, self.unocc_stp_thr_dict, self.monday_sch, self.tuesday_sch, self.wednesday_sch,
                                                 self.thursday_sch, self.friday_sch, self.saturday_sch, self.sunday_sch, self.no_required_data,
                                                 self.stcpr_reset_threshold_dict, self.sat_reset_threshold_dict)
         self.sched_reset_aircx.setup_platform_interfaces(self.publish_results, self.send_autocorrect_command)
 
-    def parse_data_dict(self, data):
-        """Breaks down the passed VOLTTRON message
-        data: dictionary
+    def parse_device_values(self, device_values):
+        """Breaks down the device values into the data arrays of the diagnostics
+        device_values: array of devices by DATA_FIELDS, NaN where a device had no value
         no return
         """
-        # reset the data arrays on new message
-        self.fan_status_data = []
-        self.stcpr_stpt_data = []
-        self.stcpr_data = []
-        self.sat_stpt_data = []
-        self.sat_data = []
-        self.zn_rht_data = []
-        self.zn_dmpr_data = []
-        self.fan_sp_data = []
-
-        for key, value in data.items():
-            if value is None:
-                continue
-            if key == self.fan_status_name:
-                self.fan_status_data = value
-            elif key == self.duct_stcpr_stpt_name:
-                self.stcpr_stpt_data = value
-            elif key == self.duct_stcpr_name:
-                self.stcpr_data = value
-            elif key == self.sat_stpt_name:
-                self.sat_stpt_data = value
-            elif key == self.sa_temp_name:
-                self.sat_data = value
-            elif key == self.zn_reheat_name:
-                self.zn_rht_data = value
-            elif key == self.zn_damper_name:
-                self.zn_dmpr_data = value
-            elif key == self.fan_sp_name:
-                self.fan_sp_data = value
+        present = ~np.isnan(device_values)
+        (self.fan_status_data, self.stcpr_stpt_data, self.stcpr_data, self.sat_stpt_data, self.sat_data,
+         self.zn_rht_data, self.zn_dmpr_data, self.fan_sp_data) = [
+            device_values[present[:, column], column].tolist() for column in range(len(DATA_FIELDS))]
 
     def check_for_missing_data(self):
         """Method that checks the parsed message results for any missing data
@@ -727,7 +758,7 @@ class AirsideAgent(Agent):
         message: dict
         no return
         """
-        current_time = parser.parse(headers["Date"])
+        current_time, local_time = self.parse_date(headers["Date"])
         missing_but_running = False
         if self.initialize_time is None and len(self.master_devices) > 1:
             self.initialize_time = self.find_reinitialize_time(current_time)
@@ -736,8 +767,7 @@ class AirsideAgent(Agent):
             if len(self.master_devices) > 1:
                 return
 
-        to_zone = dateutil.tz.gettz(self.timezone)
-        current_time = current_time.astimezone(to_zone)
+        current_time = local_time
         device_data = message[0]
         if isinstance(device_data, list):
             device_data = device_data[0]
@@ -757,27 +787,40 @@ class AirsideAgent(Agent):
             _log.warning("Needed devices: {}".format(self.needed_devices))
 
         if self.should_run_now() or missing_but_running:
-            field_names = {}
-            for point, data in self.device_values.items():
-                field_names[point] = data
-            self.run_diagnostics(current_time, field_names)
+            self.run_diagnostics(current_time, self.device_values)
             self.initialize_devices()
             if missing_but_running:
-                device_needed = self.aggregate_subdevice(field_names, topic)
+                device_needed = self.aggregate_subdevice(device_data, topic)
         else:
-            _log.info("Still need {} before running.".format(self.needed_devices))
+            _log.info("Still need %s before running.", self.needed_devices)
+
+    def parse_date(self, date_str):
+        """
+        Parse the Date header of a device publish, reusing the last result
+        since every device of a scrape publishes with the same Date.
+        :param date_str: Date header.
+        :return: (datetime, datetime in the local timezone)
+        """
+        if date_str != self.last_date[0]:
+            current_time = parser.parse(date_str)
+            self.last_date = (date_str, current_time, current_time.astimezone(dateutil.tz.gettz(self.timezone)))
+        return self.last_date[1:]
 
     def aggregate_subdevice(self, device_data, topic):
         """Get device data organized and remove the device from the needed list of data elements"""
-        tagged_device_data = {}
         device_tag = self.device_topic_dict[topic]
-        _log.debug("Current device to aggregate: {}".format(device_tag))
+        _log.debug("Current device to aggregate: %s", device_tag)
         if device_tag not in self.needed_devices:
             return False
+        values = self.device_values[self.device_rows[device_tag]]
+        point_columns = self.point_columns
         for key, value in device_data.items():
-            device_data_tag = "&".join([key, device_tag])
-            tagged_device_data[device_data_tag] = value
-        self.device_values.update(tagged_device_data)
+            column = point_columns.get(key)
+            if column is not None and value is not None:
+                try:
+                    values[column] = float(value)
+                except (TypeError, ValueError):
+                    _log.warning("Non-numeric value {} for point {} of {} skipped.".format(value, key, device_tag))
         self.needed_devices.remove(device_tag)
         return True
 
@@ -789,22 +832,18 @@ class AirsideAgent(Agent):
         :rtype: boolean
         """
         # Assumes the unit/all values will have values.
-        if not self.device_values.keys():
+        if len(self.needed_devices) == len(self.master_devices):
             return False
         return not self.needed_devices
 
-    def run_diagnostics(self, current_time, device_data):
-        """Run diagnostics on the data that is available."""
+    def run_diagnostics(self, current_time, device_values):
+        """Run diagnostics on the data that is available.
+        current_time: localized datetime of the scrape
+        device_values: array of devices by DATA_FIELDS (see create_point_columns)
+        """
         _log.info("Processing Results!")
         self.diagnostic_done_flag = False
-        device_dict = {}
-        for key, value in device_data.items():
-            point_device = [_name for _name in key.split("&")]
-            if point_device[0] not in device_dict:
-                device_dict[point_device[0]] = [value]
-            else:
-                device_dict[point_device[0]].append(value)
-        self.parse_data_dict(device_dict)
+        self.parse_device_values(device_values)
         missing_data = self.check_for_missing_data()
         if missing_data:
             _log.info("Missing data from publish: {}".format(self.missing_data))
@@ -885,10 +924,22 @@ class AirsideAgent(Agent):
                 continue
 
 
+def airside_agent(config_path, **kwargs):
+    """
+    Create the agent for the configuration: an AirsideAgent, or the host of
+    many AHUs when the configuration lists "devices".
+    """
+    config = utils.load_config(config_path)
+    if config and "devices" in config:
+        from .host_agent import AirsideHostAgent
+        return AirsideHostAgent(config_path, **kwargs)
+    return AirsideAgent(config_path, **kwargs)
+
+
 def main(argv=sys.argv):
     """Main method called by the app."""
     try:
-        utils.vip_main(AirsideAgent)
+        utils.vip_main(airside_agent)
     except Exception as exception:
         _log.exception("unhandled exception")
         _log.error(repr(exception))
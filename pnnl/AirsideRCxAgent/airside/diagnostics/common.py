@@ -52,7 +52,7 @@ under Contract DE-AC05-76RL01830
 
 import logging
 from datetime import timedelta as td
-from volttron.platform.agent.math_utils import mean
+import numpy as np
 from volttron.platform.agent.utils import setup_logging
 
 FAN_OFF = -99.3
@@ -138,13 +138,16 @@ def setpoint_control_check(set_point_array, point_array, setpoint_deviation_thre
     """
     avg_set_point = None
     diagnostic_msg = {}
+    set_point_array = np.asarray(set_point_array, dtype=float)
+    point_array = np.asarray(point_array, dtype=float)
+    if len(set_point_array):
+        # Samples are paired in order, as zip pairs the two lists.
+        paired = min(len(set_point_array), len(point_array))
+        avg_set_point = float(set_point_array.mean())
+        set_point_tracking = np.abs(set_point_array[:paired] - point_array[:paired])
+        set_point_error = set_point_tracking.mean()/avg_set_point*100.
     for sensitivity, threshold in setpoint_deviation_threshold.items():
-        if set_point_array:
-            avg_set_point = mean(set_point_array)
-            zipper = (set_point_array, point_array)
-            set_point_tracking = [abs(x - y) for x, y in zip(*zipper)]
-            set_point_error = mean(set_point_tracking)/avg_set_point*100.
-
+        if len(set_point_array):
             if set_point_error > threshold:
                 # color_code = 'red'
                 msg = '{} - {}: point deviating significantly from set point.'.format(sensitivity, dx_name)
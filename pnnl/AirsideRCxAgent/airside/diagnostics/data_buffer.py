@@ -0,0 +1,233 @@
+"""
+Copyright (c) 2020, Battelle Memorial Institute
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+The views and conclusions contained in the software and documentation are those
+of the authors and should not be interpreted as representing official policies,
+either expressed or implied, of the FreeBSD Project.
+
+This material was prepared as an account of work sponsored by an agency of the
+United States Government. Neither the United States Government nor the United
+States Department of Energy, nor Battelle, nor any of their employees, nor any
+jurisdiction or organization that has cooperated in the development of these
+materials, makes any warranty, express or implied, or assumes any legal
+liability or responsibility for the accuracy, completeness, or usefulness or
+any information, apparatus, product, software, or process disclosed, or
+represents that its use would not infringe privately owned rights.
+
+Reference herein to any specific commercial product, process, or service by
+trade name, trademark, manufacturer, or otherwise does not necessarily
+constitute or imply its endorsement, recommendation, or favoring by the
+United States Government or any agency thereof, or Battelle Memorial Institute.
+The views and opinions of authors expressed herein do not necessarily state or
+reflect those of the United States Government or any agency thereof.
+
+PACIFIC NORTHWEST NATIONAL LABORATORY
+operated by
+BATTELLE
+for the
+UNITED STATES DEPARTMENT OF ENERGY
+under Contract DE-AC05-76RL01830
+"""
+import numpy as np
+
+INITIAL_CAPACITY = 128
+
+
+class SampleBuffer(object):
+    """
+    Preallocated columnar store shared by the diagnostics of one AHU.
+
+    Each scrape is one row, identified by its timestamp, and every
+    diagnostic writes its per-sample values into its own float columns of
+    that row (NaN where a diagnostic has no value).  Rows are addressed by
+    an absolute row number that does not change when the buffer discards
+    rows no window still uses, so the arrays are reused instead of being
+    rebuilt at every reinitialize.
+    """
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self.capacity = capacity
+        self.times = np.empty(capacity, dtype=object)
+        self.columns = {}
+        self.size = 0
+        self.offset = 0
+        self.windows = []
+
+    @property
+    def end(self):
+        return self.offset + self.size
+
+    def add_column(self, name):
+        if name not in self.columns:
+            self.columns[name] = np.full(self.capacity, np.nan)
+
+    def window(self, flag):
+        """
+        Create a window of rows selected by the diagnostic that owns it.
+        :param flag: name of the column marking the rows in the window.
+        :return: BufferWindow
+        """
+        self.add_column(flag)
+        window = BufferWindow(self, flag)
+        self.windows.append(window)
+        return window
+
+    def row(self, timestamp):
+        """
+        Return the row of the timestamp, adding a row for a new timestamp.
+        :param timestamp:
+        :return: absolute row number.
+        """
+        if self.size and self.times[self.size - 1] == timestamp:
+            return self.end - 1
+        if self.size == self.capacity:
+            self.compact()
+        if self.size == self.capacity:
+            self.grow()
+        self.times[self.size] = timestamp
+        self.size += 1
+        return self.end - 1
+
+    def set(self, row, name, value):
+        self.columns[name][row - self.offset] = value
+
+    def values(self, name, start, end=None):
+        end = self.end if end is None else end
+        return self.columns[name][start - self.offset:end - self.offset]
+
+    def timestamp(self, row):
+        return self.times[row - self.offset]
+
+    def compact(self):
+        """
+        Discard the rows before the first row still used by a window.
+        """
+        starts = [window.start for window in self.windows if window.start is not None]
+        first = min(starts) if starts else self.end
+        discard = first - self.offset
+        if discard <= 0:
+            return
+        keep = self.size - discard
+        self.times[:keep] = self.times[discard:self.size]
+        self.times[keep:self.size] = None
+        for column in self.columns.values():
+            column[:keep] = column[discard:self.size]
+            column[keep:self.size] = np.nan
+        self.offset = first
+        self.size = keep
+
+    def grow(self):
+        capacity = self.capacity * 2
+        times = np.empty(capacity, dtype=object)
+        times[:self.size] = self.times[:self.size]
+        self.times = times
+        for name, column in self.columns.items():
+            grown = np.full(capacity, np.nan)
+            grown[:self.size] = column[:self.size]
+            self.columns[name] = grown
+        self.capacity = capacity
+
+
+class BufferWindow(object):
+    """
+    The rows of a SampleBuffer that a diagnostic collected since its last
+    reinitialize.  Supports len(), truthiness and [0]/[-1] access to the
+    first/last timestamps so it can be passed to common.check_date and
+    common.check_run_status in place of a timestamp list.
+    """
+    def __init__(self, buffer, flag):
+        self.buffer = buffer
+        self.flag = flag
+        self.start = None
+        self.count = 0
+        self.first = None
+        self.last = None
+
+    def add(self, row):
+        if self.start is None:
+            self.start = row
+        if self.buffer.values(self.flag, row, row + 1)[0] != 1.0:
+            self.buffer.set(row, self.flag, 1.0)
+            self.count += 1
+        if self.first is None:
+            self.first = self.buffer.timestamp(row)
+        self.last = self.buffer.timestamp(row)
+
+    def reset(self):
+        if self.start is not None:
+            self.buffer.values(self.flag, self.start)[:] = np.nan
+        self.start = None
+        self.count = 0
+        self.first = None
+        self.last = None
+
+    def mask(self):
+        if self.start is None:
+            return np.zeros(0, dtype=bool)
+        return self.buffer.values(self.flag, self.start) == 1.0
+
+    def values(self, name, mask=None):
+        """
+        Values of a column for the rows in the window.
+        :param name:
+        :param mask: result of mask(), reused when reading several columns.
+        :return: numpy array.
+        """
+        if self.start is None:
+            return np.zeros(0)
+        mask = self.mask() if mask is None else mask
+        return self.buffer.values(name, self.start)[mask]
+
+    def timestamps(self):
+        if self.start is None:
+            return []
+        return list(self.buffer.times[self.start - self.buffer.offset:self.buffer.size][self.mask()])
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if not self.count or index not in (0, -1):
+            raise IndexError("Only the first and last timestamps of a window are indexed")
+        return self.first if index == 0 else self.last
+
+
+def half_sums(values):
+    """
+    Sums used by the duct static pressure damper averages, selected with a
+    partition instead of sorting: the ceil(n/2) smallest values, the
+    n - ceil(n/2) + 1 largest values and the ceil(n/2) largest values
+    (all values when n is 1).
+    :param values: zone damper positions.
+    :return: ((sum, count) low half, (sum, count) upper half, (sum, count) high half)
+    """
+    n = len(values)
+    if n == 0:
+        return (0.0, 0), (0.0, 0), (0.0, 0)
+    values = np.asarray(values, dtype=float)
+    half = int(np.ceil(n * 0.5)) if n != 1 else 1
+    parted = np.partition(values, sorted({half - 1, n - half}))
+    low = parted[:half]
+    upper = parted[half - 1:]
+    high = parted[n - half:]
+    return (low.sum(), len(low)), (upper.sum(), len(upper)), (high.sum(), len(high))
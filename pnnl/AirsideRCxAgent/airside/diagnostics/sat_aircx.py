@@ -50,10 +50,11 @@ UNITED STATES DEPARTMENT OF ENERGY
 under Contract DE-AC05-76RL01830
 """
 import logging
-from collections import defaultdict
+import numpy as np
 from volttron.platform.agent.math_utils import mean
 from volttron.platform.agent.utils import setup_logging
 from . import common
+from .data_buffer import SampleBuffer
 
 
 setup_logging()
@@ -78,20 +79,17 @@ class SupplyTempAIRCx(object):
     temperature problems.
 
     Args:
-        timestamp_array (List[datetime]): timestamps for analysis period.
-        sat_stpt_arr (List[float]): supply-air temperature set point
-            for analysis period.
-        satemp_arr (List[float]): supply-air temperature for analysis period.
-        rht_arr (List[float]): terminal box reheat command for analysis period.
+        data_buffer (SampleBuffer): AHU sample buffer shared with the other
+            diagnostics.  The supply-air temperature, set point, average
+            reheat command, fraction of zones reheating and fraction of
+            zone dampers above each threshold are stored per sample.
 
     """
-    def __init__(self):
-        self.timestamp_array = []
-        self.sat_stpt_array = []
-        self.sat_array = []
-        self.rht_array = []
-        self.percent_rht = []
-        self.percent_dmpr = defaultdict(list)
+    def __init__(self, data_buffer=None):
+        self.data_buffer = data_buffer if data_buffer is not None else SampleBuffer()
+        for column in ("sat", "sat_stpt", "rht", "percent_rht"):
+            self.data_buffer.add_column(column)
+        self.timestamp_array = self.data_buffer.window("sat_window")
         self.table_key = None
         self.command_tuple = []
 
@@ -136,6 +134,8 @@ class SupplyTempAIRCx(object):
 
         # High SAT RCx thresholds
         self.high_dmpr_thr = high_dmpr_thr
+        for key in self.high_dmpr_thr:
+            self.data_buffer.add_column("percent_dmpr_" + key)
         self.percent_dmpr_thr = percent_dmpr_thr
         self.min_sat_stpt = min_sat_stpt
         self.sat_retuning = sat_retuning
@@ -150,12 +150,7 @@ class SupplyTempAIRCx(object):
         :return:
         """
         self.table_key = None
-        self.timestamp_array = []
-        self.sat_stpt_array = []
-        self.sat_array = []
-        self.rht_array = []
-        self.percent_rht = []
-        self.percent_dmpr = defaultdict(list)
+        self.timestamp_array.reset()
 
     def sat_aircx(self, current_time, sat_data, sat_stpt_data,
                   zone_rht_data, zone_dmpr_data):
@@ -176,11 +171,13 @@ class SupplyTempAIRCx(object):
             Status of diagnostic (dx_status)
 
         """
-        tot_rht = sum(1 if val > self.rht_on_thr else 0 for val in zone_rht_data)
+        zone_rht = np.asarray(zone_rht_data, dtype=float)
+        zone_dmpr = np.asarray(zone_dmpr_data, dtype=float)
+        tot_rht = np.count_nonzero(zone_rht > self.rht_on_thr)
         count_rht = len(zone_rht_data)
         tot_dmpr = {}
         for key, thr in self.high_dmpr_thr.items():
-            tot_dmpr[key] = sum(1 if val > thr else 0 for val in zone_dmpr_data)
+            tot_dmpr[key] = np.count_nonzero(zone_dmpr > thr)
         count_damper = len(zone_dmpr_data)
 
         if common.check_date(current_time, self.timestamp_array):
@@ -195,37 +192,56 @@ class SupplyTempAIRCx(object):
             self.reinitialize()
 
         if run_status:
-            avg_sat_stpt, dx_string, dx_msg = common.setpoint_control_check(self.sat_stpt_array, self.sat_array, self.stpt_deviation_thr, SA_TEMP_RCX)
+            window = self.timestamp_array
+            mask = window.mask()
+            sat_stpt = window.values("sat_stpt", mask)
+            avg_sat_stpt, dx_string, dx_msg = common.setpoint_control_check(sat_stpt[~np.isnan(sat_stpt)],
+                                                                            window.values("sat", mask),
+                                                                            self.stpt_deviation_thr, SA_TEMP_RCX)
             _log.info(common.table_log_format(current_time, dx_string + str(dx_msg)))
             self.publish_results(current_time, dx_string, dx_msg)
-            if self.percent_rht and self.rht_array:
-                self.low_sat(avg_sat_stpt)
-                self.high_sat(avg_sat_stpt)
+            if not np.isnan(window.values("rht", mask)).all():
+                self.low_sat(avg_sat_stpt, mask)
+                self.high_sat(avg_sat_stpt, mask)
             else:
                 diagnostic_msg = {"low": 89.2, "normal": 89.2, "high": 89.2}
                 self.publish_results(self.timestamp_array[-1], SA_TEMP_RCX1 + DX, diagnostic_msg)
                 self.publish_results(self.timestamp_array[-1], SA_TEMP_RCX2 + DX, diagnostic_msg)
             self.reinitialize()
 
-        self.sat_array.append(mean(sat_data))
+        data_buffer = self.data_buffer
+        row = data_buffer.row(current_time)
+        data_buffer.set(row, "sat", mean(sat_data))
         if sat_stpt_data:
-            self.sat_stpt_array.append(mean(sat_stpt_data))
+            data_buffer.set(row, "sat_stpt", mean(sat_stpt_data))
         if zone_rht_data and count_rht > 0:
-            self.percent_rht.append(tot_rht / count_rht)
-            self.rht_array.append(mean(zone_rht_data))
-        self.timestamp_array.append(current_time)
+            data_buffer.set(row, "percent_rht", tot_rht / count_rht)
+            data_buffer.set(row, "rht", mean(zone_rht_data))
+        self.timestamp_array.add(row)
         for key in self.high_dmpr_thr:
-            self.percent_dmpr[key].append(tot_dmpr[key] / count_damper)
+            data_buffer.set(row, "percent_dmpr_" + key, tot_dmpr[key] / count_damper)
+
+    def window_mean(self, name, mask):
+        """
+        Mean of a column over the window samples that have a value.
+        :param name:
+        :param mask:
+        :return:
+        """
+        values = self.timestamp_array.values(name, mask)
+        return values[~np.isnan(values)].mean()
 
-    def low_sat(self, avg_sat_stpt):
+    def low_sat(self, avg_sat_stpt, mask=None):
         """
         Diagnostic to identify and correct low supply-air temperature
         (correction by modifying SAT set point).
         :param avg_sat_stpt:
+        :param mask: window row mask computed by sat_aircx.
         :return:
         """
-        avg_zones_rht = mean(self.percent_rht)*100.0
-        rht_avg = mean(self.rht_array)
+        mask = self.timestamp_array.mask() if mask is None else mask
+        avg_zones_rht = self.window_mean("percent_rht", mask)*100.0
+        rht_avg = self.window_mean("rht", mask)
         thresholds = zip(self.rht_valve_thr.items(), self.percent_rht_thr.items())
         diagnostic_msg = {}
 
@@ -262,19 +278,21 @@ class SupplyTempAIRCx(object):
         _log.info(common.table_log_format(self.timestamp_array[-1], (SA_TEMP_RCX1 + DX + ": " + str(diagnostic_msg))))
         self.publish_results(self.timestamp_array[-1], SA_TEMP_RCX1 + DX, diagnostic_msg)
 
-    def high_sat(self, avg_sat_stpt):
+    def high_sat(self, avg_sat_stpt, mask=None):
         """
         Diagnostic to identify and correct high supply-air temperature
         (correction by modifying SAT set point).
         :param avg_sat_stpt:
+        :param mask: window row mask computed by sat_aircx.
         :return:
         """
-        avg_zones_rht = mean(self.percent_rht)*100.0
+        mask = self.timestamp_array.mask() if mask is None else mask
+        avg_zones_rht = self.window_mean("percent_rht", mask)*100.0
         thresholds = zip(self.percent_dmpr_thr.items(), self.percent_rht_thr.items())
         diagnostic_msg = {}
 
         for (key, percent_dmpr_thr), (key2, percent_rht_thr) in thresholds:
-            avg_zone_dmpr_data = mean(self.percent_dmpr[key]) * 100.0
+            avg_zone_dmpr_data = self.window_mean("percent_dmpr_" + key, mask) * 100.0
             if avg_zone_dmpr_data > percent_dmpr_thr and avg_zones_rht < percent_rht_thr:
                 if avg_sat_stpt is None:
                     # Create diagnostic message for fault
@@ -53,9 +53,11 @@ import datetime
 import logging
 from datetime import datetime
 from dateutil.parser import parse
+import numpy as np
 from volttron.platform.agent.math_utils import mean
 from volttron.platform.agent.utils import setup_logging
 from . import common
+from .data_buffer import SampleBuffer
 
 DUCT_STC_RCX3 = "No Static Pressure Reset Dx"
 SA_TEMP_RCX3 = "No Supply-air Temperature Reset Dx"
@@ -76,18 +78,23 @@ class SchedResetAIRCx(object):
     Operational schedule, supply-air temperature set point reset, and duct static pressure reset
     AIRCx for AHUs or RTUs.
     """
-    def __init__(self):
-        self.fan_status_array = []
+    def __init__(self, data_buffer=None):
+        # Per sample data is kept in the AHU sample buffer shared with the other diagnostics.
+        self.data_buffer = data_buffer if data_buffer is not None else SampleBuffer()
+        for column in ("unocc_stcpr_sum", "unocc_stcpr_count", "unocc_fan_status", "unocc_hour",
+                       "reset_stcpr_stpt", "reset_sat_stpt"):
+            self.data_buffer.add_column(column)
         self.schedule = {}
-        self.stcpr_array = []
-        self.schedule_time_array = []
+        # Unoccupied samples (fan status and duct static pressure).
+        self.schedule_time_array = self.data_buffer.window("unocc_window")
         self.publish_results = None
         self.send_autocorrect_command = None
 
-        self.stcpr_stpt_array = []
-        self.sat_stpt_array = []
+        # Set point samples while the fan is on.
+        self.stcpr_stpt_array = self.data_buffer.window("stcpr_stpt_window")
+        self.sat_stpt_array = self.data_buffer.window("sat_stpt_window")
         self.reset_table_key = None
-        self.timestamp_array = []
+        self.timestamp_array = self.data_buffer.window("reset_window")
         self.dx_table = {}
 
         self.monday_sch = []
@@ -146,9 +153,7 @@ class SchedResetAIRCx(object):
         Reinitialize schedule data arrays
         :return:
         """
-        self.stcpr_array = []
-        self.fan_status_array = []
-        self.schedule_time_array = []
+        self.schedule_time_array.reset()
 
     def schedule_reset_aircx(self, current_time, stcpr_data, stcpr_stpt_data,
                              sat_stpt_data, current_fan_status):
@@ -162,16 +167,18 @@ class SchedResetAIRCx(object):
         :param dx_result:
         :return:
         """
-        self.sched_aircx(current_time, stcpr_data, current_fan_status)
-        self.setpoint_reset_aircx(current_time, current_fan_status, stcpr_stpt_data, sat_stpt_data)
-        self.timestamp_array.append(current_time)
+        row = self.data_buffer.row(current_time)
+        self.sched_aircx(current_time, stcpr_data, current_fan_status, row)
+        self.setpoint_reset_aircx(current_time, current_fan_status, stcpr_stpt_data, sat_stpt_data, row)
+        self.timestamp_array.add(row)
 
-    def sched_aircx(self, current_time, stcpr_data, current_fan_status):
+    def sched_aircx(self, current_time, stcpr_data, current_fan_status, row):
         """
         Main function for operation schedule AIRCx - manages data arrays checks AIRCx run status.
         :param current_time:
         :param stcpr_data:
         :param current_fan_status:
+        :param row: sample buffer row of current_time.
         :return:
         """
         schedule = self.schedule[current_time.weekday()]
@@ -187,17 +194,21 @@ class SchedResetAIRCx(object):
             self.reinitialize_sched()
 
         if current_time.time() < schedule[0] or current_time.time() > schedule[1]:
-            self.stcpr_array.extend(stcpr_data)
-            self.fan_status_array.append((current_time, current_fan_status))
-            self.schedule_time_array.append(current_time)
-
-    def setpoint_reset_aircx(self, current_time, current_fan_status, stcpr_stpt_data, sat_stpt_data):
+            data_buffer = self.data_buffer
+            data_buffer.set(row, "unocc_stcpr_sum", sum(stcpr_data))
+            data_buffer.set(row, "unocc_stcpr_count", len(stcpr_data))
+            data_buffer.set(row, "unocc_fan_status", current_fan_status)
+            data_buffer.set(row, "unocc_hour", current_time.hour)
+            self.schedule_time_array.add(row)
+
+    def setpoint_reset_aircx(self, current_time, current_fan_status, stcpr_stpt_data, sat_stpt_data, row):
         """
         Main function for set point reset AIRCx - manages data arrays checks AIRCx run status.
         :param current_time:
         :param current_fan_status:
         :param stcpr_stpt_data:
         :param sat_stpt_data:
+        :param row: sample buffer row of current_time.
         :return:
         """
         stcpr_run_status = common.check_run_status(self.timestamp_array, current_time, self.no_req_data,
@@ -209,10 +220,10 @@ class SchedResetAIRCx(object):
         if stcpr_run_status is None:
             _log.info("{} - Insufficient data to produce - {}".format(current_time, DUCT_STC_RCX3))
             common.pre_conditions(self.publish_results, INSUFFICIENT_DATA, [DUCT_STC_RCX3], current_time)
-            self.stcpr_stpt_array = []
+            self.stcpr_stpt_array.reset()
         elif stcpr_run_status:
             self.no_static_pr_reset()
-            self.stcpr_stpt_array = []
+            self.stcpr_stpt_array.reset()
 
         sat_run_status = common.check_run_status(self.timestamp_array, current_time, self.no_req_data,
                                                  run_schedule="daily", minimum_point_array=self.sat_stpt_array)
@@ -220,18 +231,20 @@ class SchedResetAIRCx(object):
         if sat_run_status is None:
             _log.info("{} - Insufficient data to produce - {}".format(current_time, SA_TEMP_RCX3))
             common.pre_conditions(self.publish_results, INSUFFICIENT_DATA, [SA_TEMP_RCX3], current_time)
-            self.sat_stpt_array = []
-            self.timestamp_array = []
+            self.sat_stpt_array.reset()
+            self.timestamp_array.reset()
         elif sat_run_status:
             self.no_sat_stpt_reset()
-            self.sat_stpt_array = []
-            self.timestamp_array = []
+            self.sat_stpt_array.reset()
+            self.timestamp_array.reset()
 
         if current_fan_status:
             if stcpr_stpt_data:
-                self.stcpr_stpt_array.append(mean(stcpr_stpt_data))
+                self.data_buffer.set(row, "reset_stcpr_stpt", mean(stcpr_stpt_data))
+                self.stcpr_stpt_array.add(row)
             if sat_stpt_data:
-                self.sat_stpt_array.append(mean(sat_stpt_data))
+                self.data_buffer.set(row, "reset_sat_stpt", mean(sat_stpt_data))
+                self.sat_stpt_array.add(row)
 
     def unocc_fan_operation(self):
         """
@@ -240,25 +253,24 @@ class SchedResetAIRCx(object):
         """
         avg_duct_stcpr = 0
         percent_on = 0
-        fan_status_on = [(fan[0].hour, fan[1]) for fan in self.fan_status_array if int(fan[1]) == 1]
-        fanstat = [(fan[0].hour, fan[1]) for fan in self.fan_status_array]
-        hourly_counter = []
+        window = self.schedule_time_array
+        mask = window.mask()
+        fan_status = window.values("unocc_fan_status", mask)
+        hours = window.values("unocc_hour", mask).astype(int)
+        fan_on = np.trunc(fan_status) == 1
         thresholds = zip(self.unocc_time_thr.items(), self.unocc_stcpr_thr.items())
         diagnostic_msg = {}
 
-        for counter in range(24):
-            fan_on_count = [fan_status_time[1] for fan_status_time in fan_status_on if fan_status_time[0] == counter]
-            fan_count = [fan_status_time[1] for fan_status_time in fanstat if fan_status_time[0] == counter]
-            if len(fan_count):
-                hourly_counter.append(fan_on_count.count(1)/len(fan_count)*100)
-            else:
-                hourly_counter.append(0)
+        fan_count = np.bincount(hours, minlength=24)
+        fan_on_count = np.bincount(hours, weights=fan_status == 1, minlength=24)
+        hourly_counter = np.where(fan_count > 0, fan_on_count / np.maximum(fan_count, 1) * 100, 0)
 
         if self.schedule_time_array:
-            if self.fan_status_array:
-                percent_on = (len(fan_status_on)/len(self.fan_status_array)) * 100.0
-            if self.stcpr_array:
-                avg_duct_stcpr = mean(self.stcpr_array)
+            if len(fan_status):
+                percent_on = (np.count_nonzero(fan_on)/len(fan_status)) * 100.0
+            stcpr_count = window.values("unocc_stcpr_count", mask).sum()
+            if stcpr_count:
+                avg_duct_stcpr = window.values("unocc_stcpr_sum", mask).sum() / stcpr_count
 
             for (key, unocc_time_thr), (key2, unocc_stcpr_thr) in thresholds:
                 if percent_on > unocc_time_thr:
@@ -306,7 +318,8 @@ class SchedResetAIRCx(object):
         :return:
         """
         diagnostic_msg = {}
-        stcpr_daily_range = max(self.stcpr_stpt_array) - min(self.stcpr_stpt_array)
+        stcpr_stpt = self.stcpr_stpt_array.values("reset_stcpr_stpt")
+        stcpr_daily_range = stcpr_stpt.max() - stcpr_stpt.min()
         for sensitivity, stcpr_reset_thr in self.stcpr_reset_thr.items():
             if stcpr_daily_range < stcpr_reset_thr:
                 msg = ("{} - No duct static pressure reset detected.".format(sensitivity))
@@ -327,7 +340,8 @@ class SchedResetAIRCx(object):
         :return:
         """
         diagnostic_msg = {}
-        sat_daily_range = max(self.sat_stpt_array) - min(self.sat_stpt_array)
+        sat_stpt = self.sat_stpt_array.values("reset_sat_stpt")
+        sat_daily_range = sat_stpt.max() - sat_stpt.min()
         for sensitivity, reset_thr in self.sat_reset_thr.items():
             if sat_daily_range < reset_thr:
                 msg = "{} - SAT reset was not detected.".format(sensitivity)
@@ -49,11 +49,12 @@ for the
 UNITED STATES DEPARTMENT OF ENERGY
 under Contract DE-AC05-76RL01830
 """
-import math
 import logging
+import numpy as np
 from volttron.platform.agent.math_utils import mean
 from volttron.platform.agent.utils import setup_logging
 from . import common
+from .data_buffer import SampleBuffer, half_sums
 
 INCONSISTENT_DATE = -89.2
 INSUFFICIENT_DATA = -79.2
@@ -73,12 +74,14 @@ class DuctStaticAIRCx(object):
     """Air-side HVAC Self-Correcting Diagnostic: Detect and correct
     duct static pressure problems.
     """
-    def __init__(self):
-        # Initialize data arrays
+    def __init__(self, data_buffer=None):
+        # Per sample data is kept in the AHU sample buffer shared with the other diagnostics.
         self.table_key = None
-        self.stcpr_stpt_array = []
-        self.stcpr_array = []
-        self.timestamp_array = []
+        self.data_buffer = data_buffer if data_buffer is not None else SampleBuffer()
+        for column in ("stcpr", "stcpr_stpt", "ls_dmpr_low_sum", "ls_dmpr_low_count", "ls_dmpr_high_sum",
+                       "ls_dmpr_high_count", "hs_dmpr_high_sum", "hs_dmpr_high_count", "low_sf", "high_sf"):
+            self.data_buffer.add_column(column)
+        self.timestamp_array = self.data_buffer.window("stcpr_window")
         self.publish_results = None
         self.send_autocorrect_command = None
 
@@ -95,11 +98,6 @@ class DuctStaticAIRCx(object):
         self.auto_correct_flag = False
         self.min_stcpr_stpt = 0
         self.hdzn_dmpr_thr = {}
-        self.ls_dmpr_low_avg = []
-        self.ls_dmpr_high_avg = []
-        self.hs_dmpr_high_avg = []
-        self.low_sf_condition = []
-        self.high_sf_condition = []
         self.command_tuple = []
 
     def set_class_values(self, command_tuple, no_req_data,
@@ -136,14 +134,7 @@ class DuctStaticAIRCx(object):
         :return:
         """
         self.table_key = None
-        self.stcpr_stpt_array = []
-        self.stcpr_array = []
-        self.timestamp_array = []
-        self.ls_dmpr_low_avg = []
-        self.ls_dmpr_high_avg = []
-        self.hs_dmpr_high_avg = []
-        self.low_sf_condition = []
-        self.high_sf_condition = []
+        self.timestamp_array.reset()
 
     def stcpr_aircx(self, current_time, stcpr_stpt_data, stcpr_data,
                     zn_dmpr_data, low_sf_cond, high_sf_cond):
@@ -169,36 +160,57 @@ class DuctStaticAIRCx(object):
             self.reinitialize()
 
         if run_status:
-            avg_stcpr_stpt, dx_string, dx_msg = common.setpoint_control_check(self.stcpr_stpt_array, self.stcpr_array, self.stpt_deviation_thr, DUCT_STC_RCX)
+            window = self.timestamp_array
+            mask = window.mask()
+            stcpr_stpt = window.values("stcpr_stpt", mask)
+            avg_stcpr_stpt, dx_string, dx_msg = common.setpoint_control_check(stcpr_stpt[~np.isnan(stcpr_stpt)],
+                                                                              window.values("stcpr", mask),
+                                                                              self.stpt_deviation_thr, DUCT_STC_RCX)
             self.publish_results(current_time, dx_string, dx_msg)
-            self.low_stcpr_aircx(avg_stcpr_stpt)
-            self.high_stcpr_aircx(avg_stcpr_stpt)
+            self.low_stcpr_aircx(avg_stcpr_stpt, mask)
+            self.high_stcpr_aircx(avg_stcpr_stpt, mask)
             self.reinitialize()
 
-        self.stcpr_array.append(mean(stcpr_data))
+        data_buffer = self.data_buffer
+        row = data_buffer.row(current_time)
+        data_buffer.set(row, "stcpr", mean(stcpr_data))
         if stcpr_stpt_data:
-            self.stcpr_stpt_array.append(mean(stcpr_stpt_data))
+            data_buffer.set(row, "stcpr_stpt", mean(stcpr_stpt_data))
 
-        zn_dmpr_data.sort(reverse=False)
-        self.ls_dmpr_low_avg.extend(zn_dmpr_data[:int(math.ceil(len(zn_dmpr_data) * 0.5)) if len(zn_dmpr_data) != 1 else 1])
-        self.ls_dmpr_high_avg.extend(zn_dmpr_data[int(math.ceil(len(zn_dmpr_data) * 0.5)) - 1 if len(zn_dmpr_data) != 1 else 0:])
+        low, upper, high = half_sums(zn_dmpr_data)
+        data_buffer.set(row, "ls_dmpr_low_sum", low[0])
+        data_buffer.set(row, "ls_dmpr_low_count", low[1])
+        data_buffer.set(row, "ls_dmpr_high_sum", upper[0])
+        data_buffer.set(row, "ls_dmpr_high_count", upper[1])
+        data_buffer.set(row, "hs_dmpr_high_sum", high[0])
+        data_buffer.set(row, "hs_dmpr_high_count", high[1])
 
-        zn_dmpr_data.sort(reverse=True)
-        self.hs_dmpr_high_avg.extend(zn_dmpr_data[:int(math.ceil(len(zn_dmpr_data) * 0.5)) if len(zn_dmpr_data) != 1 else 1])
+        data_buffer.set(row, "low_sf", low_sf_cond if low_sf_cond is not None else 0)
+        data_buffer.set(row, "high_sf", high_sf_cond if high_sf_cond is not None else 0)
+        self.timestamp_array.add(row)
 
-        self.low_sf_condition.append(low_sf_cond if low_sf_cond is not None else 0)
-        self.high_sf_condition.append(high_sf_cond if high_sf_cond is not None else 0)
-        self.timestamp_array.append(current_time)
+    def window_average(self, name, mask):
+        """
+        Average of all zone damper values collected in the window from the
+        per sample sums and counts.
+        :param name: damper column prefix.
+        :param mask:
+        :return:
+        """
+        count = self.timestamp_array.values(name + "_count", mask).sum()
+        return self.timestamp_array.values(name + "_sum", mask).sum() / count
 
-    def low_stcpr_aircx(self, avg_stcpr_stpt):
+    def low_stcpr_aircx(self, avg_stcpr_stpt, mask=None):
         """
         AIRCx to identify and correct low duct static pressure.
         :param avg_stcpr_stpt:
+        :param mask: window row mask computed by stcpr_aircx.
         :return:
         """
-        dmpr_low_avg = mean(self.ls_dmpr_low_avg)
-        dmpr_high_avg = mean(self.ls_dmpr_high_avg)
-        low_sf_condition = True if sum(self.low_sf_condition)/len(self.low_sf_condition) > 0.5 else False
+        mask = self.timestamp_array.mask() if mask is None else mask
+        dmpr_low_avg = self.window_average("ls_dmpr_low", mask)
+        dmpr_high_avg = self.window_average("ls_dmpr_high", mask)
+        low_sf_condition = True if self.timestamp_array.values("low_sf", mask).mean() > 0.5 else False
         thresholds = zip(self.zn_high_dmpr_thr.items(), self.zn_low_dmpr_thr.items())
         diagnostic_msg = {}
 
@@ -241,14 +253,16 @@ class DuctStaticAIRCx(object):
         _log.info(common.table_log_format(self.timestamp_array[-1], (DUCT_STC_RCX1 + DX + ": " + str(diagnostic_msg))))
         self.publish_results(self.timestamp_array[-1], DUCT_STC_RCX1 + DX, diagnostic_msg)
 
-    def high_stcpr_aircx(self, avg_stcpr_stpt):
+    def high_stcpr_aircx(self, avg_stcpr_stpt, mask=None):
         """
         AIRCx to identify and correct high duct static pressure.
         :param avg_stcpr_stpt::
+        :param mask: window row mask computed by stcpr_aircx.
         :return:
         """
-        high_sf_condition = True if sum(self.high_sf_condition) / len(self.high_sf_condition) > 0.5 else False
-        dmpr_high_avg = mean(self.hs_dmpr_high_avg)
+        mask = self.timestamp_array.mask() if mask is None else mask
+        high_sf_condition = True if self.timestamp_array.values("high_sf", mask).mean() > 0.5 else False
+        dmpr_high_avg = self.window_average("hs_dmpr_high", mask)
         diagnostic_msg = {}
 
         for key, hdzn_dmpr_thr in self.hdzn_dmpr_thr.items():
@@ -47,12 +47,15 @@ under Contract DE-AC05-76RL01830
 File used to unit test Airside
 """
 import unittest
+import os
+import numpy as np
 
 from datetime import timedelta as td
 from .diagnostics.sat_aircx import SupplyTempAIRCx
 from .diagnostics.stcpr_aircx import DuctStaticAIRCx
 from .diagnostics.schedule_reset_aircx import SchedResetAIRCx
 from .diagnostics import common
+from .diagnostics.data_buffer import SampleBuffer, BufferWindow, half_sums
 from datetime import datetime
 
 
@@ -169,24 +172,17 @@ class TestDiagnosticsDuctStaticAIRCx(unittest.TestCase):
         """test the creation of duct static diagnostic class"""
         diagnostic = DuctStaticAIRCx()
         diagnostic.table_key = "test"
-        diagnostic.timestamp_array = "test"
-        diagnostic.stcpr_stpt_array = "test"
-        diagnostic.stcpr_array = "test"
-        diagnostic.ls_dmpr_low_avg = "test"
-        diagnostic.ls_dmpr_high_avg = "test"
-        diagnostic.hs_dmpr_high_avg ="test"
-        diagnostic.low_sf_condition = "test"
-        diagnostic.high_sf_condition = "test"
+        for minute in range(3):
+            row = diagnostic.data_buffer.row(datetime(2019, 1, 1, 8, minute))
+            diagnostic.data_buffer.set(row, "stcpr", 1.0)
+            diagnostic.timestamp_array.add(row)
+        assert len(diagnostic.timestamp_array) == 3
         diagnostic.reinitialize()
         assert diagnostic.table_key is None
-        assert diagnostic.timestamp_array == []
-        assert diagnostic.stcpr_stpt_array == []
-        assert diagnostic.stcpr_array == []
-        assert diagnostic.ls_dmpr_low_avg == []
-        assert diagnostic.ls_dmpr_high_avg == []
-        assert diagnostic.hs_dmpr_high_avg == []
-        assert diagnostic.low_sf_condition == []
-        assert diagnostic.high_sf_condition == []
+        assert len(diagnostic.timestamp_array) == 0
+        assert not diagnostic.timestamp_array
+        assert diagnostic.timestamp_array.timestamps() == []
+        assert len(diagnostic.timestamp_array.values("stcpr")) == 0
 
     def test_duct_static_dx_stcpr_aircx(self):
         """test the sat_aircx method"""
@@ -252,13 +248,17 @@ class TestDiagnosticsScheduleResetAIRCx(unittest.TestCase):
     def test_temp_sensor_dx_reinitialize(self):
         """test the creation of schedule reset reinitialize"""
         diagnostic = SchedResetAIRCx()
-        diagnostic.stcpr_array = "test"
-        diagnostic.fan_status_array = "test"
-        diagnostic.schedule_time_array = "test"
+        for minute in range(3):
+            row = diagnostic.data_buffer.row(datetime(2019, 1, 1, 2, minute))
+            diagnostic.data_buffer.set(row, "unocc_fan_status", 1)
+            diagnostic.schedule_time_array.add(row)
+            diagnostic.timestamp_array.add(row)
         diagnostic.reinitialize_sched()
-        assert diagnostic.stcpr_array == []
-        assert diagnostic.fan_status_array == []
-        assert diagnostic.schedule_time_array == []
+        assert len(diagnostic.schedule_time_array) == 0
+        assert diagnostic.schedule_time_array.timestamps() == []
+        assert len(diagnostic.schedule_time_array.values("unocc_fan_status")) == 0
+        # Only the schedule window is reset.
+        assert len(diagnostic.timestamp_array) == 3
 
     def test_temp_sensor_dx_schedule_reset(self):
         """test the creation of schedule reset """
@@ -317,3 +317,363 @@ class TestDiagnosticsCommon(unittest.TestCase):
         assert results_publish[1][0] == "test_analysis&1969-12-31 19:17:16"
         assert results_publish[1][1] == ['d2/diagnostic message:', "{'low': 'test', 'normal': 'test', 'high': 'test'}"]
 
+
+class TestSampleBuffer(unittest.TestCase):
+    """
+    Contains all the tests for the diagnostics sample buffer
+    """
+
+    def test_sample_buffer_row(self):
+        """test that a repeated timestamp reuses the last row"""
+        data_buffer = SampleBuffer()
+        first = data_buffer.row(datetime(2019, 1, 1, 8, 0))
+        second = data_buffer.row(datetime(2019, 1, 1, 8, 1))
+        assert data_buffer.row(datetime(2019, 1, 1, 8, 1)) == second
+        assert second == first + 1
+        assert data_buffer.size == 2
+        assert data_buffer.timestamp(first) == datetime(2019, 1, 1, 8, 0)
+
+    def test_sample_buffer_grow(self):
+        """test that a full buffer grows when every row is still in use"""
+        data_buffer = SampleBuffer(capacity=2)
+        window = data_buffer.window("flag")
+        data_buffer.add_column("value")
+        for minute in range(5):
+            row = data_buffer.row(datetime(2019, 1, 1, 8, minute))
+            data_buffer.set(row, "value", minute)
+            window.add(row)
+        assert data_buffer.capacity == 8
+        assert data_buffer.offset == 0
+        assert list(window.values("value")) == [0.0, 1.0, 2.0, 3.0, 4.0]
+
+    def test_sample_buffer_compact(self):
+        """test that rows no window uses are discarded instead of growing"""
+        data_buffer = SampleBuffer(capacity=4)
+        window = data_buffer.window("flag")
+        data_buffer.add_column("value")
+        for minute in range(4):
+            row = data_buffer.row(datetime(2019, 1, 1, 8, minute))
+            data_buffer.set(row, "value", minute)
+            window.add(row)
+        window.reset()
+        for minute in range(4, 6):
+            row = data_buffer.row(datetime(2019, 1, 1, 8, minute))
+            data_buffer.set(row, "value", minute)
+            window.add(row)
+        assert data_buffer.capacity == 4
+        assert data_buffer.offset == 4
+        assert data_buffer.size == 2
+        assert list(window.values("value")) == [4.0, 5.0]
+        assert window.timestamps() == [datetime(2019, 1, 1, 8, 4), datetime(2019, 1, 1, 8, 5)]
+
+
+class TestBufferWindow(unittest.TestCase):
+    """
+    Contains all the tests for the diagnostics buffer windows
+    """
+
+    def test_buffer_window_empty(self):
+        """test an empty window"""
+        window = SampleBuffer().window("flag")
+        assert isinstance(window, BufferWindow)
+        assert len(window) == 0
+        assert not window
+        assert window.timestamps() == []
+        assert len(window.values("flag")) == 0
+        self.assertRaises(IndexError, lambda: window[0])
+
+    def test_buffer_window_first_last(self):
+        """test the window timestamps used by check_date and check_run_status"""
+        data_buffer = SampleBuffer()
+        window = data_buffer.window("flag")
+        for minute in range(3):
+            window.add(data_buffer.row(datetime(2019, 1, 1, 8, minute)))
+        assert len(window) == 3
+        assert window[0] == datetime(2019, 1, 1, 8, 0)
+        assert window[-1] == datetime(2019, 1, 1, 8, 2)
+        self.assertRaises(IndexError, lambda: window[1])
+        assert common.check_date(datetime(2019, 1, 3, 8, 0), window) is True
+        assert not common.check_date(datetime(2019, 1, 1, 9, 0), window)
+
+    def test_buffer_window_add_twice(self):
+        """test that adding a row twice counts it once"""
+        data_buffer = SampleBuffer()
+        window = data_buffer.window("flag")
+        row = data_buffer.row(datetime(2019, 1, 1, 8, 0))
+        window.add(row)
+        window.add(row)
+        assert len(window) == 1
+
+    def test_buffer_window_shared_rows(self):
+        """test windows selecting different rows of the same buffer"""
+        data_buffer = SampleBuffer()
+        data_buffer.add_column("value")
+        every = data_buffer.window("every")
+        odd = data_buffer.window("odd")
+        for minute in range(4):
+            row = data_buffer.row(datetime(2019, 1, 1, 8, minute))
+            data_buffer.set(row, "value", minute)
+            every.add(row)
+            if minute % 2:
+                odd.add(row)
+        assert list(every.values("value")) == [0.0, 1.0, 2.0, 3.0]
+        assert list(odd.values("value")) == [1.0, 3.0]
+        assert odd[0] == datetime(2019, 1, 1, 8, 1)
+        every.reset()
+        assert len(every) == 0
+        assert list(odd.values("value")) == [1.0, 3.0]
+
+
+class TestHalfSums(unittest.TestCase):
+    """
+    Contains all the tests for the duct static pressure damper sums
+    """
+
+    def sorted_sums(self, values):
+        values = sorted(values)
+        half = int(len(values) * 0.5 + 0.5) if len(values) != 1 else 1
+        low = values[:half]
+        upper = values[half - 1:]
+        high = values[len(values) - half:]
+        return (sum(low), len(low)), (sum(upper), len(upper)), (sum(high), len(high))
+
+    def test_half_sums_empty(self):
+        """test the sums of no dampers"""
+        assert half_sums([]) == ((0.0, 0), (0.0, 0), (0.0, 0))
+
+    def test_half_sums_single(self):
+        """test that a single damper is in every half"""
+        assert half_sums([40.0]) == ((40.0, 1), (40.0, 1), (40.0, 1))
+
+    def test_half_sums_match_sorted(self):
+        """test the partition against sorting the damper positions"""
+        for values in ([10.0, 90.0], [30.0, 10.0, 20.0], [5.0, 80.0, 35.0, 60.0, 20.0, 95.0],
+                       [50.0, 50.0, 20.0, 50.0, 70.0]):
+            assert half_sums(values) == self.sorted_sums(values)
+
+
+class TestBatch(unittest.TestCase):
+    """
+    Contains the tests for the batch (historical data) mode
+    """
+    zones = ["VAV1", "VAV2", "VAV3"]
+
+    def batch_config(self):
+        return {
+            "device": {"campus": "campus", "building": "building", "unit": {}},
+            "analysis_name": "AirsideAIRCx",
+            "local_timezone": "US/Pacific",
+            "arguments": {
+                "point_mapping": {
+                    "fan_status": "supplyfanstatus",
+                    "zone_reheat": "heatingsignal",
+                    "zone_damper": "damperposition",
+                    "duct_stcpr": "ductstaticpressure",
+                    "duct_stcpr_stpt": "ductstaticpressuresetpoint",
+                    "sa_temp": "dischargeairtemperature",
+                    "fan_speedcmd": "supplyfanspeed",
+                    "sat_stpt": "dischargeairtemperaturesetpoint"
+                },
+                "data_window": 30,
+                "no_required_data": 10
+            }
+        }
+
+    def batch_frame(self, units, minutes, seed=0):
+        import pandas as pd
+        import random
+        rows = []
+        generator = random.Random(seed)
+        for unit in units:
+            for minute in range(minutes):
+                timestamp = (datetime(2020, 6, 1) + td(minutes=minute)).isoformat()
+                rows.append({
+                    "timestamp": timestamp,
+                    "unit": unit,
+                    "device": "",
+                    "supplyfanstatus": 0 if 2 <= (minute // 60) % 24 < 5 else 1,
+                    "supplyfanspeed": 40.0 + 60.0 * generator.random(),
+                    "ductstaticpressure": 0.8 + 0.4 * generator.random(),
+                    "ductstaticpressuresetpoint": 1.0,
+                    "dischargeairtemperature": None if generator.random() < 0.02 else 52.0 + 6.0 * generator.random(),
+                    "dischargeairtemperaturesetpoint": 55.0
+                })
+                for zone in self.zones:
+                    rows.append({
+                        "timestamp": timestamp,
+                        "unit": unit,
+                        "device": zone,
+                        "damperposition": generator.choice([5.0, 40.0, 95.0]),
+                        "heatingsignal": generator.choice([0.0, 0.0, 60.0])
+                    })
+        return pd.DataFrame(rows)
+
+    def test_batch_matches_agent_messages(self):
+        """test the batch results match the results of the agent fed one message at a time"""
+        import pandas as pd
+        from .batch import run_unit, create_agent, unit_config
+        config = self.batch_config()
+        frame = self.batch_frame(["AHU1"], 24 * 60)
+        # The agent waits for the start of the next scrape before it collects data.
+        first = frame["timestamp"].iloc[0]
+        results = run_unit(config, "AHU1", frame[frame["timestamp"] != first])
+
+        agent = create_agent(unit_config(config, "AHU1", self.zones), "AHU1")
+        for _, row in frame.iterrows():
+            message = {point: value for point, value in row.items()
+                       if point not in ("timestamp", "unit", "device") and not pd.isna(value)}
+            path = "AHU1/" + row["device"] if row["device"] else "AHU1"
+            agent.new_data_message(None, None, None, "devices/campus/building/" + path + "/all",
+                                   {"Date": row["timestamp"] + "+00:00"}, [message, {}])
+        assert results
+        assert results == [(timestamp, "AHU1", topic, result) for timestamp, topic, result in agent.vip.pubsub.results]
+
+    def test_batch_runs_units_in_pool(self):
+        """test run_batch processes every unit of the input file"""
+        import tempfile
+        from .batch import run_batch, run_unit
+        config = self.batch_config()
+        frame = self.batch_frame(["AHU1", "AHU2"], 120)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "data.csv")
+            frame.to_csv(path, index=False)
+            rows = []
+
+            class Writer(object):
+                def writerows(self, results):
+                    rows.extend(results)
+
+            assert run_batch(config, [path], Writer(), workers=2) == 2
+        expected = run_unit(config, "AHU1", frame[frame["unit"] == "AHU1"])
+        assert [row for row in rows if row[1] == "AHU1"] == expected
+        assert any(row[1] == "AHU2" for row in rows)
+
+
+class TestDeviceValues(unittest.TestCase):
+    """
+    Contains the tests for decoding the device publishes into device values
+    """
+
+    def create_agent(self):
+        from .batch import create_agent, unit_config
+        return create_agent(unit_config(TestBatch().batch_config(), "AHU1", ["VAV1", "VAV2"]), "AHU1")
+
+    def test_create_point_columns(self):
+        """test the point and device mapping to device value columns and rows"""
+        from .airside_agent import DATA_FIELDS
+        agent = self.create_agent()
+        assert agent.point_columns["supplyfanstatus"] == DATA_FIELDS.index("fan_status")
+        assert agent.point_columns["damperposition"] == DATA_FIELDS.index("zone_damper")
+        assert agent.point_columns["dischargeairtemperaturesetpoint"] == DATA_FIELDS.index("sat_stpt")
+        assert len(agent.point_columns) == len(DATA_FIELDS)
+        assert agent.device_rows == {"AHU1": 0, "AHU1/VAV1": 1, "AHU1/VAV2": 2}
+        assert agent.device_values.shape == (3, len(DATA_FIELDS))
+
+    def test_parse_device_values(self):
+        """test the device values are split into the data arrays, skipping missing values"""
+        agent = self.create_agent()
+        columns = agent.point_columns
+        device_values = agent.device_values
+        device_values[0, columns["supplyfanstatus"]] = 1
+        device_values[0, columns["ductstaticpressure"]] = 1.2
+        device_values[1, columns["damperposition"]] = 40.0
+        device_values[2, columns["damperposition"]] = 60.0
+        device_values[2, columns["heatingsignal"]] = 10.0
+        agent.parse_device_values(device_values)
+        assert agent.fan_status_data == [1.0]
+        assert agent.stcpr_data == [1.2]
+        assert agent.zn_dmpr_data == [40.0, 60.0]
+        assert agent.zn_rht_data == [10.0]
+        assert agent.sat_data == []
+        assert agent.fan_sp_data == []
+
+    def test_aggregate_subdevice(self):
+        """test a device publish is decoded into its row, coercing or skipping non-numeric values"""
+        agent = self.create_agent()
+        columns = agent.point_columns
+        needed = agent.aggregate_subdevice({"damperposition": "55.5", "heatingsignal": "on",
+                                            "zonetemperature": 72.0, "occupancy": None},
+                                           "devices/campus/building/AHU1/VAV1/all")
+        assert needed is True
+        assert agent.device_values[1, columns["damperposition"]] == 55.5
+        assert np.isnan(agent.device_values[1, columns["heatingsignal"]])
+        assert "AHU1/VAV1" not in agent.needed_devices
+        assert agent.aggregate_subdevice({"damperposition": 10.0}, "devices/campus/building/AHU1/VAV1/all") is False
+
+
+class TestHostAgent(unittest.TestCase):
+    """
+    Contains the tests for the multi-unit host agent
+    """
+
+    def host_config(self):
+        config = TestBatch().batch_config()
+        host_config = {key: value for key, value in config.items() if key != "device"}
+        host_config["devices"] = [
+            {"campus": "campus", "building": "building1",
+             "unit": {"AHU1": {"subdevices": TestBatch.zones}, "AHU2": {"subdevices": TestBatch.zones}}},
+            {"campus": "campus", "building": "building2",
+             "unit": {"AHU1": {"subdevices": TestBatch.zones}},
+             "arguments": {"data_window": 15}}
+        ]
+        return host_config
+
+    def create_host(self, host_config):
+        from .batch import BatchVIP, BatchCore
+        from .host_agent import AirsideHostAgent
+        host = AirsideHostAgent.__new__(AirsideHostAgent)
+        host.vip = BatchVIP()
+        host.vip.rpc = None
+        host.core = BatchCore("host")
+        host.config = host_config
+        host.create_units()
+        return host
+
+    def test_host_results_match_single_unit_agents(self):
+        """test every hosted unit publishes the results of a single unit agent"""
+        import pandas as pd
+        from .batch import BatchVIP, BatchCore, unit_config
+        from .airside_agent import AirsideAgent
+
+        batch_test = TestBatch()
+        config = batch_test.batch_config()
+        host = self.create_host(self.host_config())
+        assert host.prefixes == ["devices/campus/building1/", "devices/campus/building2/"]
+        assert sorted(host.units) == ["campus/building1/AHU1", "campus/building1/AHU2", "campus/building2/AHU1"]
+
+        units = (("building1", "AHU1"), ("building1", "AHU2"), ("building2", "AHU1"))
+        messages = []
+        for seed, (building, unit) in enumerate(units):
+            frame = batch_test.batch_frame([unit], 180, seed)
+            for _, row in frame.iterrows():
+                message = {point: value for point, value in row.items()
+                           if point not in ("timestamp", "unit", "device") and not pd.isna(value)}
+                path = unit + "/" + row["device"] if row["device"] else unit
+                messages.append((row["timestamp"], "devices/campus/{}/{}/all".format(building, path), message))
+        messages.sort(key=lambda message: message[0])
+        messages.append((messages[-1][0], "devices/campus/building1/AHU9/all", {}))
+        for timestamp, topic, message in messages:
+            host.new_data_message(None, None, None, topic, {"Date": timestamp + "+00:00"}, [message, {}])
+
+        for building, unit in units:
+            unit_device = unit_config(config, unit, TestBatch.zones)
+            unit_device["device"]["building"] = building
+            if building == "building2":
+                unit_device["arguments"]["data_window"] = 15
+            agent = AirsideAgent.hosted(unit_device, BatchVIP(), BatchCore(unit))
+            prefix = "devices/campus/{}/{}/".format(building, unit)
+            for timestamp, topic, message in messages:
+                if topic.startswith(prefix):
+                    agent.new_data_message(None, None, None, topic, {"Date": timestamp + "+00:00"}, [message, {}])
+            hosted = [result for result in host.vip.pubsub.results if "/{}/{}/".format(building, unit) in result[1]]
+            assert agent.vip.pubsub.results
+            assert hosted == agent.vip.pubsub.results
+
+    def test_host_skips_invalid_unit(self):
+        """test a unit with an invalid configuration is left out instead of stopping the host"""
+        host_config = self.host_config()
+        host_config["devices"][0]["unit"]["AHU3"] = {"subdevices": []}
+        host = self.create_host(host_config)
+        assert "campus/building1/AHU3" not in host.units
+        assert len(host.units) == 3
+        assert "devices/campus/building1/AHU3/all" not in host.topic_units
@@ -63,7 +63,8 @@ setup(
     include_package_data=True,
     name=package + 'agent',
     version=__version__,
-    install_requires=['volttron>=3.0'],
+    install_requires=['volttron>=3.0', 'numpy'],
+    extras_require={'batch': ['pandas', 'numpy'], 'host': ['aircx_host']},
     packages=packages,
     entry_points={
         'setuptools.installation': [
@@ -0,0 +1,135 @@
+"""
+Copyright (c) 2020, Battelle Memorial Institute
+All rights reserved.
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+The views and conclusions contained in the software and documentation are those
+of the authors and should not be interpreted as representing official policies,
+either expressed or implied, of the FreeBSD Project.
+This material was prepared as an account of work sponsored by an agency of the
+United States Government. Neither the United States Government nor the United
+States Department of Energy, nor Battelle, nor any of their employees, nor any
+jurisdiction or organization that has cooperated in th.e development of these
+materials, makes any warranty, express or implied, or assumes any legal
+liability or responsibility for the accuracy, completeness, or usefulness or
+any information, apparatus, product, software, or process disclosed, or
+represents that its use would not infringe privately owned rights.
+Reference herein to any specific commercial product, process, or service by
+trade name, trademark, manufacturer, or otherwise does not necessarily
+constitute or imply its endorsement, recommendation, or favoring by the
+United States Government or any agency thereof, or Battelle Memorial Institute.
+The views and opinions of authors expressed herein do not necessarily state or
+reflect those of the United States Government or any agency thereof.
+PACIFIC NORTHWEST NATIONAL LABORATORY
+operated by
+BATTELLE
+for the
+UNITED STATES DEPARTMENT OF ENERGY
+under Contract DE-AC05-76RL01830
+"""
+"""
+Benchmark of AirsideAgent.new_data_message, the decoding and aggregation
+of the device publishes of a scrape, for AHUs with 10, 50 and 200 VAV
+subdevices.  The agent is configured without a platform as in batch mode.
+
+Usage: python tests/benchmark_messages.py [--scrapes N] [--subdevices 10 50 200]
+"""
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+from datetime import datetime, timedelta as td
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from airside.batch import create_agent, unit_config
+
+POINT_MAPPING = {
+    "fan_status": "supplyfanstatus",
+    "zone_reheat": "heatingsignal",
+    "zone_damper": "damperposition",
+    "duct_stcpr": "ductstaticpressure",
+    "duct_stcpr_stpt": "ductstaticpressuresetpoint",
+    "sa_temp": "dischargeairtemperature",
+    "fan_speedcmd": "supplyfanspeed",
+    "sat_stpt": "dischargeairtemperaturesetpoint"
+}
+
+
+def scrape_messages(subdevices, scrapes, seed=0):
+    """
+    Device publishes of an AHU and its VAVs, one minute apart.
+    :return: list of (topic, headers, message)
+    """
+    generator = random.Random(seed)
+    start = datetime(2020, 1, 6, 14, 0)
+    messages = []
+    for scrape in range(scrapes):
+        headers = {"Date": (start + td(minutes=scrape)).isoformat() + "+00:00"}
+        ahu = {
+            "supplyfanstatus": 1, "supplyfanspeed": 60.0 + generator.random(),
+            "ductstaticpressure": generator.uniform(0.8, 1.2), "ductstaticpressuresetpoint": 1.0,
+            "dischargeairtemperature": generator.uniform(54.0, 56.0), "dischargeairtemperaturesetpoint": 55.0,
+            # Points that are not part of the point mapping, as in a real AHU publish.
+            "outdoorairtemperature": 70.0, "mixedairtemperature": 65.0, "returnairtemperature": 72.0
+        }
+        messages.append(("devices/campus/building/AHU1/all", headers, [ahu, {}]))
+        for subdevice in subdevices:
+            vav = {
+                "damperposition": generator.uniform(0.0, 100.0), "heatingsignal": generator.uniform(0.0, 100.0),
+                "zonetemperature": 72.0, "zonecoolingtemperaturesetpoint": 74.0,
+                "zoneheatingtemperaturesetpoint": 68.0, "zoneairflow": 400.0, "occupancy": 1
+            }
+            messages.append(("devices/campus/building/AHU1/" + subdevice + "/all", headers, [vav, {}]))
+    return messages
+
+
+def benchmark(subdevice_count, scrapes):
+    subdevices = ["VAV{}".format(number) for number in range(subdevice_count)]
+    config = {
+        "device": {"campus": "campus", "building": "building"},
+        "local_timezone": "US/Pacific",
+        "arguments": {"point_mapping": POINT_MAPPING}
+    }
+    agent = create_agent(unit_config(config, "AHU1", subdevices), "AHU1")
+    messages = scrape_messages(subdevices, scrapes)
+    start = time.perf_counter()
+    for topic, headers, message in messages:
+        agent.new_data_message(None, None, None, topic, headers, message)
+    elapsed = time.perf_counter() - start
+    return elapsed, len(messages)
+
+
+def main(argv=sys.argv):
+    arg_parser = argparse.ArgumentParser(description="Benchmark the AirsideAgent device message handling.")
+    arg_parser.add_argument("--scrapes", type=int, default=500)
+    arg_parser.add_argument("--subdevices", type=int, nargs="+", default=[10, 50, 200])
+    args = arg_parser.parse_args(argv[1:])
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print("{:>10} {:>10} {:>14} {:>14}".format("subdevices", "messages", "us/message", "scrapes/s"))
+    for subdevice_count in args.subdevices:
+        elapsed, messages = benchmark(subdevice_count, args.scrapes)
+        print("{:>10} {:>10} {:>14.1f} {:>14.1f}".format(subdevice_count, messages, elapsed / messages * 1e6,
+                                                         args.scrapes / elapsed))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
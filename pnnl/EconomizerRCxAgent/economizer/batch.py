@@ -0,0 +1,256 @@
+"""
+Copyright (c) 2020, Battelle Memorial Institute
+All rights reserved.
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+The views and conclusions contained in the software and documentation are those
+of the authors and should not be interpreted as representing official policies,
+either expressed or implied, of the FreeBSD Project.
+This material was prepared as an account of work sponsored by an agency of the
+United States Government. Neither the United States Government nor the United
+States Department of Energy, nor Battelle, nor any of their employees, nor any
+jurisdiction or organization that has cooperated in th.e development of these
+materials, makes any warranty, express or implied, or assumes any legal
+liability or responsibility for the accuracy, completeness, or usefulness or
+any information, apparatus, product, software, or process disclosed, or
+represents that its use would not infringe privately owned rights.
+Reference herein to any specific commercial product, process, or service by
+trade name, trademark, manufacturer, or otherwise does not necessarily
+constitute or imply its endorsement, recommendation, or favoring by the
+United States Government or any agency thereof, or Battelle Memorial Institute.
+The views and opinions of authors expressed herein do not necessarily state or
+reflect those of the United States Government or any agency thereof.
+PACIFIC NORTHWEST NATIONAL LABORATORY
+operated by
+BATTELLE
+for the
+UNITED STATES DEPARTMENT OF ENERGY
+under Contract DE-AC05-76RL01830
+"""
+"""
+Batch (historical) mode for the Economizer AIRCx diagnostics.
+
+Runs the EconomizerAgent diagnostics over CSV or Parquet exports of a
+historian instead of one pubsub message at a time.  The input table has
+one row per device scrape:
+
+    timestamp, unit, [device,] <point>, <point>, ...
+
+"unit" identifies the AHU/RTU and the optional "device" column the
+subdevice that published the row.  Point columns use the names of the
+configuration point_mapping.  Timestamps without a UTC offset are UTC,
+as in the Date header of device publishes.
+
+Each unit is run by one worker of a process pool with its own agent
+state, and every result is written to the output CSV with the same
+topic and diagnostic result code the agent publishes.  The scrapes are
+converted to device messages with vectorized pandas operations; the
+diagnostics themselves run message by message, in time order, since the
+data window and precondition checks depend on the preceding messages.
+
+Usage: python -m economizer.batch economizer_config data.csv [data.parquet ...] -o results.csv [-w workers]
+"""
+import sys
+import csv
+import copy
+import logging
+import argparse
+import multiprocessing
+from collections import deque
+import numpy as np
+import pandas as pd
+from volttron.platform.agent import utils
+from volttron.platform.agent.utils import setup_logging
+from .economizer_agent import EconomizerAgent
+
+setup_logging()
+_log = logging.getLogger(__name__)
+
+TIMESTAMP = "timestamp"
+UNIT = "unit"
+DEVICE = "device"
+RESULT_FIELDS = ("timestamp", "unit", "topic", "result")
+
+
+class BatchPubSub(object):
+    """
+    vip.pubsub replacement that collects the published diagnostic results.
+    """
+    def __init__(self):
+        self.results = []
+
+    def publish(self, peer, topic, headers=None, message=None):
+        self.results.append((headers["Date"], topic, message))
+
+    def subscribe(self, *args, **kwargs):
+        pass
+
+    def unsubscribe(self, *args, **kwargs):
+        pass
+
+
+class BatchVIP(object):
+    def __init__(self):
+        self.pubsub = BatchPubSub()
+
+
+class BatchCore(object):
+    def __init__(self, identity):
+        self.identity = identity
+
+
+def read_frame(path):
+    """
+    Read a CSV or Parquet historian export.
+    :param path:
+    :return: pandas DataFrame
+    """
+    if path.endswith((".parquet", ".pq")):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+def unit_config(config, unit, subdevices):
+    """
+    Configuration of the agent running one unit: the template configuration
+    with the unit and its subdevices as the only device.
+    """
+    config = copy.deepcopy(config)
+    device = config.setdefault("device", {})
+    device["unit"] = {unit: {"subdevices": list(subdevices)}}
+    return config
+
+
+def create_agent(config, unit):
+    """
+    Configure an EconomizerAgent without a platform connection.
+    :param config: configuration of the unit (see unit_config).
+    :param unit:
+    :return: EconomizerAgent
+    """
+    return EconomizerAgent.hosted(config, BatchVIP(), BatchCore(unit))
+
+
+def device_messages(frame, timezone):
+    """
+    Convert the scrapes of one unit to the device messages of its publishes,
+    dropping the points without a value.
+    :param frame: rows of the unit.
+    :param timezone: local timezone of the configuration.
+    :return: list of (localized datetime, message) in time order.
+    """
+    points = [column for column in frame.columns if column not in (TIMESTAMP, UNIT, DEVICE)]
+    timestamps = pd.to_datetime(frame[TIMESTAMP], utc=True)
+    order = np.argsort(timestamps.values, kind="stable")
+    local_times = pd.DatetimeIndex(timestamps.values[order]).tz_localize("UTC").tz_convert(timezone).to_pydatetime()
+
+    values = frame[points].to_numpy(dtype=object)[order]
+    present = ~pd.isna(frame[points]).to_numpy()[order]
+    return [(local_times[i], [{point: value for point, value, has_value in zip(points, row, row_present) if has_value}, {}])
+            for i, (row, row_present) in enumerate(zip(values, present))]
+
+
+def subdevices(frame, unit):
+    if DEVICE not in frame:
+        return []
+    device = frame[DEVICE].dropna().astype(str)
+    return sorted(set(device[~device.isin(("", unit))]))
+
+
+def run_unit(config, unit, frame):
+    """
+    Run the diagnostics of one unit over its historical data.
+    :param config: template agent configuration.
+    :param unit:
+    :param frame: rows of the unit.
+    :return: list of (timestamp, unit, topic, result)
+    """
+    agent = create_agent(unit_config(config, unit, subdevices(frame, unit)), unit)
+    for current_time, message in device_messages(frame, agent.timezone):
+        agent.run_diagnostics(current_time, message)
+    return [(timestamp, unit, topic, result) for timestamp, topic, result in agent.vip.pubsub.results]
+
+
+def initialize_worker(log_level):
+    logging.getLogger().setLevel(log_level)
+
+
+def run_batch(config, paths, writer, workers=None, log_level=logging.WARNING):
+    """
+    Run the diagnostics over every unit in the historian exports.
+    Files are read one at a time and the units are distributed over a process
+    pool, so at most one file and the units in progress are held in memory.
+    :param config: template agent configuration.
+    :param paths: CSV or Parquet files.
+    :param writer: csv writer the results are written to.
+    :param workers: number of processes, defaults to the number of CPUs.
+    :param log_level: log level of the workers.
+    :return: number of units processed.
+    """
+    workers = workers or multiprocessing.cpu_count()
+    max_pending = 2 * workers
+    units = 0
+    pool = multiprocessing.Pool(workers, initialize_worker, (log_level,))
+    try:
+        pending = deque()
+        for path in paths:
+            frame = read_frame(path)
+            for unit, unit_frame in frame.groupby(UNIT, sort=False):
+                if len(pending) >= max_pending:
+                    writer.writerows(pending.popleft().get())
+                pending.append(pool.apply_async(run_unit, (config, str(unit), unit_frame)))
+                units += 1
+            del frame
+        while pending:
+            writer.writerows(pending.popleft().get())
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    return units
+
+
+def main(argv=sys.argv):
+    """Main method called to run the batch diagnostics."""
+    arg_parser = argparse.ArgumentParser(description="Run the Economizer AIRCx diagnostics over historical data.")
+    arg_parser.add_argument("config", help="EconomizerAgent configuration file")
+    arg_parser.add_argument("data", nargs="+", help="CSV or Parquet files with timestamp, unit and point columns")
+    arg_parser.add_argument("-o", "--output", default="economizer_results.csv", help="results CSV")
+    arg_parser.add_argument("-w", "--workers", type=int, default=None, help="number of worker processes")
+    arg_parser.add_argument("-v", "--verbose", action="store_true", help="log the diagnostics of the workers")
+    args = arg_parser.parse_args(argv[1:])
+
+    config = utils.load_config(args.config)
+    # The csv module wants binary files on python 2 and newline="" on python 3.
+    output_file = open(args.output, "wb") if sys.version_info[0] < 3 else open(args.output, "w", newline="")
+    with output_file as output:
+        writer = csv.writer(output)
+        writer.writerow(RESULT_FIELDS)
+        units = run_batch(config, args.data, writer, args.workers,
+                          logging.INFO if args.verbose else logging.WARNING)
+    _log.info("Processed {} units, results in {}".format(units, args.output))
+
+
+if __name__ == "__main__":
+    """Entry point for script"""
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        pass
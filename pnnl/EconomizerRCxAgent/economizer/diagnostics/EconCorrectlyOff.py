@@ -44,9 +44,9 @@ under Contract DE-AC05-76RL01830
 """
 import logging
 from datetime import timedelta as td
-from volttron.platform.agent.math_utils import mean
 from volttron.platform.agent.utils import setup_logging
 from .. import constants
+from .sample_store import TimestampWindow
 
 setup_logging()
 _log = logging.getLogger(__name__)
@@ -62,17 +62,15 @@ class EconCorrectlyOff(object):
     """
 
     def __init__(self):
-        # Initialize data arrays
-        self.oat_values = []
-        self.rat_values = []
-        self.mat_values = []
-        self.fan_spd_values = []
-        self.oad_values = []
-        self.timestamp = []
+        # Initialize data window aggregates
+        self.oad_sum = 0.0
+        self.energy_sum = 0.0
+        self.energy_count = 0
+        self.timestamp = TimestampWindow()
         self.analysis_name = ""
 
         # Initialize not_cooling and not_economizing flags
-        self.economizing = []
+        self.economizing = TimestampWindow()
 
         self.max_dx_time = None
         self.data_window = None
@@ -125,18 +123,14 @@ class EconCorrectlyOff(object):
         self.eer = eer
 
     def run_diagnostic(self, current_time):
-
-        if self.timestamp:
-            elapsed_time = self.timestamp[-1] - self.timestamp[0]
-        else:
-            elapsed_time = td(minutes=0)
+        elapsed_time = self.timestamp.elapsed()
         if self.economizer_conditions(current_time):
             return
         if len(self.timestamp) >= self.no_required_data:
             if elapsed_time > self.max_dx_time:
-                _log.info(constants.table_log_format(self.analysis_name, self.timestamp[-1], (
+                _log.info(constants.table_log_format(self.analysis_name, self.timestamp.last, (
                           constants.ECON3 + constants.DX + ":" + str(self.inconsistent_date))))
-                self.results_publish.append(constants.table_publish_format(self.analysis_name, self.timestamp[-1],
+                self.results_publish.append(constants.table_publish_format(self.analysis_name, self.timestamp.last,
                                                                            (constants.ECON3 + constants.DX),
                                                                            self.inconsistent_date))
                 self.clear_data()
@@ -148,31 +142,26 @@ class EconCorrectlyOff(object):
                                                                        self.insufficient_data))
             self.clear_data()
 
-    def economizer_off_algorithm(self, oat, rat, mat, oad, econ_condition, cur_time, fan_sp):
+    def economizer_off_algorithm(self, econ_condition, sample):
         """Perform the Econ Correctly Off class algorithm
-        oat: float
-        rat: float
-        mat: float
-        oad: float
         econ_condition: float
-        cur_time: datetime time delta
-        fan_sp: float
+        sample: Sample
 
         No return
         """
 
-        economizing = self.economizing_check(econ_condition, cur_time)
+        economizing = self.economizing_check(econ_condition, sample.timestamp)
         if economizing:
             return
 
-        self.oat_values.append(oat)
-        self.mat_values.append(mat)
-        self.rat_values.append(rat)
-        self.oad_values.append(oad)
-        self.timestamp.append(cur_time)
+        self.oad_sum += sample.oad
+        self.timestamp.append(sample.timestamp)
 
-        fan_sp = fan_sp / 100.0 if fan_sp is not None else 1.0
-        self.fan_spd_values.append(fan_sp)
+        desired_oaf = self.desired_oaf / 100.0
+        temperature_difference = sample.mat - (sample.oat * desired_oaf + (sample.rat * (1.0 - desired_oaf)))
+        if temperature_difference > 0:
+            self.energy_sum += (1.08 * sample.fan_spd * self.cfm * temperature_difference) / (1000.0 * self.eer)
+            self.energy_count += 1
 
     def economizer_conditions(self, current_time):
         if len(self.economizing) >= len(self.economizing)*0.5:
@@ -203,8 +192,7 @@ class EconCorrectlyOff(object):
         """If the detected problems(s) are consistent then generate a fault message(s).
         No return
         """
-        desired_oaf = self.desired_oaf / 100.0
-        avg_damper = mean(self.oad_values)
+        avg_damper = self.oad_sum / float(len(self.timestamp))
         diagnostic_msg = {}
         energy_impact = {}
         for sensitivity, threshold in self.excess_damper_threshold.items():
@@ -212,7 +200,7 @@ class EconCorrectlyOff(object):
                 msg = "{} - {}: {}".format(constants.ECON3, sensitivity, self.alg_result_messages[0])
                 # color_code = "RED"
                 result = 21.1
-                energy = self.energy_impact_calculation(desired_oaf)
+                energy = self.energy_impact_calculation()
             else:
                 msg = "{} - {}: {}".format(constants.ECON3, sensitivity, self.alg_result_messages[1])
                 # color_code = "GREEN"
@@ -221,43 +209,35 @@ class EconCorrectlyOff(object):
             _log.info(msg)
             diagnostic_msg.update({sensitivity: result})
             energy_impact.update({sensitivity: energy})
-        _log.info(constants.table_log_format(self.analysis_name, self.timestamp[-1], (constants.ECON3 + constants.DX + ":" + str(diagnostic_msg))))
-        self.results_publish.append(constants.table_publish_format(self.analysis_name, self.timestamp[-1], (constants.ECON3 + constants.DX), diagnostic_msg))
-        _log.info(constants.table_log_format(self.analysis_name, self.timestamp[-1], (constants.ECON3 + constants.EI + ":" + str(energy_impact))))
-        self.results_publish.append(constants.table_publish_format(self.analysis_name, self.timestamp[-1], (constants.ECON3 + constants.EI), energy_impact))
+        _log.info(constants.table_log_format(self.analysis_name, self.timestamp.last, (constants.ECON3 + constants.DX + ":" + str(diagnostic_msg))))
+        self.results_publish.append(constants.table_publish_format(self.analysis_name, self.timestamp.last, (constants.ECON3 + constants.DX), diagnostic_msg))
+        _log.info(constants.table_log_format(self.analysis_name, self.timestamp.last, (constants.ECON3 + constants.EI + ":" + str(energy_impact))))
+        self.results_publish.append(constants.table_publish_format(self.analysis_name, self.timestamp.last, (constants.ECON3 + constants.EI), energy_impact))
         self.clear_data()
 
-    def energy_impact_calculation(self, desired_oaf):
+    def energy_impact_calculation(self):
         """ Calculate the impact the temperature values have
-        desired_oaf: float
 
         returns float
         """
         ei = 0.0
-        energy_calc = [
-            (1.08 * spd * self.cfm * (mat - (oat * desired_oaf + (rat * (1.0 - desired_oaf))))) / (1000.0 * self.eer)
-            for mat, oat, rat, spd in zip(self.mat_values, self.oat_values, self.rat_values, self.fan_spd_values)
-            if (mat - (oat * desired_oaf + (rat * (1.0 - desired_oaf)))) > 0
-        ]
-        if energy_calc:
-            avg_step = (self.timestamp[-1] - self.timestamp[0]).total_seconds() / 60 if len(self.timestamp) > 1 else 1
-            dx_time = (len(energy_calc) - 1) * avg_step if len(energy_calc) > 1 else 1.0
-            ei = (sum(energy_calc) * 60.0) / (len(energy_calc) * dx_time)
+        if self.energy_count:
+            avg_step = self.timestamp.elapsed().total_seconds() / 60 if len(self.timestamp) > 1 else 1
+            dx_time = (self.energy_count - 1) * avg_step if self.energy_count > 1 else 1.0
+            ei = (self.energy_sum * 60.0) / (self.energy_count * dx_time)
             ei = round(ei, 2)
         return ei
 
     def clear_data(self):
         """
-        Reinitialize data arrays.
+        Reinitialize data window aggregates.
 
         No return
         """
-        self.oad_values = []
-        self.oat_values = []
-        self.rat_values = []
-        self.mat_values = []
-        self.fan_spd_values = []
-        self.timestamp = []
-        self.economizing = []
+        self.oad_sum = 0.0
+        self.energy_sum = 0.0
+        self.energy_count = 0
+        self.timestamp = TimestampWindow()
+        self.economizing = TimestampWindow()
 
 
@@ -44,9 +44,9 @@ under Contract DE-AC05-76RL01830
 """
 import logging
 from datetime import timedelta as td
-from volttron.platform.agent.math_utils import mean
 from volttron.platform.agent.utils import setup_logging
 from .. import constants
+from .sample_store import TimestampWindow
 
 setup_logging()
 _log = logging.getLogger(__name__)
@@ -61,18 +61,17 @@ class EconCorrectlyOn(object):
     """
 
     def __init__(self):
-        # Initialize data arrays
-        self.oat_values = []
-        self.rat_values = []
-        self.mat_values = []
-        self.fan_spd_values = []
-        self.oad_values = []
-        self.timestamp = []
+        # Initialize data window aggregates
+        self.oaf_sum = 0.0
+        self.oad_sum = 0.0
+        self.energy_sum = 0.0
+        self.energy_count = 0
+        self.timestamp = TimestampWindow()
         self.analysis_name = ""
 
         # Initialize not_cooling and not_economizing flags
-        self.not_cooling = []
-        self.not_economizing = []
+        self.not_cooling = TimestampWindow()
+        self.not_economizing = TimestampWindow()
 
         self.open_damper_threshold = None
         self.oaf_economizing_threshold = None
@@ -133,17 +132,14 @@ class EconCorrectlyOn(object):
         self.inconsistent_date = {key: 13.2 for key in self.oaf_economizing_threshold}
 
     def run_diagnostic(self, current_time):
-        if self.timestamp:
-            elapsed_time = self.timestamp[-1] - self.timestamp[0]
-        else:
-            elapsed_time = td(minutes=0)
+        elapsed_time = self.timestamp.elapsed()
         if self.economizer_conditions(current_time):
             return
         if len(self.timestamp) >= self.no_required_data:
             if elapsed_time > self.max_dx_time:
-                _log.info(constants.table_log_format(self.analysis_name, self.timestamp[-1], (
+                _log.info(constants.table_log_format(self.analysis_name, self.timestamp.last, (
                           constants.ECON3 + constants.DX + ":" + str(self.inconsistent_date))))
-                self.results_publish.append(constants.table_publish_format(self.analysis_name, self.timestamp[-1],
+                self.results_publish.append(constants.table_publish_format(self.analysis_name, self.timestamp.last,
                                                                            (constants.ECON2 + constants.DX),
                                                                            self.inconsistent_date))
                 self.clear_data()
@@ -155,32 +151,27 @@ class EconCorrectlyOn(object):
                                                                        self.insufficient_data))
             self.clear_data()
 
-    def economizer_on_algorithm(self, cooling_call, oat, rat, mat, oad, econ_condition, cur_time, fan_sp):
+    def economizer_on_algorithm(self, cooling_call, econ_condition, sample):
         """Perform the Econ Correctly On class algorithm
         cooling_call: int
-        oat: float
-        rat: float
-        mat: float
-        oad: float
         econ_condition: float
-        cur_time: datetime time delta
-        fan_sp: float
+        sample: Sample
 
         No return
         """
 
-        economizing = self.economizing_check(cooling_call, econ_condition, cur_time)
+        economizing = self.economizing_check(cooling_call, econ_condition, sample.timestamp)
         if not economizing:
             return
 
-        self.oat_values.append(oat)
-        self.mat_values.append(mat)
-        self.rat_values.append(rat)
-        self.oad_values.append(oad)
-        self.timestamp.append(cur_time)
+        self.oaf_sum += sample.oaf
+        self.oad_sum += sample.oad
+        self.timestamp.append(sample.timestamp)
 
-        fan_sp = fan_sp / 100.0 if fan_sp is not None else 1.0
-        self.fan_spd_values.append(fan_sp)
+        temperature_difference = sample.mat - sample.oat
+        if temperature_difference > 0:
+            self.energy_sum += 1.08 * sample.fan_spd * self.cfm * temperature_difference / (1000.0 * self.eer)
+            self.energy_count += 1
 
     def economizing_check(self, cooling_call, econ_condition, cur_time):
         """Check conditions to see if should be economizing
@@ -229,9 +220,8 @@ class EconCorrectlyOn(object):
         """If the detected problems(s) are consistent then generate a fault message(s).
         No return
         """
-        oaf = [(m - r) / (o - r) for o, r, m in zip(self.oat_values, self.rat_values, self.mat_values)]
-        avg_oaf = max(0.0, min(100.0, mean(oaf) * 100.0))
-        avg_damper_signal = mean(self.oad_values)
+        avg_oaf = max(0.0, min(100.0, self.oaf_sum / float(len(self.timestamp)) * 100.0))
+        avg_damper_signal = self.oad_sum / float(len(self.timestamp))
         diagnostic_msg = {}
         energy_impact = {}
         thresholds = zip(self.open_damper_threshold.items(), self.oaf_economizing_threshold.items())
@@ -252,10 +242,10 @@ class EconCorrectlyOn(object):
             _log.info(msg)
             diagnostic_msg.update({key: result})
             energy_impact.update({key: energy})
-        _log.info(constants.table_log_format(self.analysis_name, self.timestamp[-1], (constants.ECON2 + constants.DX + ":" + str(diagnostic_msg))))
-        _log.info(constants.table_log_format(self.analysis_name, self.timestamp[-1], (constants.ECON2 + constants.EI + ":" + str(energy_impact))))
-        self.results_publish.append(constants.table_publish_format(self.analysis_name, self.timestamp[-1], (constants.ECON2 + constants.DX), diagnostic_msg))
-        self.results_publish.append(constants.table_publish_format(self.analysis_name, self.timestamp[-1], (constants.ECON2 + constants.EI),  energy_impact))
+        _log.info(constants.table_log_format(self.analysis_name, self.timestamp.last, (constants.ECON2 + constants.DX + ":" + str(diagnostic_msg))))
+        _log.info(constants.table_log_format(self.analysis_name, self.timestamp.last, (constants.ECON2 + constants.EI + ":" + str(energy_impact))))
+        self.results_publish.append(constants.table_publish_format(self.analysis_name, self.timestamp.last, (constants.ECON2 + constants.DX), diagnostic_msg))
+        self.results_publish.append(constants.table_publish_format(self.analysis_name, self.timestamp.last, (constants.ECON2 + constants.EI),  energy_impact))
         self.clear_data()
 
     def energy_impact_calculation(self):
@@ -264,28 +254,24 @@ class EconCorrectlyOn(object):
         returns float
         """
         ei = 0.0
-        energy_calc = [1.08 * spd * self.cfm * (mat - oat) / (1000.0 * self.eer)
-                       for mat, oat, spd in zip(self.mat_values, self.oat_values, self.fan_spd_values)
-                       if (mat - oat) > 0]
-        if energy_calc:
-            avg_step = (self.timestamp[-1] - self.timestamp[0]).total_seconds() / 60 if len(self.timestamp) > 1 else 1
-            dx_time = (len(energy_calc) - 1) * avg_step if len(energy_calc) > 1 else 1.0
-            ei = (sum(energy_calc) * 60.0) / (len(energy_calc) * dx_time)
+        if self.energy_count:
+            avg_step = self.timestamp.elapsed().total_seconds() / 60 if len(self.timestamp) > 1 else 1
+            dx_time = (self.energy_count - 1) * avg_step if self.energy_count > 1 else 1.0
+            ei = (self.energy_sum * 60.0) / (self.energy_count * dx_time)
             ei = round(ei, 2)
         return ei
 
     def clear_data(self):
         """
-        Reinitialize data arrays.
+        Reinitialize data window aggregates.
 
         No return
         """
-        self.oad_values = []
-        self.oat_values = []
-        self.rat_values = []
-        self.mat_values = []
-        self.fan_spd_values = []
-        self.timestamp = []
-        self.not_economizing = []
-        self.not_cooling = []
+        self.oaf_sum = 0.0
+        self.oad_sum = 0.0
+        self.energy_sum = 0.0
+        self.energy_count = 0
+        self.timestamp = TimestampWindow()
+        self.not_economizing = TimestampWindow()
+        self.not_cooling = TimestampWindow()
 
@@ -44,9 +44,9 @@ under Contract DE-AC05-76RL01830
 """
 import logging
 from datetime import timedelta as td
-from volttron.platform.agent.math_utils import mean
 from volttron.platform.agent.utils import setup_logging
 from .. import constants
+from .sample_store import TimestampWindow
 
 setup_logging()
 _log = logging.getLogger(__name__)
@@ -62,11 +62,9 @@ class InsufficientOutsideAir(object):
     """
 
     def __init__(self):
-        # Initialize data arrays
-        self.oat_values = []
-        self.rat_values = []
-        self.mat_values = []
-        self.timestamp = []
+        # Initialize data window aggregates
+        self.oaf_sum = 0.0
+        self.timestamp = TimestampWindow()
         self.max_dx_time = None
         self.analysis_name = ""
         self.results_publish = None
@@ -107,16 +105,12 @@ class InsufficientOutsideAir(object):
         self.insufficient_data = {key: 42.2 for key in self.ventilation_oaf_threshold}
 
     def run_diagnostic(self, current_time):
-        if self.timestamp:
-            elapsed_time = self.timestamp[-1] - self.timestamp[0]
-        else:
-            elapsed_time = td(minutes=0)
-
+        elapsed_time = self.timestamp.elapsed()
         if len(self.timestamp) >= self.no_required_data:
             if elapsed_time > self.max_dx_time:
-                _log.info(constants.table_log_format(self.analysis_name, self.timestamp[-1], (
+                _log.info(constants.table_log_format(self.analysis_name, self.timestamp.last, (
                             constants.ECON5 + constants.DX + ":" + str(self.inconsistent_date))))
-                self.results_publish.append(constants.table_publish_format(self.analysis_name, self.timestamp[-1],
+                self.results_publish.append(constants.table_publish_format(self.analysis_name, self.timestamp.last,
                                                                            (constants.ECON5 + constants.DX),
                                                                            self.inconsistent_date))
                 self.clear_data()
@@ -128,34 +122,28 @@ class InsufficientOutsideAir(object):
                                                                        self.insufficient_data))
             self.clear_data()
 
-    def insufficient_outside_air_algorithm(self, oatemp, ratemp, matemp, cur_time):
+    def insufficient_outside_air_algorithm(self, sample):
         """Perform the insufficient outside air class algorithm
-        oatemp: float
-        ratemp: float
-        matemp: float
-        cur_time: datetime time delta
+        sample: Sample
 
         No return
         """
-        self.oat_values.append(oatemp)
-        self.rat_values.append(ratemp)
-        self.mat_values.append(matemp)
-        self.timestamp.append(cur_time)
+        self.oaf_sum += sample.oaf
+        self.timestamp.append(sample.timestamp)
 
     def insufficient_oa(self):
         """If the detected problems(s) are consistent then generate a fault message(s).
         No return
         """
-        oaf = [(mat - rat) / (oat - rat) for oat, rat, mat in zip(self.oat_values, self.rat_values, self.mat_values)]
-        avg_oaf = mean(oaf) * 100.0
+        avg_oaf = self.oaf_sum / float(len(self.timestamp)) * 100.0
         diagnostic_msg = {}
 
         if avg_oaf < 0 or avg_oaf > 125.0:
             msg = ("{}: Inconclusive result, the OAF calculation led to an "
                    "unexpected value: {}".format(constants.ECON5, avg_oaf))
             _log.info(msg)
-            _log.info(constants.table_log_format(self.analysis_name, self.timestamp[-1], (constants.ECON5 + constants.DX + ":" + str(self.invalid_oaf_dict))))
-            self.results_publish.append(constants.table_publish_format(self.analysis_name, self.timestamp[-1], (constants.ECON5 + constants.DX), self.invalid_oaf_dict))
+            _log.info(constants.table_log_format(self.analysis_name, self.timestamp.last, (constants.ECON5 + constants.DX + ":" + str(self.invalid_oaf_dict))))
+            self.results_publish.append(constants.table_publish_format(self.analysis_name, self.timestamp.last, (constants.ECON5 + constants.DX), self.invalid_oaf_dict))
             self.clear_data()
             return
 
@@ -169,19 +157,17 @@ class InsufficientOutsideAir(object):
                 result = 40.0
             _log.info(msg)
             diagnostic_msg.update({sensitivity: result})
-        _log.info(constants.table_log_format(self.analysis_name, self.timestamp[-1], (constants.ECON5 + constants.DX + ":" + str(diagnostic_msg))))
-        self.results_publish.append(constants.table_publish_format(self.analysis_name, self.timestamp[-1], (constants.ECON5 + constants.DX), diagnostic_msg))
+        _log.info(constants.table_log_format(self.analysis_name, self.timestamp.last, (constants.ECON5 + constants.DX + ":" + str(diagnostic_msg))))
+        self.results_publish.append(constants.table_publish_format(self.analysis_name, self.timestamp.last, (constants.ECON5 + constants.DX), diagnostic_msg))
 
         self.clear_data()
 
     def clear_data(self):
         """
-        Reinitialize data arrays.
+        Reinitialize data window aggregates.
 
         No return
         """
-        self.oat_values = []
-        self.rat_values = []
-        self.mat_values = []
-        self.timestamp = []
+        self.oaf_sum = 0.0
+        self.timestamp = TimestampWindow()
         return
@@ -44,9 +44,9 @@ under Contract DE-AC05-76RL01830
 """
 import logging
 from datetime import timedelta as td
-from volttron.platform.agent.math_utils import mean
 from volttron.platform.agent.utils import setup_logging
 from .. import constants
+from .sample_store import RunningStats, TimestampWindow
 
 setup_logging()
 _log = logging.getLogger(__name__)
@@ -63,11 +63,10 @@ class TemperatureSensor(object):
     """
 
     def __init__(self):
-        # Initialize data arrays
-        self.oat_values = []
-        self.rat_values = []
-        self.mat_values = []
-        self.timestamp = []
+        # Initialize data window aggregates
+        self.oa_ma_values = RunningStats()
+        self.ra_ma_values = RunningStats()
+        self.timestamp = TimestampWindow()
 
         self.temp_sensor_problem = None
         self.max_dx_time = None
@@ -113,19 +112,16 @@ class TemperatureSensor(object):
         self.sensor_damper_dx.set_class_values(analysis_name, results_publish, data_window, no_required_data, open_damper_time, oat_mat_check, temp_damper_threshold)
 
     def run_diagnostic(self, current_time):
-        if self.timestamp:
-            elapsed_time = self.timestamp[-1] - self.timestamp[0]
-        else:
-            elapsed_time = td(minutes=0)
+        elapsed_time = self.timestamp.elapsed()
         _log.info("Elapsed time: {} -- required time: {}".format(elapsed_time, self.data_window))
         result = self.sensor_damper_dx.run_diagnostic()
 
         if len(self.timestamp) >= self.no_required_data and not result:
             _log.debug("Temperature Run -- no data: {} -- damper: {}".format(len(self.timestamp), result))
             if elapsed_time > self.max_dx_time:
-                _log.info(constants.table_log_format(self.analysis_name, self.timestamp[-1], (
+                _log.info(constants.table_log_format(self.analysis_name, self.timestamp.last, (
                             constants.ECON1 + constants.DX + ":" + str(self.inconsistent_date))))
-                self.results_publish.append(constants.table_publish_format(self.analysis_name, self.timestamp[-1],
+                self.results_publish.append(constants.table_publish_format(self.analysis_name, self.timestamp.last,
                                                                            (constants.ECON1 + constants.DX),
                                                                            self.inconsistent_date))
                 self.clear_data()
@@ -140,25 +136,19 @@ class TemperatureSensor(object):
             _log.debug("Temperature sensor else!")
             self.clear_data()
 
-    def temperature_algorithm(self, oat, rat, mat, oad, cur_time):
+    def temperature_algorithm(self, sample):
         """Perform the temperature sensor class algorithm
-        oat: float
-        rat: float
-        mat: float
-        oad: float
-        cur_time: datetime time delta
+        sample: Sample
 
         return bool
         """
-        self.oat_values.append(oat)
-        self.mat_values.append(mat)
-        self.rat_values.append(rat)
-        self.timestamp.append(cur_time)
-
+        self.oa_ma_values.append(sample.oat - sample.mat)
+        self.ra_ma_values.append(sample.rat - sample.mat)
+        self.timestamp.append(sample.timestamp)
         if self.temp_sensor_problem:
             return self.temp_sensor_problem
         else:
-            self.sensor_damper_dx.damper_algorithm(oat, mat, oad, cur_time)
+            self.sensor_damper_dx.damper_algorithm(sample)
             return self.temp_sensor_problem
 
     def temperature_sensor_dx(self):
@@ -166,6 +156,8 @@ class TemperatureSensor(object):
         No return
         """
         avg_oa_ma, avg_ra_ma, avg_ma_oa, avg_ma_ra = self.aggregate_data()
+        _log.debug("OAT - MAT: {} +/- {} -- RAT - MAT: {} +/- {}".format(avg_oa_ma, self.oa_ma_values.std(),
+                                                                         avg_ra_ma, self.ra_ma_values.std()))
         diagnostic_msg = {}
         for sensitivity, threshold in self.temp_diff_thr.items():
             if avg_oa_ma > threshold and avg_ra_ma > threshold:
@@ -183,38 +175,36 @@ class TemperatureSensor(object):
 
         if diagnostic_msg["normal"] > 0.0:
             self.temp_sensor_problem = True
-        _log.info(constants.table_log_format(self.analysis_name, self.timestamp[-1], (constants.ECON1 + constants.DX + ":" + str(diagnostic_msg))))
-        self.results_publish.append(constants.table_publish_format(self.analysis_name, self.timestamp[-1], (constants.ECON1 + constants.DX ), diagnostic_msg))
+        _log.info(constants.table_log_format(self.analysis_name, self.timestamp.last, (constants.ECON1 + constants.DX + ":" + str(diagnostic_msg))))
+        self.results_publish.append(constants.table_publish_format(self.analysis_name, self.timestamp.last, (constants.ECON1 + constants.DX ), diagnostic_msg))
         self.clear_data()
 
     def aggregate_data(self):
-        """ Calculate averages used for calculations within the class.  Needs oat, mat,rat values set in class
+        """ Calculate averages used for calculations within the class.  Needs the oat - mat and rat - mat
+        aggregates set in class
         return
         avg_oa_ma: float
         avg_ra_ma: float
         avg_ma_oa: float
         avg_ma_ra: float
         """
-        oa_ma = [(x - y) for x, y in zip(self.oat_values, self.mat_values)]
-        ra_ma = [(x - y) for x, y in zip(self.rat_values, self.mat_values)]
-        ma_oa = [(y - x) for x, y in zip(self.oat_values, self.mat_values)]
-        ma_ra = [(y - x) for x, y in zip(self.rat_values, self.mat_values)]
-        avg_oa_ma = mean(oa_ma)
-        avg_ra_ma = mean(ra_ma)
-        avg_ma_oa = mean(ma_oa)
-        avg_ma_ra = mean(ma_ra)
+        avg_oa_ma = self.oa_ma_values.mean()
+        avg_ra_ma = self.ra_ma_values.mean()
+        # Floating point rounding is symmetric, so the MAT - OAT and MAT - RAT
+        # means are exactly the negated OAT - MAT and RAT - MAT means.
+        avg_ma_oa = -avg_oa_ma
+        avg_ma_ra = -avg_ra_ma
         return avg_oa_ma, avg_ra_ma, avg_ma_oa, avg_ma_ra
 
     def clear_data(self):
         """
-        Reinitialize data arrays.
+        Reinitialize data window aggregates.
 
         No return
         """
-        self.oat_values = []
-        self.rat_values = []
-        self.mat_values = []
-        self.timestamp = []
+        self.oa_ma_values = RunningStats()
+        self.ra_ma_values = RunningStats()
+        self.timestamp = TimestampWindow()
         if self.temp_sensor_problem:
             self.temp_sensor_problem = None
 
@@ -228,10 +218,9 @@ class DamperSensorInconsistency(object):
     """
 
     def __init__(self):
-        # Initialize data arrays
-        self.oat_values = []
-        self.mat_values = []
-        self.timestamp = []
+        # Initialize data window aggregates
+        self.mat_oat_diff_sum = 0.0
+        self.timestamp = TimestampWindow()
         self.steady_state = None
         self.econ_time_check = None
         self.data_window = None
@@ -262,9 +251,8 @@ class DamperSensorInconsistency(object):
 
     def run_diagnostic(self):
         msg = ""
-        if len(self.oat_values) > self.no_required_data:
-            mat_oat_diff_list = [abs(x - y) for x, y in zip(self.oat_values, self.mat_values)]
-            open_damper_check = mean(mat_oat_diff_list)
+        if len(self.timestamp) > self.no_required_data:
+            open_damper_check = self.mat_oat_diff_sum / float(len(self.timestamp))
             diagnostic_msg = {}
             for sensitivity, threshold in self.oat_mat_check.items():
                 if open_damper_check > threshold:
@@ -278,9 +266,9 @@ class DamperSensorInconsistency(object):
                 diagnostic_msg.update({sensitivity: result})
 
             _log.info(msg)
-            _log.info(constants.table_log_format(self.analysis_name, self.timestamp[-1],
+            _log.info(constants.table_log_format(self.analysis_name, self.timestamp.last,
                                                  (constants.ECON1 + constants.DX + ":" + str(diagnostic_msg))))
-            self.results_publish.append(constants.table_publish_format(self.analysis_name, self.timestamp[-1],
+            self.results_publish.append(constants.table_publish_format(self.analysis_name, self.timestamp.last,
                                                                        (constants.ECON1 + constants.DX),
                                                                        diagnostic_msg))
             self.clear_data()
@@ -289,32 +277,28 @@ class DamperSensorInconsistency(object):
             self.clear_data()
             return False
 
-    def damper_algorithm(self, oat, mat, oad, cur_time):
+    def damper_algorithm(self, sample):
         """Perform the damper class algorithm
-        oat: float
-        mat: float
-        oad: float
-        cur_time: datetime time delta
+        sample: Sample
 
         No return
         """
-        if oad > self.oad_temperature_threshold:
+        cur_time = sample.timestamp
+        if sample.oad > self.oad_temperature_threshold:
             if self.steady_state is None:
                 self.steady_state = cur_time
             elif cur_time - self.steady_state >= self.econ_time_check:
-                self.oat_values.append(oat)
-                self.mat_values.append(mat)
+                self.mat_oat_diff_sum += abs(sample.oat - sample.mat)
                 self.timestamp.append(cur_time)
         else:
             self.steady_state = None
 
     def clear_data(self):
         """
-        Reinitialize data arrays.
+        Reinitialize data window aggregates.
 
         No return
         """
-        self.oat_values = []
-        self.mat_values = []
+        self.mat_oat_diff_sum = 0.0
         self.steady_state = None
-        self.timestamp = []
+        self.timestamp = TimestampWindow()
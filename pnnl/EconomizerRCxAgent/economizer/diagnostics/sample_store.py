@@ -0,0 +1,174 @@
+"""
+Copyright (c) 2020, Battelle Memorial Institute
+All rights reserved.
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+The views and conclusions contained in the software and documentation are those
+of the authors and should not be interpreted as representing official policies,
+either expressed or implied, of the FreeBSD Project.
+This material was prepared as an account of work sponsored by an agency of the
+United States Government. Neither the United States Government nor the United
+States Department of Energy, nor Battelle, nor any of their employees, nor any
+jurisdiction or organization that has cooperated in th.e development of these
+materials, makes any warranty, express or implied, or assumes any legal
+liability or responsibility for the accuracy, completeness, or usefulness or
+any information, apparatus, product, software, or process disclosed, or
+represents that its use would not infringe privately owned rights.
+Reference herein to any specific commercial product, process, or service by
+trade name, trademark, manufacturer, or otherwise does not necessarily
+constitute or imply its endorsement, recommendation, or favoring by the
+United States Government or any agency thereof, or Battelle Memorial Institute.
+The views and opinions of authors expressed herein do not necessarily state or
+reflect those of the United States Government or any agency thereof.
+PACIFIC NORTHWEST NATIONAL LABORATORY
+operated by
+BATTELLE
+for the
+UNITED STATES DEPARTMENT OF ENERGY
+under Contract DE-AC05-76RL01830
+"""
+"""
+Per-sample store and streaming accumulators shared by the economizer
+diagnostics.
+
+The agent builds one Sample for every device publish that passes the
+preconditions and hands it to all five diagnostics, so the values derived
+from the averaged points (the outdoor-air fraction) are computed once.
+The diagnostics keep only the aggregates of their data window, running
+sums, a TimestampWindow and RunningStats where the spread is reported,
+instead of lists of every value, so their memory does not grow with the
+length of the data window.
+"""
+import math
+from datetime import timedelta as td
+
+
+class Sample(object):
+    """
+    One economizer sample: the averaged point values of a device publish.
+    oat: float
+    rat: float
+    mat: float
+    oad: float
+    fan_spd: float, supply fan speed as a fraction (1.0 for constant volume)
+    timestamp: datetime
+    """
+    __slots__ = ("oat", "rat", "mat", "oad", "fan_spd", "timestamp", "_oaf")
+
+    def __init__(self, oat, rat, mat, oad, fan_spd, timestamp):
+        self.oat = oat
+        self.rat = rat
+        self.mat = mat
+        self.oad = oad
+        self.fan_spd = fan_spd
+        self.timestamp = timestamp
+        self._oaf = None
+
+    @property
+    def oaf(self):
+        """Outdoor-air fraction, computed on first use.
+        return float
+        """
+        if self._oaf is None:
+            self._oaf = (self.mat - self.rat) / (self.oat - self.rat)
+        return self._oaf
+
+
+class RunningStats(object):
+    """
+    Streaming count, sum and variance of the values of a data window
+    (Welford's algorithm).  The mean is the running sum over the count, the
+    same operations as math_utils.mean on the list of values, so the
+    diagnostic results do not change.
+    """
+    __slots__ = ("count", "total", "_mean", "_m2")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, value):
+        """Add one value of the data window.
+        value: float
+        No return
+        """
+        self.count += 1
+        self.total += value
+        delta = value - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (value - self._mean)
+
+    def mean(self):
+        """Mean of the data window.
+        return float
+        """
+        if self.count < 1:
+            raise ValueError("mean requires at least one data point")
+        return self.total / float(self.count)
+
+    def variance(self):
+        """Sample variance of the data window.
+        return float
+        """
+        if self.count < 2:
+            return 0.0
+        return self._m2 / (self.count - 1)
+
+    def std(self):
+        """Sample standard deviation of the data window.
+        return float
+        """
+        return math.sqrt(self.variance())
+
+
+class TimestampWindow(object):
+    """
+    First and last timestamp and number of samples of a data window.
+    """
+    __slots__ = ("count", "first", "last")
+
+    def __init__(self):
+        self.count = 0
+        self.first = None
+        self.last = None
+
+    def __len__(self):
+        return self.count
+
+    def append(self, timestamp):
+        """Add the timestamp of one sample of the data window.
+        timestamp: datetime
+        No return
+        """
+        if not self.count:
+            self.first = timestamp
+        self.last = timestamp
+        self.count += 1
+
+    def elapsed(self):
+        """Time between the first and the last sample of the data window.
+        return timedelta
+        """
+        if not self.count:
+            return td(minutes=0)
+        return self.last - self.first
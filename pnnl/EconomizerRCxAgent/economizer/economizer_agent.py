@@ -59,6 +59,7 @@ from . diagnostics.EconCorrectlyOn import EconCorrectlyOn
 from . diagnostics.EconCorrectlyOff import EconCorrectlyOff
 from . diagnostics.ExcessOutsideAir import ExcessOutsideAir
 from . diagnostics.InsufficientOutsideAir import InsufficientOutsideAir
+from . diagnostics.sample_store import Sample
 
 __version__ = "2.0.0"
 
@@ -74,7 +75,44 @@ class EconomizerAgent(Agent):
     """
     def __init__(self, config_path, **kwargs):
         super(EconomizerAgent, self).__init__(**kwargs)
+        self.initialize_attributes()
 
+        # start reading all the class configs and check them
+        self.read_config(config_path)
+        self.setup_device_list()
+        self.read_argument_config()
+        self.read_point_mapping()
+        self.configuration_value_check()
+        self.create_diagnostics()
+
+    @classmethod
+    def hosted(cls, config, vip, core):
+        """
+        Create and configure an agent that has no platform connection of its
+        own, for batch mode and the multi-unit host.
+        config: configuration of one unit
+        vip: object with the pubsub interface the agent uses
+        core: object with the identity interface the agent uses
+
+        return EconomizerAgent
+        """
+        agent = cls.__new__(cls)
+        agent.vip = vip
+        agent.core = core
+        agent.initialize_attributes()
+        agent.config = config
+        agent.setup_device_list()
+        agent.read_argument_config()
+        agent.read_point_mapping()
+        agent.configuration_value_check()
+        agent.create_diagnostics()
+        return agent
+
+    def initialize_attributes(self):
+        """
+        Set the class attributes to their defaults, used by the agent and by
+        the batch engine that runs the diagnostics without a platform.
+        """
         #list of class attributes.  Default values will be filled in from reading config file
         #string attributes
         self.config = None
@@ -169,14 +207,6 @@ class EconomizerAgent(Agent):
         self.excess_outside_air = None
         self.insufficient_outside_air = None
 
-        # start reading all the class configs and check them
-        self.read_config(config_path)
-        self.setup_device_list()
-        self.read_argument_config()
-        self.read_point_mapping()
-        self.configuration_value_check()
-        self.create_diagnostics()
-
     def read_config(self, config_path):
         """
         Use volttrons config reader to grab and parse out configuration file
@@ -663,10 +693,20 @@ class EconomizerAgent(Agent):
 
         no return
         """
-        self.diagnostic_done_flag = False
         current_time = parser.parse(headers["Date"])
         to_zone = dateutil.tz.gettz(self.timezone)
         current_time = current_time.astimezone(to_zone)
+        self.run_diagnostics(current_time, message)
+
+    def run_diagnostics(self, current_time, message):
+        """
+        Run the diagnostics on one device message.
+        current_time: localized datetime of the message
+        message: list
+
+        no return
+        """
+        self.diagnostic_done_flag = False
         _log.info("Processing Results!")
         self.parse_data_message(message)
         missing_data = self.check_for_missing_data()
@@ -713,15 +753,17 @@ class EconomizerAgent(Agent):
             self.check_for_config_update_after_diagnostics()
             return
         self.timestamp_array.append(current_time)
-        self.temp_sensor_problem = self.temp_sensor.temperature_algorithm(self.oat, self.rat, self.mat, self.oad, current_time)
+        fan_spd = self.fan_speed / 100.0 if self.fan_speed is not None else 1.0
+        sample = Sample(self.oat, self.rat, self.mat, self.oad, fan_spd, current_time)
+        self.temp_sensor_problem = self.temp_sensor.temperature_algorithm(sample)
         econ_condition, cool_call = self.determine_cooling_condition()
         _log.debug("Cool call: {} - Economizer status: {}".format(cool_call, econ_condition))
 
         if self.temp_sensor_problem is not None and not self.temp_sensor_problem:
-            self.econ_correctly_on.economizer_on_algorithm(cool_call, self.oat, self.rat, self.mat, self.oad, econ_condition, current_time, self.fan_speed)
-            self.econ_correctly_off.economizer_off_algorithm(self.oat, self.rat, self.mat, self.oad, econ_condition, current_time, self.fan_speed)
-            self.excess_outside_air.excess_ouside_air_algorithm(self.oat, self.rat, self.mat, self.oad, econ_condition, current_time, self.fan_speed)
-            self.insufficient_outside_air.insufficient_outside_air_algorithm(self.oat, self.rat, self.mat, current_time)
+            self.econ_correctly_on.economizer_on_algorithm(cool_call, econ_condition, sample)
+            self.econ_correctly_off.economizer_off_algorithm(econ_condition, sample)
+            self.excess_outside_air.excess_ouside_air_algorithm(econ_condition, sample)
+            self.insufficient_outside_air.insufficient_outside_air_algorithm(sample)
 
         if self.timestamp_array:
             elapsed_time = self.timestamp_array[-1] - self.timestamp_array[0]
@@ -764,10 +806,22 @@ class EconomizerAgent(Agent):
         self.results_publish.clear()
 
 
+def economizer_agent(config_path, **kwargs):
+    """
+    Create the agent for the configuration: an EconomizerAgent, or the host
+    of many units when the configuration lists "devices".
+    """
+    config = utils.load_config(config_path)
+    if config and "devices" in config:
+        from .host_agent import EconomizerHostAgent
+        return EconomizerHostAgent(config_path, **kwargs)
+    return EconomizerAgent(config_path, **kwargs)
+
+
 def main(argv=sys.argv):
     """Main method called by the app."""
     try:
-        utils.vip_main(EconomizerAgent)
+        utils.vip_main(economizer_agent)
     except Exception as exception:
         _log.exception("unhandled exception")
         _log.error(repr(exception))
@@ -0,0 +1,95 @@
+"""
+Copyright (c) 2020, Battelle Memorial Institute
+All rights reserved.
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+The views and conclusions contained in the software and documentation are those
+of the authors and should not be interpreted as representing official policies,
+either expressed or implied, of the FreeBSD Project.
+This material was prepared as an account of work sponsored by an agency of the
+United States Government. Neither the United States Government nor the United
+States Department of Energy, nor Battelle, nor any of their employees, nor any
+jurisdiction or organization that has cooperated in th.e development of these
+materials, makes any warranty, express or implied, or assumes any legal
+liability or responsibility for the accuracy, completeness, or usefulness or
+any information, apparatus, product, software, or process disclosed, or
+represents that its use would not infringe privately owned rights.
+Reference herein to any specific commercial product, process, or service by
+trade name, trademark, manufacturer, or otherwise does not necessarily
+constitute or imply its endorsement, recommendation, or favoring by the
+United States Government or any agency thereof, or Battelle Memorial Institute.
+The views and opinions of authors expressed herein do not necessarily state or
+reflect those of the United States Government or any agency thereof.
+PACIFIC NORTHWEST NATIONAL LABORATORY
+operated by
+BATTELLE
+for the
+UNITED STATES DEPARTMENT OF ENERGY
+under Contract DE-AC05-76RL01830
+"""
+"""
+Multi-unit host for the Economizer AIRCx diagnostics (see aircx_host.unit_host).
+
+Each unit is an EconomizerAgent and results are published with the same
+topics as a single-unit EconomizerAgent:
+
+    {
+        "analysis_name": "Economizer_AIRCx",
+        "arguments": {"point_mapping": {...}},
+        "devices": [
+            {"campus": "campus", "building": "building1",
+             "unit": {"rtu1": {"subdevices": []}, "rtu2": {"subdevices": []}}},
+            {"campus": "campus", "building": "building2",
+             "unit": {"rtu1": {"subdevices": []}},
+             "arguments": {"economizer_type": "HL"}}
+        ]
+    }
+"""
+import sys
+import logging
+from volttron.platform.agent import utils
+from volttron.platform.agent.utils import setup_logging
+from .economizer_agent import EconomizerAgent
+from aircx_host.unit_host import UnitHostAgent
+
+setup_logging()
+_log = logging.getLogger(__name__)
+
+
+class EconomizerHostAgent(UnitHostAgent):
+    """
+    Agent that runs the Economizer diagnostics of many units.
+    """
+    unit_agent = EconomizerAgent
+
+
+def main(argv=sys.argv):
+    """Main method called by the app."""
+    try:
+        utils.vip_main(EconomizerHostAgent)
+    except Exception as exception:
+        _log.exception("unhandled exception")
+        _log.error(repr(exception))
+
+
+if __name__ == "__main__":
+    """Entry point for script"""
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        pass
@@ -56,6 +56,7 @@ from .diagnostics.EconCorrectlyOff import EconCorrectlyOff
 from .diagnostics.EconCorrectlyOn import EconCorrectlyOn
 from .diagnostics.ExcessOutsideAir import ExcessOutsideAir
 from .diagnostics.InsufficientOutsideAir import InsufficientOutsideAir
+from .diagnostics.sample_store import Sample
 from datetime import datetime
 
 
@@ -93,7 +94,7 @@ class TestDiagnosticsTempSensor(unittest.TestCase):
         mat = 50
         oad = 50
         cur_time = datetime.fromtimestamp(1036)
-        sensor_problem = temp_sensor.temperature_algorithm(oat, rat, mat, oad, cur_time)
+        sensor_problem = temp_sensor.temperature_algorithm(Sample(oat, rat, mat, oad, 1.0, cur_time))
         assert sensor_problem is None
 
     def test_temp_sensor_dx(self):
@@ -106,10 +107,7 @@ class TestDiagnosticsTempSensor(unittest.TestCase):
         rat = 50
         mat = 25
         cur_time = datetime.fromtimestamp(1036)
-        temp_sensor.timestamp.append(cur_time)
-        temp_sensor.oat_values.append(oat)
-        temp_sensor.mat_values.append(mat)
-        temp_sensor.rat_values.append(rat)
+        temp_sensor.temperature_algorithm(Sample(oat, rat, mat, 0, 1.0, cur_time))
         temp_sensor.temperature_sensor_dx()
         assert temp_sensor.temp_sensor_problem is None
 
@@ -123,10 +121,7 @@ class TestDiagnosticsTempSensor(unittest.TestCase):
         rat = 50
         mat = 50
         cur_time = datetime.fromtimestamp(1036)
-        temp_sensor.timestamp.append(cur_time)
-        temp_sensor.oat_values.append(oat)
-        temp_sensor.mat_values.append(mat)
-        temp_sensor.rat_values.append(rat)
+        temp_sensor.temperature_algorithm(Sample(oat, rat, mat, 0, 1.0, cur_time))
         temp_sensor.temperature_sensor_dx()
         assert temp_sensor.temp_sensor_problem is False
 
@@ -136,12 +131,8 @@ class TestDiagnosticsTempSensor(unittest.TestCase):
         data_window = td(minutes=1)
         results = []
         temp_sensor.set_class_values("test", results, data_window, 1, 4.0, 0, 90.0)
-        temp_sensor.oat_values.append(50)
-        temp_sensor.mat_values.append(25)
-        temp_sensor.rat_values.append(50)
-        temp_sensor.oat_values.append(100)
-        temp_sensor.mat_values.append(50)
-        temp_sensor.rat_values.append(100)
+        temp_sensor.temperature_algorithm(Sample(50, 50, 25, 0, 1.0, datetime.fromtimestamp(1)))
+        temp_sensor.temperature_algorithm(Sample(100, 100, 50, 0, 1.0, datetime.fromtimestamp(61)))
         avg_oa_ma, avg_ra_ma, avg_ma_oa, avg_ma_ra = temp_sensor.aggregate_data()
         assert avg_oa_ma == 37.5
         assert avg_ra_ma == 37.5
@@ -154,21 +145,17 @@ class TestDiagnosticsTempSensor(unittest.TestCase):
         data_window = td(minutes=1)
         results = []
         temp_sensor.set_class_values("test", results, data_window, 1, 4.0, 0, 90.0)
-        temp_sensor.oat_values.append(50)
-        temp_sensor.mat_values.append(25)
-        temp_sensor.rat_values.append(50)
-        temp_sensor.oat_values.append(100)
-        temp_sensor.mat_values.append(50)
-        temp_sensor.rat_values.append(100)
+        temp_sensor.temperature_algorithm(Sample(50, 50, 25, 0, 1.0, datetime.fromtimestamp(1)))
+        temp_sensor.temperature_algorithm(Sample(100, 100, 50, 0, 1.0, datetime.fromtimestamp(61)))
         temp_sensor.temp_sensor_problem = True
-        assert len(temp_sensor.oat_values) == 2
-        assert len(temp_sensor.mat_values) == 2
-        assert len(temp_sensor.rat_values) == 2
+        assert len(temp_sensor.oa_ma_values) == 2
+        assert len(temp_sensor.ra_ma_values) == 2
+        assert len(temp_sensor.timestamp) == 2
         assert temp_sensor.temp_sensor_problem is True
         temp_sensor.clear_data()
-        assert len(temp_sensor.oat_values) == 0
-        assert len(temp_sensor.mat_values) == 0
-        assert len(temp_sensor.rat_values) == 0
+        assert len(temp_sensor.oa_ma_values) == 0
+        assert len(temp_sensor.ra_ma_values) == 0
+        assert len(temp_sensor.timestamp) == 0
         assert temp_sensor.temp_sensor_problem is None
 
 class TestDiagnosticsDamperSensorInconsistency(unittest.TestCase):
@@ -220,14 +207,12 @@ class TestDiagnosticsDamperSensorInconsistency(unittest.TestCase):
         cur_time = datetime.fromtimestamp(10000)
         results = []
         damp_sensor.set_class_values("test", results, data_window, 1, open_damp_time, oat_mat_check, 90.0)
-        damp_sensor.oat_values.append(50)
-        damp_sensor.mat_values.append(25)
+        damp_sensor.mat_oat_diff_sum += abs(50 - 25)
         damp_sensor.steady_state = first_stamp
-        damp_sensor.damper_algorithm(50, 25, 100, cur_time)
+        damp_sensor.damper_algorithm(Sample(50, 50, 25, 100, 1.0, cur_time))
         assert len(damp_sensor.timestamp) == 0
         assert damp_sensor.steady_state is None
-        assert len(damp_sensor.oat_values) == 0
-        assert len(damp_sensor.mat_values) == 0
+        assert damp_sensor.mat_oat_diff_sum == 0.0
 
     def test_damp_sensor_clear_data(self):
         """test the damp sensor clear data"""
@@ -242,17 +227,16 @@ class TestDiagnosticsDamperSensorInconsistency(unittest.TestCase):
         }
         results = []
         damp_sensor.set_class_values("test", results, data_window, 1, open_damp_time, oat_mat_check, 90.0)
-        damp_sensor.oat_values.append(50)
-        damp_sensor.mat_values.append(25)
-        damp_sensor.oat_values.append(100)
-        damp_sensor.mat_values.append(50)
+        damp_sensor.steady_state = datetime.fromtimestamp(1)
+        damp_sensor.damper_algorithm(Sample(50, 50, 25, 100, 1.0, datetime.fromtimestamp(10000)))
+        damp_sensor.damper_algorithm(Sample(100, 100, 50, 100, 1.0, datetime.fromtimestamp(10060)))
         damp_sensor.steady_state = True
-        assert len(damp_sensor.oat_values) == 2
-        assert len(damp_sensor.mat_values) == 2
+        assert len(damp_sensor.timestamp) == 2
+        assert damp_sensor.mat_oat_diff_sum == 75.0
         assert damp_sensor.steady_state is True
         damp_sensor.clear_data()
-        assert len(damp_sensor.oat_values) == 0
-        assert len(damp_sensor.mat_values) == 0
+        assert len(damp_sensor.timestamp) == 0
+        assert damp_sensor.mat_oat_diff_sum == 0.0
         assert damp_sensor.steady_state is None
 
 class TestDiagnosticsEconCorrectlyOff(unittest.TestCase):
@@ -291,12 +275,9 @@ class TestDiagnosticsEconCorrectlyOff(unittest.TestCase):
         cur_time = datetime.fromtimestamp(10000)
         results = []
         econ.set_class_values("test", results, data_window, 1, 20.0, 10.0, 6000.0, 10.0)
-        econ.economizer_off_algorithm(50.0, 25.0, 50.0, 25.0, 5.0, cur_time, 36)
-        assert len(econ.oat_values) == 0
-        assert len(econ.mat_values) == 0
-        assert len(econ.rat_values) == 0
-        assert len(econ.oad_values) == 0
-        assert len(econ.fan_spd_values) == 0
+        econ.economizer_off_algorithm(5.0, Sample(50.0, 25.0, 50.0, 25.0, 0.36, cur_time))
+        assert econ.oad_sum == 0.0
+        assert econ.energy_count == 0
         assert len(econ.timestamp) == 0
 
     def test_econ_off_algorithm_two_timestamp(self):
@@ -308,12 +289,9 @@ class TestDiagnosticsEconCorrectlyOff(unittest.TestCase):
         cur_time = datetime.fromtimestamp(10000)
         results = []
         econ.set_class_values("test", results, data_window, 1, 20.0, 10.0, 6000.0, 10.0)
-        econ.economizer_off_algorithm(50.0, 25.0, 50.0, 25.0, 5.0, cur_time, 36)
-        assert len(econ.oat_values) == 0
-        assert len(econ.mat_values) == 0
-        assert len(econ.rat_values) == 0
-        assert len(econ.oad_values) == 0
-        assert len(econ.fan_spd_values) == 0
+        econ.economizer_off_algorithm(5.0, Sample(50.0, 25.0, 50.0, 25.0, 0.36, cur_time))
+        assert econ.oad_sum == 0.0
+        assert econ.energy_count == 0
         assert len(econ.timestamp) == 1
 
     def test_econ_conditions(self):
@@ -325,16 +303,10 @@ class TestDiagnosticsEconCorrectlyOff(unittest.TestCase):
         econ.set_class_values("test", results, data_window, 1, 20.0, 10.0, 6000.0, 10.0)
         first_stamp = datetime.fromtimestamp(1)
         econ.economizing = first_stamp
-        econ.oat_values.append(50)
-        econ.mat_values.append(25)
-        econ.oad_values.append(100)
-        econ.rat_values.append(50)
+        econ.oad_sum += 100
         ret = econ.economizer_conditions(5.0, cur_time)
-        assert len(econ.oat_values) == 0
-        assert len(econ.mat_values) == 0
-        assert len(econ.rat_values) == 0
-        assert len(econ.oad_values) == 0
-        assert len(econ.fan_spd_values) == 0
+        assert econ.oad_sum == 0.0
+        assert econ.energy_count == 0
         assert len(econ.timestamp) == 0
         assert ret is True
 
@@ -347,17 +319,9 @@ class TestDiagnosticsEconCorrectlyOff(unittest.TestCase):
         econ.set_class_values("test", results, data_window, 1, 20.0, 10.0, 6000.0, 10.0)
         first_stamp = datetime.fromtimestamp(100000)
         econ.economizing = first_stamp
-        econ.oat_values.append(50)
-        econ.mat_values.append(25)
-        econ.oad_values.append(100)
-        econ.rat_values.append(50)
-        econ.fan_spd_values.append(50)
+        econ.oad_sum += 100
         ret = econ.economizer_conditions(5.0, cur_time)
-        assert len(econ.oat_values) == 1
-        assert len(econ.mat_values) == 1
-        assert len(econ.rat_values) == 1
-        assert len(econ.oad_values) == 1
-        assert len(econ.fan_spd_values) == 1
+        assert econ.oad_sum == 100
         assert len(econ.timestamp) == 0
         assert ret is True
 
@@ -378,18 +342,11 @@ class TestDiagnosticsEconCorrectlyOff(unittest.TestCase):
         results = []
         econ.set_class_values("test", results, data_window, 1, 20.0, 10.0, 6000.0, 10.0)
         first_stamp = datetime.fromtimestamp(1)
-        econ.timestamp.append(first_stamp)
         econ.economizing = first_stamp
-        econ.oat_values.append(50)
-        econ.mat_values.append(25)
-        econ.oad_values.append(100)
-        econ.rat_values.append(50)
+        econ.economizer_off_algorithm(False, Sample(50, 50, 25, 100, 1.0, first_stamp))
         econ.economizing_when_not_needed()
-        assert len(econ.oat_values) == 0
-        assert len(econ.mat_values) == 0
-        assert len(econ.rat_values) == 0
-        assert len(econ.oad_values) == 0
-        assert len(econ.fan_spd_values) == 0
+        assert econ.oad_sum == 0.0
+        assert econ.energy_count == 0
         assert len(econ.timestamp) == 0
 
     def test_econ_ei_calculation_positive(self):
@@ -397,16 +354,11 @@ class TestDiagnosticsEconCorrectlyOff(unittest.TestCase):
         econ = EconCorrectlyOff()
         data_window = td(minutes=1)
         results = []
-        econ.set_class_values("test", results, data_window, 1, 20.0, 10.0, 6000.0, 10.0)
+        econ.set_class_values("test", results, data_window, 1, 20.0, 100.0, 6000.0, 10.0)
         first_stamp = datetime.fromtimestamp(1)
-        econ.timestamp.append(first_stamp)
         econ.economizing = first_stamp
-        econ.oat_values.append(10)
-        econ.mat_values.append(20)
-        econ.oad_values.append(10)
-        econ.rat_values.append(10)
-        econ.fan_spd_values.append(10)
-        ei = econ.energy_impact_calculation(1.0)
+        econ.economizer_off_algorithm(False, Sample(10, 10, 20, 10, 10, first_stamp))
+        ei = econ.energy_impact_calculation()
         assert ei == 3888.0
 
     def test_econ_ei_calculation_zero_value(self):
@@ -414,16 +366,11 @@ class TestDiagnosticsEconCorrectlyOff(unittest.TestCase):
         econ = EconCorrectlyOff()
         data_window = td(minutes=1)
         results = []
-        econ.set_class_values("test", results, data_window, 1, 20.0, 10.0, 6000.0, 10.0)
+        econ.set_class_values("test", results, data_window, 1, 20.0, 0.0, 6000.0, 10.0)
         first_stamp = datetime.fromtimestamp(1)
-        econ.timestamp.append(first_stamp)
         econ.economizing = first_stamp
-        econ.oat_values.append(1)
-        econ.mat_values.append(1)
-        econ.oad_values.append(1)
-        econ.rat_values.append(1)
-        econ.fan_spd_values.append(1)
-        ei = econ.energy_impact_calculation(0.0)
+        econ.economizer_off_algorithm(False, Sample(1, 1, 1, 1, 1, first_stamp))
+        ei = econ.energy_impact_calculation()
         assert ei == 0.0
 
     def test_econ_ei_calculation_negative_value(self):
@@ -431,16 +378,11 @@ class TestDiagnosticsEconCorrectlyOff(unittest.TestCase):
         econ = EconCorrectlyOff()
         data_window = td(minutes=1)
         results = []
-        econ.set_class_values("test", results, data_window, 1, 20.0, 10.0, 6000.0, 10.0)
+        econ.set_class_values("test", results, data_window, 1, 20.0, -1000.0, 6000.0, 10.0)
         first_stamp = datetime.fromtimestamp(1)
-        econ.timestamp.append(first_stamp)
         econ.economizing = first_stamp
-        econ.oat_values.append(10)
-        econ.mat_values.append(20)
-        econ.oad_values.append(10)
-        econ.rat_values.append(10)
-        econ.fan_spd_values.append(10)
-        ei = econ.energy_impact_calculation(-10.0)
+        econ.economizer_off_algorithm(False, Sample(10, 10, 20, 10, 10, first_stamp))
+        ei = econ.energy_impact_calculation()
         assert ei == 3888.0
 
     def test_econ_clear_data(self):
@@ -449,21 +391,16 @@ class TestDiagnosticsEconCorrectlyOff(unittest.TestCase):
         data_window = td(minutes=1)
         results = []
         econ.set_class_values("test", results, data_window, 1, 20.0, 10.0, 6000.0, 10.0)
-        econ.oat_values.append(50)
-        econ.mat_values.append(25)
-        econ.oat_values.append(100)
-        econ.mat_values.append(50)
-        econ.oad_values.append(10)
-        econ.fan_spd_values.append(10)
-        assert len(econ.oat_values) == 2
-        assert len(econ.mat_values) == 2
-        assert len(econ.oad_values) == 1
-        assert len(econ.fan_spd_values) == 1
+        econ.economizer_off_algorithm(False, Sample(50, 70, 75, 10, 1.0, datetime.fromtimestamp(1)))
+        econ.economizer_off_algorithm(False, Sample(100, 70, 80, 10, 1.0, datetime.fromtimestamp(61)))
+        assert len(econ.timestamp) == 2
+        assert econ.oad_sum == 20.0
+        assert econ.energy_count == 2
         econ.clear_data()
-        assert len(econ.oat_values) == 0
-        assert len(econ.mat_values) == 0
-        assert len(econ.oad_values) == 0
-        assert len(econ.fan_spd_values) == 0
+        assert len(econ.timestamp) == 0
+        assert econ.oad_sum == 0.0
+        assert econ.energy_sum == 0.0
+        assert econ.energy_count == 0
 
 
 class TestDiagnosticsEconCorrectlyOn(unittest.TestCase):
@@ -500,12 +437,9 @@ class TestDiagnosticsEconCorrectlyOn(unittest.TestCase):
         cur_time = datetime.fromtimestamp(10000)
         results = []
         econ.set_class_values("test", results, data_window, 1, 20.0, 80.0, 6000.0, 10.0)
-        econ.economizer_on_algorithm(True, 50.0, 25.0, 50.0, 25.0, 5.0, cur_time, 36)
-        assert len(econ.oat_values) == 1
-        assert len(econ.mat_values) == 1
-        assert len(econ.rat_values) == 1
-        assert len(econ.oad_values) == 1
-        assert len(econ.fan_spd_values) == 1
+        econ.economizer_on_algorithm(True, 5.0, Sample(50.0, 25.0, 50.0, 25.0, 0.36, cur_time))
+        assert econ.oaf_sum == 1.0
+        assert econ.oad_sum == 25.0
         assert len(econ.timestamp) == 1
 
     def test_econ_on_algorithm_two_timestamp(self):
@@ -517,12 +451,10 @@ class TestDiagnosticsEconCorrectlyOn(unittest.TestCase):
         cur_time = datetime.fromtimestamp(10000)
         results = []
         econ.set_class_values("test", results, data_window, 1, 20.0, 80.0, 6000.0, 10.0)
-        econ.economizer_on_algorithm(True, 50.0, 25.0, 50.0, 25.0, 5.0, cur_time, 36)
-        assert len(econ.oat_values) == 0
-        assert len(econ.mat_values) == 0
-        assert len(econ.rat_values) == 0
-        assert len(econ.oad_values) == 0
-        assert len(econ.fan_spd_values) == 0
+        econ.economizer_on_algorithm(True, 5.0, Sample(50.0, 25.0, 50.0, 25.0, 0.36, cur_time))
+        assert econ.oaf_sum == 0.0
+        assert econ.oad_sum == 0.0
+        assert econ.energy_count == 0
         assert len(econ.timestamp) == 0
 
     def test_econ_on_conditions(self):
@@ -534,16 +466,11 @@ class TestDiagnosticsEconCorrectlyOn(unittest.TestCase):
         econ.set_class_values("test", results, data_window, 1, 20.0, 80.0, 6000.0, 10.0)
         first_stamp = datetime.fromtimestamp(1)
         econ.not_cooling = first_stamp
-        econ.oat_values.append(50)
-        econ.mat_values.append(25)
-        econ.oad_values.append(100)
-        econ.rat_values.append(50)
+        econ.oad_sum += 100
         ret = econ.economizer_conditions(False, 5.0, cur_time)
-        assert len(econ.oat_values) == 0
-        assert len(econ.mat_values) == 0
-        assert len(econ.rat_values) == 0
-        assert len(econ.oad_values) == 0
-        assert len(econ.fan_spd_values) == 0
+        assert econ.oaf_sum == 0.0
+        assert econ.oad_sum == 0.0
+        assert econ.energy_count == 0
         assert len(econ.timestamp) == 0
         assert ret is False
 
@@ -556,17 +483,9 @@ class TestDiagnosticsEconCorrectlyOn(unittest.TestCase):
         econ.set_class_values("test", results,  data_window, 1, 20.0, 80.0, 6000.0, 10.0)
         first_stamp = datetime.fromtimestamp(100000)
         econ.economizing = first_stamp
-        econ.oat_values.append(50)
-        econ.mat_values.append(25)
-        econ.oad_values.append(100)
-        econ.rat_values.append(50)
-        econ.fan_spd_values.append(50)
+        econ.oad_sum += 100
         ret = econ.economizer_conditions(True, 5.0, cur_time)
-        assert len(econ.oat_values) == 1
-        assert len(econ.mat_values) == 1
-        assert len(econ.rat_values) == 1
-        assert len(econ.oad_values) == 1
-        assert len(econ.fan_spd_values) == 1
+        assert econ.oad_sum == 100
         assert len(econ.timestamp) == 0
         assert ret is True
 
@@ -587,18 +506,12 @@ class TestDiagnosticsEconCorrectlyOn(unittest.TestCase):
         results = []
         econ.set_class_values("test", results, data_window, 1, 20.0, 80.0, 6000.0, 10.0)
         first_stamp = datetime.fromtimestamp(1)
-        econ.timestamp.append(first_stamp)
         econ.economizing = first_stamp
-        econ.oat_values.append(51)
-        econ.mat_values.append(25)
-        econ.oad_values.append(100)
-        econ.rat_values.append(50)
+        econ.economizer_on_algorithm(True, True, Sample(51, 50, 25, 100, 1.0, first_stamp))
         econ.not_economizing_when_needed()
-        assert len(econ.oat_values) == 0
-        assert len(econ.mat_values) == 0
-        assert len(econ.rat_values) == 0
-        assert len(econ.oad_values) == 0
-        assert len(econ.fan_spd_values) == 0
+        assert econ.oaf_sum == 0.0
+        assert econ.oad_sum == 0.0
+        assert econ.energy_count == 0
         assert len(econ.timestamp) == 0
 
     def test_econ_on_not_economizing_when_needed_0_divide(self):
@@ -609,12 +522,8 @@ class TestDiagnosticsEconCorrectlyOn(unittest.TestCase):
             results = []
             econ.set_class_values("test", results, data_window, 1, 20.0, 80.0, 6000.0, 10.0)
             first_stamp = datetime.fromtimestamp(1)
-            econ.timestamp.append(first_stamp)
             econ.economizing = first_stamp
-            econ.oat_values.append(50)
-            econ.mat_values.append(25)
-            econ.oad_values.append(100)
-            econ.rat_values.append(50)
+            econ.economizer_on_algorithm(True, True, Sample(50, 50, 25, 100, 1.0, first_stamp))
             econ.not_economizing_when_needed()
 
 
@@ -625,13 +534,8 @@ class TestDiagnosticsEconCorrectlyOn(unittest.TestCase):
         results = []
         econ.set_class_values("test", results, data_window, 1, 20.0, 80.0, 6000.0, 10.0)
         first_stamp = datetime.fromtimestamp(1)
-        econ.timestamp.append(first_stamp)
         econ.economizing = first_stamp
-        econ.oat_values.append(10)
-        econ.mat_values.append(20)
-        econ.oad_values.append(10)
-        econ.rat_values.append(10)
-        econ.fan_spd_values.append(10)
+        econ.economizer_on_algorithm(True, True, Sample(10, 15, 20, 10, 10, first_stamp))
         ei = econ.energy_impact_calculation()
         assert ei == 3888.0
 
@@ -642,13 +546,8 @@ class TestDiagnosticsEconCorrectlyOn(unittest.TestCase):
         results = []
         econ.set_class_values("test", results, data_window, 1, 20.0, 80.0, 6000.0, 10.0)
         first_stamp = datetime.fromtimestamp(1)
-        econ.timestamp.append(first_stamp)
         econ.economizing = first_stamp
-        econ.oat_values.append(1)
-        econ.mat_values.append(1)
-        econ.oad_values.append(1)
-        econ.rat_values.append(1)
-        econ.fan_spd_values.append(1)
+        econ.economizer_on_algorithm(True, True, Sample(1, 2, 1, 1, 1, first_stamp))
         ei = econ.energy_impact_calculation()
         assert ei == 0.0
 
@@ -659,13 +558,8 @@ class TestDiagnosticsEconCorrectlyOn(unittest.TestCase):
         results = []
         econ.set_class_values("test", results, data_window, 1, 20.0, 80.0, 6000.0, 10.0)
         first_stamp = datetime.fromtimestamp(1)
-        econ.timestamp.append(first_stamp)
         econ.economizing = first_stamp
-        econ.oat_values.append(10)
-        econ.mat_values.append(20)
-        econ.oad_values.append(10)
-        econ.rat_values.append(10)
-        econ.fan_spd_values.append(10)
+        econ.economizer_on_algorithm(True, True, Sample(10, 15, 20, 10, 10, first_stamp))
         ei = econ.energy_impact_calculation()
         assert ei == 3888.0
 
@@ -675,21 +569,17 @@ class TestDiagnosticsEconCorrectlyOn(unittest.TestCase):
         data_window = td(minutes=1)
         results = []
         econ.set_class_values("test", results, data_window, 1, 20.0, 80.0, 6000.0, 10.0)
-        econ.oat_values.append(50)
-        econ.mat_values.append(25)
-        econ.oat_values.append(100)
-        econ.mat_values.append(50)
-        econ.oad_values.append(10)
-        econ.fan_spd_values.append(10)
-        assert len(econ.oat_values) == 2
-        assert len(econ.mat_values) == 2
-        assert len(econ.oad_values) == 1
-        assert len(econ.fan_spd_values) == 1
+        econ.economizer_on_algorithm(True, True, Sample(50, 70, 75, 10, 1.0, datetime.fromtimestamp(1)))
+        econ.economizer_on_algorithm(True, True, Sample(100, 70, 80, 10, 1.0, datetime.fromtimestamp(61)))
+        assert len(econ.timestamp) == 2
+        assert econ.oad_sum == 20.0
+        assert econ.energy_count == 1
         econ.clear_data()
-        assert len(econ.oat_values) == 0
-        assert len(econ.mat_values) == 0
-        assert len(econ.oad_values) == 0
-        assert len(econ.fan_spd_values) == 0
+        assert len(econ.timestamp) == 0
+        assert econ.oaf_sum == 0.0
+        assert econ.oad_sum == 0.0
+        assert econ.energy_sum == 0.0
+        assert econ.energy_count == 0
 
 class TestDiagnosticsExcessOutsideAir(unittest.TestCase):
     """
@@ -727,12 +617,9 @@ class TestDiagnosticsExcessOutsideAir(unittest.TestCase):
         cur_time = datetime.fromtimestamp(10000)
         results = []
         air.set_class_values("test", results, data_window, 1, 20.0, 10.0, 6000.0, 10.0)
-        air.excess_ouside_air_algorithm(50.0, 25.0, 50.0, 25.0, 0.0, cur_time, 36)
-        assert len(air.oat_values) == 1
-        assert len(air.mat_values) == 1
-        assert len(air.rat_values) == 1
-        assert len(air.oad_values) == 1
-        assert len(air.fan_spd_values) == 1
+        air.excess_ouside_air_algorithm(0.0, Sample(50.0, 25.0, 50.0, 25.0, 0.36, cur_time))
+        assert air.oaf_sum == 1.0
+        assert air.oad_sum == 25.0
         assert len(air.timestamp) == 1
 
     def test_excess_outside_air_algorithm_two_timestamp(self):
@@ -744,12 +631,10 @@ class TestDiagnosticsExcessOutsideAir(unittest.TestCase):
         cur_time = datetime.fromtimestamp(10000)
         results = []
         air.set_class_values("test", results, data_window, 1, 20.0, 10.0, 6000.0, 10.0)
-        air.excess_ouside_air_algorithm(50.0, 25.0, 50.0, 25.0, 0.0, cur_time, 36)
-        assert len(air.oat_values) == 0
-        assert len(air.mat_values) == 0
-        assert len(air.rat_values) == 0
-        assert len(air.oad_values) == 0
-        assert len(air.fan_spd_values) == 0
+        air.excess_ouside_air_algorithm(0.0, Sample(50.0, 25.0, 50.0, 25.0, 0.36, cur_time))
+        assert air.oaf_sum == 0.0
+        assert air.oad_sum == 0.0
+        assert air.energy_count == 0
         assert len(air.timestamp) == 0
 
     def test_econ_conditions(self):
@@ -762,16 +647,11 @@ class TestDiagnosticsExcessOutsideAir(unittest.TestCase):
         first_stamp = datetime.fromtimestamp(1)
         air.economizing = first_stamp
         air.timestamp.append(first_stamp)
-        air.oat_values.append(50)
-        air.mat_values.append(25)
-        air.oad_values.append(100)
-        air.rat_values.append(50)
+        air.oad_sum += 100
         ret = air.economizer_conditions(5.0, cur_time)
-        assert len(air.oat_values) == 0
-        assert len(air.mat_values) == 0
-        assert len(air.rat_values) == 0
-        assert len(air.oad_values) == 0
-        assert len(air.fan_spd_values) == 0
+        assert air.oaf_sum == 0.0
+        assert air.oad_sum == 0.0
+        assert air.energy_count == 0
         assert len(air.timestamp) == 0
         assert ret is True
 
@@ -784,17 +664,9 @@ class TestDiagnosticsExcessOutsideAir(unittest.TestCase):
         air.set_class_values("test", results, data_window, 1, 20.0, 10.0, 6000.0, 10.0)
         first_stamp = datetime.fromtimestamp(100000)
         air.economizing = first_stamp
-        air.oat_values.append(50)
-        air.mat_values.append(25)
-        air.oad_values.append(100)
-        air.rat_values.append(50)
-        air.fan_spd_values.append(50)
+        air.oad_sum += 100
         ret = air.economizer_conditions(5.0, cur_time)
-        assert len(air.oat_values) == 1
-        assert len(air.mat_values) == 1
-        assert len(air.rat_values) == 1
-        assert len(air.oad_values) == 1
-        assert len(air.fan_spd_values) == 1
+        assert air.oad_sum == 100
         assert len(air.timestamp) == 0
         assert ret is True
 
@@ -815,18 +687,12 @@ class TestDiagnosticsExcessOutsideAir(unittest.TestCase):
         results = []
         air.set_class_values("test", results, data_window, 1, 20.0, 10.0, 6000.0, 10.0)
         first_stamp = datetime.fromtimestamp(1)
-        air.timestamp.append(first_stamp)
         air.economizing = first_stamp
-        air.oat_values.append(51)
-        air.mat_values.append(25)
-        air.oad_values.append(100)
-        air.rat_values.append(50)
+        air.excess_ouside_air_algorithm(False, Sample(51, 50, 25, 100, 1.0, first_stamp))
         air.excess_oa()
-        assert len(air.oat_values) == 0
-        assert len(air.mat_values) == 0
-        assert len(air.rat_values) == 0
-        assert len(air.oad_values) == 0
-        assert len(air.fan_spd_values) == 0
+        assert air.oaf_sum == 0.0
+        assert air.oad_sum == 0.0
+        assert air.energy_count == 0
         assert len(air.timestamp) == 0
 
     def test_excess_oa_method_dividing_zero(self):
@@ -837,18 +703,12 @@ class TestDiagnosticsExcessOutsideAir(unittest.TestCase):
             results = []
             air.set_class_values("test", results, data_window, 1, 20.0, 10.0, 6000.0, 10.0)
             first_stamp = datetime.fromtimestamp(1)
-            air.timestamp.append(first_stamp)
             air.economizing = first_stamp
-            air.oat_values.append(50)
-            air.mat_values.append(25)
-            air.oad_values.append(100)
-            air.rat_values.append(50)
+            air.excess_ouside_air_algorithm(False, Sample(50, 50, 25, 100, 1.0, first_stamp))
             air.excess_oa()
-            assert len(air.oat_values) == 0
-            assert len(air.mat_values) == 0
-            assert len(air.rat_values) == 0
-            assert len(air.oad_values) == 0
-            assert len(air.fan_spd_values) == 0
+            assert air.oaf_sum == 0.0
+            assert air.oad_sum == 0.0
+            assert air.energy_count == 0
             assert len(air.timestamp) == 0
 
     def test_oa_ei_calculation_positive(self):
@@ -856,16 +716,11 @@ class TestDiagnosticsExcessOutsideAir(unittest.TestCase):
         air = ExcessOutsideAir()
         data_window = td(minutes=1)
         results = []
-        air.set_class_values("test", results, data_window, 1, 20.0, 10.0, 6000.0, 10.0)
+        air.set_class_values("test", results, data_window, 1, 20.0, 100.0, 6000.0, 10.0)
         first_stamp = datetime.fromtimestamp(1)
-        air.timestamp.append(first_stamp)
         air.economizing = first_stamp
-        air.oat_values.append(10)
-        air.mat_values.append(20)
-        air.oad_values.append(10)
-        air.rat_values.append(10)
-        air.fan_spd_values.append(10)
-        ei = air.energy_impact_calculation(1.0)
+        air.excess_ouside_air_algorithm(False, Sample(10, 15, 20, 10, 10, first_stamp))
+        ei = air.energy_impact_calculation()
         assert ei == 3888.0
 
     def test_oa_ei_calculation_zero_value(self):
@@ -873,16 +728,11 @@ class TestDiagnosticsExcessOutsideAir(unittest.TestCase):
         air = ExcessOutsideAir()
         data_window = td(minutes=1)
         results = []
-        air.set_class_values("test", results, data_window, 1, 20.0, 10.0, 6000.0, 10.0)
+        air.set_class_values("test", results, data_window, 1, 20.0, 0.0, 6000.0, 10.0)
         first_stamp = datetime.fromtimestamp(1)
-        air.timestamp.append(first_stamp)
         air.economizing = first_stamp
-        air.oat_values.append(1)
-        air.mat_values.append(1)
-        air.oad_values.append(1)
-        air.rat_values.append(1)
-        air.fan_spd_values.append(1)
-        ei = air.energy_impact_calculation(0.0)
+        air.excess_ouside_air_algorithm(False, Sample(2, 1, 1, 1, 1, first_stamp))
+        ei = air.energy_impact_calculation()
         assert ei == 0.0
 
     def test_oa_ei_calculation_negative_value(self):
@@ -890,16 +740,11 @@ class TestDiagnosticsExcessOutsideAir(unittest.TestCase):
         air = ExcessOutsideAir()
         data_window = td(minutes=1)
         results = []
-        air.set_class_values("test", results, data_window, 1, 20.0, 10.0, 6000.0, 10.0)
+        air.set_class_values("test", results, data_window, 1, 20.0, -1000.0, 6000.0, 10.0)
         first_stamp = datetime.fromtimestamp(1)
-        air.timestamp.append(first_stamp)
         air.economizing = first_stamp
-        air.oat_values.append(10)
-        air.mat_values.append(20)
-        air.oad_values.append(10)
-        air.rat_values.append(10)
-        air.fan_spd_values.append(10)
-        ei = air.energy_impact_calculation(-10.0)
+        air.excess_ouside_air_algorithm(False, Sample(21, 20, 20, 10, 10, first_stamp))
+        ei = air.energy_impact_calculation()
         assert ei == 3888.0
 
     def test_econ_clear_data(self):
@@ -908,21 +753,17 @@ class TestDiagnosticsExcessOutsideAir(unittest.TestCase):
         data_window = td(minutes=1)
         results = []
         air.set_class_values("test", results, data_window, 1, 20.0, 10.0, 6000.0, 10.0)
-        air.oat_values.append(50)
-        air.mat_values.append(25)
-        air.oat_values.append(100)
-        air.mat_values.append(50)
-        air.oad_values.append(10)
-        air.fan_spd_values.append(10)
-        assert len(air.oat_values) == 2
-        assert len(air.mat_values) == 2
-        assert len(air.oad_values) == 1
-        assert len(air.fan_spd_values) == 1
+        air.excess_ouside_air_algorithm(False, Sample(50, 70, 75, 10, 1.0, datetime.fromtimestamp(1)))
+        air.excess_ouside_air_algorithm(False, Sample(100, 70, 80, 10, 1.0, datetime.fromtimestamp(61)))
+        assert len(air.timestamp) == 2
+        assert air.oad_sum == 20.0
+        assert air.energy_count == 2
         air.clear_data()
-        assert len(air.oat_values) == 0
-        assert len(air.mat_values) == 0
-        assert len(air.oad_values) == 0
-        assert len(air.fan_spd_values) == 0
+        assert len(air.timestamp) == 0
+        assert air.oaf_sum == 0.0
+        assert air.oad_sum == 0.0
+        assert air.energy_sum == 0.0
+        assert air.energy_count == 0
 
 class TestDiagnosticsInsufficientOutsideAir(unittest.TestCase):
     """
@@ -958,10 +799,8 @@ class TestDiagnosticsInsufficientOutsideAir(unittest.TestCase):
         cur_time = datetime.fromtimestamp(10000)
         results = []
         air.set_class_values("test", results, data_window, 1, 10.0)
-        air.insufficient_outside_air_algorithm(100.0, 50.0, 50.0, cur_time)
-        assert len(air.oat_values) == 1
-        assert len(air.mat_values) == 1
-        assert len(air.rat_values) == 1
+        air.insufficient_outside_air_algorithm(Sample(100.0, 50.0, 50.0, 0.0, 1.0, cur_time))
+        assert air.oaf_sum == 0.0
         assert len(air.timestamp) == 1
 
     def test_insufficient_ouside_air_algorithm_two_timestamps(self):
@@ -973,10 +812,8 @@ class TestDiagnosticsInsufficientOutsideAir(unittest.TestCase):
         cur_time = datetime.fromtimestamp(10000)
         results = []
         air.set_class_values("test", results, data_window, 1, 10.0)
-        air.insufficient_outside_air_algorithm(100.0, 50.0, 50.0, cur_time)
-        assert len(air.oat_values) == 0
-        assert len(air.mat_values) == 0
-        assert len(air.rat_values) == 0
+        air.insufficient_outside_air_algorithm(Sample(100.0, 50.0, 50.0, 0.0, 1.0, cur_time))
+        assert air.oaf_sum == 0.0
         assert len(air.timestamp) == 0
 
     def test_insufficient_ouside_air_oa(self):
@@ -984,17 +821,11 @@ class TestDiagnosticsInsufficientOutsideAir(unittest.TestCase):
         air = InsufficientOutsideAir()
         data_window = td(minutes=1)
         first_stamp = datetime.fromtimestamp(1)
-        air.timestamp.append(first_stamp)
-        cur_time = datetime.fromtimestamp(10000)
         results = []
         air.set_class_values("test", results, data_window, 1, 10.0)
-        air.oat_values.append(50)
-        air.mat_values.append(25)
-        air.rat_values.append(100)
+        air.insufficient_outside_air_algorithm(Sample(50, 100, 25, 0, 1.0, first_stamp))
         air.insufficient_oa()
-        assert len(air.oat_values) == 0
-        assert len(air.mat_values) == 0
-        assert len(air.rat_values) == 0
+        assert air.oaf_sum == 0.0
         assert len(air.timestamp) == 0
 
     def test_insufficient_ouside_air_clear_data(self):
@@ -1002,18 +833,164 @@ class TestDiagnosticsInsufficientOutsideAir(unittest.TestCase):
         air = InsufficientOutsideAir()
         data_window = td(minutes=1)
         first_stamp = datetime.fromtimestamp(1)
-        air.timestamp.append(first_stamp)
         results = []
         air.set_class_values("test", results, data_window, 1, 10.0)
-        air.oat_values.append(50)
-        air.mat_values.append(25)
-        air.rat_values.append(10)
-        assert len(air.oat_values) == 1
-        assert len(air.mat_values) == 1
-        assert len(air.rat_values) == 1
+        air.insufficient_outside_air_algorithm(Sample(50, 10, 25, 0, 1.0, first_stamp))
+        assert air.oaf_sum == 0.375
         assert len(air.timestamp) == 1
         air.clear_data()
-        assert len(air.oat_values) == 0
-        assert len(air.mat_values) == 0
-        assert len(air.rat_values) == 0
+        assert air.oaf_sum == 0.0
         assert len(air.timestamp) == 0
+
+
+class TestBatch(unittest.TestCase):
+    """
+    Contains the tests for the batch (historical data) mode
+    """
+
+    def batch_config(self):
+        return {
+            "device": {"campus": "campus", "building": "building", "unit": {}},
+            "analysis_name": "Economizer_AIRCx",
+            "local_timezone": "US/Pacific",
+            "arguments": {
+                "point_mapping": {
+                    "supply_fan_status": "FanStatus",
+                    "outdoor_air_temperature": "OutdoorAirTemperature",
+                    "return_air_temperature": "ReturnAirTemperature",
+                    "mixed_air_temperature": "MixedAirTemperature",
+                    "outdoor_damper_signal": "OutdoorDamperSignal",
+                    "cool_call": "CompressorStatus"
+                },
+                "device_type": "rtu",
+                "data_window": 30,
+                "no_required_data": 10
+            }
+        }
+
+    def batch_frame(self, units, minutes, seed=0):
+        import pandas as pd
+        import random
+        rows = []
+        generator = random.Random(seed)
+        for unit in units:
+            for minute in range(minutes):
+                rows.append({
+                    "timestamp": (datetime(2020, 6, 1) + td(minutes=minute)).isoformat(),
+                    "unit": unit,
+                    "FanStatus": 1 if generator.random() > 0.1 else 0,
+                    "OutdoorAirTemperature": 60.0 + 15.0 * generator.random(),
+                    "ReturnAirTemperature": 72.0 + generator.random(),
+                    "MixedAirTemperature": None if generator.random() < 0.02 else 62.0 + 8.0 * generator.random(),
+                    "OutdoorDamperSignal": generator.choice([20.0, 50.0, 100.0]),
+                    "CompressorStatus": generator.choice([0, 1])
+                })
+        return pd.DataFrame(rows)
+
+    def test_batch_matches_agent_messages(self):
+        """test the batch results match the results of the agent fed one message at a time"""
+        import pandas as pd
+        from .batch import run_unit, create_agent, unit_config
+        config = self.batch_config()
+        frame = self.batch_frame(["rtu1"], 24 * 60)
+        results = run_unit(config, "rtu1", frame)
+
+        agent = create_agent(unit_config(config, "rtu1", []), "rtu1")
+        for _, row in frame.iterrows():
+            message = {point: value for point, value in row.items()
+                       if point not in ("timestamp", "unit") and not pd.isna(value)}
+            agent.new_data_message(None, None, None, "devices/campus/building/rtu1/all",
+                                   {"Date": row["timestamp"] + "+00:00"}, [message, {}])
+        assert results
+        assert results == [(timestamp, "rtu1", topic, result) for timestamp, topic, result in agent.vip.pubsub.results]
+
+    def test_batch_runs_units_in_pool(self):
+        """test run_batch processes every unit of the input file"""
+        import tempfile
+        from .batch import run_batch, run_unit
+        config = self.batch_config()
+        frame = self.batch_frame(["rtu1", "rtu2"], 120)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "data.csv")
+            frame.to_csv(path, index=False)
+            rows = []
+
+            class Writer(object):
+                def writerows(self, results):
+                    rows.extend(results)
+
+            assert run_batch(config, [path], Writer(), workers=2) == 2
+        expected = run_unit(config, "rtu1", frame[frame["unit"] == "rtu1"])
+        assert [row for row in rows if row[1] == "rtu1"] == expected
+        assert any(row[1] == "rtu2" for row in rows)
+
+
+class TestHostAgent(unittest.TestCase):
+    """
+    Contains the tests for the multi-unit host agent
+    """
+
+    def test_host_results_match_single_unit_agents(self):
+        """test every hosted unit publishes the results of a single unit agent"""
+        import pandas as pd
+        from .batch import BatchVIP, BatchCore, unit_config
+        from .economizer_agent import EconomizerAgent
+        from .host_agent import EconomizerHostAgent
+
+        batch_test = TestBatch()
+        config = batch_test.batch_config()
+        host_config = {key: value for key, value in config.items() if key != "device"}
+        host_config["devices"] = [
+            {"campus": "campus", "building": "building1", "unit": {"rtu1": {}, "rtu2": {}}},
+            {"campus": "campus", "building": "building2", "unit": {"rtu1": {}},
+             "arguments": {"economizer_type": "HL"}}
+        ]
+        host = EconomizerHostAgent.__new__(EconomizerHostAgent)
+        host.vip = BatchVIP()
+        host.core = BatchCore("host")
+        host.config = host_config
+        host.create_units()
+        assert host.prefixes == ["devices/campus/building1/", "devices/campus/building2/"]
+
+        messages = []
+        for seed, (building, unit) in enumerate((("building1", "rtu1"), ("building1", "rtu2"), ("building2", "rtu1"))):
+            frame = batch_test.batch_frame([unit], 180, seed)
+            for _, row in frame.iterrows():
+                message = {point: value for point, value in row.items()
+                           if point not in ("timestamp", "unit") and not pd.isna(value)}
+                messages.append((row["timestamp"], "devices/campus/{}/{}/all".format(building, unit), message))
+        messages.sort(key=lambda message: message[0])
+        messages.append((messages[-1][0], "devices/campus/building1/rtu9/all", {}))
+        for timestamp, topic, message in messages:
+            host.new_data_message(None, None, None, topic, {"Date": timestamp + "+00:00"}, [message, {}])
+
+        for building, unit in (("building1", "rtu1"), ("building1", "rtu2"), ("building2", "rtu1")):
+            unit_device = unit_config(config, unit, [])
+            unit_device["device"]["building"] = building
+            if building == "building2":
+                unit_device["arguments"]["economizer_type"] = "HL"
+            agent = EconomizerAgent.hosted(unit_device, BatchVIP(), BatchCore(unit))
+            prefix = "devices/campus/{}/{}/".format(building, unit)
+            for timestamp, topic, message in messages:
+                if topic.startswith(prefix):
+                    agent.new_data_message(None, None, None, topic, {"Date": timestamp + "+00:00"}, [message, {}])
+            hosted = [result for result in host.vip.pubsub.results if "/{}/{}/".format(building, unit) in result[1]]
+            assert agent.vip.pubsub.results
+            assert hosted == agent.vip.pubsub.results
+
+    def test_host_skips_invalid_unit(self):
+        """test a unit with an invalid configuration is left out instead of stopping the host"""
+        from .batch import BatchVIP, BatchCore
+        from .host_agent import EconomizerHostAgent
+        host_config = {key: value for key, value in TestBatch().batch_config().items() if key != "device"}
+        host_config["devices"] = [{"campus": "campus", "building": "building1", "unit": {"rtu1": {}}},
+                                  {"campus": "campus", "building": "building2", "unit": {}},
+                                  {"building": "building3", "unit": {"rtu1": {}},
+                                   "arguments": {"point_mapping": {}}}]
+        host = EconomizerHostAgent.__new__(EconomizerHostAgent)
+        host.vip = BatchVIP()
+        host.core = BatchCore("host")
+        host.config = host_config
+        host.create_units()
+        assert list(host.units) == ["campus/building1/rtu1"]
+        assert host.prefixes == ["devices/campus/building1/"]
@@ -0,0 +1,5 @@
+import sys
+import os
+
+# Add system path of the agent's directory
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
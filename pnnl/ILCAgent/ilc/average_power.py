@@ -0,0 +1,163 @@
+"""
+-*- coding: utf-8 -*- {{{
+vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+Copyright (c) 2017, Battelle Memorial Institute
+All rights reserved.
+
+1.  Battelle Memorial Institute (hereinafter Battelle) hereby grants
+    permission to any person or entity lawfully obtaining a copy of this
+    software and associated documentation files (hereinafter "the Software")
+    to redistribute and use the Software in source and binary forms, with or
+    without modification.  Such person or entity may use, copy, modify, merge,
+    publish, distribute, sublicense, and/or sell copies of the Software, and
+    may permit others to do so, subject to the following conditions:
+
+    -   Redistributions of source code must retain the above copyright notice,
+        this list of conditions and the following disclaimers.
+
+    -	Redistributions in binary form must reproduce the above copyright
+        notice, this list of conditions and the following disclaimer in the
+        documentation and/or other materials provided with the distribution.
+
+    -	Other than as used herein, neither the name Battelle Memorial Institute
+        or Battelle may be used in any form whatsoever without the express
+        written consent of Battelle.
+
+2.	THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+    AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+    IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+    ARE DISCLAIMED. IN NO EVENT SHALL BATTELLE OR CONTRIBUTORS BE LIABLE FOR
+    ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+    DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+    SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+    CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+    LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+    OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+    DAMAGE.
+
+The views and conclusions contained in the software and documentation are those
+of the authors and should not be interpreted as representing official policies,
+either expressed or implied, of the FreeBSD Project.
+
+This material was prepared as an account of work sponsored by an agency of the
+United States Government. Neither the United States Government nor the United
+States Department of Energy, nor Battelle, nor any of their employees, nor any
+jurisdiction or organization that has cooperated in the development of these
+materials, makes any warranty, express or implied, or assumes any legal
+liability or responsibility for the accuracy, completeness, or usefulness or
+any information, apparatus, product, software, or process disclosed, or
+represents that its use would not infringe privately owned rights.
+
+Reference herein to any specific commercial product, process, or service by
+trade name, trademark, manufacturer, or otherwise does not necessarily
+constitute or imply its endorsement, recommendation, or favoring by the
+United States Government or any agency thereof, or Battelle Memorial Institute.
+The views and opinions of authors expressed herein do not necessarily state or
+reflect those of the United States Government or any agency thereof.
+
+PACIFIC NORTHWEST NATIONAL LABORATORY
+operated by
+BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+under Contract DE-AC05-76RL01830
+}}}
+"""
+from collections import deque
+from datetime import timedelta as td
+import numpy as np
+
+SAMPLE_OFFSET = td(seconds=15)
+
+
+class AveragePower(object):
+    """
+    Streaming building power averager.
+
+    Keeps the same sliding window as the original list based implementation
+    (a sample is only dropped when a new one is added after the window is
+    full) and returns the same exponential and arithmetic averages.  The
+    arithmetic mean is kept as a running sum and the exponential estimate
+    as S = sum((1 - a)**k * p[k]) with k = 0 for the newest sample, so a
+    sample that replaces the oldest one updates both in constant time.
+
+    The exponential smoothing constant depends on the number of samples
+    held, so S is rebuilt (one vectorized pass) while the window is still
+    filling up or when a sample arrives out of time order.
+    """
+    def __init__(self, window):
+        self.window = window
+        self.samples = deque()
+        self.total = 0.0
+        self.weighted = 0.0
+        self.smoothing = 1.0
+        self.decay = 1.0
+        self.in_order = True
+        self.updates = 0
+        self.rebuilds = 0
+
+    def __len__(self):
+        return len(self.samples)
+
+    def current_window(self):
+        if self.samples:
+            return self.samples[-1][0] - self.samples[0][0] + SAMPLE_OFFSET
+        return td(minutes=0)
+
+    def add(self, current_time, current_power):
+        """
+        Add a meter sample and return the exponential average power, the
+        arithmetic average power and the averaging window (measured before
+        the sample was added).
+        :param current_time:
+        :param current_power:
+        :return:
+        """
+        current_average_window = self.current_window()
+
+        if current_power > 0:
+            current_power = float(current_power)
+            if self.samples and current_time <= self.samples[-1][0]:
+                self.in_order = False
+            self.samples.append((current_time, current_power))
+            self.total += current_power
+
+            if current_average_window >= self.window:
+                _, oldest_power = self.samples.popleft()
+                self.total -= oldest_power
+                if self.in_order:
+                    self.weighted = current_power + (1.0 - self.smoothing) * self.weighted - self.decay * oldest_power
+                else:
+                    self.rebuild()
+            else:
+                self.rebuild()
+
+            self.updates += 1
+            if self.updates >= len(self.samples):
+                # Bound the round off accumulated by the running sum.
+                self.total = sum(power for _, power in self.samples)
+                self.updates = 0
+
+        exponential_power = self.smoothing * self.weighted
+        average_power = self.total / len(self.samples) if self.samples else 0.0
+        return exponential_power, average_power, current_average_window
+
+    def rebuild(self):
+        """
+        Recompute the smoothing constant and the exponential sum from the
+        samples ordered newest first.
+        :return:
+        """
+        self.rebuilds += 1
+        sample_count = len(self.samples)
+        smoothing = 2.0/(sample_count + 1.0)*2.0 if sample_count else 1.0
+        self.smoothing = smoothing if smoothing <= 1.0 else 1.0
+        self.decay = (1.0 - self.smoothing) ** sample_count
+
+        if self.in_order:
+            powers = np.fromiter((power for _, power in reversed(self.samples)), dtype=float, count=sample_count)
+        else:
+            ordered = sorted(self.samples, reverse=True)
+            powers = np.array([power for _, power in ordered], dtype=float)
+            times = [sample_time for sample_time, _ in self.samples]
+            self.in_order = all(earlier < later for earlier, later in zip(times, times[1:]))
+        self.weighted = float(np.dot(powers, (1.0 - self.smoothing) ** np.arange(sample_count)))
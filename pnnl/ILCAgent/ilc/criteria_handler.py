@@ -64,20 +64,24 @@ under Contract DE-AC05-76RL01830
 """
 import re
 import abc
-from sympy import symbols
+from bisect import bisect_left, bisect_right
 from sympy.core import numbers
-from sympy.parsing.sympy_parser import parse_expr
-from collections import deque
 import logging
 from datetime import timedelta as td
 from volttron.platform.agent.utils import setup_logging
+import numpy as np
 from ilc.ilc_matrices import (extract_criteria, calc_column_sums, normalize_matrix,
                               validate_input, build_score, input_matrix)
+from ilc.score_matrix import ScoreMatrix, rank_order
+from ilc.formula import compile_formula
 setup_logging()
 _log = logging.getLogger(__name__)
 
 criterion_registry = {}
 
+# Samples kept beyond the longest history window of a point.
+HISTORY_MARGIN = td(minutes=5)
+
 
 def register_criterion(name):
     def decorator(klass):
@@ -138,6 +142,11 @@ class CriteriaCluster(object):
         for device_name, device_criteria in cluster_config.items():
             self.criteria[device_name] = DeviceCriteria(device_criteria)
 
+        self.score_matrix = ScoreMatrix(criteria_labels, row_average, priority)
+        self.score_matrix.allocate([(name, device_id)
+                                    for name, device in self.criteria.items()
+                                    for device_id in device.criteria])
+
     def get_all_evaluations(self):
         results = {}
         for name, device in self.criteria.items():
@@ -146,23 +155,62 @@ class CriteriaCluster(object):
                 results[name, device_id] = evaluations
         return results
 
+    def update_score_matrix(self):
+        """
+        Re-evaluate only the devices that received data since the last
+        scoring pass and write their rows into the score matrix.
+        :return:
+        """
+        for name, device in self.criteria.items():
+            if not device.updated:
+                continue
+            for device_id in device.criteria:
+                self.score_matrix.update((name, device_id), device.evaluate(device_id))
+            device.updated = False
+
+    def get_scores(self):
+        self.update_score_matrix()
+        return self.score_matrix.scores()
+
 
 class CriteriaContainer(object):
     def __init__(self):
         self.clusters = []
         self.devices = {}
+        self.keys = []
+        self.key_rank = np.zeros(0, dtype=int)
 
     def add_criteria_cluster(self, cluster):
         self.clusters.append(cluster)
         self.devices.update(cluster.criteria)
+        self.keys.extend(cluster.score_matrix.keys)
+        rank = dict((key, i) for i, key in enumerate(sorted(self.keys)))
+        self.key_rank = np.array([rank[key] for key in self.keys], dtype=int)
+
+    def get_score_order(self, count=None):
+        """
+        Return (device, token) pairs ordered from highest to lowest AHP score.
+        :param count: only return the count highest scored pairs (None for all).
+        :return:
+        """
+        if not self.keys:
+            return []
+        scores = np.concatenate([cluster.get_scores() for cluster in self.clusters])
+        order = rank_order(scores, self.key_rank, count)
+        results = [self.keys[i] for i in order]
+
+        _log.debug("Scored devices: {}".format(results))
+        return results
 
-    def get_score_order(self):
+    def get_score_order_reference(self):
+        """
+        Pure python scoring path (one input_matrix/build_score pass and a full
+        sort per call).  Kept for validation and benchmarking of get_score_order.
+        :return:
+        """
         all_scored = []
         for cluster in self.clusters:
             evaluations = cluster.get_all_evaluations()
-
-            _log.debug('Device Evaluations: ' + str(evaluations))
-
             if not evaluations:
                 continue
 
@@ -170,9 +218,6 @@ class CriteriaContainer(object):
             scores = build_score(input_arr, cluster.row_average, cluster.priority)
             all_scored.extend(scores)
 
-            _log.debug('Input Array: ' + str(input_arr))
-            _log.debug('Scored devices: ' + str(scores))
-
         all_scored.sort(reverse=True)
         results = [x[1] for x in all_scored]
 
@@ -188,14 +233,18 @@ class DeviceCriteria(object):
         self.points = {}
         self.expressions = {}
         self.condition = {}
+        self.updated = True
+        # One PointHistory per point, shared by every history criterion of this device.
+        self.histories = {}
 
         for device_id, device_criteria in criteria_config.items():
-            criteria = Criteria(device_criteria)
+            criteria = Criteria(device_criteria, self.histories)
             self.criteria[device_id] = criteria
 
     def ingest_data(self, time_stamp, data):
         for criteria in self.criteria.values():
             criteria.ingest_data(time_stamp, data)
+        self.updated = True
 
     def criteria_status(self, token, status):
         self.criteria[token].criteria_status(status)
@@ -205,8 +254,9 @@ class DeviceCriteria(object):
 
 
 class Criteria(object):
-    def __init__(self, criteria):
+    def __init__(self, criteria, histories=None):
         self.criteria = {}
+        self.histories = histories
         for name, criterion in criteria.items():
             self.add(name, criterion)
 
@@ -215,6 +265,8 @@ class Criteria(object):
         operation_type = criterion.pop('operation_type')
         klass = criterion_registry[operation_type]
         self.criteria[name] = klass(**criterion)
+        if self.histories is not None and isinstance(self.criteria[name], HistoryCriterion):
+            self.criteria[name].share_history(self.histories)
 
     def evaluate(self):
         results = {}
@@ -337,14 +389,21 @@ class FormulaCriterion(BaseCriterion):
         self.operation_parms = operation_args.values()
         print operation_args.keys(), operation_args.values()
         self.operation_args = parse_sympy(operation_points)
-        self.points = symbols(self.operation_args)
-        self.expr = parse_expr(parse_sympy(operation))
+        self.formula = compile_formula(parse_sympy(operation), self.operation_args)
+        self.points = self.formula.points
+        self.expr = self.formula.expr
         self.point_list = []
         self.status = False
 
     def evaluate(self):
         if self.point_list:
-            value = self.expr.subs(self.point_list)
+            try:
+                value = self.formula.evaluate(self.point_list)
+            except (ZeroDivisionError, OverflowError, ValueError):
+                # Symbolic substitution yields zoo/nan/complex here which numeric_check maps to zero.
+                value = 0.0
+            except TypeError:
+                value = self.formula.subs(self.point_list)
         else:
             value = self.minimum
         return value
@@ -376,19 +435,94 @@ class MapperCriterion(BaseCriterion):
         return self.value
 
 
+class PointHistory(object):
+    """
+    Time ordered samples of one point held in parallel time and value lists.
+
+    Samples older than the longest window of the criteria reading the point
+    (plus HISTORY_MARGIN) are evicted as new samples arrive, keeping the
+    newest evicted candidate so a window start always has an interpolation
+    bracket.  Lookups are binary searches.
+    """
+    def __init__(self):
+        self.times = []
+        self.values = []
+        self.start = 0
+        self.retention = HISTORY_MARGIN
+
+    def __len__(self):
+        return len(self.times) - self.start
+
+    def require(self, window):
+        self.retention = max(self.retention, window + HISTORY_MARGIN)
+
+    def append(self, time_stamp, value):
+        if len(self.times) > self.start and time_stamp <= self.times[-1]:
+            if time_stamp == self.times[-1]:
+                # Same sample ingested by another criterion sharing this history.
+                self.values[-1] = value
+                return
+            index = bisect_right(self.times, time_stamp, self.start)
+            self.times.insert(index, time_stamp)
+            self.values.insert(index, value)
+        else:
+            self.times.append(time_stamp)
+            self.values.append(value)
+        self.evict(self.times[-1] - self.retention)
+
+    def evict(self, cutoff):
+        index = bisect_left(self.times, cutoff, self.start) - 1
+        if index > self.start:
+            self.start = index
+        if self.start > 64 and self.start * 2 > len(self.times):
+            del self.times[:self.start]
+            del self.values[:self.start]
+            self.start = 0
+
+    def bracket(self, target_time):
+        """
+        Return the samples before and at/after target_time, or None when the
+        history does not reach back to target_time.
+        :param target_time:
+        :return:
+        """
+        index = bisect_left(self.times, target_time, self.start)
+        if index == len(self.times):
+            return None
+        if index == self.start:
+            if self.times[index] != target_time:
+                return None
+            index += 1
+            if index == len(self.times):
+                sample = (self.times[index - 1], self.values[index - 1])
+                return sample, sample
+        return (self.times[index - 1], self.values[index - 1]), (self.times[index], self.values[index])
+
+
 @register_criterion('history')
 class HistoryCriterion(BaseCriterion):
     def __init__(self, comparison_type=None, point_name=None, previous_time=None, **kwargs):
         super(HistoryCriterion, self).__init__(**kwargs)
         if comparison_type is None or point_name is None or previous_time is None:
             raise ValueError('Missing parameter')
-        self.history = deque()
         self.comparison_type = comparison_type
         self.point_name = point_name
         self.previous_time_delta = td(minutes=previous_time)
+        self.history = PointHistory()
+        self.history.require(self.previous_time_delta)
         self.current_value = None
         self.history_time = None
 
+    def share_history(self, histories):
+        """
+        Use the device wide history of point_name so criteria watching the
+        same point hold one buffer.
+        :param histories: dict of point name to PointHistory.
+        :return:
+        """
+        self.history = histories.setdefault(self.point_name, self.history)
+        self.history.require(self.previous_time_delta)
+
     def linear_interpolation(self, date1, value1, date2, value2, target_date):
         end_delta_t = (date2 - date1).total_seconds()
         target_delta_t = (target_date - date1).total_seconds()
@@ -398,20 +532,16 @@ class HistoryCriterion(BaseCriterion):
         if self.current_value is None:
             return self.minimum
 
-        pre_timestamp, pre_value = self.history.pop()
-
-        if pre_timestamp > self.history_time:
-            self.history.append((pre_timestamp, pre_value))
+        bracket = self.history.bracket(self.history_time)
+        if bracket is None:
             return self.minimum
 
-        post_timestamp, post_value = self.history.pop()
-
-        while post_timestamp < self.history_time:
-            pre_value, pre_timestamp = post_value, post_timestamp
-            post_timestamp, post_value = self.history.pop()
-
-        self.history.append((post_timestamp, post_value))
-        prev_value = self.linear_interpolation(pre_timestamp, pre_value, post_timestamp, post_value, self.history_time)
+        (pre_timestamp, pre_value), (post_timestamp, post_value) = bracket
+        if pre_timestamp == post_timestamp:
+            prev_value = pre_value
+        else:
+            prev_value = self.linear_interpolation(pre_timestamp, pre_value, post_timestamp, post_value,
+                                                   self.history_time)
         if self.comparison_type == 'direct':
             value = abs(prev_value - self.current_value)
         elif self.comparison_type == 'inverse':
@@ -421,4 +551,4 @@ class HistoryCriterion(BaseCriterion):
     def ingest_data(self, time_stamp, data):
         self.history_time = time_stamp - self.previous_time_delta
         self.current_value = data[self.point_name]
-        self.history.appendleft((time_stamp, self.current_value))
+        self.history.append(time_stamp, self.current_value)
@@ -66,8 +66,8 @@ import re
 from sympy import symbols
 import logging
 from collections import defaultdict
-from sympy.parsing.sympy_parser import parse_expr
 from volttron.platform.agent.utils import setup_logging
+from ilc.formula import compile_formula
 
 
 setup_logging()
@@ -109,6 +109,21 @@ def parse_sympy(data, condition=False):
     return return_data
 
 
+def evaluate_condition(formula, data):
+    """
+    Evaluate a compiled device status or conditional curtailment condition.
+    Non numeric data, and values the compiled function cannot compare, fall
+    back to symbolic substitution.
+    :param formula: compiled Formula.
+    :param data: dict of point to value.
+    :return:
+    """
+    try:
+        return formula.evaluate_dict(data)
+    except TypeError:
+        return formula.subs([(point, data[point]) for point in formula.args])
+
+
 class CurtailmentCluster(object):
     def __init__(self, cluster_config, actuator):
         self.devices = {}
@@ -183,7 +198,7 @@ class CurtailmentManager(object):
             self.device_status_args[device_id] = device_status_args
             self.condition[device_id] = parse_sympy(condition, condition=True)
             self.points[device_id] = symbols(device_status_args)
-            self.expr[device_id] = parse_expr(self.condition[device_id])
+            self.expr[device_id] = compile_formula(self.condition[device_id], device_status_args)
 
             self.command_status[device_id] = False
             self.curtail_count[device_id] = 0.0
@@ -195,12 +210,9 @@ class CurtailmentManager(object):
                 conditional_curtail_instance.ingest_data(data)
 
         for device_id in self.command_status:
-            conditional_points = []
-            for item in self.device_status_args[device_id]:
-                conditional_points.append((item, data[item]))
             conditional_value = False
-            if conditional_points:
-                conditional_value = self.expr[device_id].subs(conditional_points)
+            if self.device_status_args[device_id]:
+                conditional_value = evaluate_condition(self.expr[device_id], data)
             _log.debug('{} (device status) evaluated to {}'.format(self.condition[device_id], conditional_value))
             try:
                 self.command_status[device_id] = bool(conditional_value)
@@ -253,16 +265,16 @@ class CurtailmentSetting(object):
 
         if self.curtailment_method.lower() == 'equation':
             self.equation_args = parse_sympy(equation['equation_args'])
-            self.points = symbols(self.equation_args)
-            self.curtail_value_formula = parse_expr(parse_sympy(equation['operation']))
+            self.curtail_value_formula = compile_formula(parse_sympy(equation['operation']), self.equation_args)
+            self.points = self.curtail_value_formula.points
             self.maximum = equation['maximum']
             self.minimum = equation['minimum']
 
         if isinstance(load, dict):
             load_args = parse_sympy(load['equation_args'])
             actuator_args = load['equation_args']
-            self.load_points = symbols(load_args)
-            load_expr = parse_expr(parse_sympy(load['operation']))
+            load_expr = compile_formula(parse_sympy(load['operation']), load_args)
+            self.load_points = load_expr.points
             self.load = {
                 'load_equation': load_expr,
                 'load_equation_args': load_args,
@@ -312,23 +324,20 @@ class ConditionalCurtailment(object):
         self.conditional_args = parse_sympy(conditional_args)
         self.points = symbols(self.conditional_args)
         self.conditional_expr = parse_sympy(condition, condition=True)
-        self.conditional_curtail = parse_expr(self.conditional_expr)
+        self.conditional_curtail = compile_formula(self.conditional_expr, self.conditional_args)
         self.curtailment = CurtailmentSetting(**kwargs)
-        self.conditional_points = []
+        self.conditional_data = {}
 
     def check_condition(self):
-        if self.conditional_points:
-            value = self.conditional_curtail.subs(self.conditional_points)
+        if self.conditional_data:
+            value = evaluate_condition(self.conditional_curtail, self.conditional_data)
             _log.debug('{} (conditional_curtail) evaluated to {}'.format(self.conditional_expr, value))
         else:
             value = False
         return value
 
     def ingest_data(self, data):
-        point_list = []
-        for point in self.conditional_args:
-            point_list.append((point, data[point]))
-        self.conditional_points = point_list
+        self.conditional_data = dict((point, data[point]) for point in self.conditional_args)
 
     def get_curtailment(self):
         return self.curtailment.get_curtailment_dict()
@@ -0,0 +1,141 @@
+"""
+-*- coding: utf-8 -*- {{{
+vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+Copyright (c) 2017, Battelle Memorial Institute
+All rights reserved.
+
+1.  Battelle Memorial Institute (hereinafter Battelle) hereby grants
+    permission to any person or entity lawfully obtaining a copy of this
+    software and associated documentation files (hereinafter "the Software")
+    to redistribute and use the Software in source and binary forms, with or
+    without modification.  Such person or entity may use, copy, modify, merge,
+    publish, distribute, sublicense, and/or sell copies of the Software, and
+    may permit others to do so, subject to the following conditions:
+
+    -   Redistributions of source code must retain the above copyright notice,
+        this list of conditions and the following disclaimers.
+
+    -	Redistributions in binary form must reproduce the above copyright
+        notice, this list of conditions and the following disclaimer in the
+        documentation and/or other materials provided with the distribution.
+
+    -	Other than as used herein, neither the name Battelle Memorial Institute
+        or Battelle may be used in any form whatsoever without the express
+        written consent of Battelle.
+
+2.	THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+    AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+    IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+    ARE DISCLAIMED. IN NO EVENT SHALL BATTELLE OR CONTRIBUTORS BE LIABLE FOR
+    ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+    DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+    SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+    CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+    LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+    OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+    DAMAGE.
+
+The views and conclusions contained in the software and documentation are those
+of the authors and should not be interpreted as representing official policies,
+either expressed or implied, of the FreeBSD Project.
+
+This material was prepared as an account of work sponsored by an agency of the
+United States Government. Neither the United States Government nor the United
+States Department of Energy, nor Battelle, nor any of their employees, nor any
+jurisdiction or organization that has cooperated in the development of these
+materials, makes any warranty, express or implied, or assumes any legal
+liability or responsibility for the accuracy, completeness, or usefulness or
+any information, apparatus, product, software, or process disclosed, or
+represents that its use would not infringe privately owned rights.
+
+Reference herein to any specific commercial product, process, or service by
+trade name, trademark, manufacturer, or otherwise does not necessarily
+constitute or imply its endorsement, recommendation, or favoring by the
+United States Government or any agency thereof, or Battelle Memorial Institute.
+The views and opinions of authors expressed herein do not necessarily state or
+reflect those of the United States Government or any agency thereof.
+
+PACIFIC NORTHWEST NATIONAL LABORATORY
+operated by
+BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+under Contract DE-AC05-76RL01830
+}}}
+"""
+from collections import defaultdict
+
+
+class DeviceRegistry(object):
+    """
+    Index of ILC devices keyed by (device, token).
+
+    Tracks which (device, token, actuator) entries are on, as reported by
+    the device status conditions, and the curtailment records held for
+    curtailed devices ([device, token, revert value, revert priority,
+    time, actuator], the entries of ILCAgent.devices_curtailed) so joins
+    against the AHP score order are dictionary lookups.
+    """
+    def __init__(self):
+        self.on_devices = {}
+        self.curtailed = []
+        self.curtailed_by_key = defaultdict(list)
+        self.curtailed_by_device = defaultdict(list)
+
+    def update_status(self, device_name, actuator, command_status):
+        """
+        Record the on/off state of every token of a device.
+        :param device_name:
+        :param actuator:
+        :param command_status: dict of token to on state.
+        :return:
+        """
+        for token, state in command_status.items():
+            key = (device_name, token)
+            if state:
+                self.on_devices.setdefault(key, {})[actuator] = (device_name, token, actuator)
+            elif key in self.on_devices:
+                self.on_devices[key].pop(actuator, None)
+                if not self.on_devices[key]:
+                    del self.on_devices[key]
+
+    def get_on_devices(self, scored_devices):
+        """
+        Return the (device, token, actuator) entries that are on, in score order.
+        :param scored_devices: (device, token) pairs in score order.
+        :return:
+        """
+        on_devices = self.on_devices
+        return [entry for key in scored_devices if key in on_devices for entry in on_devices[key].values()]
+
+    def set_curtailed(self, records):
+        self.curtailed = records
+        self.curtailed_by_key = defaultdict(list)
+        self.curtailed_by_device = defaultdict(list)
+        for record in records:
+            self.curtailed_by_key[record[0], record[1]].append(record)
+            self.curtailed_by_device[record[0]].append(record)
+
+    def add_curtailed(self, record):
+        self.curtailed.append(record)
+        self.curtailed_by_key[record[0], record[1]].append(record)
+        self.curtailed_by_device[record[0]].append(record)
+
+    def get_curtailed(self, scored_devices):
+        """
+        Return the curtailment records in score order.
+        :param scored_devices: (device, token) pairs in score order.
+        :return:
+        """
+        by_key = self.curtailed_by_key
+        return [record for key in scored_devices if key in by_key for record in by_key[key]]
+
+    def is_curtailed(self, device_name, token, actuator):
+        return any(record[5] == actuator for record in self.curtailed_by_key.get((device_name, token), ()))
+
+    def get_device_records(self, device_name):
+        """
+        Return the curtailment records of every token of a device.
+        :param device_name:
+        :return:
+        """
+        return self.curtailed_by_device.get(device_name, [])
@@ -0,0 +1,156 @@
+"""
+-*- coding: utf-8 -*- {{{
+vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+Copyright (c) 2017, Battelle Memorial Institute
+All rights reserved.
+
+1.  Battelle Memorial Institute (hereinafter Battelle) hereby grants
+    permission to any person or entity lawfully obtaining a copy of this
+    software and associated documentation files (hereinafter "the Software")
+    to redistribute and use the Software in source and binary forms, with or
+    without modification.  Such person or entity may use, copy, modify, merge,
+    publish, distribute, sublicense, and/or sell copies of the Software, and
+    may permit others to do so, subject to the following conditions:
+
+    -   Redistributions of source code must retain the above copyright notice,
+        this list of conditions and the following disclaimers.
+
+    -	Redistributions in binary form must reproduce the above copyright
+        notice, this list of conditions and the following disclaimer in the
+        documentation and/or other materials provided with the distribution.
+
+    -	Other than as used herein, neither the name Battelle Memorial Institute
+        or Battelle may be used in any form whatsoever without the express
+        written consent of Battelle.
+
+2.	THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+    AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+    IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+    ARE DISCLAIMED. IN NO EVENT SHALL BATTELLE OR CONTRIBUTORS BE LIABLE FOR
+    ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+    DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+    SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+    CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+    LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+    OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+    DAMAGE.
+
+The views and conclusions contained in the software and documentation are those
+of the authors and should not be interpreted as representing official policies,
+either expressed or implied, of the FreeBSD Project.
+
+This material was prepared as an account of work sponsored by an agency of the
+United States Government. Neither the United States Government nor the United
+States Department of Energy, nor Battelle, nor any of their employees, nor any
+jurisdiction or organization that has cooperated in the development of these
+materials, makes any warranty, express or implied, or assumes any legal
+liability or responsibility for the accuracy, completeness, or usefulness or
+any information, apparatus, product, software, or process disclosed, or
+represents that its use would not infringe privately owned rights.
+
+Reference herein to any specific commercial product, process, or service by
+trade name, trademark, manufacturer, or otherwise does not necessarily
+constitute or imply its endorsement, recommendation, or favoring by the
+United States Government or any agency thereof, or Battelle Memorial Institute.
+The views and opinions of authors expressed herein do not necessarily state or
+reflect those of the United States Government or any agency thereof.
+
+PACIFIC NORTHWEST NATIONAL LABORATORY
+operated by
+BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+under Contract DE-AC05-76RL01830
+}}}
+"""
+import logging
+from sympy import symbols, lambdify
+from sympy.parsing.sympy_parser import parse_expr
+from volttron.platform.agent.utils import setup_logging
+
+setup_logging()
+_log = logging.getLogger(__name__)
+
+# Name spaces used by the generated functions.  Max and Min have no
+# equivalent in the math module.
+LAMBDIFY_MODULES = [{"Max": max, "Min": min}, "math"]
+
+_formula_cache = {}
+
+
+class Formula(object):
+    """
+    A sympy expression compiled once to a native python function.
+
+    Values are passed positionally in the order of operation_args, the
+    same order used to build the (point, value) lists given to expr.subs.
+    They are converted to float before calling the compiled function; values
+    that are not numeric fall back to symbolic substitution, since python 2
+    compares strings with numbers without raising (e.g. '0' > 0 is True).
+    Expressions that reference symbols missing from operation_args cannot
+    be compiled and always use symbolic substitution.
+    """
+    def __init__(self, operation, operation_args):
+        self.operation = operation
+        self.args = list(operation_args)
+        self.expr = parse_expr(operation)
+        self.points = symbols(self.args)
+        free_symbols = set(str(symbol) for symbol in self.expr.free_symbols)
+        if free_symbols.issubset(self.args):
+            self.func = lambdify(self.points, self.expr, modules=LAMBDIFY_MODULES)
+        else:
+            _log.warning("Formula {} uses points missing from {}, "
+                         "using symbolic evaluation.".format(operation, self.args))
+            self.func = self.symbolic_evaluate
+
+    def symbolic_evaluate(self, *values):
+        return self.expr.subs(zip(self.args, values))
+
+    def __call__(self, *values):
+        try:
+            numeric_values = [float(value) for value in values]
+        except (TypeError, ValueError):
+            return self.symbolic_evaluate(*values)
+        return self.func(*numeric_values)
+
+    def evaluate(self, point_list):
+        """
+        Evaluate from a list of (point, value) tuples ordered as operation_args.
+        :param point_list:
+        :return:
+        """
+        return self(*[value for _, value in point_list])
+
+    def evaluate_dict(self, data):
+        """
+        Evaluate using the operation_args values found in a device data dict.
+        :param data:
+        :return:
+        """
+        return self(*[data[point] for point in self.args])
+
+    def subs(self, point_list):
+        """
+        Symbolic substitution (reference implementation).
+        :param point_list:
+        :return:
+        """
+        return self.expr.subs(point_list)
+
+    def __str__(self):
+        return str(self.expr)
+
+
+def compile_formula(operation, operation_args):
+    """
+    Return the compiled Formula for the operation string and arguments.
+    Identical formulas (common across devices of the same type) share one
+    compiled function.
+    :param operation:
+    :param operation_args:
+    :return:
+    """
+    key = (operation, tuple(operation_args))
+    formula = _formula_cache.get(key)
+    if formula is None:
+        formula = _formula_cache[key] = Formula(operation, operation_args)
+    return formula
@@ -66,15 +66,14 @@ import os
 import sys
 import logging
 import math
+import time
+from collections import defaultdict
 from datetime import timedelta as td, datetime as dt
 from dateutil import parser
 import gevent
 import dateutil.tz
-from sympy.parsing.sympy_parser import parse_expr
-from sympy import symbols
 from volttron.platform.agent import utils
 from volttron.platform.messaging import topics
-from volttron.platform.agent.math_utils import mean
 from volttron.platform.agent.utils import (setup_logging, format_timestamp, get_aware_utc_now)
 from volttron.platform.vip.agent import Agent, Core
 from volttron.platform.jsonrpc import RemoteError
@@ -82,19 +81,39 @@ from ilc.ilc_matrices import (extract_criteria, calc_column_sums,
                               normalize_matrix, validate_input)
 from ilc.curtailment_handler import CurtailmentCluster, CurtailmentContainer
 from ilc.criteria_handler import CriteriaContainer, CriteriaCluster, parse_sympy
+from ilc.formula import compile_formula
+from ilc.average_power import AveragePower
+from ilc.actuation import ActuatorFanOut
+from ilc.device_registry import DeviceRegistry
 
 
 __version__ = "1.0.4"
 
+# Actuation timings use a monotonic clock where there is one (python 3).
+monotonic = getattr(time, "monotonic", time.time)
+
 setup_logging()
 _log = logging.getLogger(__name__)
 
+# Timeout in seconds of the revert_device and request_cancel_schedule calls issued when releasing all devices.
+RELEASE_ALL_TIMEOUT = 10.0
+
 
 class ILCAgent(Agent):
 
     def __init__(self, config_path, **kwargs):
         super(ILCAgent, self).__init__(**kwargs)
         config = utils.load_config(config_path)
+        self.configure(config)
+
+    def configure(self, config):
+        """
+        Build the criteria, curtailment and power averaging state from
+        an ILC configuration.  Kept separate from __init__ so the
+        offline replay harness can drive the agent logic without a
+        platform connection.
+        :param config: parsed ILC configuration dictionary.
+        """
         campus = config.get("campus", "")
         building = config.get("building", "")
 
@@ -199,9 +218,9 @@ class ILCAgent(Agent):
             try:
                 demand_operation = parse_sympy(demand_formula["operation"])
                 _log.debug("Demand calculation - expression: {}".format(demand_operation))
-                self.demand_expr = parse_expr(parse_sympy(demand_operation))
                 self.demand_args = parse_sympy(demand_formula["operation_args"])
-                self.demand_points = symbols(self.demand_args)
+                self.demand_expr = compile_formula(parse_sympy(demand_operation), self.demand_args)
+                self.demand_points = self.demand_expr.points
             except (KeyError, ValueError):
                 _log.debug("Missing 'operation_args' or 'operation' for setting demand formula!")
                 self.calculate_demand = False
@@ -246,6 +265,11 @@ class ILCAgent(Agent):
         self.stagger_release = config.get("stagger_release", False)
         self.stagger_off_time = config.get("stagger_off_time", True)
         need_actuator_schedule = config.get("need_actuator_schedule", False)
+        # Number of actuator RPC calls issued at once for a curtailment or release group (1 is sequential).
+        self.actuator_concurrency = max(1, int(config.get("actuator_concurrency", 1)))
+        self.actuator_timeout = float(config.get("actuator_timeout", 5.0))
+        # Point values from device publishes newer than this are used instead of reading them from the actuator.
+        self.device_data_max_age = td(minutes=config.get("device_data_max_age", 5.0))
 
         self.running_ahp = False
         self.next_curtail_confirm = None
@@ -254,8 +278,13 @@ class ILCAgent(Agent):
         self.reset_curtail_count = None
         self.kill_signal_received = False
         self.scheduled_devices = set()
-        self.devices_curtailed = []
-        self.bldg_power = []
+        self.schedule_tasks = {}
+        self.schedule_task_count = 0
+        self.device_data = {}
+        self.multiple_points_unsupported = set()
+        self.registry = DeviceRegistry()
+        self.last_date = (None, None)
+        self.bldg_power = AveragePower(self.average_building_power_window)
         self.device_group_size = None
         self.current_stagger = None
         self.next_release = None
@@ -263,6 +292,20 @@ class ILCAgent(Agent):
         self.tasks = {}
         self.tz = None
         self.simulation_running = config.get("simulation_running", False)
+        self.actuation_stats = {"curtail_time": 0.0, "curtail_group_times": [], "release_time": 0.0, "failures": 0}
+        self.fan_out = ActuatorFanOut(self.vip.rpc, self.actuator_concurrency, self.actuator_timeout)
+
+    @property
+    def devices_curtailed(self):
+        """
+        Curtailment records ([device, token, revert value, revert priority,
+        time, actuator]) in the order the devices were curtailed.
+        """
+        return self.registry.curtailed
+
+    @devices_curtailed.setter
+    def devices_curtailed(self, records):
+        self.registry.set_curtailed(records)
 
     @Core.receiver("onstart")
     def starting_base(self, sender, **kwargs):
@@ -331,7 +374,7 @@ class ILCAgent(Agent):
         device_name = self.device_topic_map[topic]
         data = message[0]
         meta = message[1]
-        now = parser.parse(headers["Date"])
+        now = self.parse_date(headers["Date"])
         current_time_str = format_timestamp(now)
         parsed_data = parse_sympy(data)
 
@@ -343,9 +386,23 @@ class ILCAgent(Agent):
 
         self.criteria.get_device(device_name[0]).ingest_data(now, parsed_data)
         self.curtailment.get_device(device_name).ingest_data(parsed_data)
+        self.registry.update_status(device_name[0], device_name[1],
+                                    self.curtailment.get_device(device_name).command_status)
+        self.device_data[device_name[0]] = (now, data)
         self.create_device_status_publish(current_time_str, device_name, data, topic, meta)
         # self.create_curtailment_publish(current_time_str, device_name, meta)
 
+    def parse_date(self, date_str):
+        """
+        Parse a message Date header.  Devices scraped together publish the
+        same Date header so the last parsed header is reused.
+        :param date_str:
+        :return:
+        """
+        if date_str != self.last_date[0]:
+            self.last_date = (date_str, parser.parse(date_str))
+        return self.last_date[1]
+
     def create_curtailment_publish(self, current_time_str, device_name, meta):
         try:
             headers = {
@@ -473,28 +530,8 @@ class ILCAgent(Agent):
         if self.simulation_running:
             self.check_schedule(current_time)
 
-        if self.bldg_power:
-            current_average_window = self.bldg_power[-1][0] - self.bldg_power[0][0] + td(seconds=15)
-        else:
-            current_average_window = td(minutes=0)
-
-        if current_average_window >= self.average_building_power_window and current_power > 0:
-            self.bldg_power.append((current_time, current_power))
-            self.bldg_power.pop(0)
-        elif current_power > 0:
-            self.bldg_power.append((current_time, current_power))
-
-        smoothing_constant = 2.0/(len(self.bldg_power) + 1.0)*2.0 if self.bldg_power else 1.0
-        smoothing_constant = smoothing_constant if smoothing_constant <= 1.0 else 1.0
-        power_sort = list(self.bldg_power)
-        power_sort.sort(reverse=True)
-        average_power = 0
-
-        for n in xrange(len(self.bldg_power)):
-            average_power += power_sort[n][1] * smoothing_constant * (1.0 - smoothing_constant) ** n
-
-        norm_list = [float(i[1]) for i in self.bldg_power]
-        normal_average_power = mean(norm_list) if norm_list else 0.0
+        average_power, normal_average_power, current_average_window = self.bldg_power.add(current_time,
+                                                                                           current_power)
 
         _log.debug("Reported time: {} - instantaneous power: {}".format(current_time, current_power))
         _log.debug(
@@ -525,18 +562,14 @@ class ILCAgent(Agent):
             _log.debug("Reading building power data.")
             if self.calculate_demand:
                 try:
-                    demand_point_list = []
-                    for point in self.demand_args:
-                        _log.debug("Demand calculation - point: {} - value: {}".format(point, data[point]))
-                        demand_point_list.append((point, data[point]))
-                    current_power = self.demand_expr.subs(demand_point_list)
+                    current_power = self.demand_expr.evaluate_dict(data)
                     _log.debug("Demand calculation - calculated power: {}".format(current_power))
                 except:
                     current_power = float(data[self.power_point])
                     _log.debug("Demand calculation - exception using meter value: {}".format(current_power))
             else:
                 current_power = float(data[self.power_point])
-            current_time = parser.parse(headers["Date"])
+            current_time = self.parse_date(headers["Date"])
             average_power, normal_average_power, current_average_window = self.calculate_average_power(current_power,
                                                                                                        current_time)
 
@@ -634,11 +667,8 @@ class ILCAgent(Agent):
         if self.demand_limit is not None and bldg_power > self.demand_limit:
             result = "Current load of {} kW exceeds demand limit of {} kW.".format(bldg_power, self.demand_limit)
             scored_devices = self.criteria.get_score_order()
-            on_devices = self.curtailment.get_on_devices()
-            score_order = [device for scored in scored_devices for device in on_devices if scored in [(device[0], device[1])]]
+            score_order = self.registry.get_on_devices(scored_devices)
 
-            _log.debug("Scored devices: {}".format(scored_devices))
-            _log.debug("On devices: {}".format(on_devices))
             _log.debug("Scored and on devices: {}".format(score_order))
 
             if not score_order:
@@ -653,6 +683,7 @@ class ILCAgent(Agent):
     def actuator_request(self, score_order):
         """
         Request schedule to interact with devices via rpc call to actuator agent.
+        Devices are reserved with one schedule request per actuator.
         :param score_order: ahp priority for devices (curtailment priority).
         :return:
         """
@@ -660,46 +691,89 @@ class ILCAgent(Agent):
         start_time_str = format_timestamp(current_time)
         end_curtail_time = current_time + self.longest_possible_curtail + self.actuator_schedule_buffer
         end_time_str = format_timestamp(end_curtail_time)
-        curtailable_device = []
 
         already_handled = dict((device[0], True) for device in self.scheduled_devices)
+        to_schedule = []
 
-        for item in score_order:
+        for device, token, device_actuator in score_order:
+            if device in already_handled:
+                _log.debug("Skipping reserve device (previously reserved): " + device)
+            elif (device, device_actuator) not in to_schedule:
+                _log.debug("Reserving device: {}".format(device))
+                to_schedule.append((device, device_actuator))
 
-            device, token, device_actuator = item
+        if to_schedule and not self.kill_signal_received:
+            self.request_schedules(to_schedule, start_time_str, end_time_str, already_handled)
 
-            _log.debug("Reserving device: {}".format(device))
+        return [item for item in score_order if already_handled.get(item[0], False)]
 
-            if device in already_handled:
-                if already_handled[device]:
-                    _log.debug("Skipping reserve device (previously reserved): " + device)
-                    curtailable_device.append(item)
+    def request_schedules(self, devices, start_time_str, end_time_str, already_handled):
+        """
+        Reserve devices with one request_new_schedule call per actuator.  If an
+        actuator rejects a multi-device request the devices are requested one
+        at a time so one unavailable device does not block the others.
+        :param devices: list of (device, actuator) to reserve.
+        :param start_time_str:
+        :param end_time_str:
+        :param already_handled: dict of device -> reserved, updated in place.
+        :return:
+        """
+        by_actuator = defaultdict(list)
+        for device, device_actuator in devices:
+            by_actuator[device_actuator].append(device)
+
+        requests = []
+        for device_actuator, device_names in by_actuator.items():
+            if len(device_names) == 1:
+                task_id = device_names[0]
+            else:
+                self.schedule_task_count += 1
+                task_id = "{}_{}".format(self.agent_id, self.schedule_task_count)
+            schedule_request = [[self.base_rpc_path(unit=device, point=""), start_time_str, end_time_str]
+                                for device in device_names]
+            requests.append(((task_id, device_actuator, tuple(device_names)), device_actuator, "request_new_schedule",
+                             [self.agent_id, task_id, "HIGH", schedule_request]))
+
+        retry = []
+        for result in self.fan_out.call(requests):
+            task_id, device_actuator, device_names = result.key
+            if len(device_names) > 1 and (not result.success or result.value.get("result") == "FAILURE"):
+                _log.debug("Bulk schedule request on {} failed ({}), "
+                           "requesting devices individually.".format(device_actuator, result.error or result.value))
+                retry.extend(((device, device_actuator, (device,)), device_actuator, "request_new_schedule",
+                              [self.agent_id, device, "HIGH",
+                               [[self.base_rpc_path(unit=device, point=""), start_time_str, end_time_str]]])
+                             for device in device_names)
                 continue
+            self.handle_schedule_result(result, already_handled)
 
-            curtailed_device = self.base_rpc_path(unit=device, point="")
-            schedule_request = [[curtailed_device, start_time_str, end_time_str]]
-            try:
-                if self.kill_signal_received:
-                    break
-                result = self.vip.rpc.call(device_actuator, "request_new_schedule",
-                                           self.agent_id, device, "HIGH", schedule_request).get(timeout=5)
-            except RemoteError as ex:
-                _log.warning("Failed to schedule device {} (RemoteError): {}".format(device, str(ex)))
-                continue
+        for result in self.fan_out.call(retry):
+            self.handle_schedule_result(result, already_handled)
 
-            if result["result"] == "FAILURE":
-                _log.warn("Failed to schedule device (unavailable) " + device)
+    def handle_schedule_result(self, result, already_handled):
+        task_id, device_actuator, device_names = result.key
+        if not result.success:
+            _log.warning("Failed to schedule device(s) {}: {}".format(", ".join(device_names), result.error))
+            return
+        if result.value["result"] == "FAILURE":
+            _log.warn("Failed to schedule device (unavailable) " + ", ".join(device_names))
+            for device in device_names:
                 already_handled[device] = False
-            else:
-                already_handled[device] = True
-                self.scheduled_devices.add((device, device_actuator))
-                curtailable_device.append(item)
-
-        return curtailable_device
+            return
+        self.schedule_tasks[task_id, device_actuator] = list(device_names)
+        for device in device_names:
+            already_handled[device] = True
+            self.scheduled_devices.add((device, device_actuator))
 
     def curtail(self, scored_devices, bldg_power, current_time):
         """
         Curtail loads by turning off device (or device components),
+        Devices are handled in groups of actuator_concurrency: the points
+        needed to compute the curtailment of every device in the group are
+        read at once, devices are selected in score order until the
+        estimated curtailment covers the need and the selected set_point
+        calls are issued at once.  Devices whose reads or writes fail are
+        skipped and the next group makes up the difference.
         :param scored_devices:
         :param bldg_power:
         :param now:
@@ -707,11 +781,7 @@ class ILCAgent(Agent):
         """
         need_curtailed = bldg_power - self.demand_limit
         est_curtailed = 0.0
-        remaining_devices = scored_devices[:]
-        for device in self.devices_curtailed:
-            current_tuple = (device[0], device[1], device[5])
-            if current_tuple in remaining_devices:
-                remaining_devices.remove(current_tuple)
+        remaining_devices = [device for device in scored_devices if not self.registry.is_curtailed(*device)]
 
         if not self.running_ahp:
             _log.info("Starting AHP")
@@ -726,31 +796,177 @@ class ILCAgent(Agent):
         self.reset_curtail_count = self.curtail_end + self.reset_curtail_count_time
         self.next_curtail_confirm = current_time + self.curtail_confirm
 
-        for device in remaining_devices:
+        failures = 0
+        group_times = []
+        while remaining_devices and est_curtailed < need_curtailed:
+            if self.kill_signal_received:
+                break
+            group_start = monotonic()
+            group = remaining_devices[:self.actuator_concurrency]
+            remaining_devices = remaining_devices[self.actuator_concurrency:]
+            group_parms, read_failures = self.determine_group_curtail_parms(group, current_time)
+            failures += read_failures
+
+            selected = []
+            planned = est_curtailed
+            for index, (device, parms) in enumerate(group_parms):
+                if planned >= need_curtailed:
+                    # Not needed if every selected write succeeds, retry with the next group otherwise.
+                    remaining_devices = [item for item, _ in group_parms[index:]] + remaining_devices
+                    break
+                selected.append((device, parms))
+                planned += parms[2]
+
+            requests = [(device, device[2], "set_point", ["ilc_agent", parms[0], parms[1]])
+                        for device, parms in selected]
+            for (device, parms), result in zip(selected, self.fan_out.call(requests)):
+                device_name, device_id, actuator = device
+                curtail_point, curtail_value, curtail_load, revert_priority, revert_value = parms
+                if not result.success:
+                    _log.warning("Failed to set {} to {}: {}".format(curtail_point, curtail_value, result.error))
+                    failures += 1
+                    continue
+
+                est_curtailed += curtail_load
+                self.curtailment.get_device((device_name, actuator)).increment_curtail(device_id)
+                self.registry.add_curtailed(
+                    [device_name, device_id, revert_value, revert_priority, format_timestamp(current_time), actuator]
+                )
+
+            group_times.append(monotonic() - group_start)
+            _log.debug("Curtailment group actuation time: {} s".format(group_times[-1]))
+
+        self.actuation_stats["curtail_group_times"] = group_times
+        self.actuation_stats["curtail_time"] = sum(group_times)
+        self.actuation_stats["failures"] = failures
+        _log.debug("Curtailment actuation failures: {}".format(failures))
+
+    def curtail_read_points(self, curtail):
+        """
+        Points that must be read from the actuator to compute the curtailment.
+        :param curtail:
+        :return:
+        """
+        points = []
+        if isinstance(curtail["load"], dict):
+            points.extend(curtail["load"]["load_equation_args"])
+        points.append(curtail["point"])
+        if curtail["curtailment_method"].lower() == "equation":
+            points.extend(curtail["curtail_equation_args"])
+        unique_points = []
+        for point in points:
+            if point not in unique_points:
+                unique_points.append(point)
+        return unique_points
+
+    def determine_group_curtail_parms(self, group, current_time):
+        """
+        Read the points for every device in the group at once and compute the
+        curtailment parameters.  Devices with a failed read are dropped.
+        :param group: list of (device, token, actuator) in score order.
+        :param current_time:
+        :return: list of (device, curtail parameters), number of failed reads.
+        """
+        curtailments = []
+        device_points = []
+        for device in group:
             device_name, device_id, actuator = device
             curtail = self.curtailment.get_device((device_name, actuator)).get_curtailment(device_id)
-            curtail_point, curtail_value, curtail_load, revert_priority, revert_value = self.determine_curtail_parms(curtail, device)
-            try:
-                if self.kill_signal_received:
-                    break
-                result = self.vip.rpc.call(actuator, "set_point", "ilc_agent", curtail_point, curtail_value).get(timeout=5)
-            except RemoteError as ex:
-                _log.warning("Failed to set {} to {}: {}".format(curtail_point, curtail_value, str(ex)))
+            curtailments.append(curtail)
+            device_points.append((device, self.curtail_read_points(curtail)))
+
+        point_values, failed, failures = self.read_device_points(device_points, current_time)
+
+        group_parms = []
+        for device, curtail in zip(group, curtailments):
+            if device in failed:
                 continue
+            group_parms.append((device, self.determine_curtail_parms(curtail, device, point_values[device])))
+        return group_parms, failures
 
-            est_curtailed += curtail_load
-            self.curtailment.get_device((device_name, actuator)).increment_curtail(device_id)
-            self.devices_curtailed.append(
-                [device_name, device_id, revert_value, revert_priority, format_timestamp(current_time), actuator]
-            )
-            if est_curtailed >= need_curtailed:
-                break
+    def cached_device_data(self, device_name, current_time):
+        """
+        Return the last data published by the device if it is recent enough
+        to stand in for an actuator read.
+        :param device_name:
+        :param current_time:
+        :return:
+        """
+        data_time, data = self.device_data.get(device_name, (None, {}))
+        try:
+            if data_time is None or current_time - data_time > self.device_data_max_age:
+                return {}
+        except TypeError:
+            # naive and aware timestamps cannot be compared.
+            return {}
+        return data
+
+    def read_device_points(self, device_points, current_time):
+        """
+        Read the current value of points on many devices.  Points published
+        by the device within device_data_max_age come from the last device
+        publish.  The rest are read with one get_multiple_points call per
+        actuator, falling back to one get_point call per point for actuators
+        that do not support get_multiple_points.
+        :param device_points: list of ((device, token, actuator), [points]).
+        :param current_time:
+        :return: dict of device -> {point: value}, set of devices with a failed read, number of failed reads.
+        """
+        point_values = dict((device, {}) for device, _ in device_points)
+        to_read = defaultdict(list)
+        for device, points in device_points:
+            cached = self.cached_device_data(device[0], current_time)
+            for point in points:
+                if point in cached:
+                    point_values[device][point] = cached[point]
+                else:
+                    to_read[device[2]].append((device, point, self.base_rpc_path(unit=device[0], point=point)))
 
-    def determine_curtail_parms(self, curtail, device_dict):
+        single_reads = []
+        multiple_requests = []
+        for actuator, reads in to_read.items():
+            if actuator in self.multiple_points_unsupported:
+                single_reads.extend(reads)
+            else:
+                multiple_requests.append((actuator, actuator, "get_multiple_points", [[read[2] for read in reads]]))
+
+        failed = set()
+        failures = 0
+        for result in self.fan_out.call(multiple_requests):
+            reads = to_read[result.key]
+            if not result.success:
+                if not result.timed_out:
+                    _log.info("get_multiple_points not available on {}, reading points individually: "
+                              "{}".format(result.key, result.error))
+                    self.multiple_points_unsupported.add(result.key)
+                single_reads.extend(reads)
+                continue
+            values, errors = result.value
+            for device, point, topic in reads:
+                if topic in values:
+                    point_values[device][point] = values[topic]
+                else:
+                    _log.warning("Failed to read {}: {}".format(topic, errors.get(topic)))
+                    failed.add(device)
+                    failures += 1
+
+        requests = [((device, point), device[2], "get_point", [topic]) for device, point, topic in single_reads]
+        for result in self.fan_out.call(requests):
+            device, point = result.key
+            if result.success:
+                point_values[device][point] = result.value
+            else:
+                _log.warning("Failed to read {} on {}: {}".format(point, device[0], result.error))
+                failed.add(device)
+                failures += 1
+        return point_values, failed, failures
+
+    def determine_curtail_parms(self, curtail, device_dict, point_values):
         """
         Pull stored curtail parameters for devices.
         :param curtail:
         :param device_dict:
+        :param point_values: current values of the points in curtail_read_points.
         :return:
         """
         device, token, device_actuator = device_dict
@@ -763,28 +979,17 @@ class ILCAgent(Agent):
 
         if isinstance(curtail_load, dict):
             load_equation = curtail_load["load_equation"]
-            load_point_values = []
-
-            for point in curtail_load["load_equation_args"]:
-                point_to_get = self.base_rpc_path(unit=device, point=point)
-                value = self.vip.rpc.call(device_actuator, "get_point", point_to_get).get(timeout=5)
-                load_point_values.append((point, value))
-            curtail_load = load_equation.subs(load_point_values)
+            load_point_values = [(point, point_values[point]) for point in curtail_load["load_equation_args"]]
+            curtail_load = load_equation.evaluate(load_point_values)
 
-        revert_value = self.vip.rpc.call(device_actuator, "get_point", curtail_point).get(timeout=5)
+        revert_value = point_values[curtail_pt]
 
         if curtailment_method.lower() == "offset":
             curtail_value = revert_value + curtail["offset"]
         elif curtailment_method.lower() == "equation":
             equation = curtail["curtail_equation"]
-            equation_point_values = []
-
-            for point in curtail["curtail_equation_args"]:
-                point_get = self.base_rpc_path(unit=device, point=point)
-                value = self.vip.rpc.call(device_actuator, "get_point", point_get).get(timeout=5)
-                equation_point_values.append((point, value))
-
-            curtail_value = float(equation.subs(equation_point_values))
+            equation_point_values = [(point, point_values[point]) for point in curtail["curtail_equation_args"]]
+            curtail_value = float(equation.evaluate(equation_point_values))
         else:
             curtail_value = curtail["value"]
 
@@ -877,7 +1082,7 @@ class ILCAgent(Agent):
         _log.info("Resetting Devices: {}".format(self.devices_curtailed))
 
         scored_devices = self.criteria.get_score_order()
-        curtailed = [device for scored in scored_devices for device in self.devices_curtailed if scored in [(device[0], device[1])]]
+        curtailed = self.registry.get_curtailed(scored_devices)
 
         _log.debug("Curtailed devices: {}".format(self.devices_curtailed))
 
@@ -886,6 +1091,7 @@ class ILCAgent(Agent):
         index_counter = 0
         _log.debug("Curtailed devices for release reverse sort: {}".format(currently_curtailed))
 
+        requests = []
         for item in range(self.device_group_size.pop(0)):
             device, device_id, revert_val, revert_priority, modified_time, actuator = curtailed_iterate[item]
             curtail = self.curtailment.get_device((device, actuator)).get_curtailment(device_id)
@@ -895,22 +1101,30 @@ class ILCAgent(Agent):
 
             _log.debug("Returned revert value: {}".format(revert_value))
 
-            try:
-                if revert_value is not None:
-                    result = self.vip.rpc.call(actuator, "set_point", "ilc", curtailed_point, revert_value).get(timeout=5)
-                    _log.debug("Reverted point: {} to value: {}".format(curtailed_point, revert_value))
-                else:
-                    result = self.vip.rpc.call(actuator, "revert_point", "ilc", curtailed_point).get(timeout=5)
-                    _log.debug("Reverted point: {} - Result: {}".format(curtailed_point, result))
-                if currently_curtailed:
-                    _log.debug("Removing from curtailed list: {} ".format(curtailed_iterate[item]))
-                    self.curtailment.get_device((device, actuator)).reset_curtail_status(device_id)
-                    index = curtailed_iterate.index(curtailed_iterate[item]) - index_counter
-                    currently_curtailed.pop(index)
-                    index_counter += 1
-            except RemoteError as ex:
-                _log.warning("Failed to revert point {} (RemoteError): {}".format(curtailed_point, str(ex)))
+            if revert_value is not None:
+                requests.append((item, actuator, "set_point", ["ilc", curtailed_point, revert_value]))
+            else:
+                requests.append((item, actuator, "revert_point", ["ilc", curtailed_point]))
+
+        start = monotonic()
+        for request, result in zip(requests, self.fan_out.call(requests)):
+            item, actuator, method, args = request
+            device, device_id = curtailed_iterate[item][:2]
+            curtailed_point = args[1]
+            if not result.success:
+                _log.warning("Failed to revert point {}: {}".format(curtailed_point, result.error))
                 continue
+            if method == "set_point":
+                _log.debug("Reverted point: {} to value: {}".format(curtailed_point, args[2]))
+            else:
+                _log.debug("Reverted point: {} - Result: {}".format(curtailed_point, result.value))
+            if currently_curtailed:
+                _log.debug("Removing from curtailed list: {} ".format(curtailed_iterate[item]))
+                self.curtailment.get_device((device, actuator)).reset_curtail_status(device_id)
+                index = curtailed_iterate.index(curtailed_iterate[item]) - index_counter
+                currently_curtailed.pop(index)
+                index_counter += 1
+        self.actuation_stats["release_time"] = monotonic() - start
         self.devices_curtailed = currently_curtailed
 
     def get_revert_value(self, device, revert_priority, revert_value):
@@ -922,13 +1136,10 @@ class ILCAgent(Agent):
         :param revert_value:
         :return:
         """
-        current_device_list = []
         if revert_priority is None:
             return None
 
-        for curtailed in self.devices_curtailed:
-            if curtailed[0] == device:
-                current_device_list.append(curtailed)
+        current_device_list = self.registry.get_device_records(device)
 
         if len(current_device_list) <= 1:
             return None
@@ -936,9 +1147,8 @@ class ILCAgent(Agent):
         index_value = max(current_device_list, key=lambda t: t[2])
         return_value = index_value[2]
         _log.debug("Stored revert value: {} for device: {}".format(return_value, device))
-        curtail_set_index = self.devices_curtailed.index(index_value)
-        self.devices_curtailed[curtail_set_index][2] = revert_value
-        self.devices_curtailed[curtail_set_index][3] = revert_priority
+        index_value[2] = revert_value
+        index_value[3] = revert_priority
 
         return return_value
 
@@ -952,14 +1162,23 @@ class ILCAgent(Agent):
         self.reset_all_devices()
 
     def reset_all_devices(self):
-        for device in self.scheduled_devices:
-            release_all_device = self.base_rpc_path(unit=device[0], point="")
-            try:
-                release_all = self.vip.rpc.call(device[1], "revert_device", "ilc", release_all_device).get(timeout=10)
-                _log.debug("Revert device: {} with return value {}".format(release_all_device, release_all))
-            except RemoteError as ex:
-                _log.warning("Failed revert all on device {} (RemoteError): {}".format(release_all_device, str(ex)))
-            result = self.vip.rpc.call(device[1], "request_cancel_schedule", self.agent_id, device[0]).get(timeout=10)
+        devices = list(self.scheduled_devices)
+        revert_requests = [(device, device[1], "revert_device", ["ilc", self.base_rpc_path(unit=device[0], point="")])
+                           for device in devices]
+        for result in self.fan_out.call(revert_requests, timeout=RELEASE_ALL_TIMEOUT):
+            release_all_device = self.base_rpc_path(unit=result.key[0], point="")
+            if result.success:
+                _log.debug("Revert device: {} with return value {}".format(release_all_device, result.value))
+            else:
+                _log.warning("Failed revert all on device {}: {}".format(release_all_device, result.error))
+
+        cancel_requests = [(task, task[1], "request_cancel_schedule", [self.agent_id, task[0]])
+                           for task in self.schedule_tasks]
+        for result in self.fan_out.call(cancel_requests, timeout=RELEASE_ALL_TIMEOUT):
+            if not result.success:
+                _log.warning("Failed to cancel schedule {} for device(s) {}: "
+                             "{}".format(result.key[0], self.schedule_tasks[result.key], result.error))
+        self.schedule_tasks = {}
         self.scheduled_devices = set()
 
     def create_application_status(self, current_time_str, result):
@@ -986,11 +1205,19 @@ class ILCAgent(Agent):
             application_message = [
                 {
                     "Result": result,
-                    "ApplicationState": application_state
+                    "ApplicationState": application_state,
+                    "CurtailActuationTime": self.actuation_stats["curtail_time"],
+                    "CurtailGroupActuationTimes": self.actuation_stats["curtail_group_times"],
+                    "ReleaseActuationTime": self.actuation_stats["release_time"],
+                    "ActuationFailures": self.actuation_stats["failures"]
                 },
                 {
                     "Result": {"tz": self.power_meta["tz"], "type": "string", "units": "None"},
-                    "ApplicationState": {"tz": self.power_meta["tz"], "type": "string", "units": "None"}
+                    "ApplicationState": {"tz": self.power_meta["tz"], "type": "string", "units": "None"},
+                    "CurtailActuationTime": {"tz": self.power_meta["tz"], "type": "float", "units": "seconds"},
+                    "CurtailGroupActuationTimes": {"tz": self.power_meta["tz"], "type": "array", "units": "seconds"},
+                    "ReleaseActuationTime": {"tz": self.power_meta["tz"], "type": "float", "units": "seconds"},
+                    "ActuationFailures": {"tz": self.power_meta["tz"], "type": "integer", "units": "None"}
                 }
             ]
             self.vip.pubsub.publish("pubsub", self.ilc_topic, headers=headers, message=application_message).get(timeout=15.0)
@@ -1016,11 +1243,11 @@ class ILCAgent(Agent):
                 previous_value = data[curtail_pt]
                 control_time = None
                 device_state = "Inactive"
-                for item in self.devices_curtailed:
-                    if device_name[0] == item[0]:
-                        previous_value = item[2]
-                        control_time = item[4]
-                        device_state = "Active"
+                records = self.registry.get_device_records(device_name[0])
+                if records:
+                    previous_value = records[-1][2]
+                    control_time = records[-1][4]
+                    device_state = "Active"
 
                 headers = {
                     "Date": current_time_str,
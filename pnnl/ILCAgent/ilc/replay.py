@@ -0,0 +1,547 @@
+"""
+-*- coding: utf-8 -*- {{{
+vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+Copyright (c) 2017, Battelle Memorial Institute
+All rights reserved.
+
+1.  Battelle Memorial Institute (hereinafter Battelle) hereby grants
+    permission to any person or entity lawfully obtaining a copy of this
+    software and associated documentation files (hereinafter "the Software")
+    to redistribute and use the Software in source and binary forms, with or
+    without modification.  Such person or entity may use, copy, modify, merge,
+    publish, distribute, sublicense, and/or sell copies of the Software, and
+    may permit others to do so, subject to the following conditions:
+
+    -   Redistributions of source code must retain the above copyright notice,
+        this list of conditions and the following disclaimers.
+
+    -	Redistributions in binary form must reproduce the above copyright
+        notice, this list of conditions and the following disclaimer in the
+        documentation and/or other materials provided with the distribution.
+
+    -	Other than as used herein, neither the name Battelle Memorial Institute
+        or Battelle may be used in any form whatsoever without the express
+        written consent of Battelle.
+
+2.	THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+    AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+    IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+    ARE DISCLAIMED. IN NO EVENT SHALL BATTELLE OR CONTRIBUTORS BE LIABLE FOR
+    ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+    DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+    SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+    CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+    LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+    OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+    DAMAGE.
+
+The views and conclusions contained in the software and documentation are those
+of the authors and should not be interpreted as representing official policies,
+either expressed or implied, of the FreeBSD Project.
+
+This material was prepared as an account of work sponsored by an agency of the
+United States Government. Neither the United States Government nor the United
+States Department of Energy, nor Battelle, nor any of their employees, nor any
+jurisdiction or organization that has cooperated in the development of these
+materials, makes any warranty, express or implied, or assumes any legal
+liability or responsibility for the accuracy, completeness, or usefulness or
+any information, apparatus, product, software, or process disclosed, or
+represents that its use would not infringe privately owned rights.
+
+Reference herein to any specific commercial product, process, or service by
+trade name, trademark, manufacturer, or otherwise does not necessarily
+constitute or imply its endorsement, recommendation, or favoring by the
+United States Government or any agency thereof, or Battelle Memorial Institute.
+The views and opinions of authors expressed herein do not necessarily state or
+reflect those of the United States Government or any agency thereof.
+
+PACIFIC NORTHWEST NATIONAL LABORATORY
+operated by
+BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+under Contract DE-AC05-76RL01830
+}}}
+"""
+"""
+Offline replay of historical meter and device data through the ILC logic.
+
+The ILCAgent criteria, curtailment and power averaging code is driven
+directly from CSV files: no platform, message bus or actuator agent is
+needed.  Actuator calls go to a FakeActuator (or any subclass of it) and
+publishes are dropped, so a replay runs as fast as the ILC logic itself.
+
+Every CSV has a timestamp column and one column per point.  The meter
+CSV holds the power meter points, one device CSV per curtailable device
+holds the points that device would publish on its "all" topic.
+
+Usage: python -m ilc.replay ilc_config --meter meter.csv --device RTU1=rtu1.csv [--device ...]
+"""
+import sys
+import csv
+import json
+import time
+import heapq
+import logging
+import argparse
+from collections import OrderedDict
+from datetime import datetime
+from dateutil import parser
+from volttron.platform.agent import utils
+from volttron.platform.agent.utils import setup_logging, format_timestamp
+from ilc.ilc_agent import ILCAgent
+
+setup_logging()
+_log = logging.getLogger(__name__)
+
+DEVICE_DATA = 0
+METER_DATA = 1
+
+# Formats tried with strptime before falling back to dateutil for every row.
+TIMESTAMP_FORMATS = ("%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S.%f", "%Y-%m-%d %H:%M:%S.%f",
+                     "%m/%d/%Y %H:%M:%S", "%m/%d/%Y %H:%M")
+
+STAGES = ("device_data", "meter_data", "averaging", "scoring", "scheduling", "curtail", "release", "release_all")
+
+
+class ReplayResult(object):
+    """
+    Completed RPC or publish result with the AsyncResult get interface.
+    """
+    __slots__ = ("value", "error")
+
+    def __init__(self, value=None, error=None):
+        self.value = value
+        self.error = error
+
+    def get(self, timeout=None):
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class FakeActuator(object):
+    """
+    In-memory stand in for the actuator agent.
+
+    Point values come from the replayed device data.  Written values are
+    kept as overrides, reported back to the ILC in the device data, until
+    the point or device is reverted.  Every write is logged with the replay
+    time.  Subclass to model actuator failures or device responses.
+    """
+    def __init__(self):
+        self.values = {}
+        self.overrides = {}
+        self.writes = []
+        self.now = None
+
+    def update(self, values):
+        """
+        Store the latest replayed point values.
+        :param values: dict of point topic to value.
+        :return:
+        """
+        self.values.update(values)
+
+    def get_point(self, topic):
+        if topic in self.overrides:
+            return self.overrides[topic]
+        return self.values[topic]
+
+    def get_multiple_points(self, topics):
+        values = {}
+        errors = {}
+        for topic in topics:
+            try:
+                values[topic] = self.get_point(topic)
+            except KeyError:
+                errors[topic] = "No data replayed for {}".format(topic)
+        return values, errors
+
+    def set_point(self, requester_id, topic, value):
+        self.overrides[topic] = value
+        self.writes.append((self.now, "set_point", topic, value))
+        return value
+
+    def revert_point(self, requester_id, topic):
+        self.overrides.pop(topic, None)
+        self.writes.append((self.now, "revert_point", topic, None))
+
+    def revert_device(self, requester_id, device_topic):
+        for topic in [topic for topic in self.overrides if topic.startswith(device_topic)]:
+            del self.overrides[topic]
+        self.writes.append((self.now, "revert_device", device_topic, None))
+
+    def request_new_schedule(self, requester_id, task_id, priority, requests):
+        return {"result": "SUCCESS", "data": {}, "info": ""}
+
+    def request_cancel_schedule(self, requester_id, task_id):
+        return {"result": "SUCCESS", "data": {}, "info": ""}
+
+
+class ReplayRPC(object):
+    """
+    vip.rpc replacement that dispatches actuator calls to a FakeActuator.
+    """
+    def __init__(self, actuator):
+        self.actuator = actuator
+        self.calls = 0
+
+    def call(self, peer, method, *args):
+        self.calls += 1
+        try:
+            return ReplayResult(getattr(self.actuator, method)(*args))
+        except Exception as ex:
+            return ReplayResult(error=ex)
+
+
+class ReplayPubSub(object):
+    """
+    vip.pubsub replacement that counts and drops publishes.
+    """
+    def __init__(self):
+        self.published = 0
+
+    def publish(self, peer, topic, headers=None, message=None):
+        self.published += 1
+        return ReplayResult()
+
+    def subscribe(self, *args, **kwargs):
+        return ReplayResult()
+
+
+class ReplayVIP(object):
+    def __init__(self, rpc, pubsub):
+        self.rpc = rpc
+        self.pubsub = pubsub
+
+
+class ReplayCore(object):
+    """
+    Demand limit schedules are replayed with ILCReplay.add_target instead of
+    timers, so scheduled callbacks are ignored.
+    """
+    def schedule(self, *args, **kwargs):
+        return None
+
+
+def timestamp_parser():
+    """
+    Return a function parsing the timestamps of one file.  The first
+    strptime format that matches is reused for the following rows,
+    timestamps no format matches (time zone offsets) are parsed by dateutil.
+    """
+    formats = list(TIMESTAMP_FORMATS)
+
+    def parse(time_str):
+        for index, time_format in enumerate(formats):
+            try:
+                timestamp = datetime.strptime(time_str, time_format)
+            except ValueError:
+                continue
+            if index:
+                formats.insert(0, formats.pop(index))
+            return timestamp
+        return parser.parse(time_str)
+    return parse
+
+
+def read_csv(file_name, timestamp_column="timestamp"):
+    """
+    Read a time ordered CSV of point values.
+    :param file_name:
+    :param timestamp_column: name of the timestamp column, the first column is used if it is missing.
+    :return: generator of (timestamp, timestamp string, {point: value}).
+    """
+    with open(file_name, "rb") as csv_file:
+        reader = csv.reader(csv_file)
+        header = next(reader)
+        time_index = header.index(timestamp_column) if timestamp_column in header else 0
+        columns = [(index, name) for index, name in enumerate(header) if index != time_index]
+        parse = timestamp_parser()
+        for row in reader:
+            if not row:
+                continue
+            data = {}
+            for index, name in columns:
+                value = row[index]
+                if value == "":
+                    continue
+                try:
+                    data[name] = float(value)
+                except ValueError:
+                    data[name] = value
+            yield parse(row[time_index]), row[time_index], data
+
+
+class ILCReplay(object):
+    """
+    Replay meter and device data through ILCAgent without a platform.
+
+    The agent is configured from the normal ILC configuration and its
+    message handlers are called directly in timestamp order.  Stage
+    timings are inclusive: meter_data contains the averaging, scoring and
+    actuation stages it triggers.
+    """
+    def __init__(self, config, actuator=None, load_response=False, tz="UTC"):
+        """
+        :param config: ILC configuration dictionary or file name.
+        :param actuator: FakeActuator (or subclass) receiving the actuator calls.
+        :param load_response: subtract the estimated load of curtailed devices from the meter power.
+        :param tz: time zone reported in the device and meter metadata.
+        """
+        if not isinstance(config, dict):
+            config = utils.load_config(config)
+        self.actuator = actuator if actuator is not None else FakeActuator()
+        self.rpc = ReplayRPC(self.actuator)
+        self.pubsub = ReplayPubSub()
+        self.load_response = load_response
+        self.tz = tz
+
+        agent = ILCAgent.__new__(ILCAgent)
+        agent.vip = ReplayVIP(self.rpc, self.pubsub)
+        agent.core = ReplayCore()
+        agent.configure(config)
+        self.agent = agent
+
+        self.device_topics = dict((device_name[0], topic) for topic, device_name in agent.device_topic_map.items())
+        self.point_topics = {}
+        self.device_meta = {}
+        self.current_time = None
+        self.curtail_loads = {}
+        self.decisions = []
+        self.timings = OrderedDict((stage, [0, 0.0]) for stage in STAGES)
+        self.samples = {DEVICE_DATA: 0, METER_DATA: 0}
+        self.peak_power = None
+        self.max_curtailed = 0
+        self.first_time = None
+        self.wall_time = 0.0
+
+        agent.new_data = self.timed("device_data", agent.new_data)
+        agent.load_message_handler = self.timed("meter_data", agent.load_message_handler)
+        agent.calculate_average_power = self.timed("averaging", self.calculate_average_power)
+        agent.criteria.get_score_order = self.timed("scoring", agent.criteria.get_score_order)
+        agent.actuator_request = self.timed("scheduling", agent.actuator_request)
+        agent.determine_curtail_parms = self.determine_curtail_parms
+        agent.curtail = self.timed("curtail", self.curtail)
+        agent.reset_devices = self.timed("release", self.reset_devices)
+        agent.reset_all_devices = self.timed("release_all", agent.reset_all_devices)
+
+    def timed(self, stage, method):
+        timing = self.timings[stage]
+
+        def wrapper(*args, **kwargs):
+            start = time.time()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                timing[0] += 1
+                timing[1] += time.time() - start
+        return wrapper
+
+    def add_target(self, start, end, target):
+        """
+        Replay a demand limit for a period, as received by
+        simulation_demand_limit_handler from the TargetAgent.
+        :param start: datetime or timestamp string.
+        :param end: datetime or timestamp string.
+        :param target: demand limit in the meter units.
+        :return:
+        """
+        start = parser.parse(start) if not hasattr(start, "tzinfo") else start
+        end = parser.parse(end) if not hasattr(end, "tzinfo") else end
+        self.agent.simulation_running = True
+        if start.tzinfo is not None:
+            self.agent.tz = start.tzinfo
+        task_id = "replay_{}".format(len(self.agent.tasks))
+        self.agent.tasks[task_id] = {"start": start, "end": end, "target": float(target)}
+
+    def calculate_average_power(self, current_power, current_time):
+        result = ILCAgent.calculate_average_power(self.agent, current_power, current_time)
+        if self.peak_power is None or result[0] > self.peak_power:
+            self.peak_power = result[0]
+        return result
+
+    def determine_curtail_parms(self, curtail, device_dict, point_values):
+        parms = ILCAgent.determine_curtail_parms(self.agent, curtail, device_dict, point_values)
+        self.curtail_loads[device_dict] = parms
+        return parms
+
+    def curtail(self, scored_devices, bldg_power, current_time):
+        count = len(self.agent.registry.curtailed)
+        ILCAgent.curtail(self.agent, scored_devices, bldg_power, current_time)
+        for record in self.agent.registry.curtailed[count:]:
+            device_name, token, revert_value, _, _, actuator = record
+            curtail_point, curtail_value, curtail_load = self.curtail_loads[device_name, token, actuator][:3]
+            self.decisions.append({
+                "time": format_timestamp(current_time),
+                "action": "curtail",
+                "device": device_name,
+                "token": token,
+                "point": curtail_point,
+                "value": curtail_value,
+                "revert_value": revert_value,
+                "load": curtail_load,
+                "power": bldg_power,
+                "demand_limit": self.agent.demand_limit
+            })
+        self.max_curtailed = max(self.max_curtailed, len(self.agent.registry.curtailed))
+
+    def reset_devices(self):
+        before = list(self.agent.registry.curtailed)
+        ILCAgent.reset_devices(self.agent)
+        remaining = set(id(record) for record in self.agent.registry.curtailed)
+        for record in before:
+            if id(record) not in remaining:
+                self.decisions.append({
+                    "time": format_timestamp(self.current_time),
+                    "action": "release",
+                    "device": record[0],
+                    "token": record[1],
+                    "value": record[2],
+                    "demand_limit": self.agent.demand_limit
+                })
+
+    def curtailed_load(self):
+        loads = self.curtail_loads
+        return sum(loads[record[0], record[1], record[5]][2] for record in self.agent.registry.curtailed)
+
+    def device_message(self, device_name, time_str, data):
+        """
+        Feed one device sample to the actuator and ILCAgent.new_data.
+        """
+        topic = self.device_topics[device_name]
+        point_topics = self.point_topics.get(device_name)
+        if point_topics is None:
+            point_topics = self.point_topics[device_name] = {}
+            self.device_meta[device_name] = {}
+        for point in data:
+            if point not in point_topics:
+                point_topics[point] = self.agent.base_rpc_path(unit=device_name, point=point)
+                self.device_meta[device_name][point] = {"tz": self.tz, "type": "float", "units": ""}
+
+        overrides = self.actuator.overrides
+        self.actuator.update(dict((point_topics[point], value) for point, value in data.items()))
+        if overrides:
+            data = dict((point, overrides.get(point_topics[point], value)) for point, value in data.items())
+        self.agent.new_data("pubsub", "replay", "pubsub", topic, {"Date": time_str},
+                            [data, self.device_meta[device_name]])
+
+    def meter_message(self, time_str, data):
+        """
+        Feed one meter sample to ILCAgent.load_message_handler.
+        """
+        power_point = self.agent.power_point
+        if self.load_response and self.agent.registry.curtailed and power_point in data:
+            data = dict(data)
+            data[power_point] = max(0.0, float(data[power_point]) - self.curtailed_load())
+        meta = {power_point: {"tz": self.tz, "type": "float", "units": "kiloWatts"}}
+        self.agent.load_message_handler("pubsub", "replay", "pubsub", self.agent.power_meter_topic,
+                                        {"Date": time_str}, [data, meta])
+
+    def run(self, meter_data, device_data):
+        """
+        Replay the samples in timestamp order, device samples first when a
+        device and the meter report at the same time.
+        :param meter_data: iterable of (timestamp, timestamp string, {point: value}).
+        :param device_data: dict of device name to an iterable like meter_data.
+        :return: report()
+        """
+        streams = [self.tagged(meter_data, METER_DATA, None)]
+        for device_name, samples in device_data.items():
+            if device_name not in self.device_topics:
+                raise ValueError("Device {} is not in the ILC curtailment configuration".format(device_name))
+            streams.append(self.tagged(samples, DEVICE_DATA, device_name))
+
+        start = time.time()
+        for current_time, kind, _, name, time_str, data in heapq.merge(*streams):
+            if self.first_time is None:
+                self.first_time = current_time
+            self.current_time = current_time
+            self.actuator.now = current_time
+            self.samples[kind] += 1
+            if kind == DEVICE_DATA:
+                self.device_message(name, time_str, data)
+            else:
+                self.meter_message(time_str, data)
+        self.wall_time += time.time() - start
+        return self.report()
+
+    @staticmethod
+    def tagged(samples, kind, name):
+        for sequence, (current_time, time_str, data) in enumerate(samples):
+            yield current_time, kind, sequence, name, time_str, data
+
+    def report(self):
+        """
+        Summary of the replay: sample counts, simulated and wall clock time,
+        curtailment decisions and per stage call counts and timings.
+        """
+        simulated = 0.0
+        if self.first_time is not None:
+            simulated = (self.current_time - self.first_time).total_seconds()
+        return {
+            "meter_samples": self.samples[METER_DATA],
+            "device_samples": self.samples[DEVICE_DATA],
+            "start": format_timestamp(self.first_time) if self.first_time is not None else None,
+            "end": format_timestamp(self.current_time) if self.current_time is not None else None,
+            "simulated_seconds": simulated,
+            "wall_seconds": self.wall_time,
+            "speedup": simulated / self.wall_time if self.wall_time else None,
+            "curtailments": sum(1 for decision in self.decisions if decision["action"] == "curtail"),
+            "releases": sum(1 for decision in self.decisions if decision["action"] == "release"),
+            "max_curtailed": self.max_curtailed,
+            "peak_average_power": self.peak_power,
+            "actuator_calls": self.rpc.calls,
+            "stages": OrderedDict((stage, {"calls": calls,
+                                           "seconds": seconds,
+                                           "mean_ms": seconds / calls * 1000.0 if calls else 0.0})
+                                  for stage, (calls, seconds) in self.timings.items()),
+            "decisions": self.decisions
+        }
+
+
+def main(argv=sys.argv):
+    arg_parser = argparse.ArgumentParser(description="Replay historical data through the ILC logic.")
+    arg_parser.add_argument("config", help="ILC agent configuration file")
+    arg_parser.add_argument("--meter", required=True, help="power meter CSV")
+    arg_parser.add_argument("--device", action="append", default=[], metavar="NAME=CSV",
+                            help="device CSV, repeat for every device")
+    arg_parser.add_argument("--timestamp-column", default="timestamp")
+    arg_parser.add_argument("--demand-limit", type=float, help="override the configured demand_limit")
+    arg_parser.add_argument("--targets", help="CSV of start, end, target demand limits")
+    arg_parser.add_argument("--load-response", action="store_true",
+                            help="subtract the estimated load of curtailed devices from the meter power")
+    arg_parser.add_argument("--decisions", help="write the curtailment decisions to this CSV")
+    arg_parser.add_argument("--verbose", action="store_true", help="keep the ILC debug logging")
+    args = arg_parser.parse_args(argv[1:])
+
+    if not args.verbose:
+        logging.getLogger("ilc").setLevel(logging.WARNING)
+
+    replay = ILCReplay(args.config, load_response=args.load_response)
+    if args.demand_limit is not None:
+        replay.agent.demand_limit = args.demand_limit
+    if args.targets:
+        with open(args.targets, "rb") as targets:
+            for target in csv.DictReader(targets):
+                replay.add_target(target["start"], target["end"], target["target"])
+
+    device_data = {}
+    for device in args.device:
+        device_name, file_name = device.split("=", 1)
+        device_data[device_name] = read_csv(file_name, args.timestamp_column)
+    report = replay.run(read_csv(args.meter, args.timestamp_column), device_data)
+
+    decisions = report.pop("decisions")
+    if args.decisions:
+        fields = ["time", "action", "device", "token", "point", "value", "revert_value", "load", "power",
+                  "demand_limit"]
+        with open(args.decisions, "wb") as decision_file:
+            writer = csv.DictWriter(decision_file, fields)
+            writer.writeheader()
+            writer.writerows(decisions)
+    print(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
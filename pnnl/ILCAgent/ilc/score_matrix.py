@@ -0,0 +1,148 @@
+"""
+-*- coding: utf-8 -*- {{{
+vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+Copyright (c) 2017, Battelle Memorial Institute
+All rights reserved.
+
+1.  Battelle Memorial Institute (hereinafter Battelle) hereby grants
+    permission to any person or entity lawfully obtaining a copy of this
+    software and associated documentation files (hereinafter "the Software")
+    to redistribute and use the Software in source and binary forms, with or
+    without modification.  Such person or entity may use, copy, modify, merge,
+    publish, distribute, sublicense, and/or sell copies of the Software, and
+    may permit others to do so, subject to the following conditions:
+
+    -   Redistributions of source code must retain the above copyright notice,
+        this list of conditions and the following disclaimers.
+
+    -	Redistributions in binary form must reproduce the above copyright
+        notice, this list of conditions and the following disclaimer in the
+        documentation and/or other materials provided with the distribution.
+
+    -	Other than as used herein, neither the name Battelle Memorial Institute
+        or Battelle may be used in any form whatsoever without the express
+        written consent of Battelle.
+
+2.	THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+    AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+    IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+    ARE DISCLAIMED. IN NO EVENT SHALL BATTELLE OR CONTRIBUTORS BE LIABLE FOR
+    ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+    DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+    SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+    CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+    LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+    OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+    DAMAGE.
+
+The views and conclusions contained in the software and documentation are those
+of the authors and should not be interpreted as representing official policies,
+either expressed or implied, of the FreeBSD Project.
+
+This material was prepared as an account of work sponsored by an agency of the
+United States Government. Neither the United States Government nor the United
+States Department of Energy, nor Battelle, nor any of their employees, nor any
+jurisdiction or organization that has cooperated in the development of these
+materials, makes any warranty, express or implied, or assumes any legal
+liability or responsibility for the accuracy, completeness, or usefulness or
+any information, apparatus, product, software, or process disclosed, or
+represents that its use would not infringe privately owned rights.
+
+Reference herein to any specific commercial product, process, or service by
+trade name, trademark, manufacturer, or otherwise does not necessarily
+constitute or imply its endorsement, recommendation, or favoring by the
+United States Government or any agency thereof, or Battelle Memorial Institute.
+The views and opinions of authors expressed herein do not necessarily state or
+reflect those of the United States Government or any agency thereof.
+
+PACIFIC NORTHWEST NATIONAL LABORATORY
+operated by
+BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+under Contract DE-AC05-76RL01830
+}}}
+"""
+import logging
+import numpy as np
+from volttron.platform.agent.utils import setup_logging
+
+setup_logging()
+_log = logging.getLogger(__name__)
+
+
+class ScoreMatrix(object):
+    """
+    Dense device x criteria matrix for one criteria cluster.
+
+    Rows are allocated once for every (device, token) pair in the cluster
+    and are overwritten in place when new evaluations arrive.  Column
+    normalization and the weighted AHP sum are done for all rows at once.
+    """
+    def __init__(self, criteria_labels, row_average, priority):
+        self.criteria_labels = list(criteria_labels)
+        self.column_index = dict((label, i) for i, label in enumerate(self.criteria_labels))
+        self.weights = np.asarray(row_average, dtype=float)
+        self.priority = float(priority)
+        self.keys = []
+        self.row_index = {}
+        self.matrix = np.zeros((0, len(self.criteria_labels)))
+
+    def allocate(self, keys):
+        """
+        Reserve one row per (device, token) pair.
+        :param keys: list of (device_name, device_id) tuples.
+        :return:
+        """
+        self.keys = list(keys)
+        self.row_index = dict((key, row) for row, key in enumerate(self.keys))
+        self.matrix = np.zeros((len(self.keys), len(self.criteria_labels)))
+
+    def update(self, key, evaluations):
+        """
+        Write the criteria evaluations for one (device, token) pair into its row.
+        :param key: (device_name, device_id) tuple.
+        :param evaluations: dict of criteria label to evaluated value.
+        :return:
+        """
+        if len(evaluations) != len(self.column_index) or not set(evaluations).issubset(self.column_index):
+            raise Exception('Input criteria and data criteria do not match.')
+        row = self.matrix[self.row_index[key]]
+        for label, value in evaluations.items():
+            try:
+                row[self.column_index[label]] = float(value)
+            except (TypeError, ValueError):
+                row[self.column_index[label]] = 0.0
+
+    def scores(self):
+        """
+        Normalize each criteria column by its sum and return the priority
+        weighted score for every row (same ordering as self.keys).
+        :return:
+        """
+        if not self.keys:
+            return np.zeros(0)
+        col_sums = self.matrix.sum(axis=0)
+        normalized = np.zeros_like(self.matrix)
+        np.divide(self.matrix, col_sums, out=normalized, where=(self.matrix != 0) & (col_sums != 0))
+        return normalized.dot(self.weights) * self.priority
+
+
+def rank_order(scores, key_rank, count=None):
+    """
+    Return row indices ordered by descending score, ties broken by
+    descending key (the ordering produced by sorting (score, key) tuples
+    in reverse).  When count is given only the top count rows are selected
+    with a partial partition instead of sorting every row.
+    :param scores: array of device scores.
+    :param key_rank: array with the rank of each row's key in sorted key order.
+    :param count: number of highest scored rows to return (None for all).
+    :return:
+    """
+    candidates = np.arange(len(scores))
+    if count is not None and 0 < count < len(scores):
+        threshold = np.partition(scores, len(scores) - count)[len(scores) - count]
+        candidates = np.flatnonzero(scores >= threshold)
+    order = candidates[np.lexsort((key_rank[candidates], scores[candidates]))[::-1]]
+    if count is not None:
+        order = order[:count]
+    return order
@@ -0,0 +1,218 @@
+"""
+-*- coding: utf-8 -*- {{{
+vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+Copyright (c) 2017, Battelle Memorial Institute
+All rights reserved.
+
+1.  Battelle Memorial Institute (hereinafter Battelle) hereby grants
+    permission to any person or entity lawfully obtaining a copy of this
+    software and associated documentation files (hereinafter "the Software")
+    to redistribute and use the Software in source and binary forms, with or
+    without modification.  Such person or entity may use, copy, modify, merge,
+    publish, distribute, sublicense, and/or sell copies of the Software, and
+    may permit others to do so, subject to the following conditions:
+
+    -   Redistributions of source code must retain the above copyright notice,
+        this list of conditions and the following disclaimers.
+
+    -	Redistributions in binary form must reproduce the above copyright
+        notice, this list of conditions and the following disclaimer in the
+        documentation and/or other materials provided with the distribution.
+
+    -	Other than as used herein, neither the name Battelle Memorial Institute
+        or Battelle may be used in any form whatsoever without the express
+        written consent of Battelle.
+
+2.	THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+    AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+    IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+    ARE DISCLAIMED. IN NO EVENT SHALL BATTELLE OR CONTRIBUTORS BE LIABLE FOR
+    ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+    DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+    SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+    CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+    LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+    OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+    DAMAGE.
+
+The views and conclusions contained in the software and documentation are those
+of the authors and should not be interpreted as representing official policies,
+either expressed or implied, of the FreeBSD Project.
+
+This material was prepared as an account of work sponsored by an agency of the
+United States Government. Neither the United States Government nor the United
+States Department of Energy, nor Battelle, nor any of their employees, nor any
+jurisdiction or organization that has cooperated in the development of these
+materials, makes any warranty, express or implied, or assumes any legal
+liability or responsibility for the accuracy, completeness, or usefulness or
+any information, apparatus, product, software, or process disclosed, or
+represents that its use would not infringe privately owned rights.
+
+Reference herein to any specific commercial product, process, or service by
+trade name, trademark, manufacturer, or otherwise does not necessarily
+constitute or imply its endorsement, recommendation, or favoring by the
+United States Government or any agency thereof, or Battelle Memorial Institute.
+The views and opinions of authors expressed herein do not necessarily state or
+reflect those of the United States Government or any agency thereof.
+
+PACIFIC NORTHWEST NATIONAL LABORATORY
+operated by
+BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+under Contract DE-AC05-76RL01830
+}}}
+"""
+import gevent
+from gevent.event import AsyncResult
+from volttron.platform.jsonrpc import RemoteError
+
+from ilc.actuation import ActuatorFanOut
+from ilc.replay import ILCReplay, FakeActuator, read_csv
+from test_replay import build_site
+
+
+class FakeRPC(object):
+    """
+    vip.rpc stand in: each call answers after a delay, or fails, and the
+    number of calls in flight is tracked.
+    """
+    def __init__(self, delays=None, errors=None):
+        self.delays = delays or {}
+        self.errors = errors or {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = []
+
+    def call(self, peer, method, *args):
+        key = args[0]
+        self.calls.append((peer, method, args))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        result = AsyncResult()
+
+        def answer():
+            gevent.sleep(self.delays.get(key, 0.01))
+            self.in_flight -= 1
+            if key in self.errors:
+                result.set_exception(self.errors[key])
+            else:
+                result.set((method, key))
+        gevent.spawn(answer)
+        return result
+
+
+def requests(keys):
+    return [(key, "platform.actuator", "get_point", [key]) for key in keys]
+
+
+def test_results_in_request_order_with_partial_failure():
+    rpc = FakeRPC(delays={"a": 0.05, "b": 0.01, "c": 0.03},
+                  errors={"b": RemoteError("point locked"), "c": ValueError("bad value")})
+    results = ActuatorFanOut(rpc, concurrency=3, timeout=1.0).call(requests(["a", "b", "c", "d"]))
+
+    assert [result.key for result in results] == ["a", "b", "c", "d"]
+    assert [result.success for result in results] == [True, False, False, True]
+    assert results[0].value == ("get_point", "a")
+    assert results[1].error.startswith("RemoteError")
+    assert results[2].error.startswith("ValueError")
+    assert not any(result.timed_out for result in results)
+
+
+def test_timeout():
+    rpc = FakeRPC(delays={"slow": 0.5})
+    fan_out = ActuatorFanOut(rpc, concurrency=2, timeout=0.1)
+    slow, fast = fan_out.call(requests(["slow", "fast"]))
+
+    assert slow.timed_out and not slow.success
+    assert slow.elapsed < 0.5
+    assert fast.success and not fast.timed_out
+
+    slow, = fan_out.call(requests(["slow"]), timeout=1.0)
+    assert slow.success
+
+
+def test_concurrency_limit():
+    keys = ["p{}".format(n) for n in range(10)]
+    for concurrency in (1, 3, 20):
+        rpc = FakeRPC()
+        results = ActuatorFanOut(rpc, concurrency=concurrency).call(requests(keys))
+        assert all(result.success for result in results)
+        assert rpc.max_in_flight == min(concurrency, len(keys))
+    assert ActuatorFanOut(FakeRPC()).call([]) == []
+
+
+def curtailed_replay(tmpdir, actuator, concurrency):
+    """
+    Replay a site up to its last curtailment before the first release.
+    """
+    config, meter_csv, device_csvs = build_site(tmpdir, 6, 14 * 60)
+    config["actuator_concurrency"] = concurrency
+    replay = ILCReplay(config)
+    replay.run(read_csv(meter_csv), dict((name, read_csv(file_name)) for name, file_name in device_csvs.items()))
+    curtail_time = None
+    for decision in replay.decisions:
+        if decision["action"] == "release":
+            break
+        curtail_time = decision["time"]
+
+    replay = ILCReplay(config, actuator=actuator)
+    meter = (sample for sample in read_csv(meter_csv) if sample[1] <= curtail_time)
+    devices = dict((name, (sample for sample in read_csv(file_name) if sample[1] <= curtail_time))
+                   for name, file_name in device_csvs.items())
+    replay.run(meter, devices)
+    return replay
+
+
+class FailingActuator(FakeActuator):
+    """
+    Fails every call on the devices in failing.
+    """
+    def __init__(self, failing):
+        FakeActuator.__init__(self)
+        self.failing = failing
+
+    def check(self, topic):
+        if any("/{}/".format(device) in topic or topic.startswith("{}/".format(device)) for device in self.failing):
+            raise RuntimeError("device offline")
+
+    def set_point(self, requester_id, topic, value):
+        self.check(topic)
+        return FakeActuator.set_point(self, requester_id, topic, value)
+
+    def revert_point(self, requester_id, topic):
+        self.check(topic)
+        return FakeActuator.revert_point(self, requester_id, topic)
+
+
+def test_curtail_skips_failed_writes_in_groups(tmpdir):
+    actuator = FailingActuator(["HP0", "HP1"])
+    replay = curtailed_replay(tmpdir, actuator, concurrency=3)
+    agent = replay.agent
+
+    curtailed = [record[0] for record in agent.devices_curtailed]
+    assert curtailed
+    assert "HP0" not in curtailed and "HP1" not in curtailed
+    group_times = agent.actuation_stats["curtail_group_times"]
+    assert group_times and all(group_time > 0.0 for group_time in group_times)
+    assert agent.actuation_stats["curtail_time"] == sum(group_times)
+    written = [write[2] for write in actuator.writes if write[1] == "set_point"]
+    assert len(written) == len(curtailed)
+
+
+def test_reset_devices_keeps_devices_that_fail_to_revert(tmpdir):
+    actuator = FailingActuator([])
+    replay = curtailed_replay(tmpdir, actuator, concurrency=4)
+    agent = replay.agent
+    curtailed = [record[0] for record in agent.devices_curtailed]
+    assert len(curtailed) > 1
+
+    actuator.failing = [curtailed[0]]
+    agent.device_group_size = [len(curtailed)]
+    replay.reset_devices()
+    assert [record[0] for record in agent.devices_curtailed] == [curtailed[0]]
+
+    actuator.failing = []
+    agent.device_group_size = [1]
+    replay.reset_devices()
+    assert not agent.devices_curtailed
+    assert not actuator.overrides
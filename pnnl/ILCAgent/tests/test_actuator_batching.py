@@ -0,0 +1,221 @@
+"""
+-*- coding: utf-8 -*- {{{
+vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+Copyright (c) 2017, Battelle Memorial Institute
+All rights reserved.
+
+1.  Battelle Memorial Institute (hereinafter Battelle) hereby grants
+    permission to any person or entity lawfully obtaining a copy of this
+    software and associated documentation files (hereinafter "the Software")
+    to redistribute and use the Software in source and binary forms, with or
+    without modification.  Such person or entity may use, copy, modify, merge,
+    publish, distribute, sublicense, and/or sell copies of the Software, and
+    may permit others to do so, subject to the following conditions:
+
+    -   Redistributions of source code must retain the above copyright notice,
+        this list of conditions and the following disclaimers.
+
+    -	Redistributions in binary form must reproduce the above copyright
+        notice, this list of conditions and the following disclaimer in the
+        documentation and/or other materials provided with the distribution.
+
+    -	Other than as used herein, neither the name Battelle Memorial Institute
+        or Battelle may be used in any form whatsoever without the express
+        written consent of Battelle.
+
+2.	THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+    AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+    IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+    ARE DISCLAIMED. IN NO EVENT SHALL BATTELLE OR CONTRIBUTORS BE LIABLE FOR
+    ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+    DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+    SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+    CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+    LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+    OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+    DAMAGE.
+
+The views and conclusions contained in the software and documentation are those
+of the authors and should not be interpreted as representing official policies,
+either expressed or implied, of the FreeBSD Project.
+
+This material was prepared as an account of work sponsored by an agency of the
+United States Government. Neither the United States Government nor the United
+States Department of Energy, nor Battelle, nor any of their employees, nor any
+jurisdiction or organization that has cooperated in the development of these
+materials, makes any warranty, express or implied, or assumes any legal
+liability or responsibility for the accuracy, completeness, or usefulness or
+any information, apparatus, product, software, or process disclosed, or
+represents that its use would not infringe privately owned rights.
+
+Reference herein to any specific commercial product, process, or service by
+trade name, trademark, manufacturer, or otherwise does not necessarily
+constitute or imply its endorsement, recommendation, or favoring by the
+United States Government or any agency thereof, or Battelle Memorial Institute.
+The views and opinions of authors expressed herein do not necessarily state or
+reflect those of the United States Government or any agency thereof.
+
+PACIFIC NORTHWEST NATIONAL LABORATORY
+operated by
+BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+under Contract DE-AC05-76RL01830
+}}}
+"""
+from datetime import datetime, timedelta as td
+
+import gevent
+from dateutil.tz import tzutc
+
+from ilc.replay import ILCReplay, FakeActuator
+from test_replay import build_site
+
+
+class RecordingActuator(FakeActuator):
+    """
+    FakeActuator recording the actuator methods called.
+    """
+    def __init__(self, unavailable=(), bulk_schedules=True, multiple_points=True, timeout_multiple_points=False):
+        FakeActuator.__init__(self)
+        self.unavailable = unavailable
+        self.bulk_schedules = bulk_schedules
+        self.multiple_points = multiple_points
+        self.timeout_multiple_points = timeout_multiple_points
+        self.methods = []
+
+    def request_new_schedule(self, requester_id, task_id, priority, requests):
+        self.methods.append(("request_new_schedule", len(requests)))
+        if len(requests) > 1 and not self.bulk_schedules:
+            return {"result": "FAILURE", "data": {}, "info": "MALFORMED_REQUEST"}
+        if any(request[0].endswith("/{}/".format(device)) or request[0].endswith("/{}".format(device))
+               for request in requests for device in self.unavailable):
+            return {"result": "FAILURE", "data": {}, "info": "CONFLICTS_WITH_EXISTING_SCHEDULES"}
+        return FakeActuator.request_new_schedule(self, requester_id, task_id, priority, requests)
+
+    def get_multiple_points(self, topics):
+        self.methods.append(("get_multiple_points", len(topics)))
+        if self.timeout_multiple_points:
+            raise gevent.Timeout()
+        if not self.multiple_points:
+            raise NotImplementedError("get_multiple_points")
+        values = {}
+        errors = {}
+        for topic in topics:
+            try:
+                values[topic] = FakeActuator.get_point(self, topic)
+            except KeyError:
+                errors[topic] = "No data replayed for {}".format(topic)
+        return values, errors
+
+    def get_point(self, topic):
+        self.methods.append(("get_point", topic))
+        return FakeActuator.get_point(self, topic)
+
+    def count(self, method):
+        return len([call for call in self.methods if call[0] == method])
+
+
+def make_agent(tmpdir, actuator, device_count=4):
+    config, _, _ = build_site(tmpdir, device_count, 1)
+    replay = ILCReplay(config, actuator=actuator)
+    return replay.agent
+
+
+def test_bulk_schedule(tmpdir):
+    actuator = RecordingActuator()
+    agent = make_agent(tmpdir, actuator)
+    devices = [("HP{}".format(n), "platform.actuator") for n in range(4)]
+    already_handled = {}
+    agent.request_schedules(devices, "start", "end", already_handled)
+
+    assert actuator.methods == [("request_new_schedule", 4)]
+    assert already_handled == dict(("HP{}".format(n), True) for n in range(4))
+    assert agent.scheduled_devices == set(devices)
+    assert list(agent.schedule_tasks.values()) == [[device for device, _ in devices]]
+
+
+def test_bulk_schedule_retried_per_device(tmpdir):
+    actuator = RecordingActuator(unavailable=["HP2"], bulk_schedules=False)
+    agent = make_agent(tmpdir, actuator)
+    devices = [("HP{}".format(n), "platform.actuator") for n in range(4)]
+    already_handled = {}
+    agent.request_schedules(devices, "start", "end", already_handled)
+
+    assert actuator.methods == [("request_new_schedule", 4)] + [("request_new_schedule", 1)] * 4
+    assert already_handled == {"HP0": True, "HP1": True, "HP2": False, "HP3": True}
+    assert agent.scheduled_devices == set(device for device in devices if device[0] != "HP2")
+    assert sorted(agent.schedule_tasks) == [("HP0", "platform.actuator"), ("HP1", "platform.actuator"),
+                                            ("HP3", "platform.actuator")]
+
+
+def device_points(agent, devices, points):
+    for device in devices:
+        for point in points:
+            agent.vip.rpc.actuator.values[agent.base_rpc_path(unit=device[0], point=point)] = 70.0 + len(point)
+    return [(device, points) for device in devices]
+
+
+def test_read_points_with_get_multiple_points(tmpdir):
+    actuator = RecordingActuator()
+    agent = make_agent(tmpdir, actuator)
+    devices = [("HP{}".format(n), "FirstStageCooling", "platform.actuator") for n in range(3)]
+    requests = device_points(agent, devices, ["ZoneTemperatureSetPoint", "AverageZoneTemperature"])
+    missing = agent.base_rpc_path(unit="HP2", point="AverageZoneTemperature")
+    del actuator.values[missing]
+
+    values, failed, failures = agent.read_device_points(requests, datetime(2017, 7, 1))
+    assert actuator.methods == [("get_multiple_points", 6)]
+    assert values[devices[0]] == {"ZoneTemperatureSetPoint": 93.0, "AverageZoneTemperature": 92.0}
+    assert failed == set([devices[2]]) and failures == 1
+
+
+def test_read_points_fallback(tmpdir):
+    actuator = RecordingActuator(multiple_points=False)
+    agent = make_agent(tmpdir, actuator)
+    devices = [("HP{}".format(n), "FirstStageCooling", "platform.actuator") for n in range(2)]
+    requests = device_points(agent, devices, ["ZoneTemperatureSetPoint", "AverageZoneTemperature"])
+
+    values, failed, failures = agent.read_device_points(requests, datetime(2017, 7, 1))
+    assert actuator.count("get_multiple_points") == 1
+    assert actuator.count("get_point") == 4
+    assert agent.multiple_points_unsupported == set(["platform.actuator"])
+    assert values[devices[1]] == {"ZoneTemperatureSetPoint": 93.0, "AverageZoneTemperature": 92.0}
+    assert not failed and not failures
+
+    # The unsupported actuator is read point by point from then on.
+    agent.read_device_points(requests, datetime(2017, 7, 1))
+    assert actuator.count("get_multiple_points") == 1
+    assert actuator.count("get_point") == 8
+
+
+def test_read_points_timeout_is_not_unsupported(tmpdir):
+    actuator = RecordingActuator(timeout_multiple_points=True)
+    agent = make_agent(tmpdir, actuator)
+    devices = [("HP0", "FirstStageCooling", "platform.actuator")]
+    requests = device_points(agent, devices, ["ZoneTemperatureSetPoint"])
+
+    values, failed, failures = agent.read_device_points(requests, datetime(2017, 7, 1))
+    assert values[devices[0]] == {"ZoneTemperatureSetPoint": 93.0}
+    assert not agent.multiple_points_unsupported
+
+
+def test_cached_device_data(tmpdir):
+    actuator = RecordingActuator()
+    agent = make_agent(tmpdir, actuator)
+    device = ("HP0", "FirstStageCooling", "platform.actuator")
+    requests = device_points(agent, [device], ["ZoneTemperatureSetPoint", "AverageZoneTemperature"])
+    now = datetime(2017, 7, 1, 12, tzinfo=tzutc())
+    agent.device_data["HP0"] = (now, {"ZoneTemperatureSetPoint": 75.0})
+
+    assert agent.cached_device_data("HP0", now + agent.device_data_max_age) == {"ZoneTemperatureSetPoint": 75.0}
+    assert agent.cached_device_data("HP0", now + agent.device_data_max_age + td(seconds=1)) == {}
+    assert agent.cached_device_data("HP0", datetime(2017, 7, 1, 12)) == {}
+    assert agent.cached_device_data("HP1", now) == {}
+
+    values, _, _ = agent.read_device_points(requests, now + td(minutes=1))
+    assert values[device] == {"ZoneTemperatureSetPoint": 75.0, "AverageZoneTemperature": 92.0}
+    assert actuator.methods == [("get_multiple_points", 1)]
+
+    values, _, _ = agent.read_device_points(requests, now + td(hours=1))
+    assert values[device] == {"ZoneTemperatureSetPoint": 93.0, "AverageZoneTemperature": 92.0}
+    assert actuator.methods[-1] == ("get_multiple_points", 2)
@@ -0,0 +1,156 @@
+"""
+-*- coding: utf-8 -*- {{{
+vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+Copyright (c) 2017, Battelle Memorial Institute
+All rights reserved.
+
+1.  Battelle Memorial Institute (hereinafter Battelle) hereby grants
+    permission to any person or entity lawfully obtaining a copy of this
+    software and associated documentation files (hereinafter "the Software")
+    to redistribute and use the Software in source and binary forms, with or
+    without modification.  Such person or entity may use, copy, modify, merge,
+    publish, distribute, sublicense, and/or sell copies of the Software, and
+    may permit others to do so, subject to the following conditions:
+
+    -   Redistributions of source code must retain the above copyright notice,
+        this list of conditions and the following disclaimers.
+
+    -	Redistributions in binary form must reproduce the above copyright
+        notice, this list of conditions and the following disclaimer in the
+        documentation and/or other materials provided with the distribution.
+
+    -	Other than as used herein, neither the name Battelle Memorial Institute
+        or Battelle may be used in any form whatsoever without the express
+        written consent of Battelle.
+
+2.	THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+    AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+    IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+    ARE DISCLAIMED. IN NO EVENT SHALL BATTELLE OR CONTRIBUTORS BE LIABLE FOR
+    ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+    DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+    SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+    CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+    LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+    OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+    DAMAGE.
+
+The views and conclusions contained in the software and documentation are those
+of the authors and should not be interpreted as representing official policies,
+either expressed or implied, of the FreeBSD Project.
+
+This material was prepared as an account of work sponsored by an agency of the
+United States Government. Neither the United States Government nor the United
+States Department of Energy, nor Battelle, nor any of their employees, nor any
+jurisdiction or organization that has cooperated in the development of these
+materials, makes any warranty, express or implied, or assumes any legal
+liability or responsibility for the accuracy, completeness, or usefulness or
+any information, apparatus, product, software, or process disclosed, or
+represents that its use would not infringe privately owned rights.
+
+Reference herein to any specific commercial product, process, or service by
+trade name, trademark, manufacturer, or otherwise does not necessarily
+constitute or imply its endorsement, recommendation, or favoring by the
+United States Government or any agency thereof, or Battelle Memorial Institute.
+The views and opinions of authors expressed herein do not necessarily state or
+reflect those of the United States Government or any agency thereof.
+
+PACIFIC NORTHWEST NATIONAL LABORATORY
+operated by
+BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+under Contract DE-AC05-76RL01830
+}}}
+"""
+import math
+import random
+import timeit
+from datetime import datetime, timedelta as td
+import pytest
+
+from ilc.average_power import AveragePower
+
+
+def reference_average_power(bldg_power, window, current_power, current_time):
+    """Original list based ILCAgent.calculate_average_power."""
+    if bldg_power:
+        current_average_window = bldg_power[-1][0] - bldg_power[0][0] + td(seconds=15)
+    else:
+        current_average_window = td(minutes=0)
+
+    if current_average_window >= window and current_power > 0:
+        bldg_power.append((current_time, current_power))
+        bldg_power.pop(0)
+    elif current_power > 0:
+        bldg_power.append((current_time, current_power))
+
+    smoothing_constant = 2.0/(len(bldg_power) + 1.0)*2.0 if bldg_power else 1.0
+    smoothing_constant = smoothing_constant if smoothing_constant <= 1.0 else 1.0
+    power_sort = list(bldg_power)
+    power_sort.sort(reverse=True)
+    average_power = 0
+
+    for n in range(len(bldg_power)):
+        average_power += power_sort[n][1] * smoothing_constant * (1.0 - smoothing_constant) ** n
+
+    norm_list = [float(i[1]) for i in bldg_power]
+    normal_average_power = sum(norm_list)/len(norm_list) if norm_list else 0.0
+    return average_power, normal_average_power, current_average_window
+
+
+def meter_replay(seconds, interval=1, seed=0):
+    """Building load profile with noise, meter dropouts and late samples."""
+    rng = random.Random(seed)
+    start = datetime(2017, 7, 1, 12, 0)
+    samples = []
+    for step in range(0, seconds, interval):
+        power = 250.0 + 60.0 * math.sin(step / 900.0) + rng.gauss(0.0, 5.0)
+        if rng.random() < 0.01:
+            power = 0.0
+        time_stamp = start + td(seconds=step)
+        if rng.random() < 0.005:
+            time_stamp -= td(seconds=rng.randint(1, 30))
+        samples.append((time_stamp, power))
+    return samples
+
+
+@pytest.mark.parametrize("window_minutes, interval", [(1, 1), (15, 1), (15, 60), (30, 5)])
+def test_replay_matches_reference(window_minutes, interval):
+    window = td(minutes=window_minutes)
+    averager = AveragePower(window)
+    bldg_power = []
+    for current_time, current_power in meter_replay(2 * 3600, interval):
+        expected = reference_average_power(bldg_power, window, current_power, current_time)
+        result = averager.add(current_time, current_power)
+        assert result[0] == pytest.approx(expected[0], rel=1e-9)
+        assert result[1] == pytest.approx(expected[1], rel=1e-9)
+        assert result[2] == expected[2]
+        assert len(averager) == len(bldg_power)
+
+
+def test_steady_state_is_incremental():
+    averager = AveragePower(td(minutes=15))
+    samples = [(datetime(2017, 7, 1) + td(seconds=step), 100.0 + step % 7) for step in range(4 * 3600)]
+    for current_time, current_power in samples[:1800]:
+        averager.add(current_time, current_power)
+    rebuilds = averager.rebuilds
+    for current_time, current_power in samples[1800:]:
+        averager.add(current_time, current_power)
+    assert averager.rebuilds == rebuilds
+
+
+def test_cost_per_sample_independent_of_window():
+    def steady_state_cost(window_minutes):
+        averager = AveragePower(td(minutes=window_minutes))
+        start = datetime(2017, 7, 1)
+        count = window_minutes * 60 + 10
+        for step in range(count):
+            averager.add(start + td(seconds=step), 100.0)
+        stamps = [start + td(seconds=step) for step in range(count, count + 2000)]
+
+        def run():
+            for stamp in stamps:
+                averager.add(stamp, 120.0)
+        return min(timeit.repeat(run, number=1, repeat=3))
+
+    assert steady_state_cost(30) < 3.0 * steady_state_cost(1)
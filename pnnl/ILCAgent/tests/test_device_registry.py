@@ -0,0 +1,126 @@
+"""
+-*- coding: utf-8 -*- {{{
+vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+Copyright (c) 2017, Battelle Memorial Institute
+All rights reserved.
+
+1.  Battelle Memorial Institute (hereinafter Battelle) hereby grants
+    permission to any person or entity lawfully obtaining a copy of this
+    software and associated documentation files (hereinafter "the Software")
+    to redistribute and use the Software in source and binary forms, with or
+    without modification.  Such person or entity may use, copy, modify, merge,
+    publish, distribute, sublicense, and/or sell copies of the Software, and
+    may permit others to do so, subject to the following conditions:
+
+    -   Redistributions of source code must retain the above copyright notice,
+        this list of conditions and the following disclaimers.
+
+    -	Redistributions in binary form must reproduce the above copyright
+        notice, this list of conditions and the following disclaimer in the
+        documentation and/or other materials provided with the distribution.
+
+    -	Other than as used herein, neither the name Battelle Memorial Institute
+        or Battelle may be used in any form whatsoever without the express
+        written consent of Battelle.
+
+2.	THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+    AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+    IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+    ARE DISCLAIMED. IN NO EVENT SHALL BATTELLE OR CONTRIBUTORS BE LIABLE FOR
+    ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+    DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+    SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+    CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+    LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+    OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+    DAMAGE.
+
+The views and conclusions contained in the software and documentation are those
+of the authors and should not be interpreted as representing official policies,
+either expressed or implied, of the FreeBSD Project.
+
+This material was prepared as an account of work sponsored by an agency of the
+United States Government. Neither the United States Government nor the United
+States Department of Energy, nor Battelle, nor any of their employees, nor any
+jurisdiction or organization that has cooperated in the development of these
+materials, makes any warranty, express or implied, or assumes any legal
+liability or responsibility for the accuracy, completeness, or usefulness or
+any information, apparatus, product, software, or process disclosed, or
+represents that its use would not infringe privately owned rights.
+
+Reference herein to any specific commercial product, process, or service by
+trade name, trademark, manufacturer, or otherwise does not necessarily
+constitute or imply its endorsement, recommendation, or favoring by the
+United States Government or any agency thereof, or Battelle Memorial Institute.
+The views and opinions of authors expressed herein do not necessarily state or
+reflect those of the United States Government or any agency thereof.
+
+PACIFIC NORTHWEST NATIONAL LABORATORY
+operated by
+BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+under Contract DE-AC05-76RL01830
+}}}
+"""
+import random
+
+from ilc.device_registry import DeviceRegistry
+
+ACTUATORS = ["platform.actuator", "building2.actuator"]
+
+
+def build_registry(device_count, tokens=2, seed=0):
+    """
+    Registry with random on states and curtailment records, plus the flat
+    on_devices and devices_curtailed lists the agent used before.
+    """
+    rng = random.Random(seed)
+    registry = DeviceRegistry()
+    on_devices = []
+    records = []
+    scored = []
+    for n in range(device_count):
+        device_name = "RTU{}".format(n)
+        actuator = ACTUATORS[n % len(ACTUATORS)]
+        status = dict(("Stage{}".format(token), rng.random() < 0.7) for token in range(tokens))
+        registry.update_status(device_name, actuator, status)
+        for token, state in sorted(status.items()):
+            scored.append((device_name, token))
+            if state:
+                on_devices.append((device_name, token, actuator))
+                if rng.random() < 0.3:
+                    records.append([device_name, token, 72.0, None, "2017-07-01T14:00:00", actuator])
+    rng.shuffle(scored)
+    rng.shuffle(records)
+    registry.set_curtailed(records)
+    return registry, scored, on_devices, records
+
+
+def test_on_devices_in_score_order():
+    registry, scored, on_devices, _ = build_registry(300)
+    expected = [device for score in scored for device in on_devices if score in [(device[0], device[1])]]
+    assert registry.get_on_devices(scored) == expected
+
+
+def test_curtailed_in_score_order():
+    registry, scored, _, records = build_registry(300)
+    expected = [device for score in scored for device in records if score in [(device[0], device[1])]]
+    assert registry.get_curtailed(scored) == expected
+    for record in records:
+        assert registry.is_curtailed(record[0], record[1], record[5])
+        assert registry.get_device_records(record[0])[-1] == [item for item in records if item[0] == record[0]][-1]
+
+
+def test_status_updates():
+    registry = DeviceRegistry()
+    registry.update_status("RTU1", ACTUATORS[0], {"Stage1": True, "Stage2": True})
+    registry.update_status("RTU1", ACTUATORS[0], {"Stage1": False, "Stage2": True})
+    assert registry.get_on_devices([("RTU1", "Stage1"), ("RTU1", "Stage2")]) == [("RTU1", "Stage2", ACTUATORS[0])]
+
+    record = ["RTU1", "Stage2", 72.0, None, "2017-07-01T14:00:00", ACTUATORS[0]]
+    registry.add_curtailed(record)
+    assert registry.curtailed == [record]
+    assert registry.is_curtailed("RTU1", "Stage2", ACTUATORS[0])
+    assert not registry.is_curtailed("RTU1", "Stage2", ACTUATORS[1])
+    registry.set_curtailed([])
+    assert not registry.is_curtailed("RTU1", "Stage2", ACTUATORS[0])
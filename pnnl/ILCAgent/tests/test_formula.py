@@ -0,0 +1,219 @@
+"""
+-*- coding: utf-8 -*- {{{
+vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+Copyright (c) 2017, Battelle Memorial Institute
+All rights reserved.
+
+1.  Battelle Memorial Institute (hereinafter Battelle) hereby grants
+    permission to any person or entity lawfully obtaining a copy of this
+    software and associated documentation files (hereinafter "the Software")
+    to redistribute and use the Software in source and binary forms, with or
+    without modification.  Such person or entity may use, copy, modify, merge,
+    publish, distribute, sublicense, and/or sell copies of the Software, and
+    may permit others to do so, subject to the following conditions:
+
+    -   Redistributions of source code must retain the above copyright notice,
+        this list of conditions and the following disclaimers.
+
+    -	Redistributions in binary form must reproduce the above copyright
+        notice, this list of conditions and the following disclaimer in the
+        documentation and/or other materials provided with the distribution.
+
+    -	Other than as used herein, neither the name Battelle Memorial Institute
+        or Battelle may be used in any form whatsoever without the express
+        written consent of Battelle.
+
+2.	THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+    AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+    IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+    ARE DISCLAIMED. IN NO EVENT SHALL BATTELLE OR CONTRIBUTORS BE LIABLE FOR
+    ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+    DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+    SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+    CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+    LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+    OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+    DAMAGE.
+
+The views and conclusions contained in the software and documentation are those
+of the authors and should not be interpreted as representing official policies,
+either expressed or implied, of the FreeBSD Project.
+
+This material was prepared as an account of work sponsored by an agency of the
+United States Government. Neither the United States Government nor the United
+States Department of Energy, nor Battelle, nor any of their employees, nor any
+jurisdiction or organization that has cooperated in the development of these
+materials, makes any warranty, express or implied, or assumes any legal
+liability or responsibility for the accuracy, completeness, or usefulness or
+any information, apparatus, product, software, or process disclosed, or
+represents that its use would not infringe privately owned rights.
+
+Reference herein to any specific commercial product, process, or service by
+trade name, trademark, manufacturer, or otherwise does not necessarily
+constitute or imply its endorsement, recommendation, or favoring by the
+United States Government or any agency thereof, or Battelle Memorial Institute.
+The views and opinions of authors expressed herein do not necessarily state or
+reflect those of the United States Government or any agency thereof.
+
+PACIFIC NORTHWEST NATIONAL LABORATORY
+operated by
+BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+under Contract DE-AC05-76RL01830
+}}}
+"""
+import random
+import pytest
+from sympy.core import numbers
+from sympy.parsing.sympy_parser import parse_expr
+
+from ilc.formula import compile_formula, Formula
+from ilc.criteria_handler import FormulaCriterion
+from ilc.curtailment_handler import CurtailmentManager, ConditionalCurtailment, evaluate_condition
+from ilc.ilc_agent import ILCAgent
+
+FORMULAS = [
+    ("1/(AverageZoneTemperature-CoolingTemperatureSetPoint)", ["CoolingTemperatureSetPoint", "AverageZoneTemperature"]),
+    ("Abs(WholeBuildingPower)", ["WholeBuildingPower"]),
+    ("SupplyFanSpeed/100*RatedPower+1/2", ["SupplyFanSpeed", "RatedPower"]),
+    ("Max(ZoneTemperature-2,Min(SetPoint,75))", ["ZoneTemperature", "SetPoint"]),
+    ("sqrt(Power1**2+Power2**2)*0.9", ["Power1", "Power2"]),
+    ("Power1+Power2+Power3", ["Power1", "Power2", "Power3"])
+]
+
+
+@pytest.mark.parametrize("operation, args", FORMULAS)
+def test_compiled_matches_sympy(operation, args):
+    rng = random.Random(operation)
+    formula = compile_formula(operation, args)
+    for _ in range(50):
+        point_list = [(arg, round(rng.uniform(-100.0, 100.0), 2)) for arg in args]
+        if "sqrt" not in operation:
+            point_list[-1] = (args[-1], rng.randint(1, 90))
+        expected = formula.subs(point_list)
+        assert formula.evaluate(point_list) == pytest.approx(float(expected), rel=1e-12)
+        assert formula.evaluate_dict(dict(point_list)) == formula.evaluate(point_list)
+
+
+def test_compile_cache_shared():
+    operation, args = FORMULAS[0]
+    assert compile_formula(operation, args) is compile_formula(operation, list(args))
+    assert compile_formula(operation, args) is not compile_formula(operation, args[::-1])
+
+
+def test_missing_argument_falls_back_to_sympy():
+    formula = Formula("a+b", ["a"])
+    assert formula.evaluate([("a", 1.0)]) == formula.subs([("a", 1.0)])
+
+
+def test_criterion_division_by_zero_matches_sympy():
+    criterion = FormulaCriterion(operation="1/(ZoneTemperature-SetPoint)",
+                                 operation_args=["SetPoint", "ZoneTemperature"],
+                                 minimum=0, maximum=10)
+    criterion.ingest_data(None, {"SetPoint": 72.0, "ZoneTemperature": 72.0})
+    symbolic = criterion.numeric_check(criterion.expr.subs(criterion.point_list))
+    assert criterion.evaluate_criterion() == criterion.evaluate_bounds(symbolic) == 0.0
+
+    criterion.ingest_data(None, {"SetPoint": 72.0, "ZoneTemperature": 76.0})
+    symbolic = criterion.numeric_check(criterion.expr.subs(criterion.point_list))
+    assert isinstance(symbolic, numbers.Float)
+    assert criterion.evaluate_criterion() == pytest.approx(float(criterion.evaluate_bounds(symbolic)))
+
+
+CONDITIONS = [
+    (["FirstStageCooling"], ["FirstStageCooling"]),
+    (["FirstStageCooling > 0", "&", "ZoneTemperature < 75"], ["FirstStageCooling", "ZoneTemperature"]),
+    (["SupplyFanSpeed > 50", "|", "ZoneTemperature - SetPoint > 2"], ["SupplyFanSpeed", "ZoneTemperature", "SetPoint"])
+]
+
+CURTAIL = {"point": "ZoneTemperatureSetPoint", "curtailment_method": "offset", "offset": 2.0, "load": 6.0}
+
+
+def random_data(rng, args):
+    return dict((arg, rng.choice([0, 1, round(rng.uniform(0.0, 100.0), 1)])) for arg in args)
+
+
+def reference_condition(condition, data, args):
+    return bool(parse_expr(condition).subs([(arg, data[arg]) for arg in args]))
+
+
+@pytest.mark.parametrize("condition, args", CONDITIONS)
+def test_device_status_matches_sympy(condition, args):
+    rng = random.Random(str(condition))
+    manager = CurtailmentManager({"HP0": {"curtail": dict(CURTAIL),
+                                          "device_status": {"condition": condition, "device_status_args": args}}})
+    for _ in range(50):
+        data = random_data(rng, args)
+        manager.ingest_data(data)
+        assert manager.command_status["HP0"] == reference_condition(manager.condition["HP0"], data, args)
+
+
+@pytest.mark.parametrize("condition, args", CONDITIONS)
+def test_conditional_curtailment_matches_sympy(condition, args):
+    rng = random.Random(str(condition))
+    conditional = ConditionalCurtailment(condition=condition, conditional_args=args, **CURTAIL)
+    assert conditional.check_condition() is False
+    for _ in range(50):
+        data = random_data(rng, args)
+        data["Unused"] = "ignored"
+        conditional.ingest_data(data)
+        assert bool(conditional.check_condition()) == reference_condition(conditional.conditional_expr, data, args)
+
+
+def test_condition_falls_back_to_sympy():
+    formula = compile_formula("a > 0", ["a"])
+    assert evaluate_condition(formula, {"a": 5.0})
+
+    def not_comparable(*values):
+        raise TypeError("unorderable types")
+    formula = Formula("a > 0", ["a"])
+    formula.func = not_comparable
+    assert evaluate_condition(formula, {"a": "5"})
+
+
+@pytest.mark.parametrize("value", ["0", "5", "-1.5", "on", None])
+def test_string_condition_values_match_sympy(value):
+    # On python 2, '0' > 0 is True without raising, so strings must not reach the compiled function.
+    formula = compile_formula("(FanStatus>0)", ["FanStatus"])
+    reference = formula.subs([("FanStatus", value)])
+    try:
+        expected = bool(reference)
+    except TypeError:
+        expected = None
+    manager = CurtailmentManager({"HP0": {"curtail": dict(CURTAIL),
+                                          "device_status": {"condition": ["(FanStatus>0)"],
+                                                            "device_status_args": ["FanStatus"]}}})
+    manager.ingest_data({"FanStatus": value})
+    assert manager.command_status["HP0"] is (expected or False)
+    if expected is not None:
+        assert bool(evaluate_condition(formula, {"FanStatus": value})) is expected
+
+
+def test_string_formula_values_match_sympy():
+    formula = compile_formula("SupplyFanSpeed/100*RatedPower", ["SupplyFanSpeed", "RatedPower"])
+    assert formula.evaluate([("SupplyFanSpeed", "50"), ("RatedPower", 10)]) == 5.0
+    assert formula.evaluate([("SupplyFanSpeed", "fast"), ("RatedPower", 10)]) == \
+        formula.subs([("SupplyFanSpeed", "fast"), ("RatedPower", 10)])
+
+
+def test_criterion_type_error_falls_back_to_sympy():
+    criterion = FormulaCriterion(operation="ZoneTemperature-SetPoint",
+                                 operation_args=["SetPoint", "ZoneTemperature"],
+                                 minimum=0, maximum=10)
+
+    def not_comparable(*values):
+        raise TypeError("unsupported operand")
+    criterion.formula = Formula("ZoneTemperature-SetPoint", ["SetPoint", "ZoneTemperature"])
+    criterion.formula.func = not_comparable
+    criterion.ingest_data(None, {"SetPoint": 72.0, "ZoneTemperature": 76.0})
+    assert criterion.evaluate() == 4.0
+
+
+def test_parse_date_reuses_last_header():
+    agent = ILCAgent.__new__(ILCAgent)
+    agent.last_date = (None, None)
+    first = agent.parse_date("2017-07-01T12:00:00+00:00")
+    assert agent.parse_date("2017-07-01T12:00:00+00:00") is first
+    second = agent.parse_date("2017-07-01T12:01:00+00:00")
+    assert (second - first).total_seconds() == 60.0
+    assert agent.parse_date("2017-07-01T12:00:00+00:00") == first
@@ -0,0 +1,166 @@
+"""
+-*- coding: utf-8 -*- {{{
+vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+Copyright (c) 2017, Battelle Memorial Institute
+All rights reserved.
+
+1.  Battelle Memorial Institute (hereinafter Battelle) hereby grants
+    permission to any person or entity lawfully obtaining a copy of this
+    software and associated documentation files (hereinafter "the Software")
+    to redistribute and use the Software in source and binary forms, with or
+    without modification.  Such person or entity may use, copy, modify, merge,
+    publish, distribute, sublicense, and/or sell copies of the Software, and
+    may permit others to do so, subject to the following conditions:
+
+    -   Redistributions of source code must retain the above copyright notice,
+        this list of conditions and the following disclaimers.
+
+    -	Redistributions in binary form must reproduce the above copyright
+        notice, this list of conditions and the following disclaimer in the
+        documentation and/or other materials provided with the distribution.
+
+    -	Other than as used herein, neither the name Battelle Memorial Institute
+        or Battelle may be used in any form whatsoever without the express
+        written consent of Battelle.
+
+2.	THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+    AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+    IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+    ARE DISCLAIMED. IN NO EVENT SHALL BATTELLE OR CONTRIBUTORS BE LIABLE FOR
+    ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+    DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+    SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+    CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+    LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+    OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+    DAMAGE.
+
+The views and conclusions contained in the software and documentation are those
+of the authors and should not be interpreted as representing official policies,
+either expressed or implied, of the FreeBSD Project.
+
+This material was prepared as an account of work sponsored by an agency of the
+United States Government. Neither the United States Government nor the United
+States Department of Energy, nor Battelle, nor any of their employees, nor any
+jurisdiction or organization that has cooperated in the development of these
+materials, makes any warranty, express or implied, or assumes any legal
+liability or responsibility for the accuracy, completeness, or usefulness or
+any information, apparatus, product, software, or process disclosed, or
+represents that its use would not infringe privately owned rights.
+
+Reference herein to any specific commercial product, process, or service by
+trade name, trademark, manufacturer, or otherwise does not necessarily
+constitute or imply its endorsement, recommendation, or favoring by the
+United States Government or any agency thereof, or Battelle Memorial Institute.
+The views and opinions of authors expressed herein do not necessarily state or
+reflect those of the United States Government or any agency thereof.
+
+PACIFIC NORTHWEST NATIONAL LABORATORY
+operated by
+BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+under Contract DE-AC05-76RL01830
+}}}
+"""
+import random
+from collections import deque
+from datetime import datetime, timedelta as td
+import pytest
+
+from ilc.criteria_handler import DeviceCriteria, HistoryCriterion, PointHistory, HISTORY_MARGIN
+
+
+class ReferenceHistory(object):
+    """Original deque based HistoryCriterion evaluation."""
+    def __init__(self, previous_time):
+        self.history = deque()
+        self.previous_time_delta = td(minutes=previous_time)
+        self.current_value = None
+        self.history_time = None
+
+    def evaluate(self):
+        if self.current_value is None:
+            return 0.0
+        pre_timestamp, pre_value = self.history.pop()
+        if pre_timestamp > self.history_time:
+            self.history.append((pre_timestamp, pre_value))
+            return 0.0
+        post_timestamp, post_value = self.history.pop()
+        while post_timestamp < self.history_time:
+            pre_value, pre_timestamp = post_value, post_timestamp
+            post_timestamp, post_value = self.history.pop()
+        self.history.append((post_timestamp, post_value))
+        end_delta_t = (post_timestamp - pre_timestamp).total_seconds()
+        target_delta_t = (self.history_time - pre_timestamp).total_seconds()
+        prev_value = (post_value - pre_value) * (target_delta_t / end_delta_t) + pre_value
+        return abs(prev_value - self.current_value)
+
+    def ingest_data(self, time_stamp, data):
+        self.history_time = time_stamp - self.previous_time_delta
+        self.current_value = data["ZoneTemperature"]
+        self.history.appendleft((time_stamp, self.current_value))
+
+
+def zone_temperatures(count, interval=td(minutes=1), seed=0):
+    rng = random.Random(seed)
+    start = datetime(2017, 7, 1, 8, 0)
+    temperature = 72.0
+    for step in range(count):
+        temperature += rng.uniform(-0.3, 0.3)
+        yield start + step * interval, {"ZoneTemperature": temperature}
+
+
+@pytest.mark.parametrize("interval_seconds", [30, 60, 300])
+def test_matches_reference(interval_seconds):
+    rng = random.Random(1)
+    criterion = HistoryCriterion(comparison_type="direct", point_name="ZoneTemperature", previous_time=15, minimum=0.0)
+    reference = ReferenceHistory(15)
+    for time_stamp, data in zone_temperatures(2000, td(seconds=interval_seconds)):
+        criterion.ingest_data(time_stamp, data)
+        reference.ingest_data(time_stamp, data)
+        if rng.random() < 0.2:
+            assert criterion.evaluate_criterion() == pytest.approx(reference.evaluate())
+
+
+def test_memory_is_bounded():
+    criterion = HistoryCriterion(comparison_type="direct", point_name="ZoneTemperature", previous_time=15)
+    window_samples = int((td(minutes=15) + HISTORY_MARGIN).total_seconds() / 60) + 2
+    for time_stamp, data in zone_temperatures(60 * 24 * 30):
+        criterion.ingest_data(time_stamp, data)
+        assert len(criterion.history) <= window_samples
+    assert len(criterion.history.times) <= 2 * window_samples + 64
+
+
+def test_out_of_order_sample():
+    history = PointHistory()
+    start = datetime(2017, 7, 1)
+    for minutes in (0, 1, 3, 2, 4):
+        history.append(start + td(minutes=minutes), float(minutes))
+    assert history.times[history.start:] == [start + td(minutes=m) for m in range(5)]
+    assert history.bracket(start + td(minutes=2, seconds=30)) == ((start + td(minutes=2), 2.0),
+                                                                  (start + td(minutes=3), 3.0))
+    assert history.bracket(start - td(minutes=1)) is None
+
+
+def test_shared_history():
+    config = {
+        token: {
+            "history-short": {"comparison_type": "direct", "operation_type": "history",
+                              "point_name": "ZoneTemperature", "previous_time": 5},
+            "history-long": {"comparison_type": "direct", "operation_type": "history",
+                             "point_name": "ZoneTemperature", "previous_time": 30}
+        } for token in ("FirstStageCooling", "SecondStageCooling")
+    }
+    device = DeviceCriteria(config)
+    histories = set(id(criterion.history) for criteria in device.criteria.values()
+                    for criterion in criteria.criteria.values())
+    assert len(histories) == 1
+    history = device.histories["ZoneTemperature"]
+    assert history.retention == td(minutes=30) + HISTORY_MARGIN
+
+    for time_stamp, data in zone_temperatures(120):
+        device.ingest_data(time_stamp, data)
+    assert len(history) == 30 + HISTORY_MARGIN.seconds // 60 + 2
+    for token in config:
+        evaluations = device.evaluate(token)
+        assert evaluations["history-long"] > 0.0 and evaluations["history-short"] > 0.0
@@ -0,0 +1,228 @@
+"""
+-*- coding: utf-8 -*- {{{
+vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+Copyright (c) 2017, Battelle Memorial Institute
+All rights reserved.
+
+1.  Battelle Memorial Institute (hereinafter Battelle) hereby grants
+    permission to any person or entity lawfully obtaining a copy of this
+    software and associated documentation files (hereinafter "the Software")
+    to redistribute and use the Software in source and binary forms, with or
+    without modification.  Such person or entity may use, copy, modify, merge,
+    publish, distribute, sublicense, and/or sell copies of the Software, and
+    may permit others to do so, subject to the following conditions:
+
+    -   Redistributions of source code must retain the above copyright notice,
+        this list of conditions and the following disclaimers.
+
+    -	Redistributions in binary form must reproduce the above copyright
+        notice, this list of conditions and the following disclaimer in the
+        documentation and/or other materials provided with the distribution.
+
+    -	Other than as used herein, neither the name Battelle Memorial Institute
+        or Battelle may be used in any form whatsoever without the express
+        written consent of Battelle.
+
+2.	THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+    AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+    IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+    ARE DISCLAIMED. IN NO EVENT SHALL BATTELLE OR CONTRIBUTORS BE LIABLE FOR
+    ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+    DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+    SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+    CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+    LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+    OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+    DAMAGE.
+
+The views and conclusions contained in the software and documentation are those
+of the authors and should not be interpreted as representing official policies,
+either expressed or implied, of the FreeBSD Project.
+
+This material was prepared as an account of work sponsored by an agency of the
+United States Government. Neither the United States Government nor the United
+States Department of Energy, nor Battelle, nor any of their employees, nor any
+jurisdiction or organization that has cooperated in the development of these
+materials, makes any warranty, express or implied, or assumes any legal
+liability or responsibility for the accuracy, completeness, or usefulness or
+any information, apparatus, product, software, or process disclosed, or
+represents that its use would not infringe privately owned rights.
+
+Reference herein to any specific commercial product, process, or service by
+trade name, trademark, manufacturer, or otherwise does not necessarily
+constitute or imply its endorsement, recommendation, or favoring by the
+United States Government or any agency thereof, or Battelle Memorial Institute.
+The views and opinions of authors expressed herein do not necessarily state or
+reflect those of the United States Government or any agency thereof.
+
+PACIFIC NORTHWEST NATIONAL LABORATORY
+operated by
+BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+under Contract DE-AC05-76RL01830
+}}}
+"""
+import os
+import csv
+import json
+import math
+import random
+from datetime import datetime, timedelta as td
+
+from ilc.replay import ILCReplay, FakeActuator, read_csv
+
+PAIRWISE = {
+    "history-zonetemperature": {"rated-power": 3},
+    "rated-power": {},
+    "zonetemperature-setpoint": {"history-zonetemperature": 5, "rated-power": 6, "stage": 2},
+    "stage": {"history-zonetemperature": 3, "rated-power": 4}
+}
+
+
+def write_csv(file_name, fields, rows):
+    with open(file_name, "wb") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(fields)
+        writer.writerows(rows)
+
+
+def build_site(path, device_count, minutes, seed=0, demand_limit=30.0):
+    """
+    Write an ILC configuration for device_count heat pumps and one sample
+    per minute of meter and device data.  The building load peaks above
+    demand_limit in the middle of every day.
+    :return: configuration dictionary, meter CSV, dict of device name to CSV.
+    """
+    rng = random.Random(seed)
+    criteria = {}
+    curtailment = {}
+    for n in range(device_count):
+        device_name = "HP{}".format(n)
+        criteria[device_name] = {"FirstStageCooling": {
+            "zonetemperature-setpoint": {"operation_type": "formula", "minimum": 0, "maximum": 10,
+                                         "operation": "1/(AverageZoneTemperature-CoolingTemperatureSetPoint)",
+                                         "operation_args": ["CoolingTemperatureSetPoint", "AverageZoneTemperature"]},
+            "rated-power": {"operation_type": "status", "point_name": "FirstStageCooling",
+                            "on_value": rng.choice([4.4, 6.0]), "off_value": 0.0},
+            "stage": {"operation_type": "constant", "value": 1.0},
+            "history-zonetemperature": {"operation_type": "history", "comparison_type": "direct",
+                                        "point_name": "AverageZoneTemperature", "previous_time": 15,
+                                        "minimum": 0, "maximum": 10}
+        }}
+        curtailment[device_name] = {"FirstStageCooling": {
+            "device_status": {"condition": "FirstStageCooling", "device_status_args": ["FirstStageCooling"]},
+            "curtail": {"point": "ZoneTemperatureSetPoint", "curtailment_method": "offset", "offset": 2.0,
+                        "load": 6.0}
+        }}
+    files = {}
+    for name, content in (("criteria", criteria), ("curtailment", curtailment), ("pairwise", PAIRWISE)):
+        files[name] = os.path.join(str(path), "{}.json".format(name))
+        with open(files[name], "w") as config_file:
+            json.dump(content, config_file)
+    config = {
+        "campus": "CAMPUS", "building": "BUILDING", "agent_id": "ILC",
+        "power_meter": {"device": "METERS", "point": "WholeBuildingPower"},
+        "demand_limit": demand_limit, "curtailment_time": 20.0, "curtailment_confirm": 5.0,
+        "curtailment_break": 20.0, "average_building_power_window": 15.0, "stagger_release": True,
+        "clusters": [{"device_curtailment_file": files["curtailment"], "device_criteria_file": files["criteria"],
+                      "pairwise_criteria_file": files["pairwise"], "cluster_priority": 1.0}]
+    }
+
+    start = datetime(2017, 7, 1)
+    times = [start + td(minutes=minute) for minute in range(minutes)]
+    meter_rows = []
+    for current_time in times:
+        hour = current_time.hour + current_time.minute / 60.0
+        power = 20.0 + 20.0 * max(0.0, math.sin((hour - 8.0) / 10.0 * math.pi)) + rng.gauss(0.0, 1.0)
+        meter_rows.append([current_time.isoformat(), round(power, 3)])
+    meter_csv = os.path.join(str(path), "meter.csv")
+    write_csv(meter_csv, ["timestamp", "WholeBuildingPower"], meter_rows)
+
+    device_csvs = {}
+    for n in range(device_count):
+        device_name = "HP{}".format(n)
+        temperature = rng.uniform(72.0, 76.0)
+        rows = []
+        for current_time in times:
+            temperature = min(80.0, max(71.5, temperature + rng.uniform(-0.2, 0.2)))
+            rows.append([current_time.isoformat(), 1, round(temperature, 2), 71.0, 72.0])
+        device_csvs[device_name] = os.path.join(str(path), "{}.csv".format(device_name))
+        write_csv(device_csvs[device_name], ["timestamp", "FirstStageCooling", "AverageZoneTemperature",
+                                             "CoolingTemperatureSetPoint", "ZoneTemperatureSetPoint"], rows)
+    return config, meter_csv, device_csvs
+
+
+def replay_site(replay, meter_csv, device_csvs):
+    return replay.run(read_csv(meter_csv), dict((name, read_csv(file_name))
+                                                for name, file_name in device_csvs.items()))
+
+
+def test_replay_curtails_and_releases(tmpdir):
+    config, meter_csv, device_csvs = build_site(tmpdir, 10, 24 * 60)
+    replay = ILCReplay(config)
+    report = replay_site(replay, meter_csv, device_csvs)
+
+    assert report["meter_samples"] == 24 * 60
+    assert report["device_samples"] == 10 * 24 * 60
+    assert report["simulated_seconds"] == (24 * 60 - 1) * 60
+    assert report["curtailments"] > 0
+    assert report["releases"] == report["curtailments"]
+    assert report["stages"]["curtail"]["calls"] > 0
+    assert report["stages"]["scoring"]["calls"] > 0
+
+    curtailments = [decision for decision in report["decisions"] if decision["action"] == "curtail"]
+    writes = [write for write in replay.actuator.writes if write[1] == "set_point"]
+    for decision in curtailments:
+        assert decision["power"] > decision["demand_limit"]
+        assert decision["value"] == decision["revert_value"] + 2.0
+    assert len(writes) >= len(curtailments)
+    assert not replay.actuator.overrides
+    assert not replay.agent.devices_curtailed
+
+
+def test_overrides_reach_device_data(tmpdir):
+    config, meter_csv, device_csvs = build_site(tmpdir, 4, 14 * 60)
+    replay = ILCReplay(config)
+    replay_site(replay, meter_csv, device_csvs)
+    curtail_time = [decision for decision in replay.decisions if decision["action"] == "curtail"][0]["time"]
+
+    replay = ILCReplay(config)
+    cut_off = read_csv(meter_csv)
+    meter = (sample for sample in cut_off if sample[1] <= curtail_time)
+    devices = dict((name, (sample for sample in read_csv(file_name) if sample[1] <= curtail_time))
+                   for name, file_name in device_csvs.items())
+    replay.run(meter, devices)
+    assert replay.actuator.overrides
+    for topic, value in replay.actuator.overrides.items():
+        assert replay.actuator.get_point(topic) == value
+
+
+def test_targets_and_load_response(tmpdir):
+    config, meter_csv, device_csvs = build_site(tmpdir, 10, 24 * 60, demand_limit=None)
+    replay = ILCReplay(config)
+    assert replay_site(replay, meter_csv, device_csvs)["curtailments"] == 0
+
+    replay = ILCReplay(config)
+    replay.add_target("2017-07-01T14:00:00", "2017-07-01T16:00:00", 30.0)
+    report = replay_site(replay, meter_csv, device_csvs)
+    assert report["curtailments"] > 0
+    assert all("2017-07-01T14:00:00" <= decision["time"] < "2017-07-01T16:00:00"
+               for decision in report["decisions"] if decision["action"] == "curtail")
+
+    responsive = ILCReplay(config, load_response=True)
+    responsive.add_target("2017-07-01T14:00:00", "2017-07-01T16:00:00", 30.0)
+    assert replay_site(responsive, meter_csv, device_csvs)["curtailments"] <= report["curtailments"]
+
+
+def test_failed_writes_are_skipped(tmpdir):
+    class FailingActuator(FakeActuator):
+        def set_point(self, requester_id, topic, value):
+            if "/HP0/" in topic or topic.startswith("HP0/"):
+                raise RuntimeError("device offline")
+            return FakeActuator.set_point(self, requester_id, topic, value)
+
+    config, meter_csv, device_csvs = build_site(tmpdir, 3, 14 * 60)
+    replay = ILCReplay(config, actuator=FailingActuator())
+    report = replay_site(replay, meter_csv, device_csvs)
+    assert report["curtailments"] > 0
+    assert all(decision["device"] != "HP0" for decision in report["decisions"])
@@ -0,0 +1,166 @@
+"""
+-*- coding: utf-8 -*- {{{
+vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+Copyright (c) 2017, Battelle Memorial Institute
+All rights reserved.
+
+1.  Battelle Memorial Institute (hereinafter Battelle) hereby grants
+    permission to any person or entity lawfully obtaining a copy of this
+    software and associated documentation files (hereinafter "the Software")
+    to redistribute and use the Software in source and binary forms, with or
+    without modification.  Such person or entity may use, copy, modify, merge,
+    publish, distribute, sublicense, and/or sell copies of the Software, and
+    may permit others to do so, subject to the following conditions:
+
+    -   Redistributions of source code must retain the above copyright notice,
+        this list of conditions and the following disclaimers.
+
+    -	Redistributions in binary form must reproduce the above copyright
+        notice, this list of conditions and the following disclaimer in the
+        documentation and/or other materials provided with the distribution.
+
+    -	Other than as used herein, neither the name Battelle Memorial Institute
+        or Battelle may be used in any form whatsoever without the express
+        written consent of Battelle.
+
+2.	THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+    AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+    IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+    ARE DISCLAIMED. IN NO EVENT SHALL BATTELLE OR CONTRIBUTORS BE LIABLE FOR
+    ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+    DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+    SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+    CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+    LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+    OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+    DAMAGE.
+
+The views and conclusions contained in the software and documentation are those
+of the authors and should not be interpreted as representing official policies,
+either expressed or implied, of the FreeBSD Project.
+
+This material was prepared as an account of work sponsored by an agency of the
+United States Government. Neither the United States Government nor the United
+States Department of Energy, nor Battelle, nor any of their employees, nor any
+jurisdiction or organization that has cooperated in the development of these
+materials, makes any warranty, express or implied, or assumes any legal
+liability or responsibility for the accuracy, completeness, or usefulness or
+any information, apparatus, product, software, or process disclosed, or
+represents that its use would not infringe privately owned rights.
+
+Reference herein to any specific commercial product, process, or service by
+trade name, trademark, manufacturer, or otherwise does not necessarily
+constitute or imply its endorsement, recommendation, or favoring by the
+United States Government or any agency thereof, or Battelle Memorial Institute.
+The views and opinions of authors expressed herein do not necessarily state or
+reflect those of the United States Government or any agency thereof.
+
+PACIFIC NORTHWEST NATIONAL LABORATORY
+operated by
+BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+under Contract DE-AC05-76RL01830
+}}}
+"""
+import random
+from datetime import datetime
+import pytest
+
+from ilc.ilc_matrices import calc_column_sums, normalize_matrix
+from ilc.criteria_handler import CriteriaContainer, CriteriaCluster
+
+CRITERIA_MATRIX = {
+    "rated-power": {"stage": 3},
+    "stage": {},
+    "zonetemperature-setpoint": {"rated-power": 6, "stage": 2}
+}
+CRITERIA_LABELS = ["rated-power", "stage", "zonetemperature-setpoint"]
+
+
+def criteria_weights():
+    index_of = dict((label, i) for i, label in enumerate(CRITERIA_LABELS))
+    matrix = [[0.0 for _ in CRITERIA_LABELS] for _ in CRITERIA_LABELS]
+    for row_label, comparisons in CRITERIA_MATRIX.items():
+        row = index_of[row_label]
+        matrix[row][row] = 1.0
+        for col_label, value in comparisons.items():
+            col = index_of[col_label]
+            matrix[row][col] = float(value)
+            matrix[col][row] = 1.0 / float(value)
+    return normalize_matrix(matrix, calc_column_sums(matrix))
+
+
+def device_criteria(on_value, stage):
+    return {
+        "zonetemperature-setpoint": {
+            "operation": "1/(ZoneTemperature-CoolingSetPoint)",
+            "operation_type": "formula",
+            "operation_args": ["CoolingSetPoint", "ZoneTemperature"],
+            "minimum": 0,
+            "maximum": 10
+        },
+        "rated-power": {
+            "on_value": on_value,
+            "off_value": 0.0,
+            "operation_type": "status",
+            "point_name": "Cooling"
+        },
+        "stage": {
+            "value": stage,
+            "operation_type": "constant"
+        }
+    }
+
+
+def build_container(device_count, clusters=1, seed=0):
+    rng = random.Random(seed)
+    container = CriteriaContainer()
+    weights = criteria_weights()
+    names = []
+    for cluster in range(clusters):
+        config = {}
+        for n in range(device_count // clusters):
+            name = "RTU{}_{}".format(cluster, n)
+            config[name] = {"Cooling": device_criteria(rng.choice([2.0, 4.4, 6.0]), rng.choice([1.0, 2.0]))}
+            names.append(name)
+        container.add_criteria_cluster(CriteriaCluster(1.0 + cluster, CRITERIA_LABELS, weights, config))
+    return container, names
+
+
+def ingest_random(container, names, seed=0):
+    rng = random.Random(seed)
+    now = datetime(2017, 7, 1, 14, 0)
+    for name in names:
+        data = {
+            "Cooling": rng.choice([0, 1]),
+            "ZoneTemperature": round(rng.uniform(72.0, 80.0), 1),
+            "CoolingSetPoint": 71.0
+        }
+        container.get_device(name).ingest_data(now, data)
+
+
+@pytest.mark.parametrize("device_count, clusters", [(10, 1), (100, 1), (120, 3)])
+def test_score_order_matches_reference(device_count, clusters):
+    container, names = build_container(device_count, clusters)
+    for seed in range(3):
+        ingest_random(container, names, seed)
+        assert container.get_score_order() == container.get_score_order_reference()
+
+
+def test_top_k_matches_full_order():
+    container, names = build_container(200, 2)
+    ingest_random(container, names)
+    full_order = container.get_score_order()
+    for count in (1, 5, 50, 200, 500):
+        assert container.get_score_order(count) == full_order[:count]
+
+
+def test_rows_update_in_place():
+    container, names = build_container(10)
+    ingest_random(container, names, 1)
+    first = container.get_score_order()
+    matrix = container.clusters[0].score_matrix.matrix
+    ingest_random(container, names, 2)
+    assert container.get_score_order() == container.get_score_order_reference()
+    assert container.clusters[0].score_matrix.matrix is matrix
+    assert container.get_score_order() != first